@@ -170,8 +170,13 @@ class Kaos(Protocol):
         """Search for files/directories matching a pattern in the given path."""
         ...
 
-    async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
-        """Read the entire file contents as bytes, or the first n bytes if provided."""
+    async def readbytes(
+        self, path: StrOrKaosPath, n: int | None = None, *, offset: int = 0
+    ) -> bytes:
+        """
+        Read the entire file contents as bytes, or the first n bytes if provided.
+        Reading starts at byte `offset` of the file if provided.
+        """
         ...
 
     async def readtext(
@@ -299,8 +304,8 @@ def glob(
     return get_current_kaos().glob(path, pattern, case_sensitive=case_sensitive)
 
 
-async def readbytes(path: StrOrKaosPath, n: int | None = None) -> bytes:
-    return await get_current_kaos().readbytes(path, n=n)
+async def readbytes(path: StrOrKaosPath, n: int | None = None, *, offset: int = 0) -> bytes:
+    return await get_current_kaos().readbytes(path, n=n, offset=offset)
 
 
 async def readtext(
@@ -108,9 +108,13 @@ class LocalKaos:
         for entry in entries:
             yield KaosPath.unsafe_from_local_path(entry)
 
-    async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
+    async def readbytes(
+        self, path: StrOrKaosPath, n: int | None = None, *, offset: int = 0
+    ) -> bytes:
         local_path = path.unsafe_to_local_path() if isinstance(path, KaosPath) else Path(path)
         async with aiofiles.open(local_path, mode="rb") as f:
+            if offset:
+                await f.seek(offset)
             return await f.read() if n is None else await f.read(n)
 
     async def readtext(
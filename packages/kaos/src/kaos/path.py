@@ -154,9 +154,12 @@ class KaosPath:
         """Return all paths matching the pattern under this directory."""
         return kaos.glob(self, pattern, case_sensitive=case_sensitive)
 
-    async def read_bytes(self, n: int | None = None) -> bytes:
-        """Read the entire file contents as bytes, or the first n bytes if provided."""
-        return await kaos.readbytes(self, n=n)
+    async def read_bytes(self, n: int | None = None, *, offset: int = 0) -> bytes:
+        """
+        Read the entire file contents as bytes, or the first n bytes if provided.
+        Reading starts at byte `offset` of the file if provided.
+        """
+        return await kaos.readbytes(self, n=n, offset=offset)
 
     async def read_text(
         self,
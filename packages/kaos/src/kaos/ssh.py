@@ -217,9 +217,11 @@ class SSHKaos:
         for entry in await self._sftp.glob(f"{real_path}/{pattern}"):
             yield KaosPath(await self._sftp.realpath(str(entry)))
 
-    async def readbytes(self, path: StrOrKaosPath, n: int | None = None) -> bytes:
+    async def readbytes(
+        self, path: StrOrKaosPath, n: int | None = None, *, offset: int = 0
+    ) -> bytes:
         async with self._sftp.open(str(path), "rb") as f:
-            return await f.read() if n is None else await f.read(n)
+            return await f.read(-1 if n is None else n, offset)
 
     async def readtext(
         self,
@@ -92,3 +92,4 @@ async def test_read_write_bytes(kaos_cwd: KaosPath):
     file_path = KaosPath("data.bin")
     await file_path.write_bytes(b"\x00\x01\xff")
     assert await file_path.read_bytes() == b"\x00\x01\xff"
+    assert await file_path.read_bytes(2, offset=1) == b"\x01\xff"
@@ -94,6 +94,9 @@ async def test_read_write_bytes(local_kaos: LocalKaos):
     file_path = tmp_path / "data.bin"
     await local_kaos.writebytes(file_path, b"\x00\x01\xff")
     assert await local_kaos.readbytes(file_path) == b"\x00\x01\xff"
+    assert await local_kaos.readbytes(file_path, 1, offset=1) == b"\x01"
+    assert await local_kaos.readbytes(file_path, offset=2) == b"\xff"
+    assert await local_kaos.readbytes(file_path, offset=3) == b""
 
 
 def _python_code_args(code: str) -> tuple[str, str, str]:
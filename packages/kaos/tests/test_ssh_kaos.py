@@ -186,6 +186,9 @@ async def test_kaospath_roundtrip(bind_current_kaos: SSHKaos, remote_base: str):
 
     roundtrip = await bytes_path.read_bytes()
     assert roundtrip == bytes_payload
+    assert await bytes_path.read_bytes(4) == bytes_payload[:4]
+    assert await bytes_path.read_bytes(4, offset=8) == bytes_payload[8:12]
+    assert await bytes_path.read_bytes(offset=30) == bytes_payload[30:]
 
     assert str(KaosPath.cwd()) == remote_base
 
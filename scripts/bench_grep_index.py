@@ -0,0 +1,151 @@
+"""
+Benchmark searches narrowed down by the trigram index of `Grep` against plain ripgrep.
+
+A synthetic tree of `--files` source files is generated, a few of which contain the searched
+identifier, and indexed once while it is watched; each search is then run `--runs` times both
+ways, and the results are checked to be the same.
+
+    uv run scripts/bench_grep_index.py --files 200000
+    uv run scripts/bench_grep_index.py --pattern 'needle_[a-z]+\\('
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from kimi_cli.tools.file.grep_index import GrepIndex, required_trigrams
+from kimi_cli.utils.workspace_index import WorkspaceIndex
+
+WORDS = (
+    "value", "result", "index", "buffer", "parse", "render", "handle", "config", "client",
+    "server", "request", "response", "token", "stream", "cache", "update", "data", "error",
+)  # fmt: skip
+
+
+def generate_tree(root: Path, files: int, lines: int, matching: int, seed: int) -> None:
+    rng = random.Random(seed)
+    matching_files = set(rng.sample(range(files), matching))
+    for i in range(files):
+        directory = root / f"pkg_{i % 100:02d}" / f"mod_{i // 100 % 50:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        body = [
+            f"    {rng.choice(WORDS)}_{rng.randrange(1000)} = "
+            f"{rng.choice(WORDS)}({rng.choice(WORDS)}, {rng.randrange(100)})"
+            for _ in range(lines)
+        ]
+        if i in matching_files:
+            body.insert(rng.randrange(lines), "    needle_lookup(value)")
+        (directory / f"file_{i}.py").write_text(
+            f"def func_{i}():\n" + "\n".join(body) + "\n", encoding="utf-8"
+        )
+
+
+def rg(rg_path: str, cwd: Path, *args: str) -> list[str]:
+    result = subprocess.run(
+        [rg_path, *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False
+    )
+    return sorted(result.stdout.decode("utf-8", errors="surrogateescape").splitlines())
+
+
+async def narrowed_search(rg_path: str, root: Path, index: GrepIndex, pattern: str) -> list[str]:
+    trigrams = required_trigrams(pattern, ignore_case=False)
+    assert trigrams is not None
+    candidates = await index.candidates(
+        str(root),
+        (".", None, None),
+        lambda: asyncio.to_thread(rg, rg_path, root, "--files", "--", "."),
+        trigrams,
+    )
+    if candidates is None:
+        raise RuntimeError("the search was not narrowed down")
+    if not candidates:
+        return []
+    return await asyncio.to_thread(
+        rg, rg_path, root, "--files-with-matches", "--", pattern, *candidates
+    )
+
+
+async def timed(runs: int, search: Callable[[], Awaitable[list[str]]]) -> tuple[float, list[str]]:
+    times: list[float] = []
+    result: list[str] = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        result = await search()
+        times.append(time.perf_counter() - started_at)
+    return statistics.median(times), result
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    rg_path = args.rg or shutil.which("rg")
+    if rg_path is None:
+        print("error: ripgrep not found, pass --rg", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix="kimi-bench-grep-") as tmp:
+        tmp_dir = Path(tmp)
+        root = tmp_dir / "work"
+        started_at = time.perf_counter()
+        generate_tree(root, args.files, args.lines, args.matching, args.seed)
+        print(f"generated:  {args.files} files in {time.perf_counter() - started_at:.2f}s")
+
+        if required_trigrams(args.pattern, ignore_case=False) is None:
+            print(f"error: no trigrams can be derived from {args.pattern!r}", file=sys.stderr)
+            return 1
+        started_at = time.perf_counter()
+        workspace = WorkspaceIndex(root)
+        workspace.start()
+        index = GrepIndex(workspace, tmp_dir / "index.sqlite3")
+        index.start()
+        workspace.wait_ready()
+        # The index is checked again once the directories are watched.
+        while workspace.synced_ns == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(index.wait_ready)
+        print(f"indexed:    {args.files} files in {time.perf_counter() - started_at:.2f}s")
+
+        full_time, full = await timed(
+            args.runs,
+            lambda: asyncio.to_thread(
+                rg, rg_path, root, "--files-with-matches", "--", args.pattern, "."
+            ),
+        )
+        narrowed_time, narrowed = await timed(
+            args.runs, lambda: narrowed_search(rg_path, root, index, args.pattern)
+        )
+        index.close()
+        workspace.close()
+
+    if full != narrowed:
+        print("error: narrowed search returned different results", file=sys.stderr)
+        return 1
+    print(f"matches:    {len(full)}")
+    print(f"ripgrep:    {full_time * 1000:.1f}ms")
+    print(f"narrowed:   {narrowed_time * 1000:.1f}ms")
+    print(f"speedup:    {full_time / narrowed_time:.2f}x")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure searches narrowed down by the index.")
+    parser.add_argument("--files", type=int, default=100_000, help="Files to generate.")
+    parser.add_argument("--lines", type=int, default=200, help="Lines per file.")
+    parser.add_argument("--matching", type=int, default=20, help="Files containing a match.")
+    parser.add_argument("--pattern", default=r"needle_lookup\(", help="Pattern to search for.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs of each search.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated tree.")
+    parser.add_argument("--rg", default=None, help="Path of ripgrep (found in PATH by default).")
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""
+Benchmark event throughput of `kimi --wire` with the scripted echo provider.
+
+The scripted provider streams `--deltas` text chunks in a single turn; the benchmark measures
+how fast they come out of the Wire server's stdout.
+
+    uv run scripts/bench_wire.py --deltas 20000
+    uv run scripts/bench_wire.py --deltas 20000 --coalesce-ms 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+
+def write_config(tmp_dir: Path, deltas: int, delta_text: str) -> Path:
+    script = "\n".join(f'text: "{delta_text}"' for _ in range(deltas))
+    scripts_path = tmp_dir / "scripts.json"
+    scripts_path.write_text(json.dumps([script]), encoding="utf-8")
+    config = {
+        "default_model": "scripted",
+        "models": {
+            "scripted": {
+                "provider": "scripted_provider",
+                "model": "scripted_echo",
+                "max_context_size": 100000,
+            }
+        },
+        "providers": {
+            "scripted_provider": {
+                "type": "_scripted_echo",
+                "base_url": "",
+                "api_key": "",
+                "env": {"KIMI_SCRIPTED_ECHO_SCRIPTS": str(scripts_path)},
+            }
+        },
+    }
+    config_path = tmp_dir / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    return config_path
+
+
+def send(process: subprocess.Popen[bytes], payload: dict[str, Any]) -> None:
+    assert process.stdin is not None
+    process.stdin.write(json.dumps(payload).encode("utf-8") + b"\n")
+    process.stdin.flush()
+
+
+def read_until_response(
+    process: subprocess.Popen[bytes], response_id: str
+) -> tuple[dict[str, Any], int, int]:
+    """Read stdout until the response with `response_id`, returning (response, events, bytes)."""
+    assert process.stdout is not None
+    events = 0
+    total_bytes = 0
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise EOFError("Wire process closed its output stream")
+        total_bytes += len(line)
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if msg.get("method") == "event":
+            events += 1
+        if msg.get("id") == response_id:
+            return msg, events, total_bytes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure `kimi --wire` event throughput.")
+    parser.add_argument("--deltas", type=int, default=10000, help="Text deltas to stream.")
+    parser.add_argument("--delta-text", default="tok ", help="Text of each delta.")
+    parser.add_argument(
+        "--coalesce-ms",
+        type=int,
+        default=None,
+        help="Request delta coalescing with this window (disabled by default).",
+    )
+    parser.add_argument(
+        "--cmd",
+        default=os.getenv("KIMI_E2E_WIRE_CMD", "uv run kimi"),
+        help="Command used to start Kimi Code CLI.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kimi-bench-wire-") as tmp:
+        tmp_dir = Path(tmp)
+        home_dir = tmp_dir / "home"
+        work_dir = tmp_dir / "work"
+        home_dir.mkdir()
+        work_dir.mkdir()
+        config_path = write_config(tmp_dir, args.deltas, args.delta_text)
+
+        env = os.environ.copy()
+        env["HOME"] = str(home_dir)
+        env["USERPROFILE"] = str(home_dir)
+        env["KIMI_SHARE_DIR"] = str(home_dir / ".kimi")
+        cmd = [
+            *shlex.split(args.cmd),
+            "--wire",
+            "--yolo",
+            "--config-file",
+            str(config_path),
+            "--work-dir",
+            str(work_dir),
+        ]
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+        )
+        try:
+            params: dict[str, Any] = {"protocol_version": "1.3"}
+            if args.coalesce_ms is not None:
+                params["delta_coalescing"] = {"window_ms": args.coalesce_ms}
+            send(
+                process,
+                {"jsonrpc": "2.0", "id": "init", "method": "initialize", "params": params},
+            )
+            read_until_response(process, "init")
+
+            started_at = time.perf_counter()
+            send(
+                process,
+                {
+                    "jsonrpc": "2.0",
+                    "id": "prompt",
+                    "method": "prompt",
+                    "params": {"user_input": "bench"},
+                },
+            )
+            resp, events, total_bytes = read_until_response(process, "prompt")
+            elapsed = time.perf_counter() - started_at
+        finally:
+            assert process.stdin is not None
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    status = resp.get("result", {}).get("status")
+    if status != "finished":
+        print(f"error: prompt did not finish: {resp}", file=sys.stderr)
+        return 1
+
+    print(f"deltas:     {args.deltas}")
+    print(f"events:     {events}")
+    print(f"bytes:      {total_bytes}")
+    print(f"elapsed:    {elapsed:.3f}s")
+    print(f"events/s:   {events / elapsed:,.0f}")
+    print(f"deltas/s:   {args.deltas / elapsed:,.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
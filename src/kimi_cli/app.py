@@ -31,6 +31,8 @@ from kimi_cli.wire.types import ContentPart, WireMessage
 if TYPE_CHECKING:
     from fastmcp.mcp_config import MCPConfig
 
+    from kimi_cli.wire.server import WireWriter
+
 
 def enable_logging(debug: bool = False, *, redirect_stderr: bool = True) -> None:
     # NOTE: stderr redirection is implemented by swapping the process-level fd=2 (dup2).
@@ -362,3 +364,11 @@ class KimiCLI:
         async with self._env():
             server = WireServer(self._soul)
             await server.serve()
+
+    async def run_wire(self, reader: asyncio.StreamReader, writer: WireWriter) -> None:
+        """Run the Kimi Code CLI instance as Wire server over the given streams."""
+        from kimi_cli.wire.server import WireServer
+
+        async with self._env():
+            server = WireServer(self._soul)
+            await server.serve((reader, writer))
@@ -790,7 +790,16 @@ def web_worker(session_id: str) -> None:
     set_process_title("kimi-code-worker")
 
     from kimi_cli.app import enable_logging
-    from kimi_cli.web.runner.worker import run_worker
+    from kimi_cli.web.runner.worker import run_host, run_pooled_worker, run_worker
+
+    if session_id == "-":
+        enable_logging(debug=False)
+        asyncio.run(run_pooled_worker())
+        return
+    if session_id == "+":
+        enable_logging(debug=False)
+        asyncio.run(run_host())
+        return
 
     try:
         parsed_session_id = UUID(session_id)
@@ -55,6 +55,43 @@ def web(
             help="Only allow access from local network (default) or allow public access.",
         ),
     ] = True,
+    worker_pool_size: Annotated[
+        int,
+        typer.Option(
+            "--worker-pool-size",
+            min=0,
+            max=8,
+            help="Number of idle session workers to keep ready, so sessions open faster.",
+        ),
+    ] = 0,
+    sessions_per_worker: Annotated[
+        int,
+        typer.Option(
+            "--sessions-per-worker",
+            min=1,
+            max=64,
+            help="Number of sessions a worker process may host, to share memory between them.",
+        ),
+    ] = 1,
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers",
+            min=1,
+            max=32,
+            help="Number of server processes; each session is served by one of them.",
+        ),
+    ] = 1,
+    peer_host: Annotated[
+        str | None,
+        typer.Option(
+            "--peer-host",
+            help=(
+                "Address other servers reach this one at, to serve sessions together with "
+                "servers on other hosts sharing the same storage."
+            ),
+        ),
+    ] = None,
 ):
     """Run Kimi Code CLI web interface."""
     from kimi_cli.web.app import run_web_server
@@ -77,4 +114,8 @@ def web(
         dangerously_omit_auth=dangerously_omit_auth,
         restrict_sensitive_apis=restrict_sensitive_apis,
         lan_only=lan_only,
+        worker_pool_size=worker_pool_size,
+        sessions_per_worker=sessions_per_worker,
+        workers=workers,
+        peer_host=peer_host,
     )
@@ -83,6 +83,17 @@ class LoopControl(BaseModel):
     context_tokens + reserved_context_size >= max_context_size. Default is 50000."""
 
 
+class GrepConfig(BaseModel):
+    """Grep tool configuration."""
+
+    trigram_index: bool = False
+    """Keep a trigram index of each work directory under the share directory, and only search
+    the files that may match. The index follows changes by watching the work directory, and
+    searches are not narrowed down while it cannot be watched, e.g. when it has more
+    directories than inotify watches (`fs.inotify.max_user_watches`). Worth it for very large
+    repositories."""
+
+
 class MoonshotSearchConfig(BaseModel):
     """Moonshot Search configuration."""
 
@@ -166,6 +177,7 @@ class Config(BaseModel):
         default_factory=dict, description="List of LLM providers"
     )
     loop_control: LoopControl = Field(default_factory=LoopControl, description="Agent loop control")
+    grep: GrepConfig = Field(default_factory=GrepConfig, description="Grep tool configuration")
     services: Services = Field(default_factory=Services, description="Services configuration")
     mcp: MCPConfig = Field(default_factory=MCPConfig, description="MCP configuration")
 
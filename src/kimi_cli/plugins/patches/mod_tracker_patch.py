@@ -37,37 +37,8 @@ class SessionModifications:
 
     file_changes: dict[str, FileChange] = field(default_factory=dict)
 
-    def _count_line_changes(self, old_text: str, new_text: str) -> tuple[int, int]:
-        """
-        使用 difflib 准确计算增删行数。
-
-        Returns:
-            (added_lines, removed_lines)
-        """
-        from difflib import SequenceMatcher
-
-        old_lines = old_text.splitlines() if old_text else []
-        new_lines = new_text.splitlines() if new_text else []
-
-        added = 0
-        removed = 0
-
-        sm = SequenceMatcher(None, old_lines, new_lines)
-        for tag, i1, i2, j1, j2 in sm.get_opcodes():
-            if tag == "delete":
-                removed += i2 - i1
-            elif tag == "insert":
-                added += j2 - j1
-            elif tag == "replace":
-                removed += i2 - i1
-                added += j2 - j1
-
-        return added, removed
-
-    def record_change(self, path: str, old_text: str, new_text: str) -> None:
+    def record_change(self, path: str, added: int, removed: int) -> None:
         """记录一次文件修改。"""
-        added, removed = self._count_line_changes(old_text, new_text)
-
         if path not in self.file_changes:
             self.file_changes[path] = FileChange(path=path)
 
@@ -160,65 +131,36 @@ class ModTrackerPatch(PatchBase):
             return False
 
     def _patch_file_tools(self) -> None:
-        """Hook文件修改工具。"""
+        """
+        Hook文件修改工具。
+        增删行数取自工具结果的 extras，由工具生成 diff 时一并算出，无需再次读取文件和计算 diff。
+        """
+        from kaos.path import KaosPath
+
         from kimi_cli.tools.file.replace import StrReplaceFile
         from kimi_cli.tools.file.write import WriteFile
 
-        # Hook WriteFile
-        original_write_call = WriteFile.__call__
-
-        async def patched_write_call(self, params):
-            # 获取原始文件内容（如果存在）
-            from kaos.path import KaosPath
+        def hook(tool_cls, tool_name: str) -> None:
+            original_call = tool_cls.__call__
 
-            p = KaosPath(params.path).expanduser().canonical()
+            async def patched_call(self, params):
+                # 调用原始方法
+                result = await original_call(self, params)
 
-            old_text = ""
-            if await p.exists():
-                old_text = await p.read_text(errors="replace") or ""
+                # 如果成功，记录修改
+                extras = result.extras or {}
+                if not result.is_error and "lines_added" in extras:
+                    p = KaosPath(params.path).expanduser().canonical()
+                    tracker = get_mod_tracker()
+                    tracker.record_change(str(p), extras["lines_added"], extras["lines_removed"])
+                    KimiSoulPatch.record_tool_call(tool_name)
 
-            # 调用原始方法
-            result = await original_write_call(self, params)
-
-            # 如果成功，记录修改
-            if not result.is_error:
-                new_text = params.content
-                if params.mode == "append" and old_text:
-                    new_text = old_text + params.content
-
-                tracker = get_mod_tracker()
-                tracker.record_change(str(p), old_text, new_text)
-                KimiSoulPatch.record_tool_call("WriteFile")
-
-            return result
-
-        WriteFile.__call__ = patched_write_call
-
-        # Hook StrReplaceFile
-        original_replace_call = StrReplaceFile.__call__
-
-        async def patched_replace_call(self, params):
-            from kaos.path import KaosPath
-
-            p = KaosPath(params.path).expanduser().canonical()
-
-            old_text = ""
-            if await p.exists():
-                old_text = await p.read_text(errors="replace") or ""
-
-            # 调用原始方法
-            result = await original_replace_call(self, params)
-
-            # 如果成功，记录修改
-            if not result.is_error:
-                new_text = await p.read_text(errors="replace") or ""
-                tracker = get_mod_tracker()
-                tracker.record_change(str(p), old_text, new_text)
-                KimiSoulPatch.record_tool_call("StrReplaceFile")
+                return result
 
-            return result
+            tool_cls.__call__ = patched_call
 
-        StrReplaceFile.__call__ = patched_replace_call
+        hook(WriteFile, "WriteFile")
+        hook(StrReplaceFile, "StrReplaceFile")
 
     def _patch_status_snapshot(self) -> None:
         """扩展StatusSnapshot以包含修改信息。"""
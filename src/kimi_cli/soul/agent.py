@@ -10,6 +10,8 @@ from typing import TYPE_CHECKING, Any
 import pydantic
 from jinja2 import Environment as JinjaEnvironment
 from jinja2 import StrictUndefined, TemplateError, UndefinedError
+from kaos import get_current_kaos
+from kaos.local import local_kaos
 from kaos.path import KaosPath
 from kosong.tooling import Toolset
 
@@ -26,6 +28,7 @@ from kimi_cli.soul.toolset import KimiToolset
 from kimi_cli.utils.environment import Environment
 from kimi_cli.utils.logging import logger
 from kimi_cli.utils.path import list_directory
+from kimi_cli.utils.workspace_index import WorkspaceIndex, get_workspace_index
 
 if TYPE_CHECKING:
     from fastmcp.mcp_config import MCPConfig
@@ -77,6 +80,8 @@ class Runtime:
     environment: Environment
     skills: dict[str, Skill]
     additional_dirs: list[KaosPath]
+    workspace_index: WorkspaceIndex | None = None
+    """The index of the files in the work directory, when it is on the local filesystem."""
 
     @staticmethod
     async def create(
@@ -87,6 +92,12 @@ class Runtime:
         yolo: bool,
         skills_dir: KaosPath | None = None,
     ) -> Runtime:
+        # Start indexing the work directory in the background, for the tools to query.
+        workspace_index = (
+            get_workspace_index(session.work_dir.unsafe_to_local_path())
+            if get_current_kaos().name == local_kaos.name
+            else None
+        )
         ls_output, agents_md, environment = await asyncio.gather(
             list_directory(session.work_dir),
             load_agents_md(session.work_dir),
@@ -175,6 +186,7 @@ class Runtime:
             environment=environment,
             skills=skills_by_name,
             additional_dirs=additional_dirs,
+            workspace_index=workspace_index,
         )
 
     def copy_for_fixed_subagent(self) -> Runtime:
@@ -192,6 +204,7 @@ class Runtime:
             skills=self.skills,
             # Share the same list reference so /add-dir mutations propagate to all agents
             additional_dirs=self.additional_dirs,
+            workspace_index=self.workspace_index,
         )
 
     def copy_for_dynamic_subagent(self) -> Runtime:
@@ -209,6 +222,7 @@ class Runtime:
             skills=self.skills,
             # Share the same list reference so /add-dir mutations propagate to all agents
             additional_dirs=self.additional_dirs,
+            workspace_index=self.workspace_index,
         )
 
 
@@ -51,6 +51,15 @@ def extract_key_argument(json_content: str | streamingjson.Lexer, tool_name: str
             if not isinstance(curr_args, dict) or not curr_args.get("path"):
                 return None
             key_argument = _normalize_path(str(curr_args["path"]))
+        case "ReadFiles":
+            if not isinstance(curr_args, dict) or not isinstance(curr_args.get("files"), list):
+                return None
+            files = cast(list[JsonType], curr_args["files"])
+            key_argument = ", ".join(
+                _normalize_path(str(file["path"]))
+                for file in files
+                if isinstance(file, dict) and file.get("path")
+            )
         case "ReadMediaFile":
             if not isinstance(curr_args, dict) or not curr_args.get("path"):
                 return None
@@ -16,15 +16,19 @@ class FileActions(StrEnum):
 from .glob import Glob  # noqa: E402
 from .grep_local import Grep  # noqa: E402
 from .read import ReadFile  # noqa: E402
+from .read_batch import ReadFiles  # noqa: E402
 from .read_media import ReadMediaFile  # noqa: E402
 from .replace import StrReplaceFile  # noqa: E402
+from .symbols import FindSymbol  # noqa: E402
 from .write import WriteFile  # noqa: E402
 
 __all__ = (
     "ReadFile",
+    "ReadFiles",
     "ReadMediaFile",
     "Glob",
     "Grep",
+    "FindSymbol",
     "WriteFile",
     "StrReplaceFile",
 )
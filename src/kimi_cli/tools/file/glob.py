@@ -1,6 +1,13 @@
 """Glob tool implementation."""
 
+import asyncio
+import contextlib
+import fnmatch
+import re
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
 from pathlib import Path
+from stat import S_ISDIR, S_ISLNK
 from typing import override
 
 from kaos.path import KaosPath
@@ -9,9 +16,18 @@ from pydantic import BaseModel, Field
 
 from kimi_cli.soul.agent import Runtime
 from kimi_cli.tools.utils import load_desc
-from kimi_cli.utils.path import is_within_workspace, list_directory
+from kimi_cli.utils.gitignore import (
+    GITIGNORE_FILENAME,
+    IgnoreRule,
+    IgnoreRules,
+    load_ignore_rules,
+    read_ignore_rules,
+)
+from kimi_cli.utils.path import is_within_workspace
+from kimi_cli.utils.workspace_index import WorkspaceIndex
 
 MAX_MATCHES = 1000
+_STAT_BATCH_SIZE = 64
 
 
 class Params(BaseModel):
@@ -26,6 +42,173 @@ class Params(BaseModel):
         description="Whether to include directories in results.",
         default=True,
     )
+    sort_by_mtime: bool = Field(
+        description=(
+            "Sort results by modification time, newest first, instead of by path. "
+            "All matches must then be found before any is returned, so prefer specific "
+            "patterns with it."
+        ),
+        default=False,
+    )
+
+
+@dataclass(slots=True)
+class _Entry:
+    path: KaosPath
+    is_dir: bool
+    is_symlink: bool
+    mtime: float | None
+    """`None` for entries listed by the workspace index, until they are stat-ed."""
+
+
+@dataclass(slots=True)
+class _Step:
+    """A directory to match the pattern segments from `index` on in."""
+
+    directory: KaosPath
+    index: int
+    parent_rules: IgnoreRules
+    rules: IgnoreRules | None = None
+    """Rules for the entries of the directory, once its own `.gitignore` is read."""
+
+
+async def _stat_entry(path: KaosPath) -> _Entry | None:
+    try:
+        st = await path.stat(follow_symlinks=False)
+        is_symlink = S_ISLNK(st.st_mode)
+        if is_symlink:
+            with contextlib.suppress(OSError):
+                st = await path.stat()
+    except OSError:
+        return None
+    return _Entry(path, S_ISDIR(st.st_mode), is_symlink, st.st_mtime)
+
+
+async def _scan(directory: KaosPath, index: WorkspaceIndex | None) -> tuple[list[_Entry], bool]:
+    """Entries of a directory in name order, and whether it has a `.gitignore` file.
+
+    The entries are taken from the workspace index if it has the directory up to date, and
+    otherwise listed and stat-ed concurrently.
+    """
+    if index is not None:
+        try:
+            mtime = (await directory.stat()).st_mtime
+        except OSError:
+            return [], False
+        if (listing := index.listing(str(directory), mtime)) is not None:
+            entries = [
+                _Entry(directory / entry.name, entry.is_dir, entry.is_symlink, None)
+                for entry in listing
+            ]
+            return entries, any(entry.name == GITIGNORE_FILENAME for entry in listing)
+    try:
+        paths = sorted([path async for path in directory.iterdir()], key=lambda p: p.name)
+    except OSError:
+        return [], False
+    entries: list[_Entry] = []
+    for start in range(0, len(paths), _STAT_BATCH_SIZE):
+        batch = paths[start : start + _STAT_BATCH_SIZE]
+        stats = await asyncio.gather(*(_stat_entry(path) for path in batch))
+        entries.extend(entry for entry in stats if entry is not None)
+    has_gitignore = any(path.name == GITIGNORE_FILENAME for path in paths)
+    return entries, has_gitignore
+
+
+async def _iter_matches(
+    root: KaosPath, pattern: str, rules: IgnoreRules, index: WorkspaceIndex | None = None
+) -> AsyncGenerator[_Entry]:
+    """Match `pattern` in `root`, walking only the directories the pattern can match in.
+
+    Entries matched by wildcards are skipped if they are ignored by `.gitignore` rules, so
+    `**` does not descend into e.g. `node_modules`; directories named literally in the
+    pattern are always searched. `**` does not follow symlinks to directories.
+    """
+    segments = [
+        segment for segment in pattern.replace("\\", "/").split("/") if segment not in ("", ".")
+    ]
+    if not segments:
+        return
+    regexes = [
+        re.compile(fnmatch.translate(segment)) if _has_magic(segment) else None
+        for segment in segments
+    ]
+    last = len(segments) - 1
+    stack = [_Step(root, 0, rules, rules)]
+    visited: set[tuple[str, int]] = set()
+    yielded: set[str] = set()
+
+    async def rules_of(step: _Step, has_gitignore: bool | None) -> IgnoreRules:
+        if step.rules is None:
+            own: list[IgnoreRule] = []
+            if has_gitignore is None or has_gitignore:
+                own = await read_ignore_rules(step.directory)
+            step.rules = step.parent_rules.descend(step.directory.name, own)
+        return step.rules
+
+    while stack:
+        step = stack.pop()
+        key = (str(step.directory), step.index)
+        if key in visited:
+            continue
+        visited.add(key)
+        segment = segments[step.index]
+        regex = regexes[step.index]
+        found: list[_Entry] = []
+        children: list[_Step] = []
+
+        if regex is None and segment != "**":
+            entry = await _stat_entry(step.directory / segment)
+            if entry is not None:
+                if step.index == last:
+                    found.append(entry)
+                elif entry.is_dir:
+                    children.append(_Step(entry.path, step.index + 1, await rules_of(step, None)))
+        else:
+            entries, has_gitignore = await _scan(step.directory, index)
+            dir_rules = await rules_of(step, has_gitignore)
+            for entry in entries:
+                if dir_rules.is_ignored(entry.path.name, is_dir=entry.is_dir):
+                    continue
+                if segment == "**":
+                    if step.index == last:
+                        found.append(entry)
+                    if entry.is_dir and not entry.is_symlink:
+                        children.append(_Step(entry.path, step.index, dir_rules))
+                elif regex is not None and regex.match(entry.path.name):
+                    if step.index == last:
+                        found.append(entry)
+                    elif entry.is_dir:
+                        children.append(_Step(entry.path, step.index + 1, dir_rules))
+            if segment == "**" and step.index < last:
+                # `**` also matches no directory at all.
+                children.append(_Step(step.directory, step.index + 1, step.parent_rules, dir_rules))
+
+        for entry in found:
+            if str(entry.path) not in yielded:
+                yielded.add(str(entry.path))
+                yield entry
+        # Depth-first, in name order.
+        stack.extend(reversed(children))
+
+
+async def _with_mtimes(entries: list[_Entry]) -> list[_Entry]:
+    """Stat the entries listed by the workspace index, dropping those that are gone."""
+    result: list[_Entry] = []
+    for start in range(0, len(entries), _STAT_BATCH_SIZE):
+        batch = entries[start : start + _STAT_BATCH_SIZE]
+        stats = await asyncio.gather(
+            *(_stat_entry(entry.path) if entry.mtime is None else _return(entry) for entry in batch)
+        )
+        result.extend(entry for entry in stats if entry is not None)
+    return result
+
+
+async def _return(entry: _Entry) -> _Entry:
+    return entry
+
+
+def _has_magic(segment: str) -> bool:
+    return any(c in segment for c in "*?[")
 
 
 class Glob(CallableTool2[Params]):
@@ -42,23 +225,7 @@ class Glob(CallableTool2[Params]):
         super().__init__()
         self._work_dir = runtime.builtin_args.KIMI_WORK_DIR
         self._additional_dirs = runtime.additional_dirs
-
-    async def _validate_pattern(self, pattern: str) -> ToolError | None:
-        """Validate that the pattern is safe to use."""
-        if pattern.startswith("**"):
-            ls_result = await list_directory(self._work_dir)
-            return ToolError(
-                output=ls_result,
-                message=(
-                    f"Pattern `{pattern}` starts with '**' which is not allowed. "
-                    "This would recursively search all directories and may include large "
-                    "directories like `node_modules`. Use more specific patterns instead. "
-                    "For your convenience, a list of all files and directories in the "
-                    "top level of the working directory is provided below."
-                ),
-                brief="Unsafe pattern",
-            )
-        return None
+        self._index = runtime.workspace_index
 
     async def _validate_directory(self, directory: KaosPath) -> ToolError | None:
         """Validate that the directory is safe to search."""
@@ -79,11 +246,6 @@ class Glob(CallableTool2[Params]):
     @override
     async def __call__(self, params: Params) -> ToolReturnValue:
         try:
-            # Validate pattern safety
-            pattern_error = await self._validate_pattern(params.pattern)
-            if pattern_error:
-                return pattern_error
-
             dir_path = KaosPath(params.directory) if params.directory else self._work_dir
 
             if not dir_path.is_absolute():
@@ -111,25 +273,33 @@ class Glob(CallableTool2[Params]):
                     brief="Invalid directory",
                 )
 
-            # Perform the glob search - users can use ** directly in pattern
-            matches: list[KaosPath] = []
-            async for match in dir_path.glob(params.pattern):
-                matches.append(match)
+            # Stream the matches, and stop as soon as there are more than can be returned.
+            rules = await load_ignore_rules(dir_path)
+            matches: list[_Entry] = []
+            more = False
+            async for entry in _iter_matches(dir_path, params.pattern, rules, self._index):
+                if not params.include_dirs and entry.is_dir:
+                    continue
+                if len(matches) >= MAX_MATCHES and not params.sort_by_mtime:
+                    more = True
+                    break
+                matches.append(entry)
 
-            # Filter out directories if not requested
-            if not params.include_dirs:
-                matches = [p for p in matches if await p.is_file()]
-
-            # Sort for consistent output
-            matches.sort()
+            if params.sort_by_mtime:
+                matches = await _with_mtimes(matches)
+                matches.sort(key=lambda entry: entry.mtime or 0.0, reverse=True)
+            else:
+                # Sort for consistent output
+                matches.sort(key=lambda entry: entry.path)
 
             # Limit matches
-            message = (
-                f"Found {len(matches)} matches for pattern `{params.pattern}`."
-                if len(matches) > 0
-                else f"No matches found for pattern `{params.pattern}`."
-            )
-            if len(matches) > MAX_MATCHES:
+            if more:
+                message = f"Found more than {MAX_MATCHES} matches for pattern `{params.pattern}`."
+            elif matches:
+                message = f"Found {len(matches)} matches for pattern `{params.pattern}`."
+            else:
+                message = f"No matches found for pattern `{params.pattern}`."
+            if more or len(matches) > MAX_MATCHES:
                 matches = matches[:MAX_MATCHES]
                 message += (
                     f" Only the first {MAX_MATCHES} matches are returned. "
@@ -137,7 +307,7 @@ class Glob(CallableTool2[Params]):
                 )
 
             return ToolOk(
-                output="\n".join(str(p.relative_to(dir_path)) for p in matches),
+                output="\n".join(str(entry.path.relative_to(dir_path)) for entry in matches),
                 message=message,
             )
 
@@ -0,0 +1,915 @@
+"""
+A persistent trigram index of the work directory, which narrows down the files `Grep` reads.
+
+The index is an inverted one: for each trigram (3-byte sequence of the lowercased content of a
+file), it keeps the posting list of the files that contain it. A search derives the trigrams
+every match must contain from the literal parts of its pattern, intersects their posting lists,
+and passes the files found to ripgrep as explicit paths, so that the tree is not walked and no
+other file is read.
+
+The files ripgrep would search with the filters of a search are listed with `rg --files` once,
+and the listing is kept until files are added or removed, or ignore files change. As ripgrep
+searches the files it is given regardless of ignore rules and filters, only the listed files
+are passed to it; as it reports matches in binary files it is given differently, searches that
+may match binary files are not narrowed down. The results are thus the same as those of a full
+scan.
+
+The index follows the changes of the work directory through the watcher of its workspace index
+(see `kimi_cli.utils.workspace_index`): changed files are indexed again in the background, or
+right before a search that may read them, and a search first waits for the changes made before
+it to be reported. Searches are only narrowed down while the directories are watched and the
+index is up to date with them: where the watches of inotify run out (see
+`fs.inotify.max_user_watches`), the workspace index is polled and ripgrep walks the whole tree.
+The workspace index lists at most `MAX_WORKSPACE_ENTRIES` entries; the directories it skips are
+passed to ripgrep as a whole, next to the candidates found in the rest of the tree.
+
+The index is stored under the share directory. Posting lists are appended to in chunks as files
+are indexed, under new ids for the files indexed again; the ids of removed files and of former
+versions of files are dropped from them when they are compacted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import contextlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import dataclass, field
+from hashlib import md5
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import BinaryIO
+
+from kimi_cli.share import get_share_dir
+from kimi_cli.utils.logging import logger
+from kimi_cli.utils.workspace_index import WorkspaceIndex
+
+INDEX_FORMAT = "2"
+MAX_INDEXED_FILE_BYTES = 8 * 1024 * 1024
+"""The trigrams of larger files are not indexed, and they are always searched."""
+MAX_WORKSPACE_ENTRIES = 4_000_000
+"""The workspace index lists up to this many entries once it is followed by the index, instead
+of its own default limit."""
+MIN_FILES_TO_NARROW = 20_000
+"""Searches over fewer files are left to ripgrep alone, as it is fast enough for them."""
+MAX_CANDIDATE_RATIO = 0.5
+"""Searches that would still read more than this share of the files are not narrowed down."""
+MAX_CANDIDATE_BYTES = 256 * 1024
+"""Searches whose candidate paths are longer in total are not narrowed down, as the paths are
+passed on the command line of ripgrep."""
+MAX_FILES_TO_INDEX_ON_SEARCH = 256
+"""Searches that would first have to index more changed files are not narrowed down."""
+SYNC_TIMEOUT = 1.0
+"""Seconds a search waits for the changes made before it to be reported."""
+_INDEX_BATCH_SIZE = 512
+_MAX_CHUNKS = 1024
+"""Posting lists are compacted once they are made of more chunks."""
+_MIN_DEAD_IDS_TO_COMPACT = 10_000
+_SKIPPED_LIST_RATIO = 16
+"""Posting lists this many times longer than the candidates found so far are not read, as they
+would rule out few of them."""
+_RACY_NS = 2_000_000_000
+"""Files modified this shortly before they were indexed are indexed again when the index is
+loaded, as a change within the same timestamp tick would go unnoticed."""
+_MAX_LISTINGS = 8
+"""Listings of the files searched with different filters that are kept."""
+_ID_TYPECODE = "I"
+_POSTINGS_COLUMNS = "(trigram INTEGER, chunk INTEGER, ids BLOB, PRIMARY KEY (trigram, chunk))"
+_NUL_SCAN_BYTES = 1024 * 1024
+_IGNORE_FILENAMES = frozenset({".gitignore", ".ignore", ".rgignore"})
+_UTF16_BOMS = (b"\xff\xfe", b"\xfe\xff")
+# With `--ignore-case`, ripgrep matches `k` and `s` to these (KELVIN SIGN, LATIN SMALL LETTER
+# LONG S) as well.
+_ASCII_CASE_VARIANTS = ((b"\xe2\x84\xaa", b"k"), (b"\xc5\xbf", b"s"))
+
+
+def _trigrams_of_literal(literal: str, *, ignore_case: bool) -> set[int]:
+    data = literal.encode("utf-8").lower()
+    trigrams: set[int] = set()
+    for i in range(len(data) - 2):
+        chunk = data[i : i + 3]
+        # Non-ASCII letters are only folded by ripgrep, and not by the index.
+        if ignore_case and any(byte >= 0x80 for byte in chunk):
+            continue
+        trigrams.add(int.from_bytes(chunk, "big"))
+    return trigrams
+
+
+def required_trigrams(pattern: str, *, ignore_case: bool) -> set[int] | None:
+    """The trigrams every match of the ripgrep `pattern` contains, if any can be told."""
+    parsed = _required_literals(pattern)
+    if parsed is None:
+        return None
+    literals, case_flag = parsed
+    trigrams: set[int] = set()
+    for literal in literals:
+        trigrams |= _trigrams_of_literal(literal, ignore_case=ignore_case or case_flag)
+    return trigrams or None
+
+
+def _class_end(pattern: str, start: int) -> int | None:
+    """The index after the character class starting at `start`."""
+    i = start + 1
+    depth = 1
+    n = len(pattern)
+    if i < n and pattern[i] == "^":
+        i += 1
+    if i < n and pattern[i] == "]":
+        i += 1
+    while i < n:
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+        elif c == "[":
+            if pattern.startswith("[:", i) and (end := pattern.find(":]", i + 2)) != -1:
+                i = end + 2
+                continue
+            depth += 1
+            i += 1
+            if i < n and pattern[i] == "^":
+                i += 1
+            if i < n and pattern[i] == "]":
+                i += 1
+        elif c == "]":
+            depth -= 1
+            i += 1
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return None
+
+
+def _group_end(pattern: str, start: int) -> int | None:
+    """The index after the group starting at `start`."""
+    i = start + 1
+    depth = 1
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+        elif c == "[":
+            end = _class_end(pattern, i)
+            if end is None:
+                return None
+            i = end
+        elif c == "(":
+            depth += 1
+            i += 1
+        elif c == ")":
+            depth -= 1
+            i += 1
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return None
+
+
+def _escape_end(pattern: str, start: int) -> int | None:
+    """The index after the escape sequence starting at `start`, which is not a literal."""
+    kind = pattern[start + 1]
+    if kind in "pPxuU" and pattern.startswith("{", start + 2):
+        end = pattern.find("}", start + 3)
+        return None if end == -1 else end + 1
+    length = {"p": 3, "P": 3, "x": 4, "u": 6, "U": 10}.get(kind, 2)
+    return start + length if start + length <= len(pattern) else None
+
+
+def _required_literals(pattern: str) -> tuple[list[str], bool] | None:
+    """Literal strings every match of `pattern` contains, and whether case-insensitive flags
+    are used in it.
+
+    Only the top level of the pattern is looked at, and any syntax that is not understood gives
+    up on it: a wrong answer would make searches miss matches.
+    """
+    literals: list[str] = []
+    current: list[str] = []
+    case_flag = False
+
+    def flush() -> None:
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        literal: str | None = None
+        if c == "\\":
+            if i + 1 >= n:
+                return None
+            escaped = pattern[i + 1]
+            # `\<` and `\>` are word boundaries.
+            if escaped.isascii() and not escaped.isalnum() and escaped not in "<>":
+                literal = escaped
+                i += 2
+            else:
+                end = _escape_end(pattern, i)
+                if end is None:
+                    return None
+                i = end
+        elif c == "[":
+            end = _class_end(pattern, i)
+            if end is None:
+                return None
+            i = end
+        elif c == "(":
+            if pattern.startswith("(?", i):
+                flags_end = i + 2
+                while flags_end < n and (pattern[flags_end].isalpha() or pattern[flags_end] == "-"):
+                    flags_end += 1
+                flags = pattern[i + 2 : flags_end]
+                if "x" in flags:
+                    return None
+                if "i" in flags.split("-")[0]:
+                    case_flag = True
+                if flags_end < n and pattern[flags_end] == ")":
+                    # Flags for the rest of the pattern, not a group.
+                    i = flags_end + 1
+                    continue
+            end = _group_end(pattern, i)
+            if end is None:
+                return None
+            i = end
+        elif c == "|" or c == ")":
+            return None
+        elif c in ".^$":
+            i += 1
+        elif c in "*+?{":
+            # A repetition of nothing.
+            return None
+        else:
+            literal = c
+            i += 1
+
+        # A repetition of the item that was just read.
+        optional = repeated = False
+        if i < n and pattern[i] in "*?":
+            optional = True
+            i += 1
+        elif i < n and pattern[i] == "+":
+            repeated = True
+            i += 1
+        elif i < n and pattern[i] == "{":
+            end = pattern.find("}", i)
+            bounds = pattern[i + 1 : end].split(",") if end != -1 else []
+            if (
+                not 1 <= len(bounds) <= 2
+                or not bounds[0].isdigit()
+                or (len(bounds) == 2 and bounds[1] and not bounds[1].isdigit())
+            ):
+                return None
+            low = int(bounds[0])
+            optional = low == 0
+            repeated = len(bounds) == 2 or low > 1
+            i = end + 1
+        if (optional or repeated) and i < n and pattern[i] == "?":
+            # Lazy repetition.
+            i += 1
+
+        if literal is None or optional:
+            flush()
+        else:
+            current.append(literal)
+            if repeated:
+                # What follows may come after more of the item.
+                flush()
+    flush()
+    return literals, case_flag
+
+
+def _content_trigrams(data: bytes) -> set[tuple[int, int, int]]:
+    lowered = data.lower()
+    trigrams = set(zip(lowered, lowered[1:], lowered[2:], strict=False))
+    for variant, replacement in _ASCII_CASE_VARIANTS:
+        if variant in data:
+            replaced = data.replace(variant, replacement).lower()
+            trigrams |= set(zip(replaced, replaced[1:], replaced[2:], strict=False))
+    return trigrams
+
+
+def _file_trigrams(data: bytes) -> set[int]:
+    """The trigrams of the content of a file, as `required_trigrams` gives them."""
+    return {(a << 16) | (b << 8) | c for a, b, c in _content_trigrams(data)}
+
+
+def _has_nul(f: BinaryIO) -> bool:
+    while chunk := f.read(_NUL_SCAN_BYTES):
+        if b"\0" in chunk:
+            return True
+    return False
+
+
+@dataclass(slots=True)
+class _FileEntry:
+    id: int
+    mtime_ns: int
+    size: int
+    indexed_ns: int
+    binary: bool
+    """Whether the file contains NUL bytes, as ripgrep reports matches in such files differently
+    when it is given them explicitly."""
+    opaque: bool
+    """Whether the trigrams of the file are not indexed, so that it is always searched."""
+
+
+def _is_below(key: str, ancestor: str | None) -> bool:
+    """Whether `key` is strictly below `ancestor`, both relative to the root, where `None` stands
+    for a directory above the root."""
+    if ancestor is None:
+        return True
+    if not ancestor:
+        return bool(key)
+    return key.startswith(ancestor + os.sep)
+
+
+@dataclass(slots=True)
+class _Listing:
+    """The files ripgrep searches with the filters of a search."""
+
+    version: tuple[int, int]
+    """The version of the ignore files and of the workspace index it was listed at."""
+    watched: bool = True
+    """Whether all the files are in watched directories, without which searches over them are
+    not narrowed down."""
+    paths: dict[str, str] = field(default_factory=dict[str, str])
+    """The paths of the files as ripgrep prints them, by their paths relative to the root."""
+    directories: dict[str, str] = field(default_factory=dict[str, str])
+    """The directories not listed by the workspace index, which are searched as a whole, as
+    ripgrep prints their paths, by their paths relative to the root."""
+    n_files: int = 0
+    """The number of files, including those in `directories`."""
+    unindexed: set[str] = field(default_factory=set[str])
+    """Files that were not indexed yet."""
+
+
+class GrepIndex:
+    """The trigram index of the files of `workspace`, updated in a background thread."""
+
+    def __init__(self, workspace: WorkspaceIndex, db_path: Path) -> None:
+        self.workspace = workspace
+        self.root = workspace.root
+        self._root_prefix = str(self.root).rstrip(os.sep) + os.sep
+        self._db_path = db_path
+        self._db: sqlite3.Connection | None = None
+        # Guards the state below and the database, which the background thread and searches
+        # both update.
+        self._lock = threading.Lock()
+        # Keyed by the path relative to `root`.
+        self._files: dict[str, _FileEntry] = {}
+        self._paths: dict[int, str] = {}
+        self._opaque: set[str] = set()
+        self._next_id = 0
+        self._next_chunk = 0
+        self._dead_ids = 0
+        # Files to index (again), with the number of the change that made them so.
+        self._dirty: dict[str, int] = {}
+        self._changes = 0
+        self._workspace_files: frozenset[str] = frozenset()
+        self._workspace_version = -1
+        self._ignore_version = 0
+        # Advances whenever changes may have been missed, after which all files are checked.
+        self._epoch = 0
+        self._verified_epoch = -1
+        self._listings: OrderedDict[tuple[str, str, str | None, str | None], _Listing] = (
+            OrderedDict()
+        )
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._closed = threading.Event()
+        self._thread: threading.Thread | None = None
+        workspace.add_listener(self._on_change)
+        workspace.raise_max_entries(MAX_WORKSPACE_ENTRIES)
+
+    def start(self) -> None:
+        """Start loading and updating the index in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="kimi-grep-index", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self.workspace.remove_listener(self._on_change)
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            if self._db is not None:
+                with contextlib.suppress(sqlite3.Error):
+                    self._db.close()
+                self._db = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Wait until the index is up to date with the changes reported so far."""
+        return self._idle.wait(timeout)
+
+    async def candidates(
+        self,
+        cwd: str,
+        filters: tuple[str, str | None, str | None],
+        list_files: Callable[[], Awaitable[list[str] | None]],
+        trigrams: set[int],
+    ) -> list[str] | None:
+        """The files to search for matches that contain all `trigrams`, as paths to pass to
+        ripgrep, or `None` if the search is not worth narrowing down.
+
+        Args:
+            cwd: The directory ripgrep runs in.
+            filters: The path searched, and the glob and file type filters of the search.
+            list_files: Lists the files ripgrep searches with the filters, as it prints them.
+            trigrams: The trigrams every match contains.
+        """
+        try:
+            if not self._is_current() or len(self._workspace_files) < MIN_FILES_TO_NARROW:
+                return None
+            if not await self._wait_synced():
+                return None
+            listing = await self._listing(cwd, filters, list_files)
+            if listing is None or listing.n_files < MIN_FILES_TO_NARROW:
+                return None
+            return await asyncio.to_thread(self._candidates, listing, trigrams)
+        except Exception:
+            logger.exception("Failed to narrow down a search of {root}", root=self.root)
+            return None
+
+    def _key(self, path: str) -> str | None:
+        """The normalized absolute `path` relative to the root, if it is under it."""
+        if path == str(self.root):
+            return ""
+        return path[len(self._root_prefix) :] if path.startswith(self._root_prefix) else None
+
+    def _is_current(self) -> bool:
+        return (
+            self._thread is not None
+            and self._thread.is_alive()
+            and self.workspace.mode == "watch"
+            and self._verified_epoch == self._epoch
+        )
+
+    async def _wait_synced(self) -> bool:
+        """Wait for the changes made until now to be reported."""
+        started_ns = time.time_ns()
+        deadline = time.monotonic() + SYNC_TIMEOUT
+        while self.workspace.synced_ns < started_ns:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def _listing(
+        self,
+        cwd: str,
+        filters: tuple[str, str | None, str | None],
+        list_files: Callable[[], Awaitable[list[str] | None]],
+    ) -> _Listing | None:
+        key = (cwd, *filters)
+        version = (self._ignore_version, self.workspace.version)
+        listing = self._listings.get(key)
+        if listing is not None and listing.version == version:
+            self._listings.move_to_end(key)
+        else:
+            files = await list_files()
+            if files is None:
+                return None
+            listing = await asyncio.to_thread(
+                self._make_listing, cwd, os.path.join(cwd, filters[0]), files, version
+            )
+            self._listings[key] = listing
+            while len(self._listings) > _MAX_LISTINGS:
+                self._listings.popitem(last=False)
+        return listing if listing.watched else None
+
+    def _make_listing(
+        self, cwd: str, searched: str, files: list[str], version: tuple[int, int]
+    ) -> _Listing:
+        self._sync_workspace()
+        workspace_files = self._workspace_files
+        searched_key = self._key(os.path.normpath(searched))
+        indexed: dict[str, bool] = {}
+
+        def is_indexed(key: str) -> bool:
+            if key not in indexed:
+                indexed[key] = self.workspace.listing(self._root_prefix + key) is not None
+            return indexed[key]
+
+        listing = _Listing(version, n_files=len(files))
+        for file in files:
+            key = self._key(os.path.normpath(os.path.join(cwd, file)))
+            if key is None:
+                # Changes to the file would not be reported.
+                return _Listing(version, watched=False)
+            if key in workspace_files:
+                listing.paths[key] = file
+                continue
+            directory = os.path.dirname(key)
+            if not directory or is_indexed(directory):
+                # A file the workspace index ignores, e.g. one that a glob matches.
+                return _Listing(version, watched=False)
+            # The file is under a directory the workspace index skipped, whose topmost one is
+            # searched as a whole, unless that is what the search is over anyway.
+            while (parent := os.path.dirname(directory)) and not is_indexed(parent):
+                directory = parent
+            if not is_indexed(parent) or not _is_below(directory, searched_key):
+                return _Listing(version, watched=False)
+            if directory not in listing.directories:
+                printed = file
+                for _ in range(key.count(os.sep) - directory.count(os.sep)):
+                    printed = os.path.dirname(printed)
+                listing.directories[directory] = printed
+        with self._lock:
+            listing.unindexed = {key for key in listing.paths if key not in self._files}
+        return listing
+
+    def _candidates(self, listing: _Listing, trigrams: set[int]) -> list[str] | None:
+        # Files that changed are indexed first, as they may be searched.
+        with self._lock:
+            listing.unindexed = {key for key in listing.unindexed if key not in self._files}
+            pending = set(listing.unindexed)
+            for key in self._dirty:
+                if len(pending) > MAX_FILES_TO_INDEX_ON_SEARCH:
+                    return None
+                if key in listing.paths:
+                    pending.add(key)
+        if len(pending) > MAX_FILES_TO_INDEX_ON_SEARCH:
+            return None
+        if pending:
+            self._index_files(list(pending))
+
+        with self._lock:
+            if not self._is_current() or any(key not in self._files for key in pending):
+                return None
+            keys = {self._paths[id_] for id_ in self._posting_ids(trigrams) if id_ in self._paths}
+            keys |= self._opaque
+            candidates: list[str] = []
+            n_bytes = 0
+            for key in keys:
+                path = listing.paths.get(key)
+                if path is None:
+                    continue
+                if self._files[key].binary:
+                    return None
+                candidates.append(path)
+                n_bytes += len(os.fsencode(path)) + 1
+                if n_bytes > MAX_CANDIDATE_BYTES:
+                    return None
+        directories = sorted(listing.directories.values())
+        n_bytes += sum(len(os.fsencode(path)) + 1 for path in directories)
+        if n_bytes > MAX_CANDIDATE_BYTES:
+            return None
+        n_searched = len(candidates) + listing.n_files - len(listing.paths)
+        if n_searched > listing.n_files * MAX_CANDIDATE_RATIO:
+            return None
+        return sorted(candidates) + directories
+
+    def _posting_ids(self, trigrams: set[int]) -> set[int]:
+        """Ids of the files whose content may contain all `trigrams`, including former ids."""
+        db = self._connect()
+        sizes: dict[int, int] = {}
+        for trigram in trigrams:
+            (size,) = db.execute(
+                "SELECT SUM(LENGTH(ids)) FROM postings WHERE trigram = ?", (trigram,)
+            ).fetchone()
+            if size is None:
+                # No indexed file contains the trigram.
+                return set()
+            sizes[trigram] = size // array(_ID_TYPECODE).itemsize
+        ids: set[int] | None = None
+        for trigram in sorted(sizes, key=sizes.__getitem__):
+            if ids is not None and sizes[trigram] > len(ids) * _SKIPPED_LIST_RATIO:
+                break
+            postings = array(_ID_TYPECODE)
+            for (blob,) in db.execute(
+                "SELECT ids FROM postings WHERE trigram = ? ORDER BY chunk", (trigram,)
+            ):
+                postings.frombytes(blob)
+            ids = set(postings) if ids is None else ids.intersection(postings)
+            if not ids:
+                break
+        return ids or set()
+
+    def _on_change(self, keys: set[str] | None) -> None:
+        # Called from the thread of the workspace index.
+        with self._lock:
+            if keys is None:
+                self._epoch += 1
+            else:
+                for key in keys:
+                    if os.path.basename(key) in _IGNORE_FILENAMES:
+                        self._ignore_version += 1
+                    if key in self._files or key in self._workspace_files:
+                        self._mark_dirty(key)
+        self._idle.clear()
+        self._wakeup.set()
+
+    def _mark_dirty(self, key: str) -> None:
+        self._changes += 1
+        self._dirty[key] = self._changes
+
+    # The methods below run in the thread of the index, except for `_index_files`, which
+    # searches call as well.
+
+    def _run(self) -> None:
+        try:
+            self._load()
+            while not self.workspace.wait_ready(0.1):
+                if self._closed.is_set():
+                    return
+            while not self._closed.is_set():
+                self._wakeup.clear()
+                if not self._update():
+                    self._idle.set()
+                    self._wakeup.wait()
+        except Exception:
+            if not self._closed.is_set():
+                logger.exception("Stopped updating the grep index of {root}", root=self.root)
+
+    def _update(self) -> bool:
+        """Do the next piece of pending work, and return whether there was any."""
+        if self._verified_epoch != self._epoch:
+            self._verify()
+            return True
+        if self._sync_workspace():
+            return True
+        with self._lock:
+            batch = list(islice(self._dirty, _INDEX_BATCH_SIZE))
+        if batch:
+            self._index_files(batch)
+            return True
+        if self._next_chunk > _MAX_CHUNKS or self._dead_ids > max(
+            len(self._paths), _MIN_DEAD_IDS_TO_COMPACT
+        ):
+            self._compact()
+            return True
+        return False
+
+    def _verify(self) -> None:
+        """Find the files that changed while changes may not have been reported."""
+        epoch = self._epoch
+        self._sync_workspace()
+        with self._lock:
+            entries = list(self._files.items())
+        changed: list[str] = []
+        for key, entry in entries:
+            try:
+                st = os.lstat(self._root_prefix + key)
+            except OSError:
+                changed.append(key)
+                continue
+            if (
+                st.st_mtime_ns != entry.mtime_ns
+                or st.st_size != entry.size
+                or entry.indexed_ns - entry.mtime_ns < _RACY_NS
+            ):
+                changed.append(key)
+        with self._lock:
+            for key in changed:
+                self._mark_dirty(key)
+            # Ignore files may have changed too.
+            self._ignore_version += 1
+            self._verified_epoch = epoch
+
+    def _sync_workspace(self) -> bool:
+        """Follow the files added to and removed from the workspace index.
+
+        Returns whether they changed since the last time.
+        """
+        version = self.workspace.version
+        if version == self._workspace_version:
+            return False
+        files = frozenset(
+            path.replace("/", os.sep) for path in self.workspace.paths() if not path.endswith("/")
+        )
+        with self._lock:
+            if version <= self._workspace_version:
+                return False
+            self._workspace_files = files
+            self._workspace_version = version
+            for key in files:
+                if key not in self._files and key not in self._dirty:
+                    self._mark_dirty(key)
+            removed = [key for key in self._files if key not in files]
+            if removed:
+                for key in removed:
+                    self._forget(key)
+                db = self._connect()
+                with db:
+                    db.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in removed])
+                    self._save_meta(db)
+        return True
+
+    def _index_files(self, keys: list[str]) -> None:
+        with self._lock:
+            changes = {key: self._dirty.get(key) for key in keys}
+            workspace_files = self._workspace_files
+        read = [(key, self._read(key) if key in workspace_files else None) for key in keys]
+
+        with self._lock:
+            postings: defaultdict[int, array[int]] = defaultdict(lambda: array(_ID_TYPECODE))
+            rows: list[tuple[str, int, int, int, int, bool, bool]] = []
+            removed: list[tuple[str]] = []
+            for key, result in read:
+                self._forget(key)
+                if result is None:
+                    removed.append((key,))
+                    continue
+                entry, trigrams = result
+                entry.id = self._next_id
+                self._next_id += 1
+                self._files[key] = entry
+                self._paths[entry.id] = key
+                if entry.opaque:
+                    self._opaque.add(key)
+                for trigram in trigrams:
+                    postings[trigram].append(entry.id)
+                rows.append(
+                    (
+                        key,
+                        entry.id,
+                        entry.mtime_ns,
+                        entry.size,
+                        entry.indexed_ns,
+                        entry.binary,
+                        entry.opaque,
+                    )
+                )
+            db = self._connect()
+            with db:
+                db.executemany("DELETE FROM files WHERE path = ?", removed)
+                db.executemany(
+                    "INSERT OR REPLACE INTO files "
+                    "(path, id, mtime_ns, size, indexed_ns, binary, opaque) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if postings:
+                    db.executemany(
+                        "INSERT INTO postings (trigram, chunk, ids) VALUES (?, ?, ?)",
+                        (
+                            (trigram, self._next_chunk, ids.tobytes())
+                            for trigram, ids in postings.items()
+                        ),
+                    )
+                    self._next_chunk += 1
+                self._save_meta(db)
+            for key, change in changes.items():
+                # Files that changed again while they were read stay dirty.
+                if self._dirty.get(key) == change:
+                    self._dirty.pop(key, None)
+
+    def _read(self, key: str) -> tuple[_FileEntry, set[int]] | None:
+        path = self._root_prefix + key
+        try:
+            st = os.lstat(path)
+            # ripgrep does not follow symbolic links.
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            indexed_ns = time.time_ns()
+            with open(path, "rb") as f:
+                data = f.read(MAX_INDEXED_FILE_BYTES + 1)
+                if len(data) > MAX_INDEXED_FILE_BYTES:
+                    binary = b"\0" in data or _has_nul(f)
+                    entry = _FileEntry(-1, st.st_mtime_ns, st.st_size, indexed_ns, binary, True)
+                    return entry, set()
+        except OSError:
+            return None
+        if data.startswith(_UTF16_BOMS):
+            # ripgrep transcodes these files before searching them.
+            return _FileEntry(-1, st.st_mtime_ns, st.st_size, indexed_ns, False, True), set()
+        entry = _FileEntry(-1, st.st_mtime_ns, st.st_size, indexed_ns, b"\0" in data, False)
+        return entry, _file_trigrams(data)
+
+    def _forget(self, key: str) -> None:
+        entry = self._files.pop(key, None)
+        if entry is None:
+            return
+        del self._paths[entry.id]
+        self._opaque.discard(key)
+        if not entry.opaque:
+            self._dead_ids += 1
+
+    def _compact(self) -> None:
+        """Merge the chunks of each posting list, and drop the ids no longer in use."""
+        with self._lock:
+            live = self._paths
+
+            def compacted(rows: sqlite3.Cursor) -> Iterator[tuple[int, bytes]]:
+                for trigram, group in groupby(rows, key=itemgetter(0)):
+                    ids = array(_ID_TYPECODE)
+                    for _, blob in group:
+                        ids.frombytes(blob)
+                    kept = array(_ID_TYPECODE, (id_ for id_ in ids if id_ in live))
+                    if kept:
+                        yield trigram, kept.tobytes()
+
+            db = self._connect()
+            with db:
+                db.execute("DROP TABLE IF EXISTS compacted")
+                db.execute(f"CREATE TABLE compacted {_POSTINGS_COLUMNS}")
+                rows = db.cursor().execute(
+                    "SELECT trigram, ids FROM postings ORDER BY trigram, chunk"
+                )
+                db.executemany(
+                    "INSERT INTO compacted (trigram, chunk, ids) VALUES (?, 0, ?)",
+                    compacted(rows),
+                )
+                db.execute("DROP TABLE postings")
+                db.execute("ALTER TABLE compacted RENAME TO postings")
+                self._next_chunk = 1
+                self._dead_ids = 0
+                self._save_meta(db)
+
+    def _save_meta(self, db: sqlite3.Connection) -> None:
+        db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("next_id", str(self._next_id)),
+                ("next_chunk", str(self._next_chunk)),
+                ("dead_ids", str(self._dead_ids)),
+            ],
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._closed.is_set():
+            raise RuntimeError("The grep index is closed")
+        if self._db is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self._db_path, check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = db.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+            if row is None or row[0] != INDEX_FORMAT:
+                with db:
+                    db.execute("DROP TABLE IF EXISTS files")
+                    db.execute("DROP TABLE IF EXISTS postings")
+                    db.execute("DELETE FROM meta")
+                    db.execute(
+                        "INSERT INTO meta (key, value) VALUES ('format', ?)", (INDEX_FORMAT,)
+                    )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, id INTEGER, "
+                "mtime_ns INTEGER, size INTEGER, indexed_ns INTEGER, binary INTEGER, "
+                "opaque INTEGER)"
+            )
+            db.execute(f"CREATE TABLE IF NOT EXISTS postings {_POSTINGS_COLUMNS}")
+            self._db = db
+        return self._db
+
+    def _load(self) -> None:
+        with self._lock:
+            db = self._connect()
+            meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+            self._next_id = int(meta.get("next_id", 0))
+            self._next_chunk = int(meta.get("next_chunk", 0))
+            self._dead_ids = int(meta.get("dead_ids", 0))
+            rows = db.execute(
+                "SELECT path, id, mtime_ns, size, indexed_ns, binary, opaque FROM files"
+            )
+            for path, id_, mtime_ns, size, indexed_ns, binary, opaque in rows:
+                entry = _FileEntry(id_, mtime_ns, size, indexed_ns, bool(binary), bool(opaque))
+                self._files[path] = entry
+                self._paths[id_] = path
+                if entry.opaque:
+                    self._opaque.add(path)
+
+
+_indexes: dict[str, GrepIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_grep_index(workspace: WorkspaceIndex) -> GrepIndex:
+    """The index of the work directory `workspace` indexes, stored under the share directory,
+    which is started when first asked for."""
+    key = str(workspace.root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.closed or index.workspace is not workspace:
+            if index is not None:
+                index.close()
+            digest = md5(key.encode("utf-8", errors="surrogateescape")).hexdigest()
+            db_path = get_share_dir() / "grep-index" / f"{digest}.sqlite3"
+            index = _indexes[key] = GrepIndex(workspace, db_path)
+            index.start()
+    return index
+
+
+@atexit.register
+def _close_indexes() -> None:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
@@ -1,25 +1,34 @@
 """
 The local version of the Grep tool using ripgrep.
-Be cautious that `KaosPath` is not used in this implementation.
+Be cautious that `KaosPath` is not used in this implementation, except for resolving relative
+paths against the working directory.
 """
 
 import asyncio
+import base64
+import contextlib
+import json
+import os
 import platform
 import shutil
 import stat
 import tarfile
 import tempfile
 import zipfile
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import override
+from typing import Any, cast, override
 
 import aiohttp
-import ripgrepy  # type: ignore[reportMissingTypeStubs]
+from kaos.path import KaosPath
 from kosong.tooling import CallableTool2, ToolError, ToolReturnValue
 from pydantic import BaseModel, Field
 
 import kimi_cli
 from kimi_cli.share import get_share_dir
+from kimi_cli.soul.agent import Runtime
+from kimi_cli.tools.file.grep_index import GrepIndex, get_grep_index, required_trigrams
 from kimi_cli.tools.utils import ToolResultBuilder, load_desc
 from kimi_cli.utils.aiohttp import new_client_session
 from kimi_cli.utils.logging import logger
@@ -116,6 +125,17 @@ class Params(BaseModel):
 RG_VERSION = "15.0.0"
 RG_BASE_URL = "http://cdn.kimi.com/binaries/kimi-cli/rg"
 _RG_DOWNLOAD_LOCK = asyncio.Lock()
+_READ_CHUNK_SIZE = 64 * 1024
+_MAX_LINE_BYTES = 64 * 1024
+"""Lines longer than this are cut, the output builder shortens them further anyway."""
+_MAX_JSON_LINE_BYTES = 1024 * 1024
+"""Longer JSON events of ripgrep are cut, which only happens for very long lines."""
+_MAX_STDERR_BYTES = 4096
+
+MAX_MATCHES_PER_FILE = 20
+"""Matches shown per file in content mode; the rest are only counted."""
+MAX_LINE_CHARS = 500
+"""Characters of a line shown in content mode."""
 
 
 def _rg_binary_name() -> str:
@@ -225,7 +245,7 @@ async def _download_and_install_rg(bin_name: str) -> Path:
     return destination
 
 
-async def _ensure_rg_path() -> str:
+async def ensure_rg_path() -> str:
     bin_name = _rg_binary_name()
     existing = _find_existing_rg(bin_name)
     if existing:
@@ -240,72 +260,399 @@ async def _ensure_rg_path() -> str:
         return str(downloaded)
 
 
+def _build_rg_args(rg_path: str, params: Params, *, paths: list[str] | None = None) -> list[str]:
+    """The arguments of ripgrep, which searches `paths` instead of the path of `params` if
+    given."""
+    args = [rg_path]
+    if paths is not None:
+        # ripgrep leaves out the path in the output of a search of a single file.
+        args.append("--with-filename")
+
+    # Search options
+    if params.ignore_case:
+        args.append("--ignore-case")
+    if params.multiline:
+        args += ["--multiline", "--multiline-dotall"]
+
+    # Content display options (only for content mode)
+    if params.output_mode == "content":
+        if params.before_context is not None:
+            args += ["--before-context", str(params.before_context)]
+        if params.after_context is not None:
+            args += ["--after-context", str(params.after_context)]
+        if params.context is not None:
+            args += ["--context", str(params.context)]
+        if params.line_number:
+            args.append("--line-number")
+        args.append("--json")
+
+    # File filtering options
+    if params.glob:
+        args += ["--glob", params.glob]
+    if params.type:
+        args += ["--type", params.type]
+
+    # Output mode
+    if params.output_mode == "files_with_matches":
+        args.append("--files-with-matches")
+    elif params.output_mode == "count_matches":
+        args.append("--count-matches")
+
+    args += ["--", params.pattern]
+    args += paths if paths is not None else [os.path.expanduser(params.path)]
+    return args
+
+
+async def _list_files(rg_path: str, params: Params, cwd: str) -> list[str] | None:
+    """The files ripgrep would search for `params`, as it would print their paths."""
+    args = [rg_path, "--files"]
+    if params.glob:
+        args += ["--glob", params.glob]
+    if params.type:
+        args += ["--type", params.type]
+    args += ["--", os.path.expanduser(params.path)]
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        cwd=cwd,
+    )
+    stdout, _ = await process.communicate()
+    # With errors, e.g. unreadable directories, a narrowed search would not report them.
+    if process.returncode != 0:
+        return None
+    return stdout.decode("utf-8", errors="surrogateescape").splitlines()
+
+
+async def iter_lines(
+    stream: asyncio.StreamReader, max_line_bytes: int = _MAX_LINE_BYTES
+) -> AsyncIterator[bytes]:
+    """Yield the lines of `stream` as they arrive, cutting those that are too long."""
+    pending = b""
+    skipping = False
+    while chunk := await stream.read(_READ_CHUNK_SIZE):
+        # `pending` is at most `max_line_bytes` long, so each chunk is only split once.
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+            else:
+                yield line[:max_line_bytes] + b"\n"
+        if len(pending) > max_line_bytes:
+            if not skipping:
+                yield pending[:max_line_bytes] + b"\n"
+                skipping = True
+            pending = b""
+    if pending and not skipping:
+        yield pending
+
+
+async def read_tail(stream: asyncio.StreamReader, limit: int) -> bytes:
+    """Read `stream` to the end, keeping only the last `limit` bytes."""
+    tail = b""
+    while chunk := await stream.read(_READ_CHUNK_SIZE):
+        tail = (tail + chunk)[-limit:]
+    return tail
+
+
+def _json_text(value: Any) -> str:
+    """Text of an arbitrary data object of ripgrep's JSON output."""
+    if not isinstance(value, dict):
+        return ""
+    value = cast(dict[str, Any], value)
+    if isinstance(text := value.get("text"), str):
+        return text
+    if isinstance(data := value.get("bytes"), str):
+        return base64.b64decode(data).decode("utf-8", errors="replace")
+    return ""
+
+
+def clip_line(line: str, match_start: int | None = None) -> str:
+    """Cut a line to `MAX_LINE_CHARS`, keeping the part around the match if there is one."""
+    if len(line) <= MAX_LINE_CHARS:
+        return line
+    start = 0
+    if match_start is not None and match_start > MAX_LINE_CHARS // 2:
+        start = min(match_start - MAX_LINE_CHARS // 4, len(line) - MAX_LINE_CHARS)
+    clipped = line[start : start + MAX_LINE_CHARS]
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + MAX_LINE_CHARS < len(line) else ""
+    return f"{prefix}{clipped}{suffix}"
+
+
+@dataclass(slots=True)
+class _FileMatches:
+    path: str
+    lines: list[tuple[int | None, bool, str]] = field(
+        default_factory=list[tuple[int | None, bool, str]]
+    )
+    """Line number, whether the line matched, and its text."""
+    shown_matches: int = 0
+    shown_matched_lines: int = 0
+    matched_lines: int = 0
+    capped: bool = False
+
+
+class _ContentMatches:
+    """Matches of a search in content mode, collected from ripgrep's JSON event stream.
+
+    At most `MAX_MATCHES_PER_FILE` matches of each file are kept, so that the results
+    sample many files rather than the head of one.
+    """
+
+    def __init__(self) -> None:
+        self.files: dict[str, _FileMatches] = {}
+        self.n_lines = 0
+        self.n_chars = 0
+        self._current: _FileMatches | None = None
+
+    def feed(self, raw: bytes) -> None:
+        try:
+            event = json.loads(raw)
+        except ValueError:
+            # Cut because the line is very long, see `iter_lines`.
+            if raw.startswith(b'{"type":"match"') and self._current is not None:
+                self._add_match(self._current, None, ["[line too long to show]"], None)
+            return
+        if not isinstance(event, dict):
+            return
+        event = cast(dict[str, Any], event)
+        data = event.get("data")
+        if not isinstance(data, dict):
+            return
+        data = cast(dict[str, Any], data)
+        match event.get("type"):
+            case "begin":
+                path = _json_text(data.get("path"))
+                self._current = self.files.setdefault(path, _FileMatches(path))
+            case "match" | "context" if self._current is not None:
+                line_number = data.get("line_number")
+                line_number = line_number if isinstance(line_number, int) else None
+                lines = _json_text(data.get("lines")).splitlines() or [""]
+                if event["type"] == "context":
+                    if not self._current.capped:
+                        self._add_lines(self._current, line_number, lines, False)
+                    return
+                submatches = data.get("submatches")
+                match_start: int | None = None
+                if isinstance(submatches, list) and submatches:
+                    first = cast(dict[str, Any], cast(list[Any], submatches)[0])
+                    if isinstance(start := first.get("start"), int):
+                        # ripgrep reports byte offsets.
+                        match_start = len(
+                            lines[0].encode("utf-8")[:start].decode("utf-8", errors="ignore")
+                        )
+                self._add_match(self._current, line_number, lines, match_start)
+            case "end" if self._current is not None:
+                stats = data.get("stats")
+                if isinstance(stats, dict):
+                    matched_lines = cast(dict[str, Any], stats).get("matched_lines")
+                    if isinstance(matched_lines, int):
+                        self._current.matched_lines = matched_lines
+                self._current = None
+            case _:
+                pass
+
+    def _add_match(
+        self,
+        file: _FileMatches,
+        line_number: int | None,
+        lines: list[str],
+        match_start: int | None,
+    ) -> None:
+        if file.shown_matches >= MAX_MATCHES_PER_FILE:
+            file.capped = True
+            return
+        file.shown_matches += 1
+        file.shown_matched_lines += len(lines)
+        self._add_lines(file, line_number, lines, True, match_start)
+
+    def _add_lines(
+        self,
+        file: _FileMatches,
+        line_number: int | None,
+        lines: list[str],
+        is_match: bool,
+        match_start: int | None = None,
+    ) -> None:
+        for offset, line in enumerate(lines):
+            text = clip_line(line, match_start if offset == 0 else None)
+            file.lines.append(
+                (line_number + offset if line_number is not None else None, is_match, text)
+            )
+            self.n_lines += 1
+            self.n_chars += len(file.path) + len(text) + 2
+
+    @property
+    def matched_lines(self) -> int:
+        return sum(
+            max(file.matched_lines, file.shown_matched_lines) for file in self.files.values()
+        )
+
+    def render(self, *, with_path: bool, line_number: bool, context: bool) -> list[str]:
+        """Render the matches like ripgrep does, in the order of the file paths."""
+        rendered: list[str] = []
+        for file in sorted(self.files.values(), key=lambda file: file.path):
+            if not file.lines:
+                continue
+            if context and rendered:
+                rendered.append("--")
+            previous: int | None = None
+            for number, is_match, text in file.lines:
+                if (
+                    context
+                    and previous is not None
+                    and number is not None
+                    and number > previous + 1
+                ):
+                    rendered.append("--")
+                separator = ":" if is_match else "-"
+                prefix = f"{file.path}{separator}" if with_path else ""
+                if line_number and number is not None:
+                    prefix += f"{number}{separator}"
+                rendered.append(prefix + text)
+                previous = number
+            hidden = file.matched_lines - file.shown_matched_lines
+            if hidden > 0:
+                location = f"{file.path}: " if with_path else ""
+                rendered.append(f"{location}... {hidden} more matching lines not shown")
+        return rendered
+
+
 class Grep(CallableTool2[Params]):
     name: str = "Grep"
-    description: str = load_desc(Path(__file__).parent / "grep.md")
+    description: str = load_desc(
+        Path(__file__).parent / "grep.md",
+        {
+            "MAX_MATCHES_PER_FILE": str(MAX_MATCHES_PER_FILE),
+            "MAX_LINE_CHARS": str(MAX_LINE_CHARS),
+        },
+    )
     params: type[Params] = Params
 
+    def __init__(self, runtime: Runtime) -> None:
+        super().__init__()
+        self._index: GrepIndex | None = None
+        if (
+            runtime.config.grep.trigram_index
+            and runtime.workspace_index is not None
+            and platform.system() != "Windows"
+        ):
+            self._index = get_grep_index(runtime.workspace_index)
+
+    async def _narrow_search(self, rg_path: str, params: Params, cwd: str) -> list[str] | None:
+        """The files the trigram index cannot rule out, as paths to pass to ripgrep, if the
+        search is worth narrowing down."""
+        if self._index is None:
+            return None
+        trigrams = required_trigrams(params.pattern, ignore_case=params.ignore_case)
+        if trigrams is None:
+            return None
+        path = os.path.expanduser(params.path)
+        if not os.path.isdir(os.path.join(cwd, path)):
+            return None
+        candidates = await self._index.candidates(
+            cwd,
+            (path, params.glob, params.type),
+            lambda: _list_files(rg_path, params, cwd),
+            trigrams,
+        )
+        if candidates is not None:
+            logger.debug("Narrowed down the search to {n} files", n=len(candidates))
+        return candidates
+
     @override
     async def __call__(self, params: Params) -> ToolReturnValue:
         try:
             builder = ToolResultBuilder()
-            message = ""
+            messages: list[str] = []
 
-            # Initialize ripgrep with pattern and path
-            rg_path = await _ensure_rg_path()
+            rg_path = await ensure_rg_path()
             logger.debug("Using ripgrep binary: {rg_bin}", rg_bin=rg_path)
-            rg = ripgrepy.Ripgrepy(params.pattern, params.path, rg_path=rg_path)
-
-            # Apply search options
-            if params.ignore_case:
-                rg = rg.ignore_case()
-            if params.multiline:
-                rg = rg.multiline().multiline_dotall()
-
-            # Content display options (only for content mode)
-            if params.output_mode == "content":
-                if params.before_context is not None:
-                    rg = rg.before_context(params.before_context)
-                if params.after_context is not None:
-                    rg = rg.after_context(params.after_context)
-                if params.context is not None:
-                    rg = rg.context(params.context)
-                if params.line_number:
-                    rg = rg.line_number()
-
-            # File filtering options
-            if params.glob:
-                rg = rg.glob(params.glob)
-            if params.type:
-                rg = rg.type_(params.type)
-
-            # Set output mode
-            if params.output_mode == "files_with_matches":
-                rg = rg.files_with_matches()
-            elif params.output_mode == "count_matches":
-                rg = rg.count_matches()
-
-            # Execute search
-            result = rg.run(universal_newlines=False)
-
-            # Get results
-            output = result.as_string
-
-            # Apply head limit if specified
-            if params.head_limit is not None:
-                lines = output.split("\n")
-                if len(lines) > params.head_limit:
-                    lines = lines[: params.head_limit]
-                    output = "\n".join(lines)
-                    message = f"Results truncated to first {params.head_limit} lines"
-                    if params.output_mode in ["content", "files_with_matches", "count_matches"]:
-                        output += f"\n... (results truncated to {params.head_limit} lines)"
-
-            if not output:
+
+            # Stream the output of ripgrep, and stop it as soon as enough has been read, so
+            # the cost of a search depends on what is returned rather than on the repository.
+            cwd = str(KaosPath.cwd())
+            paths = await self._narrow_search(rg_path, params, cwd)
+            if paths == []:
+                return builder.ok(message="No matches found")
+            process = await asyncio.create_subprocess_exec(
+                *_build_rg_args(rg_path, params, paths=paths),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+            )
+            assert process.stdout is not None
+            assert process.stderr is not None
+            stderr_task = asyncio.create_task(read_tail(process.stderr, _MAX_STDERR_BYTES))
+            matches: _ContentMatches | None = None
+            stopped_early = False
+            n_lines = 0
+            truncated = False
+            try:
+                if params.output_mode == "content":
+                    matches = _ContentMatches()
+                    async for event in iter_lines(process.stdout, _MAX_JSON_LINE_BYTES):
+                        matches.feed(event)
+                        if matches.n_chars > builder.max_chars or (
+                            params.head_limit is not None and matches.n_lines > params.head_limit
+                        ):
+                            stopped_early = True
+                            break
+                else:
+                    async for line in iter_lines(process.stdout):
+                        if params.head_limit is not None and n_lines >= params.head_limit:
+                            truncated = True
+                            break
+                        builder.write(line.decode("utf-8", errors="replace"))
+                        n_lines += 1
+                        if builder.is_full:
+                            break
+            finally:
+                if process.returncode is None:
+                    with contextlib.suppress(ProcessLookupError):
+                        process.kill()
+                await process.wait()
+                stderr = await stderr_task
+
+            if matches is not None:
+                with_path = not os.path.isfile(os.path.join(cwd, os.path.expanduser(params.path)))
+                for line in matches.render(
+                    with_path=with_path,
+                    line_number=params.line_number,
+                    context=bool(params.before_context or params.after_context or params.context),
+                ):
+                    if params.head_limit is not None and n_lines >= params.head_limit:
+                        truncated = True
+                        break
+                    builder.write(line + "\n")
+                    n_lines += 1
+                if matches.files:
+                    n_matched, n_files = matches.matched_lines, len(matches.files)
+                    summary = (
+                        f"Found {'at least ' if stopped_early else ''}"
+                        f"{n_matched} matching line{'' if n_matched == 1 else 's'} "
+                        f"in {n_files} file{'' if n_files == 1 else 's'}"
+                    )
+                    if any(file.capped for file in matches.files.values()):
+                        summary += f", showing at most {MAX_MATCHES_PER_FILE} per file"
+                    messages.insert(0, summary)
+
+            if truncated:
+                messages.append(f"Results truncated to first {params.head_limit} lines")
+                builder.write(f"... (results truncated to {params.head_limit} lines)")
+
+            # ripgrep exits with 1 if nothing matched, and with 2 on errors, which may only
+            # concern some of the files, e.g. unreadable ones.
+            if process.returncode == 2 and not n_lines:
+                raise RuntimeError(stderr.decode("utf-8", errors="replace").strip())
+
+            if not n_lines and not truncated:
                 return builder.ok(message="No matches found")
 
-            builder.write(output)
-            return builder.ok(message=message)
+            return builder.ok(message=". ".join(messages))
 
         except Exception as e:
             return ToolError(
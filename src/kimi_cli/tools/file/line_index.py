@@ -0,0 +1,87 @@
+"""
+Sparse line-offset index of large files, so that `ReadFile` can seek to the lines it reads
+instead of reading the file from the start.
+
+The byte offset of every `CHECKPOINT_LINES`-th line is recorded as the lines of a file are
+read, so reading a window of lines only reads from the closest recorded line before it. The
+indexes are kept in memory for the last `MAX_INDEXED_FILES` files read, and an index is only
+used while the size and modification time of its file stay the same.
+"""
+
+import re
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from typing import Literal
+
+from kaos import get_current_kaos
+from kaos.path import KaosPath
+
+CHECKPOINT_LINES = 1000
+"""Lines between the recorded line offsets."""
+MAX_INDEXED_FILES = 16
+CHUNK_BYTES = 1 << 20
+
+# Lines end like in files opened in text mode with universal newlines.
+_LINE_END = re.compile(rb"\r\n|\r|\n")
+
+
+@dataclass(slots=True)
+class _LineIndex:
+    offsets: list[int] = field(default_factory=lambda: [0])
+    """Byte offsets of lines 1, `CHECKPOINT_LINES` + 1, 2 * `CHECKPOINT_LINES` + 1, ..."""
+
+
+_indexes: OrderedDict[tuple[int, str, int, float], _LineIndex] = OrderedDict()
+
+
+def _get_index(key: tuple[int, str, int, float]) -> _LineIndex:
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = _LineIndex()
+        while len(_indexes) > MAX_INDEXED_FILES:
+            _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(key)
+    return index
+
+
+async def read_lines_from(
+    path: KaosPath, line_offset: int, *, errors: Literal["strict", "ignore", "replace"] = "strict"
+) -> AsyncIterator[str]:
+    """
+    The lines of the UTF-8 text file `path`, starting from line `line_offset`, like
+    `KaosPath.read_lines` yields them: line endings are translated to `\\n`.
+    """
+    assert line_offset >= 1
+    stat = await path.stat()
+    index = _get_index((id(get_current_kaos()), str(path), stat.st_size, stat.st_mtime))
+    checkpoint = min((line_offset - 1) // CHECKPOINT_LINES, len(index.offsets) - 1)
+    # `buffer` holds the bytes read from `offset`, where line `line_no` starts.
+    line_no = checkpoint * CHECKPOINT_LINES + 1
+    offset = index.offsets[checkpoint]
+    buffer = b""
+    eof = False
+    while not eof:
+        chunk = await path.read_bytes(CHUNK_BYTES, offset=offset + len(buffer))
+        eof = not chunk
+        buffer += chunk
+        start = 0
+        for match in _LINE_END.finditer(buffer):
+            if match.group() == b"\r" and match.end() == len(buffer) and not eof:
+                # The line may end with `\r\n` split across two chunks.
+                break
+            if line_no >= line_offset:
+                yield buffer[start : match.start()].decode("utf-8", errors) + "\n"
+            start = match.end()
+            line_no += 1
+            if line_no == len(index.offsets) * CHECKPOINT_LINES + 1:
+                index.offsets.append(offset + start)
+        if eof and start < len(buffer) and line_no >= line_offset:
+            yield buffer[start:].decode("utf-8", errors)
+        if line_no < line_offset:
+            # Skipped lines do not need to be kept, only whether a skipped line may end
+            # with `\r\n` split across two chunks.
+            start = max(start, len(buffer) - 1)
+        offset += start
+        buffer = buffer[start:]
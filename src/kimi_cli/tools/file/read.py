@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pathlib import Path
 from typing import override
 
@@ -6,6 +7,7 @@ from kosong.tooling import CallableTool2, ToolError, ToolOk, ToolReturnValue
 from pydantic import BaseModel, Field
 
 from kimi_cli.soul.agent import Runtime
+from kimi_cli.tools.file.line_index import read_lines_from
 from kimi_cli.tools.file.utils import MEDIA_SNIFF_BYTES, detect_file_type
 from kimi_cli.tools.utils import load_desc, truncate_line
 from kimi_cli.utils.path import is_within_workspace
@@ -13,6 +15,106 @@ from kimi_cli.utils.path import is_within_workspace
 MAX_LINES = 1000
 MAX_LINE_LENGTH = 2000
 MAX_BYTES = 100 << 10  # 100KB
+INDEXED_FILE_BYTES = 1 << 20  # 1MB
+
+
+@dataclass(slots=True)
+class FileLines:
+    """Lines read from a text file by `read_file_lines`."""
+
+    lines: list[str]
+    """The lines read, with lines longer than `MAX_LINE_LENGTH` truncated."""
+    truncated_line_numbers: list[int]
+    max_lines_reached: bool
+    max_bytes_reached: bool
+
+
+async def check_text_file(p: KaosPath, path: str) -> ToolError | None:
+    """Check that `p` is an existing text file. `path` is how the file is referred to in errors."""
+    if not await p.exists():
+        return ToolError(
+            message=f"`{path}` does not exist.",
+            brief="File not found",
+        )
+    if not await p.is_file():
+        return ToolError(
+            message=f"`{path}` is not a file.",
+            brief="Invalid path",
+        )
+
+    header = await p.read_bytes(MEDIA_SNIFF_BYTES)
+    file_type = detect_file_type(str(p), header=header)
+    if file_type.kind in ("image", "video"):
+        return ToolError(
+            message=(
+                f"`{path}` is a {file_type.kind} file. "
+                "Use other appropriate tools to read image or video files."
+            ),
+            brief="Unsupported file type",
+        )
+
+    if file_type.kind == "unknown":
+        return ToolError(
+            message=(
+                f"`{path}` seems not readable. "
+                "You may need to read it with proper shell commands, Python tools "
+                "or MCP tools if available. "
+                "If you read/operate it with Python, you MUST ensure that any "
+                "third-party packages are installed in a virtual environment (venv)."
+            ),
+            brief="File not readable",
+        )
+    return None
+
+
+async def read_file_lines(
+    p: KaosPath,
+    line_offset: int,
+    n_lines: int,
+    *,
+    max_lines: int = MAX_LINES,
+    max_bytes: int = MAX_BYTES,
+) -> FileLines:
+    """Read up to `n_lines` lines of the text file `p`, starting from line `line_offset`."""
+    lines: list[str] = []
+    n_bytes = 0
+    truncated_line_numbers: list[int] = []
+    max_lines_reached = False
+    max_bytes_reached = False
+    if (await p.stat()).st_size >= INDEXED_FILE_BYTES:
+        # Seek to the lines to read in large files, instead of reading up to them
+        current_line_no = line_offset - 1
+        read_lines = read_lines_from(p, line_offset, errors="replace")
+    else:
+        current_line_no = 0
+        read_lines = p.read_lines(errors="replace")
+    async for line in read_lines:
+        current_line_no += 1
+        if current_line_no < line_offset:
+            continue
+        truncated = truncate_line(line, MAX_LINE_LENGTH)
+        if truncated != line:
+            truncated_line_numbers.append(current_line_no)
+        lines.append(truncated)
+        n_bytes += len(truncated.encode("utf-8"))
+        if len(lines) >= n_lines:
+            break
+        if len(lines) >= max_lines:
+            max_lines_reached = True
+            break
+        if n_bytes >= max_bytes:
+            max_bytes_reached = True
+            break
+    return FileLines(lines, truncated_line_numbers, max_lines_reached, max_bytes_reached)
+
+
+def format_lines(lines: list[str], line_offset: int) -> str:
+    """Format lines read from line `line_offset` with line numbers, like `cat -n`."""
+    # Use 6-digit line number width, right-aligned, with tab separator.
+    # Lines already contain \n, just join them.
+    return "".join(
+        f"{line_num:6d}\t{line}" for line_num, line in enumerate(lines, start=line_offset)
+    )
 
 
 class Params(BaseModel):
@@ -95,93 +197,27 @@ class ReadFile(CallableTool2[Params]):
             if err := await self._validate_path(p):
                 return err
             p = p.canonical()
-
-            if not await p.exists():
-                return ToolError(
-                    message=f"`{params.path}` does not exist.",
-                    brief="File not found",
-                )
-            if not await p.is_file():
-                return ToolError(
-                    message=f"`{params.path}` is not a file.",
-                    brief="Invalid path",
-                )
-
-            header = await p.read_bytes(MEDIA_SNIFF_BYTES)
-            file_type = detect_file_type(str(p), header=header)
-            if file_type.kind in ("image", "video"):
-                return ToolError(
-                    message=(
-                        f"`{params.path}` is a {file_type.kind} file. "
-                        "Use other appropriate tools to read image or video files."
-                    ),
-                    brief="Unsupported file type",
-                )
-
-            if file_type.kind == "unknown":
-                return ToolError(
-                    message=(
-                        f"`{params.path}` seems not readable. "
-                        "You may need to read it with proper shell commands, Python tools "
-                        "or MCP tools if available. "
-                        "If you read/operate it with Python, you MUST ensure that any "
-                        "third-party packages are installed in a virtual environment (venv)."
-                    ),
-                    brief="File not readable",
-                )
+            if err := await check_text_file(p, params.path):
+                return err
 
             assert params.line_offset >= 1
             assert params.n_lines >= 1
 
-            lines: list[str] = []
-            n_bytes = 0
-            truncated_line_numbers: list[int] = []
-            max_lines_reached = False
-            max_bytes_reached = False
-            current_line_no = 0
-            async for line in p.read_lines(errors="replace"):
-                current_line_no += 1
-                if current_line_no < params.line_offset:
-                    continue
-                truncated = truncate_line(line, MAX_LINE_LENGTH)
-                if truncated != line:
-                    truncated_line_numbers.append(current_line_no)
-                lines.append(truncated)
-                n_bytes += len(truncated.encode("utf-8"))
-                if len(lines) >= params.n_lines:
-                    break
-                if len(lines) >= MAX_LINES:
-                    max_lines_reached = True
-                    break
-                if n_bytes >= MAX_BYTES:
-                    max_bytes_reached = True
-                    break
-
-            # Format output with line numbers like `cat -n`
-            lines_with_no: list[str] = []
-            for line_num, line in zip(
-                range(params.line_offset, params.line_offset + len(lines)), lines, strict=True
-            ):
-                # Use 6-digit line number width, right-aligned, with tab separator
-                lines_with_no.append(f"{line_num:6d}\t{line}")
-
+            read = await read_file_lines(p, params.line_offset, params.n_lines)
             message = (
-                f"{len(lines)} lines read from file starting from line {params.line_offset}."
-                if len(lines) > 0
+                f"{len(read.lines)} lines read from file starting from line {params.line_offset}."
+                if len(read.lines) > 0
                 else "No lines read from file."
             )
-            if max_lines_reached:
+            if read.max_lines_reached:
                 message += f" Max {MAX_LINES} lines reached."
-            elif max_bytes_reached:
+            elif read.max_bytes_reached:
                 message += f" Max {MAX_BYTES} bytes reached."
-            elif len(lines) < params.n_lines:
+            elif len(read.lines) < params.n_lines:
                 message += " End of file reached."
-            if truncated_line_numbers:
-                message += f" Lines {truncated_line_numbers} were truncated."
-            return ToolOk(
-                output="".join(lines_with_no),  # lines already contain \n, just join them
-                message=message,
-            )
+            if read.truncated_line_numbers:
+                message += f" Lines {read.truncated_line_numbers} were truncated."
+            return ToolOk(output=format_lines(read.lines, params.line_offset), message=message)
         except Exception as e:
             return ToolError(
                 message=f"Failed to read {params.path}. Error: {e}",
@@ -0,0 +1,179 @@
+"""ReadFiles tool implementation."""
+
+import asyncio
+import html
+from pathlib import Path
+from typing import override
+
+from kaos.path import KaosPath
+from kosong.tooling import CallableTool2, ToolError, ToolOk, ToolReturnValue
+from pydantic import BaseModel, Field
+
+from kimi_cli.soul.agent import Runtime
+from kimi_cli.tools.file.read import (
+    MAX_LINE_LENGTH,
+    MAX_LINES,
+    FileLines,
+    check_text_file,
+    format_lines,
+    read_file_lines,
+)
+from kimi_cli.tools.utils import load_desc
+from kimi_cli.utils.path import is_within_workspace
+
+MAX_FILES = 20
+MAX_TOTAL_LINES = 3000
+MAX_TOTAL_BYTES = 200 << 10  # 200KB
+
+
+class FileRange(BaseModel):
+    path: str = Field(
+        description=(
+            "The path to the file to read. Absolute paths are required when reading files "
+            "outside the working directory."
+        )
+    )
+    line_offset: int = Field(
+        description="The line number to start reading the file from.",
+        default=1,
+        ge=1,
+    )
+    n_lines: int | None = Field(
+        description=(
+            "The number of lines to read from the file. "
+            f"By default read up to {MAX_LINES} lines, which is the max allowed value."
+        ),
+        default=None,
+        ge=1,
+        le=MAX_LINES,
+    )
+
+
+class Params(BaseModel):
+    files: list[FileRange] = Field(
+        description=f"The files to read, at most {MAX_FILES}.",
+        min_length=1,
+        max_length=MAX_FILES,
+    )
+
+
+def _attr(value: str) -> str:
+    return html.escape(value, quote=False).replace('"', "&quot;")
+
+
+class ReadFiles(CallableTool2[Params]):
+    name: str = "ReadFiles"
+    params: type[Params] = Params
+
+    def __init__(self, runtime: Runtime) -> None:
+        description = load_desc(
+            Path(__file__).parent / "read_batch.md",
+            {
+                "MAX_FILES": MAX_FILES,
+                "MAX_LINES": MAX_LINES,
+                "MAX_TOTAL_LINES": MAX_TOTAL_LINES,
+                "MAX_TOTAL_BYTES": MAX_TOTAL_BYTES,
+                "MAX_LINE_LENGTH": MAX_LINE_LENGTH,
+            },
+        )
+        super().__init__(description=description)
+        self._work_dir = runtime.builtin_args.KIMI_WORK_DIR
+        self._additional_dirs = runtime.additional_dirs
+
+    async def _validate_path(self, path: KaosPath) -> ToolError | None:
+        """Validate that the path is safe to read."""
+        resolved_path = path.canonical()
+
+        if (
+            not is_within_workspace(resolved_path, self._work_dir, self._additional_dirs)
+            and not path.is_absolute()
+        ):
+            # Outside files can only be read with absolute paths
+            return ToolError(
+                message=(
+                    f"`{path}` is not an absolute path. "
+                    "You must provide an absolute path to read a file "
+                    "outside the working directory."
+                ),
+                brief="Invalid path",
+            )
+        return None
+
+    async def _read(self, file: FileRange) -> FileLines | ToolError:
+        if not file.path:
+            return ToolError(message="File path cannot be empty.", brief="Empty file path")
+        try:
+            p = KaosPath(file.path).expanduser()
+            if err := await self._validate_path(p):
+                return err
+            p = p.canonical()
+            if err := await check_text_file(p, file.path):
+                return err
+            # Every file is read up to the budget of the whole batch, which is then shared
+            # out in the order of the files.
+            return await read_file_lines(
+                p,
+                file.line_offset,
+                file.n_lines or MAX_LINES,
+                max_lines=MAX_LINES,
+                max_bytes=MAX_TOTAL_BYTES,
+            )
+        except Exception as e:
+            return ToolError(
+                message=f"Failed to read {file.path}. Error: {e}",
+                brief="Failed to read file",
+            )
+
+    @override
+    async def __call__(self, params: Params) -> ToolReturnValue:
+        results = await asyncio.gather(*(self._read(file) for file in params.files))
+
+        output: list[str] = []
+        n_read = n_failed = 0
+        n_lines = n_bytes = 0
+        budget_reached = False
+        for file, result in zip(params.files, results, strict=True):
+            path = _attr(file.path)
+            if isinstance(result, ToolError):
+                n_failed += 1
+                output.append(f'<file path="{path}" error="{_attr(result.message)}" />\n')
+                continue
+
+            lines: list[str] = []
+            for line in result.lines:
+                if n_lines >= MAX_TOTAL_LINES or n_bytes >= MAX_TOTAL_BYTES:
+                    budget_reached = True
+                    break
+                lines.append(line)
+                n_lines += 1
+                n_bytes += len(line.encode("utf-8"))
+            n_read += 1
+
+            attrs = f'path="{path}"'
+            if lines:
+                attrs += f' lines="{file.line_offset}-{file.line_offset + len(lines) - 1}"'
+            next_line = file.line_offset + len(lines)
+            if len(lines) < len(result.lines):
+                attrs += (
+                    f' truncated="Budget of {MAX_TOTAL_LINES} lines or {MAX_TOTAL_BYTES} bytes '
+                    f'for all files reached, continue from line {next_line}"'
+                )
+            elif result.max_bytes_reached or (file.n_lines is None and len(lines) == MAX_LINES):
+                attrs += f' truncated="Continue from line {next_line}"'
+            elif len(lines) < (file.n_lines or MAX_LINES):
+                attrs += ' end_of_file="true"'
+            if long_lines := [n for n in result.truncated_line_numbers if n < next_line]:
+                attrs += f' long_lines_truncated="{", ".join(map(str, long_lines))}"'
+            content = format_lines(lines, file.line_offset)
+            if content and not content.endswith("\n"):
+                content += "\n"
+            output.append(f"<file {attrs}>\n{content}</file>\n")
+
+        message = f"{n_read} of {len(params.files)} files read, {n_lines} lines in total."
+        if budget_reached:
+            message += " Budget for all files reached."
+        if n_failed:
+            message += f" Failed to read {n_failed} file{'' if n_failed == 1 else 's'}."
+        if not n_read:
+            return ToolError(output="".join(output), message=message, brief="Failed to read files")
+        return ToolOk(output="".join(output), message=message)
@@ -7,10 +7,9 @@ from pydantic import BaseModel, Field
 
 from kimi_cli.soul.agent import Runtime
 from kimi_cli.soul.approval import Approval
-from kimi_cli.tools.display import DisplayBlock
 from kimi_cli.tools.file import FileActions
 from kimi_cli.tools.utils import ToolRejectedError, load_desc
-from kimi_cli.utils.diff import build_diff_blocks
+from kimi_cli.utils.diff import diff_file
 from kimi_cli.utils.path import is_within_workspace
 
 
@@ -113,9 +112,7 @@ class StrReplaceFile(CallableTool2[Params]):
                     brief="No replacements made",
                 )
 
-            diff_blocks: list[DisplayBlock] = list(
-                build_diff_blocks(str(p), original_content, content)
-            )
+            diff = await diff_file(str(p), original_content, content)
 
             action = (
                 FileActions.EDIT
@@ -128,7 +125,7 @@ class StrReplaceFile(CallableTool2[Params]):
                 self.name,
                 action,
                 f"Edit file `{p}`",
-                display=diff_blocks,
+                display=diff.blocks,
             ):
                 return ToolRejectedError()
 
@@ -150,7 +147,8 @@ class StrReplaceFile(CallableTool2[Params]):
                     f"File successfully edited. "
                     f"Applied {len(edits)} edit(s) with {total_replacements} total replacement(s)."
                 ),
-                display=diff_blocks,
+                display=diff.blocks,
+                extras=diff.extras(),
             )
 
         except Exception as e:
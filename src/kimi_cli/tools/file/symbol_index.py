@@ -0,0 +1,611 @@
+"""
+The definitions of classes, functions and other symbols in source files, for `FindSymbol`.
+
+Python files are parsed with `ast`. Other languages are scanned line by line with patterns in
+the spirit of ctags, and the extent of a definition is found by matching the braces of its body,
+skipping those in strings and comments.
+
+The symbols of each file are cached in a database under the share directory, one per work
+directory, and parsed again when the mtime or size of the file changes.
+"""
+
+from __future__ import annotations
+
+import ast
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from hashlib import md5
+from pathlib import Path
+
+from kimi_cli.share import get_share_dir
+from kimi_cli.utils.logging import logger
+
+INDEX_FORMAT = "1"
+MAX_PARSED_FILE_BYTES = 4 * 1024 * 1024
+"""Larger files are not parsed."""
+_RACY_NS = 2_000_000_000
+"""Files modified this shortly before they were parsed are parsed again, as a change within
+the same timestamp tick would go unnoticed."""
+_MAX_SIGNATURE_LINES = 8
+"""How many lines after the start of a definition its body may open."""
+
+
+@dataclass(frozen=True, slots=True)
+class Symbol:
+    name: str
+    kind: str
+    """E.g. `class`, `function` or `method`."""
+    line: int
+    end_line: int
+    container: str | None = None
+    """The qualified name of the class, type or module the symbol is defined in."""
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.container}.{self.name}" if self.container else self.name
+
+
+def _qualify(container: str | None, name: str) -> str:
+    return f"{container}.{name}" if container else name
+
+
+def _python_symbols(text: str) -> list[Symbol] | None:
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    symbols: list[Symbol] = []
+
+    def visit(body: list[ast.stmt], container: str | None, in_class: bool) -> None:
+        for node in body:
+            end_line = node.end_lineno or node.lineno
+            if isinstance(node, ast.ClassDef):
+                symbols.append(Symbol(node.name, "class", node.lineno, end_line, container))
+                visit(node.body, _qualify(container, node.name), True)
+            elif isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+                kind = "method" if in_class else "function"
+                symbols.append(Symbol(node.name, kind, node.lineno, end_line, container))
+                visit(node.body, _qualify(container, node.name), False)
+            elif isinstance(node, ast.TypeAlias):
+                symbols.append(Symbol(node.name.id, "type", node.lineno, end_line, container))
+            elif isinstance(node, ast.Assign | ast.AnnAssign):
+                # Only module and class attributes, not local variables.
+                if container is not None and not in_class:
+                    continue
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append(
+                            Symbol(target.id, "variable", node.lineno, end_line, container)
+                        )
+            elif isinstance(node, ast.If | ast.Try | ast.TryStar | ast.With | ast.AsyncWith):
+                # E.g. `if TYPE_CHECKING:` or `try: import ...` blocks.
+                visit(node.body, container, in_class)
+                if isinstance(node, ast.If | ast.Try | ast.TryStar):
+                    visit(node.orelse, container, in_class)
+                if isinstance(node, ast.Try | ast.TryStar):
+                    for handler in node.handlers:
+                        visit(handler.body, container, in_class)
+                    visit(node.finalbody, container, in_class)
+
+    visit(tree.body, None, False)
+    return symbols
+
+
+_PYTHON_FALLBACK = re.compile(
+    r"^[ \t]*(?:async[ \t]+)?(?P<kind>def|class)[ \t]+(?P<name>\w+)", re.M
+)
+
+
+def _python_fallback_symbols(text: str) -> list[Symbol]:
+    """Definitions in Python files with syntax errors, without their extent."""
+    symbols: list[Symbol] = []
+    for match in _PYTHON_FALLBACK.finditer(text):
+        line = text.count("\n", 0, match.start()) + 1
+        kind = "class" if match["kind"] == "class" else "function"
+        symbols.append(Symbol(match["name"], kind, line, line))
+    return symbols
+
+
+@dataclass(frozen=True, slots=True)
+class _Rule:
+    kind: str
+    """The kind of the symbols, unless the pattern has a `kind` group."""
+    pattern: re.Pattern[str]
+    """Matched at the start of lines, with a `name` and optionally a `container` group."""
+    members: bool = False
+    """Whether methods are defined directly in the body of the definition, like in classes."""
+    block: bool = True
+    """Whether a body in braces, or a `;`, follows the definition."""
+    needs_body: bool = False
+    """Whether definitions without a body, i.e. declarations, are skipped."""
+    member: bool = False
+    """Whether the rule only applies directly in the body of a container."""
+    symbol: bool = True
+    """Whether the definition is a symbol, rather than only a container (like Rust `impl`)."""
+
+
+@dataclass(frozen=True, slots=True)
+class _Language:
+    rules: tuple[_Rule, ...]
+    char_literal: str
+    """The pattern of character literals, or of strings in single quotes."""
+    raw_strings: bool = False
+    """Whether strings in backticks may span lines."""
+
+
+def _rule(kind: str, pattern: str, **kwargs: bool) -> _Rule:
+    return _Rule(kind, re.compile(pattern), **kwargs)
+
+
+_QUOTED_CHAR = r"'(?:\\.[^'\n]{0,8}|[^'\\\n])'"
+_QUOTED_STRING = r"'(?:\\.|[^'\\\n])*'"
+_METHOD_KEYWORDS = (
+    r"(?!(?:if|for|while|switch|catch|return|function|with|do|else|new|throw|case)\b)"
+)
+
+_JS_LIKE = _Language(
+    rules=(
+        _rule(
+            "class",
+            r"^\s*(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?"
+            r"class\s+(?P<name>[\w$]+)",
+            members=True,
+        ),
+        _rule(
+            "interface",
+            r"^\s*(?:export\s+)?(?:declare\s+)?interface\s+(?P<name>[\w$]+)",
+            members=True,
+        ),
+        _rule("enum", r"^\s*(?:export\s+)?(?:declare\s+)?(?:const\s+)?enum\s+(?P<name>[\w$]+)"),
+        _rule(
+            "type",
+            r"^\s*(?:export\s+)?(?:declare\s+)?type\s+(?P<name>[\w$]+)\s*(?:<[^=]*>)?\s*=",
+            block=False,
+        ),
+        _rule(
+            "function",
+            r"^\s*(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:async\s+)?"
+            r"function\s*\*?\s*(?P<name>[\w$]+)",
+        ),
+        _rule(
+            "function",
+            r"^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[\w$]+)\s*(?::[^=]+)?=\s*"
+            r"(?:async\s+)?(?:function\b|(?:\([^)]*\)|[\w$]+)\s*(?::[^=]+)?=>)",
+        ),
+        _rule(
+            "method",
+            r"^\s*(?:(?:public|private|protected|static|readonly|abstract|override|async|"
+            rf"get|set)\s+)*\*?\s*{_METHOD_KEYWORDS}(?P<name>#?[\w$]+)\s*(?:<[^>]*>)?\s*\(",
+            member=True,
+            needs_body=True,
+        ),
+        _rule(
+            "method",
+            r"^\s*(?:(?:public|private|protected|static|readonly|override)\s+)*"
+            r"(?P<name>#?[\w$]+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:\([^)]*\)|[\w$]+)\s*=>",
+            member=True,
+        ),
+    ),
+    char_literal=_QUOTED_STRING,
+    raw_strings=True,
+)
+
+_GO = _Language(
+    rules=(
+        _rule(
+            "method",
+            r"^func\s*\(\s*(?:\w+\s+)?\*?(?P<container>\w+)(?:\[[^\]]*\])?\s*\)\s*(?P<name>\w+)",
+        ),
+        _rule("function", r"^func\s+(?P<name>\w+)"),
+        _rule("struct", r"^type\s+(?P<name>\w+)(?:\[[^\]]*\])?\s+struct\b"),
+        _rule("interface", r"^type\s+(?P<name>\w+)(?:\[[^\]]*\])?\s+interface\b"),
+        _rule(
+            "type",
+            r"^type\s+(?P<name>\w+)(?:\[[^\]]*\])?\s+(?!struct\b|interface\b)\S",
+            block=False,
+        ),
+    ),
+    char_literal=_QUOTED_CHAR,
+    raw_strings=True,
+)
+
+_RUST_VISIBILITY = r"(?:pub(?:\s*\([^)]*\))?\s+)?"
+_RUST = _Language(
+    rules=(
+        _rule(
+            "function",
+            rf"^\s*{_RUST_VISIBILITY}(?:default\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?"
+            r'(?:extern\s+"[^"]*"\s+)?fn\s+(?P<name>\w+)',
+        ),
+        _rule("struct", rf"^\s*{_RUST_VISIBILITY}struct\s+(?P<name>\w+)"),
+        _rule("enum", rf"^\s*{_RUST_VISIBILITY}enum\s+(?P<name>\w+)"),
+        _rule("union", rf"^\s*{_RUST_VISIBILITY}union\s+(?P<name>\w+)"),
+        _rule(
+            "trait",
+            rf"^\s*{_RUST_VISIBILITY}(?:unsafe\s+)?(?:auto\s+)?trait\s+(?P<name>\w+)",
+            members=True,
+        ),
+        _rule(
+            "impl",
+            r"^\s*(?:unsafe\s+)?impl\b(?:\s*<[^{]*?>)?\s+(?:[^{]*?\s+for\s+)?&?(?:\w+::)*"
+            r"(?P<name>\w+)",
+            members=True,
+            symbol=False,
+        ),
+        _rule("module", rf"^\s*{_RUST_VISIBILITY}mod\s+(?P<name>\w+)"),
+        _rule("macro", r"^\s*macro_rules!\s*(?P<name>\w+)"),
+        _rule(
+            "constant",
+            rf"^\s*{_RUST_VISIBILITY}(?:const|static)\s+(?:mut\s+)?(?P<name>\w+)\s*:",
+            block=False,
+        ),
+        _rule("type", rf"^\s*{_RUST_VISIBILITY}type\s+(?P<name>\w+)", block=False),
+    ),
+    char_literal=_QUOTED_CHAR,
+)
+
+_JAVA_MODIFIERS = (
+    r"(?:(?:public|protected|private|internal|static|final|abstract|sealed|partial|strictfp|"
+    r"readonly|synchronized|native|default|virtual|override|async|extern|unsafe|new)\s+)*"
+)
+_JAVA_LIKE = _Language(
+    rules=(
+        _rule(
+            "class",
+            rf"^\s*(?:@\w+(?:\([^)]*\))?\s+)*{_JAVA_MODIFIERS}"
+            r"(?P<kind>class|interface|enum|record|struct)\s+(?P<name>\w+)",
+            members=True,
+        ),
+        _rule("namespace", r"^\s*namespace\s+(?P<name>[\w.]+)"),
+        _rule(
+            "constructor",
+            r"^\s*(?:public|protected|private|internal)\s+(?P<name>\w+)\s*\(",
+            member=True,
+            needs_body=True,
+        ),
+        _rule(
+            "method",
+            rf"^\s*(?:@\w+(?:\([^)]*\))?\s+)*{_JAVA_MODIFIERS}(?:<[^>]+>\s+)?{_METHOD_KEYWORDS}"
+            r"[\w\[\].?]+(?:\s*<[^()]*>)?(?:\[\])*\s+(?P<name>\w+)\s*(?:<[^>]*>)?\s*\(",
+            member=True,
+            needs_body=True,
+        ),
+    ),
+    char_literal=_QUOTED_CHAR,
+)
+
+_C_KEYWORDS = (
+    r"(?!(?:if|else|for|while|switch|return|typedef|using|case|do|goto|struct|class|union|enum|"
+    r"namespace|template|static_assert|public|private|protected|sizeof|delete|new)\b)"
+)
+_C_LIKE = _Language(
+    rules=(
+        _rule("namespace", r"^\s*namespace\s+(?P<name>[\w:]+)(?=\s*(?:\{|$))"),
+        _rule(
+            "class",
+            r"^\s*(?:typedef\s+)?(?:template\s*<[^>]*>\s*)?(?P<kind>struct|class|union|enum)"
+            r"(?:\s+class)?\s+(?:\w+\s+)*?(?P<name>\w+)\s*(?:final\s*)?(?::[^;{]*)?(?=\{|$)",
+            members=True,
+            needs_body=True,
+        ),
+        _rule("macro", r"^\s*#\s*define\s+(?P<name>\w+)", block=False),
+        _rule(
+            "function",
+            rf"^{_C_KEYWORDS}(?:[\w:*&<>,~]+[ \t*&]+)*?[*&]*"
+            r"(?P<name>(?:\w+::)*~?[A-Za-z_]\w*)\s*\((?!\s*\*)",
+            needs_body=True,
+        ),
+        _rule(
+            "method",
+            rf"^\s+(?:(?:virtual|static|inline|explicit|constexpr|friend)\s+)*{_C_KEYWORDS}"
+            r"(?:[\w:*&<>,~]+[ \t*&]+)*?[*&]*(?P<name>~?[A-Za-z_]\w*)\s*\((?!\s*\*)",
+            member=True,
+            needs_body=True,
+        ),
+    ),
+    char_literal=_QUOTED_CHAR,
+)
+
+_LANGUAGES: dict[str, _Language] = {
+    **dict.fromkeys((".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts"), _JS_LIKE),
+    ".go": _GO,
+    ".rs": _RUST,
+    **dict.fromkeys((".java", ".cs"), _JAVA_LIKE),
+    **dict.fromkeys((".c", ".h", ".cc", ".cpp", ".cxx", ".hpp", ".hh", ".hxx"), _C_LIKE),
+}
+SUPPORTED_EXTENSIONS = frozenset({".py", ".pyi", *_LANGUAGES})
+
+_token_patterns: dict[int, re.Pattern[str]] = {}
+
+
+def _token_pattern(language: _Language) -> re.Pattern[str]:
+    pattern = _token_patterns.get(id(language))
+    if pattern is None:
+        backtick = r"`(?:\\.|[^`\\])*`" if language.raw_strings else r"`[^`\n]*`"
+        pattern = re.compile(
+            r"(?P<masked>//[^\n]*|/\*.*?(?:\*/|\Z)|"
+            rf'"(?:\\.|[^"\\\n])*"|{language.char_literal}|{backtick})|(?P<brace>[{{}};])',
+            re.S,
+        )
+        _token_patterns[id(language)] = pattern
+    return pattern
+
+
+class _Braces:
+    """The braces and semicolons of a source file outside of strings and comments."""
+
+    def __init__(self, text: str, language: _Language) -> None:
+        self.line_starts = [0, *(m.end() for m in re.finditer("\n", text))]
+        self.offsets: list[int] = []
+        self.chars: list[str] = []
+        self.depths: list[int] = []
+        """The brace depth after each brace or semicolon."""
+        self.closing: dict[int, int] = {}
+        """The offset of the closing brace of each opening brace."""
+        self.masked_starts: list[int] = []
+        self.masked_ends: list[int] = []
+        opened: list[int] = []
+        for match in _token_pattern(language).finditer(text):
+            if match["masked"] is not None:
+                self.masked_starts.append(match.start())
+                self.masked_ends.append(match.end())
+                continue
+            char = match["brace"]
+            if char == "{":
+                opened.append(match.start())
+            elif char == "}" and opened:
+                self.closing[opened.pop()] = match.start()
+            self.offsets.append(match.start())
+            self.chars.append(char)
+            self.depths.append(len(opened))
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.line_starts, offset)
+
+    def depth_at(self, offset: int) -> int:
+        index = bisect_right(self.offsets, offset - 1) - 1
+        return self.depths[index] if index >= 0 else 0
+
+    def is_masked(self, offset: int) -> bool:
+        index = bisect_right(self.masked_starts, offset) - 1
+        return index >= 0 and offset < self.masked_ends[index]
+
+    def body(self, offset: int, line: int) -> tuple[int | None, int]:
+        """The opening brace of the body of the definition at `offset`, if it has one, and
+        the last line of the definition."""
+        index = bisect_right(self.offsets, offset - 1)
+        while index < len(self.offsets):
+            position = self.offsets[index]
+            if self.line_of(position) > line + _MAX_SIGNATURE_LINES:
+                break
+            char = self.chars[index]
+            if char == "{":
+                closing = self.closing.get(position)
+                end_line = self.line_of(closing) if closing is not None else len(self.line_starts)
+                return position, end_line
+            if char == ";":
+                return None, self.line_of(position)
+            # The end of the enclosing block.
+            break
+        return None, line
+
+
+@dataclass(slots=True)
+class _Scope:
+    """A definition with a body, which qualifies the names of the symbols defined in it."""
+
+    symbol: Symbol
+    body_depth: int
+    """The brace depth directly in its body."""
+    members: bool
+
+
+def _regex_symbols(text: str, language: _Language) -> list[Symbol]:
+    braces = _Braces(text, language)
+    scopes: list[_Scope] = []
+    symbols: list[Symbol] = []
+    lines = text.split("\n")
+    for index, line_text in enumerate(lines):
+        line = index + 1
+        offset = braces.line_starts[index]
+        stripped = len(line_text) - len(line_text.lstrip())
+        if not line_text.strip() or braces.is_masked(offset + stripped):
+            continue
+        while scopes and scopes[-1].symbol.end_line < line:
+            scopes.pop()
+        enclosing = scopes[-1] if scopes else None
+        in_members = (
+            enclosing is not None
+            and enclosing.members
+            and braces.depth_at(offset) == enclosing.body_depth
+        )
+        for rule in language.rules:
+            if rule.member and not in_members:
+                continue
+            match = rule.pattern.match(line_text)
+            if match is None:
+                continue
+            body, end_line = braces.body(offset + match.end(), line) if rule.block else (None, line)
+            if rule.needs_body and body is None:
+                continue
+            name: str = match["name"]
+            kind: str = match.groupdict().get("kind") or rule.kind
+            container: str | None = match.groupdict().get("container")
+            if container is None and enclosing is not None:
+                container = enclosing.symbol.qualified_name
+                if kind == "function" and in_members:
+                    kind = "method"
+            if "::" in name:
+                # E.g. `Parser::parse` in C++.
+                *path, name = name.split("::")
+                if path[0]:
+                    container = _qualify(container, ".".join(path))
+            symbol = Symbol(name, kind, line, end_line, container)
+            if rule.symbol:
+                symbols.append(symbol)
+            if body is not None and end_line > line:
+                scopes.append(_Scope(symbol, braces.depth_at(body + 1), rule.members))
+            break
+    return symbols
+
+
+def parse_symbols(path: str, text: str) -> list[Symbol] | None:
+    """The symbols defined in the source file `path` with content `text`.
+
+    Returns `None` if the language of the file is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".py", ".pyi"):
+        symbols = _python_symbols(text)
+        return symbols if symbols is not None else _python_fallback_symbols(text)
+    language = _LANGUAGES.get(extension)
+    if language is None:
+        return None
+    return _regex_symbols(text, language)
+
+
+@dataclass(slots=True)
+class _FileEntry:
+    mtime_ns: int
+    size: int
+    indexed_ns: int
+    symbols: list[Symbol]
+
+
+def _encode_symbols(symbols: list[Symbol]) -> str:
+    return json.dumps([[s.name, s.kind, s.line, s.end_line, s.container] for s in symbols])
+
+
+def _decode_symbols(data: str) -> list[Symbol]:
+    return [Symbol(*fields) for fields in json.loads(data)]
+
+
+class SymbolIndex:
+    """The symbols of the source files of one work directory."""
+
+    def __init__(self, root: Path, db_path: Path) -> None:
+        self.root = root
+        self._db_path = db_path
+        self._db: sqlite3.Connection | None = None
+        self._files: dict[str, _FileEntry] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    async def symbols_of(self, paths: list[str]) -> dict[str, list[Symbol]]:
+        """The symbols of the supported source files among the absolute `paths`."""
+        return await asyncio.to_thread(self._symbols_of, paths)
+
+    def _symbols_of(self, paths: list[str]) -> dict[str, list[Symbol]]:
+        self._load()
+        result: dict[str, list[Symbol]] = {}
+        rows: list[tuple[str, int, int, int, str]] = []
+        for path in paths:
+            if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entry = self._files.get(path)
+            if (
+                entry is not None
+                and entry.mtime_ns == st.st_mtime_ns
+                and entry.size == st.st_size
+                and entry.indexed_ns - entry.mtime_ns >= _RACY_NS
+            ):
+                result[path] = entry.symbols
+                continue
+            if st.st_size > MAX_PARSED_FILE_BYTES:
+                continue
+            indexed_ns = time.time_ns()
+            try:
+                with open(path, "rb") as f:
+                    text = f.read(MAX_PARSED_FILE_BYTES).decode("utf-8", errors="replace")
+            except OSError:
+                continue
+            symbols = parse_symbols(path, text) or []
+            self._files[path] = _FileEntry(st.st_mtime_ns, st.st_size, indexed_ns, symbols)
+            rows.append((path, st.st_mtime_ns, st.st_size, indexed_ns, _encode_symbols(symbols)))
+            result[path] = symbols
+        if rows:
+            try:
+                with self._lock:
+                    db = self._connect()
+                    with db:
+                        db.executemany(
+                            "INSERT OR REPLACE INTO files "
+                            "(path, mtime_ns, size, indexed_ns, symbols) VALUES (?, ?, ?, ?, ?)",
+                            rows,
+                        )
+            except sqlite3.Error as e:
+                logger.warning(
+                    "Failed to update the symbol index of {root}: {error}", root=self.root, error=e
+                )
+        return result
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self._db_path, check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = db.execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+            if row is None or row[0] != INDEX_FORMAT:
+                with db:
+                    db.execute("DROP TABLE IF EXISTS files")
+                    db.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('format', ?)",
+                        (INDEX_FORMAT,),
+                    )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, "
+                "size INTEGER, indexed_ns INTEGER, symbols TEXT)"
+            )
+            self._db = db
+        return self._db
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                rows = self._connect().execute(
+                    "SELECT path, mtime_ns, size, indexed_ns, symbols FROM files"
+                )
+                for path, mtime_ns, size, indexed_ns, data in rows:
+                    symbols = _decode_symbols(data)
+                    self._files[path] = _FileEntry(mtime_ns, size, indexed_ns, symbols)
+            except (sqlite3.Error, ValueError, TypeError) as e:
+                logger.warning(
+                    "Failed to load the symbol index of {root}: {error}", root=self.root, error=e
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                with contextlib.suppress(sqlite3.Error):
+                    self._db.close()
+                self._db = None
+
+
+_indexes: dict[str, SymbolIndex] = {}
+
+
+def get_symbol_index(root: Path) -> SymbolIndex:
+    """The symbol index of the work directory `root`, stored under the share directory."""
+    key = os.path.abspath(root)
+    index = _indexes.get(key)
+    if index is None:
+        digest = md5(key.encode("utf-8", errors="surrogateescape")).hexdigest()
+        db_path = get_share_dir() / "symbol-index" / f"{digest}.sqlite3"
+        index = _indexes[key] = SymbolIndex(Path(key), db_path)
+    return index
@@ -0,0 +1,306 @@
+"""FindSymbol tool implementation."""
+
+import asyncio
+import contextlib
+import os
+import re
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Literal, override
+
+from kaos.path import KaosPath
+from kosong.tooling import CallableTool2, ToolError, ToolReturnValue
+from pydantic import BaseModel, Field
+
+from kimi_cli.soul.agent import Runtime
+from kimi_cli.tools.file.grep_local import clip_line, ensure_rg_path, iter_lines, read_tail
+from kimi_cli.tools.file.symbol_index import (
+    SUPPORTED_EXTENSIONS,
+    Symbol,
+    SymbolIndex,
+    get_symbol_index,
+)
+from kimi_cli.tools.utils import ToolResultBuilder, load_desc
+
+MAX_RESULTS = 100
+_MAX_STDERR_BYTES = 4096
+_NAME_PATTERN = re.compile(r"[\w$#~]+")
+
+
+class Params(BaseModel):
+    query: Literal["definition", "references", "outline"] = Field(
+        description=(
+            "`definition`: Where the symbol `name` is defined; "
+            "`references`: Where `name` is used, with the symbol each use is in; "
+            "`outline`: The symbols defined in the file `path`."
+        )
+    )
+    name: str | None = Field(
+        description=(
+            "Name of the symbol, for `definition` and `references`. May be qualified with the "
+            "class or type it is defined in, e.g. `Parser.parse`."
+        ),
+        default=None,
+    )
+    path: str = Field(
+        description=(
+            "File or directory to look in. Defaults to current working directory. "
+            "For `outline`, the file to list the symbols of."
+        ),
+        default=".",
+    )
+
+
+async def _rg_lines(rg_path: str, args: list[str], cwd: str) -> AsyncIterator[str]:
+    """Lines of the output of ripgrep run with `args`, until the caller stops reading."""
+    globs = [arg for extension in sorted(SUPPORTED_EXTENSIONS) for arg in ("-g", f"*{extension}")]
+    process = await asyncio.create_subprocess_exec(
+        rg_path,
+        *globs,
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+    )
+    assert process.stdout is not None
+    assert process.stderr is not None
+    stderr_task = asyncio.create_task(read_tail(process.stderr, _MAX_STDERR_BYTES))
+    n_lines = 0
+    try:
+        async for line in iter_lines(process.stdout):
+            n_lines += 1
+            yield line.decode("utf-8", errors="surrogateescape").rstrip("\n")
+    finally:
+        if process.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+        await process.wait()
+        stderr = await stderr_task
+    # ripgrep exits with 1 if nothing matched, and with 2 on errors, which may only concern
+    # some of the files, e.g. unreadable ones.
+    if process.returncode == 2 and not n_lines:
+        raise RuntimeError(stderr.decode("utf-8", errors="replace").strip())
+
+
+def _split_name(name: str) -> tuple[str | None, str]:
+    """The qualifier and the name of the symbol `name`."""
+    qualifier, _, simple = name.replace("::", ".").rpartition(".")
+    return qualifier or None, simple
+
+
+def _is_in(symbol: Symbol, qualifier: str | None) -> bool:
+    if qualifier is None:
+        return True
+    container = symbol.container or ""
+    return container == qualifier or container.endswith(f".{qualifier}")
+
+
+def _enclosing(symbols: list[Symbol], line: int) -> Symbol | None:
+    """The innermost symbol whose definition spans `line`."""
+    enclosing: Symbol | None = None
+    for symbol in symbols:
+        if symbol.line <= line <= symbol.end_line and (
+            enclosing is None or symbol.line >= enclosing.line
+        ):
+            enclosing = symbol
+    return enclosing
+
+
+def _read_lines(path: str, numbers: set[int]) -> dict[int, str]:
+    lines: dict[int, str] = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for number, line in enumerate(f, start=1):
+                if number in numbers:
+                    lines[number] = line.rstrip("\r\n")
+                    if len(lines) == len(numbers):
+                        break
+    except OSError:
+        pass
+    return lines
+
+
+class FindSymbol(CallableTool2[Params]):
+    name: str = "FindSymbol"
+    description: str = load_desc(
+        Path(__file__).parent / "symbols.md",
+        {
+            "MAX_RESULTS": str(MAX_RESULTS),
+        },
+    )
+    params: type[Params] = Params
+
+    def __init__(self, runtime: Runtime) -> None:
+        super().__init__()
+        self._index: SymbolIndex = get_symbol_index(
+            runtime.builtin_args.KIMI_WORK_DIR.unsafe_to_local_path()
+        )
+
+    async def _outline(self, path: str, params: Params) -> ToolReturnValue:
+        if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTENSIONS:
+            return ToolError(
+                message=f"`{params.path}` is not a source file of a supported language.",
+                brief="Unsupported file",
+            )
+        if not os.path.isfile(path):
+            return ToolError(message=f"`{params.path}` is not a file.", brief="Invalid path")
+        symbols = (await self._index.symbols_of([path])).get(path)
+        if symbols is None:
+            return ToolError(message=f"Failed to read `{params.path}`.", brief="Invalid path")
+        if not symbols:
+            return ToolResultBuilder().ok(message=f"No symbols found in `{params.path}`")
+        builder = ToolResultBuilder()
+        open_scopes: list[Symbol] = []
+        for symbol in sorted(symbols, key=lambda s: (s.line, -s.end_line)):
+            # Nest symbols under the definitions they are in, e.g. methods under classes.
+            container = symbol.container or ""
+            while open_scopes and not (
+                symbol.line <= open_scopes[-1].end_line
+                and f"{container}.".startswith(f"{open_scopes[-1].qualified_name}.")
+            ):
+                open_scopes.pop()
+            label = symbol.qualified_name
+            if open_scopes:
+                label = label.removeprefix(f"{open_scopes[-1].qualified_name}.")
+            indent = "  " * len(open_scopes)
+            builder.write(f"{indent}{symbol.line}-{symbol.end_line} {symbol.kind} {label}\n")
+            open_scopes.append(symbol)
+            if builder.is_full:
+                break
+        return builder.ok(message=f"Found {len(symbols)} symbols in `{params.path}`")
+
+    async def _definitions(
+        self, rg_path: str, name: str, params: Params, cwd: str
+    ) -> ToolReturnValue:
+        qualifier, simple = _split_name(name)
+        args = ["--files-with-matches", "--word-regexp", "--fixed-strings", "--", simple]
+        files: dict[str, str] = {}
+        async for file in _rg_lines(rg_path, [*args, os.path.expanduser(params.path)], cwd):
+            files[os.path.normpath(os.path.join(cwd, file))] = file
+        symbols = await self._index.symbols_of(list(files))
+        found = [
+            (path, symbol)
+            for path in sorted(symbols, key=lambda path: files[path])
+            for symbol in symbols[path]
+            if symbol.name == simple and _is_in(symbol, qualifier)
+        ]
+        if not found:
+            return ToolResultBuilder().ok(message=f"No definitions of `{name}` found")
+
+        shown = found[:MAX_RESULTS]
+        numbers: dict[str, set[int]] = {}
+        for path, symbol in shown:
+            numbers.setdefault(path, set()).add(symbol.line)
+        texts = dict(
+            zip(
+                numbers,
+                await asyncio.gather(
+                    *(
+                        asyncio.to_thread(_read_lines, path, lines)
+                        for path, lines in numbers.items()
+                    )
+                ),
+                strict=True,
+            )
+        )
+        builder = ToolResultBuilder()
+        for path, symbol in shown:
+            text = clip_line(texts[path].get(symbol.line, "").strip())
+            builder.write(
+                f"{files[path]}:{symbol.line}-{symbol.end_line}: "
+                f"{symbol.kind} {symbol.qualified_name}: {text}\n"
+            )
+        message = f"Found {len(found)} definition{'' if len(found) == 1 else 's'} of `{name}`"
+        if len(found) > MAX_RESULTS:
+            message += f", showing the first {MAX_RESULTS}"
+        return builder.ok(message=message)
+
+    async def _references(
+        self, rg_path: str, name: str, params: Params, cwd: str
+    ) -> ToolReturnValue:
+        qualifier, simple = _split_name(name)
+        args = [
+            "--null",
+            "--line-number",
+            "--no-heading",
+            "--with-filename",
+            "--word-regexp",
+            "--fixed-strings",
+            "--",
+            simple,
+            os.path.expanduser(params.path),
+        ]
+        matches: list[tuple[str, int, str]] = []
+        more = False
+        async for line in _rg_lines(rg_path, args, cwd):
+            file, _, rest = line.partition("\0")
+            number, _, text = rest.partition(":")
+            if not number.isdigit():
+                continue
+            if len(matches) >= MAX_RESULTS:
+                more = True
+                break
+            matches.append((file, int(number), text))
+        if not matches:
+            return ToolResultBuilder().ok(message=f"No references to `{name}` found")
+
+        paths = {file: os.path.normpath(os.path.join(cwd, file)) for file, _, _ in matches}
+        symbols = await self._index.symbols_of(list(paths.values()))
+        builder = ToolResultBuilder()
+        for file, number, text in matches:
+            file_symbols = symbols.get(paths[file], [])
+            definition = next(
+                (
+                    symbol
+                    for symbol in file_symbols
+                    if symbol.line == number and symbol.name == simple and _is_in(symbol, qualifier)
+                ),
+                None,
+            )
+            if definition is not None:
+                where = f" (definition of {definition.qualified_name})"
+            elif (scope := _enclosing(file_symbols, number)) is not None:
+                where = f" (in {scope.qualified_name})"
+            else:
+                where = ""
+            text = text.strip()
+            builder.write(f"{file}:{number}{where}: {clip_line(text, text.find(simple))}\n")
+            if builder.is_full:
+                break
+        message = (
+            f"Found {'more than ' if more else ''}{len(matches)} "
+            f"reference{'' if len(matches) == 1 and not more else 's'} to `{name}`"
+        )
+        if more:
+            message += f", showing the first {MAX_RESULTS}. Narrow down the search with `path`"
+        return builder.ok(message=message)
+
+    @override
+    async def __call__(self, params: Params) -> ToolReturnValue:
+        try:
+            cwd = str(KaosPath.cwd())
+            if params.query == "outline":
+                path = os.path.normpath(os.path.join(cwd, os.path.expanduser(params.path)))
+                return await self._outline(path, params)
+
+            name = (params.name or "").strip()
+            _, simple = _split_name(name)
+            if not _NAME_PATTERN.fullmatch(simple):
+                return ToolError(
+                    message=(
+                        f"`{params.query}` needs the name of a symbol, e.g. `parse` or "
+                        f"`Parser.parse`, got `{params.name}`."
+                    ),
+                    brief="Invalid symbol name",
+                )
+            rg_path = await ensure_rg_path()
+            if params.query == "definition":
+                return await self._definitions(rg_path, name, params, cwd)
+            return await self._references(rg_path, name, params, cwd)
+
+        except Exception as e:
+            return ToolError(
+                message=f"Failed to find symbol. Error: {e}",
+                brief="Failed to find symbol",
+            )
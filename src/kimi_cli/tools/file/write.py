@@ -7,10 +7,9 @@ from pydantic import BaseModel, Field
 
 from kimi_cli.soul.agent import Runtime
 from kimi_cli.soul.approval import Approval
-from kimi_cli.tools.display import DisplayBlock
 from kimi_cli.tools.file import FileActions
 from kimi_cli.tools.utils import ToolRejectedError, load_desc
-from kimi_cli.utils.diff import build_diff_blocks
+from kimi_cli.utils.diff import diff_file
 from kimi_cli.utils.path import is_within_workspace
 
 
@@ -102,13 +101,7 @@ class WriteFile(CallableTool2[Params]):
             new_text = (
                 params.content if params.mode == "overwrite" else (old_text or "") + params.content
             )
-            diff_blocks: list[DisplayBlock] = list(
-                build_diff_blocks(
-                    str(p),
-                    old_text or "",
-                    new_text,
-                )
-            )
+            diff = await diff_file(str(p), old_text or "", new_text)
 
             action = (
                 FileActions.EDIT
@@ -121,7 +114,7 @@ class WriteFile(CallableTool2[Params]):
                 self.name,
                 action,
                 f"Write file `{p}`",
-                display=diff_blocks,
+                display=diff.blocks,
             ):
                 return ToolRejectedError()
 
@@ -139,7 +132,8 @@ class WriteFile(CallableTool2[Params]):
                 is_error=False,
                 output="",
                 message=(f"File successfully {action}. Current size: {file_size} bytes."),
-                display=diff_blocks,
+                display=diff.blocks,
+                extras=diff.extras(),
             )
 
         except Exception as e:
@@ -17,6 +17,8 @@ from io import BytesIO
 from pathlib import Path
 from typing import Any, Literal, override
 
+from kaos import get_current_kaos
+from kaos.local import local_kaos
 from kaos.path import KaosPath
 from PIL import Image
 from prompt_toolkit import PromptSession
@@ -49,6 +51,7 @@ from kimi_cli.utils.logging import logger
 from kimi_cli.utils.media_tags import wrap_media_part
 from kimi_cli.utils.slashcmd import SlashCommand
 from kimi_cli.utils.string import random_string
+from kimi_cli.utils.workspace_index import WorkspaceIndex, get_workspace_index
 from kimi_cli.wire.types import ContentPart, ImageURLPart, TextPart
 
 PROMPT_SYMBOL = "✨"
@@ -132,7 +135,11 @@ class SlashCommandCompleter(Completer):
 
 
 class LocalFileMentionCompleter(Completer):
-    """Offer fuzzy `@` path completion by indexing workspace files."""
+    """Offer fuzzy `@` path completion by indexing workspace files.
+
+    Paths come from the shared workspace index once it is built, and from walking `root` with
+    a limit until then.
+    """
 
     _FRAGMENT_PATTERN = re.compile(r"[^\s@]+")
     _TRIGGER_GUARDS = frozenset((".", "-", "_", "`", "'", '"', ":", "@", "#", "~"))
@@ -215,10 +222,14 @@ class LocalFileMentionCompleter(Completer):
         *,
         refresh_interval: float = 2.0,
         limit: int = 1000,
+        index: WorkspaceIndex | None = None,
     ) -> None:
         self._root = root
         self._refresh_interval = refresh_interval
         self._limit = limit
+        self._index = index
+        self._indexed_version = -1
+        self._indexed_paths: list[str] = []
         self._cache_time: float = 0.0
         self._cached_paths: list[str] = []
         self._top_cache_time: float = 0.0
@@ -256,6 +267,16 @@ class LocalFileMentionCompleter(Completer):
         if now - self._top_cache_time <= self._refresh_interval:
             return self._top_cached_paths
 
+        if self._index is not None and (listing := self._index.listing(self._root)) is not None:
+            names = [
+                f"{entry.name}/" if entry.is_dir else entry.name
+                for entry in listing
+                if not self._is_ignored(entry.name)
+            ]
+            self._top_cached_paths = names[: self._limit]
+            self._top_cache_time = now
+            return self._top_cached_paths
+
         entries: list[str] = []
         try:
             for entry in sorted(self._root.iterdir(), key=lambda p: p.name):
@@ -272,7 +293,32 @@ class LocalFileMentionCompleter(Completer):
         self._top_cache_time = now
         return self._top_cached_paths
 
+    def _get_indexed_paths(self, index: WorkspaceIndex) -> list[str]:
+        version = index.version
+        if version != self._indexed_version:
+            self._indexed_paths = [
+                path
+                for path in index.paths()
+                if not any(self._is_ignored(part) for part in path.rstrip("/").split("/"))
+            ]
+            self._indexed_version = version
+
+        # Narrow the candidates down to those the fuzzy completer can match before applying the
+        # limit, so that matches deep in large workspaces are not cut off.
+        fragment = self._fragment_hint or ""
+        pattern = re.compile(".*?".join(map(re.escape, fragment)), re.IGNORECASE)
+        paths: list[str] = []
+        for path in self._indexed_paths:
+            if pattern.search(path):
+                paths.append(path)
+                if len(paths) >= self._limit:
+                    break
+        return paths
+
     def _get_deep_paths(self) -> list[str]:
+        if self._index is not None and self._index.ready:
+            return self._get_indexed_paths(self._index)
+
         now = time.monotonic()
         if now - self._cache_time <= self._refresh_interval:
             return self._cached_paths
@@ -670,11 +716,15 @@ class CustomPromptSession:
             self._last_history_content = history_entries[-1].content
 
         # Build completers
+        work_dir = KaosPath.cwd().unsafe_to_local_path()
+        is_local = get_current_kaos().name == local_kaos.name
         self._agent_mode_completer = merge_completers(
             [
                 SlashCommandCompleter(agent_mode_slash_commands),
                 # TODO(kaos): we need an async KaosFileMentionCompleter
-                LocalFileMentionCompleter(KaosPath.cwd().unsafe_to_local_path()),
+                LocalFileMentionCompleter(
+                    work_dir, index=get_workspace_index(work_dir) if is_local else None
+                ),
             ],
             deduplicate=True,
         )
@@ -1,11 +1,34 @@
 from __future__ import annotations
 
+import asyncio
 import difflib
+from collections import Counter
+from dataclasses import dataclass
 from difflib import SequenceMatcher
 
-from kimi_cli.tools.display import DiffDisplayBlock
+from kosong.tooling import BriefDisplayBlock
+from kosong.utils.typing import JsonType
+
+from kimi_cli.tools.display import DiffDisplayBlock, DisplayBlock
 
 N_CONTEXT_LINES = 3
+MAX_DIFF_LINES = 10_000
+"""Changed lines of the old and new text together above which only a summary is diffed."""
+N_SUMMARY_LINES = 20
+"""Lines of the old and new text shown in a summary diff."""
+
+
+@dataclass(frozen=True, slots=True)
+class FileDiff:
+    """Display blocks of the diff of a file, and the number of lines it adds and removes."""
+
+    blocks: list[DisplayBlock]
+    lines_added: int
+    lines_removed: int
+
+    def extras(self) -> dict[str, JsonType]:
+        """The line counts, as the `extras` of the result of the tool making the change."""
+        return {"lines_added": self.lines_added, "lines_removed": self.lines_removed}
 
 
 def format_unified_diff(
@@ -60,15 +83,13 @@ def format_unified_diff(
     return "".join(diff)
 
 
-def build_diff_blocks(
+def _diff_blocks(
     path: str,
-    old_text: str,
-    new_text: str,
+    old_lines: list[str],
+    new_lines: list[str],
+    matcher: SequenceMatcher[str],
+    start: int = 0,
 ) -> list[DiffDisplayBlock]:
-    """Build diff display blocks grouped with small context windows."""
-    old_lines = old_text.splitlines()
-    new_lines = new_text.splitlines()
-    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
     blocks: list[DiffDisplayBlock] = []
     for group in matcher.get_grouped_opcodes(n=N_CONTEXT_LINES):
         if not group:
@@ -82,6 +103,86 @@ def build_diff_blocks(
                 path=path,
                 old_text="\n".join(old_lines[i1:i2]),
                 new_text="\n".join(new_lines[j1:j2]),
+                old_start_line=start + i1 + 1,
+                new_start_line=start + j1 + 1,
             )
         )
     return blocks
+
+
+def build_diff_blocks(
+    path: str,
+    old_text: str,
+    new_text: str,
+) -> list[DiffDisplayBlock]:
+    """Build diff display blocks grouped with small context windows."""
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return _diff_blocks(path, old_lines, new_lines, matcher)
+
+
+def _diff_file(path: str, old_text: str, new_text: str) -> FileDiff:
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    # Only the lines between the common prefix and suffix, with the context around them,
+    # need to be diffed, which is usually a small part of a large file that is edited.
+    n_common = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < n_common and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n_common - prefix and old_lines[-suffix - 1] == new_lines[-suffix - 1]:
+        suffix += 1
+    old_changed = old_lines[prefix : len(old_lines) - suffix]
+    new_changed = new_lines[prefix : len(new_lines) - suffix]
+
+    if len(old_changed) + len(new_changed) > MAX_DIFF_LINES:
+        # Diffing takes up to quadratic time, so only count the lines that are not in both
+        # texts, and show where the change starts.
+        counts = Counter(old_changed)
+        counts.subtract(new_changed)
+        removed = sum(count for count in counts.values() if count > 0)
+        added = sum(-count for count in counts.values() if count < 0)
+        return FileDiff(
+            blocks=[
+                DiffDisplayBlock(
+                    path=path,
+                    old_text="\n".join(old_changed[:N_SUMMARY_LINES]),
+                    new_text="\n".join(new_changed[:N_SUMMARY_LINES]),
+                    old_start_line=prefix + 1,
+                    new_start_line=prefix + 1,
+                ),
+                BriefDisplayBlock(
+                    text=(
+                        f"Diff too large to show, showing the first {N_SUMMARY_LINES} changed "
+                        f"lines from line {prefix + 1}: about +{added}/-{removed} lines"
+                    )
+                ),
+            ],
+            lines_added=added,
+            lines_removed=removed,
+        )
+
+    start = max(prefix - N_CONTEXT_LINES, 0)
+    old_lines = old_lines[start : len(old_lines) - max(suffix - N_CONTEXT_LINES, 0)]
+    new_lines = new_lines[start : len(new_lines) - max(suffix - N_CONTEXT_LINES, 0)]
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return FileDiff(
+        blocks=list(_diff_blocks(path, old_lines, new_lines, matcher, start)),
+        lines_added=added,
+        lines_removed=removed,
+    )
+
+
+async def diff_file(path: str, old_text: str, new_text: str) -> FileDiff:
+    """
+    Diff a file changed from `old_text` to `new_text` for display, off the event loop.
+    Only a summary is built if more than `MAX_DIFF_LINES` lines changed.
+    """
+    return await asyncio.to_thread(_diff_file, path, old_text, new_text)
@@ -0,0 +1,169 @@
+"""Matching of paths against the rules of `.gitignore` files."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from kaos.path import KaosPath
+
+GITIGNORE_FILENAME = ".gitignore"
+ALWAYS_IGNORED = frozenset({".git"})
+"""Names of directories that are ignored without any rule."""
+
+
+@dataclass(frozen=True, slots=True)
+class IgnoreRule:
+    regex: re.Pattern[str]
+    """Matches paths relative to the directory of the `.gitignore` file, with `/` separators."""
+    negated: bool
+    dir_only: bool
+
+
+def _translate_segment(segment: str) -> str:
+    out: list[str] = []
+    i = 0
+    while i < len(segment):
+        c = segment[i]
+        i += 1
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "\\" and i < len(segment):
+            out.append(re.escape(segment[i]))
+            i += 1
+        elif c == "[" and (end := segment.find("]", i + 1)) != -1:
+            body = segment[i:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+def parse_gitignore(text: str) -> list[IgnoreRule]:
+    """Parse the rules of a `.gitignore` file."""
+    rules: list[IgnoreRule] = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        # Trailing spaces are ignored unless escaped.
+        line = re.sub(r"(?<!\\) +$", "", line)
+        negated = line.startswith("!")
+        if negated or line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        anchored = "/" in line
+        parts = line.lstrip("/").split("/")
+        regex = "" if anchored else "(?:.*/)?"
+        for index, part in enumerate(parts):
+            last = index == len(parts) - 1
+            if part == "**":
+                regex += ".*" if last else "(?:.*/)?"
+            else:
+                regex += _translate_segment(part) + ("" if last else "/")
+        rules.append(IgnoreRule(re.compile(regex + r"\Z", re.S), negated, dir_only))
+    return rules
+
+
+class IgnoreRules:
+    """The `.gitignore` rules that apply in a directory, including those of its ancestors.
+
+    Rules of deeper directories come later and take precedence, like in git.
+    """
+
+    __slots__ = ("_layers",)
+
+    def __init__(self, layers: tuple[tuple[str, tuple[IgnoreRule, ...]], ...] = ()) -> None:
+        # Each layer is the rules of one `.gitignore` file, with the path of this directory
+        # relative to the directory of that file.
+        self._layers = layers
+
+    def descend(self, name: str, rules: list[IgnoreRule] | None = None) -> IgnoreRules:
+        """The rules of the subdirectory `name`, with the rules of its own `.gitignore`."""
+        layers = tuple((f"{prefix}{name}/", layer) for prefix, layer in self._layers)
+        if rules:
+            layers += (("", tuple(rules)),)
+        return IgnoreRules(layers)
+
+    def is_ignored(self, name: str, *, is_dir: bool) -> bool:
+        """Whether the entry `name` of this directory is ignored."""
+        if is_dir and name in ALWAYS_IGNORED:
+            return True
+        ignored = False
+        for prefix, rules in self._layers:
+            path = prefix + name
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.negated == ignored and rule.regex.match(path):
+                    ignored = not rule.negated
+        return ignored
+
+
+async def read_ignore_rules(directory: KaosPath) -> list[IgnoreRule]:
+    """The rules of the `.gitignore` file in `directory`, if it has one."""
+    try:
+        return parse_gitignore(await (directory / GITIGNORE_FILENAME).read_text(errors="replace"))
+    except OSError:
+        return []
+
+
+async def load_ignore_rules(directory: KaosPath) -> IgnoreRules:
+    """The rules that apply in `directory`, from the root of the git repository it is in.
+
+    Outside of git repositories only the rules of `directory` itself apply.
+    """
+    directory = directory.canonical()
+    chain = [directory]
+    current = directory
+    while not await (current / ".git").exists():
+        if current.parent == current:
+            chain = [directory]
+            break
+        current = current.parent
+        chain.append(current)
+
+    chain.reverse()
+    own = await read_ignore_rules(chain[0])
+    rules = IgnoreRules((("", tuple(own)),) if own else ())
+    for path in chain[1:]:
+        rules = rules.descend(path.name, await read_ignore_rules(path))
+    return rules
+
+
+def read_local_ignore_rules(directory: Path) -> list[IgnoreRule]:
+    """Like `read_ignore_rules`, for a directory of the local filesystem."""
+    try:
+        return parse_gitignore((directory / GITIGNORE_FILENAME).read_text(errors="replace"))
+    except OSError:
+        return []
+
+
+def load_local_ignore_rules(directory: Path) -> IgnoreRules:
+    """Like `load_ignore_rules`, for a directory of the local filesystem.
+
+    For code that runs off the event loop, e.g. in a thread.
+    """
+    chain = [directory]
+    current = directory
+    while not (current / ".git").exists():
+        if current.parent == current:
+            chain = [directory]
+            break
+        current = current.parent
+        chain.append(current)
+
+    chain.reverse()
+    own = read_local_ignore_rules(chain[0])
+    rules = IgnoreRules((("", tuple(own)),) if own else ())
+    for path in chain[1:]:
+        rules = rules.descend(path.name, read_local_ignore_rules(path))
+    return rules
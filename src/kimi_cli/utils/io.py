@@ -3,6 +3,8 @@ from __future__ import annotations
 import contextlib
 import json
 import os
+import shutil
+import sys
 import tempfile
 from pathlib import Path
 from typing import Any
@@ -25,3 +27,67 @@ def atomic_json_write(data: Any, path: Path) -> None:
         with contextlib.suppress(OSError):
             os.unlink(tmp_path)
         raise
+
+
+_FICLONE = 0x40049409
+"""Linux ioctl that makes a file share all data blocks of another, on filesystems with
+copy-on-write (Btrfs, XFS, bcachefs, ...)."""
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def copy_file_prefix(src: Path, dst: Path, length: int | None = None) -> None:
+    """Copy the first `length` bytes (or all) of `src` to a new file `dst`, cheaply if possible.
+
+    Whole files are cloned as copy-on-write reflinks where the filesystem supports it, and
+    ranges are copied with `copy_file_range(2)`, which lets the kernel share or copy the data
+    without passing it through user space. Otherwise the data is copied in chunks.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        length = size if length is None else min(length, size)
+        if length == size and length > 0 and _clone_file(fsrc.fileno(), fdst.fileno()):
+            return
+
+        copied = 0
+        if hasattr(os, "copy_file_range"):
+            with contextlib.suppress(OSError):
+                while copied < length:
+                    n = os.copy_file_range(
+                        fsrc.fileno(), fdst.fileno(), length - copied, copied, copied
+                    )
+                    if n == 0:
+                        break
+                    copied += n
+
+        fsrc.seek(copied)
+        fdst.seek(copied)
+        while copied < length:
+            chunk = fsrc.read(min(_COPY_CHUNK_BYTES, length - copied))
+            if not chunk:
+                break
+            fdst.write(chunk)
+            copied += len(chunk)
+        fdst.truncate(copied)
+
+
+def _clone_file(src_fd: int, dst_fd: int) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+    except OSError:
+        return False
+    return True
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """Hard link `src` to `dst`, or copy it if linking is not possible.
+
+    Only for files that are never modified in place, since both names share the data.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
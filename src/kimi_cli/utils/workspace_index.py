@@ -0,0 +1,544 @@
+"""An in-process index of the files in a workspace.
+
+The index is built once in a background thread, and then kept current by watching the indexed
+directories with `watchfiles` (inotify on Linux), or by polling their modification times where
+they cannot be watched. Everything in the process that lists the workspace shares the index of
+the work directory (see `get_workspace_index`): the `Glob` tool and the `@` file mention
+completer of the shell.
+
+Entries ignored by `.gitignore` rules are listed in their directory, but ignored directories are
+neither indexed nor watched, so e.g. `node_modules` is never walked.
+
+While the directories are watched, the changes of their entries are also reported to listeners
+(see `add_listener`), which the trigram index of `Grep` follows.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from kimi_cli.utils.gitignore import (
+    GITIGNORE_FILENAME,
+    IgnoreRules,
+    load_local_ignore_rules,
+    read_local_ignore_rules,
+)
+from kimi_cli.utils.logging import logger
+
+MAX_INDEXED_ENTRIES = 200_000
+"""Directories found after this many entries are not indexed, and are listed on demand, unless
+the limit is raised (see `WorkspaceIndex.raise_max_entries`)."""
+POLL_INTERVAL = 2.0
+"""Seconds between checks of the indexed directories when they cannot be watched."""
+_WATCH_TIMEOUT_MS = 100
+"""Longest time between two checks for changes, and so between two advances of `synced_ns`."""
+_WATCH_DELAY_NS = 50_000_000
+"""Changes reach the watcher within this time after they are made."""
+_RACY_SECONDS = 2.0
+"""Listings of directories modified this shortly before they were scanned are not trusted until
+they are scanned again, as a change within the same timestamp tick would go unnoticed."""
+
+
+@dataclass(frozen=True, slots=True)
+class IndexEntry:
+    name: str
+    is_dir: bool
+    """Whether the entry is a directory, or a symlink to one."""
+    is_symlink: bool
+    ignored: bool
+    """Whether the entry is ignored by `.gitignore` rules."""
+
+
+@dataclass(frozen=True, slots=True)
+class _Listing:
+    entries: tuple[IndexEntry, ...]
+    rules: IgnoreRules
+    """The rules for the entries of the directory."""
+    mtime: float
+    gitignore_mtime: float | None
+    racy: bool
+
+
+class WorkspaceIndex:
+    """The directories under `root`, listed once and kept current in the background.
+
+    Listings are replaced as a whole, so they can be read from any thread without locking.
+    """
+
+    def __init__(self, root: Path, *, poll_interval: float = POLL_INTERVAL) -> None:
+        self.root = Path(os.path.abspath(root))
+        self._root_str = str(self.root)
+        self._prefix = self._root_str.rstrip(os.sep) + os.sep
+        self._poll_interval = poll_interval
+        # Keyed by the path relative to `root`, "" for `root` itself.
+        self._listings: dict[str, _Listing] = {}
+        self._entry_count = 0
+        self._max_entries = MAX_INDEXED_ENTRIES
+        self._skipped: set[str] = set()
+        """Directories not indexed as there were too many entries."""
+        self._version = 0
+        self._paths: list[str] = []
+        self._paths_version = -1
+        self._lock = threading.Lock()
+        self._requests: set[str] = set()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._built = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._listeners: tuple[Callable[[set[str] | None], None], ...] = ()
+        self._synced_ns = 0
+        self.mode: Literal["watch", "poll"] | None = None
+        """How the index is kept current, once it is built."""
+
+    def start(self) -> None:
+        """Start building the index in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="kimi-workspace-index", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial build of the index is done."""
+        return self._built.is_set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self._built.wait(timeout)
+
+    @property
+    def version(self) -> int:
+        """A number that changes whenever a listing of the index does."""
+        return self._version
+
+    @property
+    def synced_ns(self) -> int:
+        """Changes made before this time (as of `time.time_ns`) are applied to the index and
+        reported to the listeners. Only advances while the directories are watched."""
+        return self._synced_ns
+
+    def add_listener(self, listener: Callable[[set[str] | None], None]) -> None:
+        """Report the changes of the workspace to `listener` while its directories are watched.
+
+        `listener` is called from the thread of the index with the paths of the changed entries,
+        relative to `root`, or with `None` when changes may have been missed: whenever the
+        directories start being watched, which includes after new ones were added.
+        """
+        with self._lock:
+            self._listeners = (*self._listeners, listener)
+
+    def remove_listener(self, listener: Callable[[set[str] | None], None]) -> None:
+        with self._lock:
+            self._listeners = tuple(other for other in self._listeners if other is not listener)
+
+    def raise_max_entries(self, max_entries: int) -> None:
+        """Index up to `max_entries` entries, including the directories skipped so far."""
+        if max_entries <= self._max_entries:
+            return
+        self._max_entries = max_entries
+        self._wakeup.set()
+
+    def listing(
+        self, directory: Path | str, mtime: float | None = None
+    ) -> tuple[IndexEntry, ...] | None:
+        """The entries of `directory` in name order, or `None` if it is not indexed.
+
+        Args:
+            directory: An absolute, normalized path.
+            mtime: The current modification time of `directory`. If given, the listing is only
+                returned if it is known to be up to date with it, and is refreshed otherwise.
+        """
+        key = self._key(str(directory))
+        if key is None:
+            return None
+        listing = self._listings.get(key)
+        if listing is None:
+            return None
+        if mtime is not None and (listing.racy or listing.mtime != mtime):
+            self.refresh(directory)
+            return None
+        return listing.entries
+
+    def refresh(self, directory: Path | str) -> None:
+        """Ask for `directory` to be listed again."""
+        key = self._key(str(directory))
+        if key is None:
+            return
+        with self._lock:
+            self._requests.add(key)
+        self._wakeup.set()
+
+    def paths(self) -> list[str]:
+        """Paths of the indexed entries that are not ignored, relative to `root`.
+
+        Paths use `/` separators, directories end with `/`, and they are in depth-first name
+        order. The list is shared until the index changes, and must not be modified.
+        """
+        with self._lock:
+            if self._paths_version == self._version:
+                return self._paths
+            version = self._version
+            listings = dict(self._listings)
+
+        paths: list[str] = []
+        stack: list[tuple[str, str, int]] = [("", "", 0)]
+        while stack:
+            key, prefix, start = stack.pop()
+            listing = listings.get(key)
+            if listing is None:
+                continue
+            entries = listing.entries
+            for index in range(start, len(entries)):
+                entry = entries[index]
+                if entry.ignored:
+                    continue
+                if not entry.is_dir:
+                    paths.append(prefix + entry.name)
+                    continue
+                paths.append(f"{prefix}{entry.name}/")
+                if not entry.is_symlink:
+                    # Resume this directory after the subdirectory.
+                    stack.append((key, prefix, index + 1))
+                    stack.append((os.path.join(key, entry.name), f"{prefix}{entry.name}/", 0))
+                    break
+
+        with self._lock:
+            if version >= self._paths_version:
+                self._paths = paths
+                self._paths_version = version
+        return paths
+
+    def _key(self, directory: str) -> str | None:
+        if directory == self._root_str:
+            return ""
+        if directory.startswith(self._prefix):
+            return directory[len(self._prefix) :]
+        return None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._root_str, key) if key else self._root_str
+
+    # The methods below run in the thread of the index.
+
+    def _run(self) -> None:
+        try:
+            self._index_tree("", None)
+        except Exception:
+            logger.exception("Failed to index the workspace {root}", root=self.root)
+        finally:
+            self._built.set()
+        logger.debug(
+            "Indexed {count} entries of the workspace {root}",
+            count=self._entry_count,
+            root=self.root,
+        )
+
+        try:
+            self.mode = "watch"
+            if self._watch():
+                return
+            self.mode = "poll"
+            while not self._closed.is_set():
+                self._poll()
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+        except Exception:
+            logger.exception("Stopped keeping the index of {root} current", root=self.root)
+
+    def _watch(self) -> bool:
+        """Watch the indexed directories until the index is closed.
+
+        Returns `False` if they cannot be watched, to poll them instead.
+        """
+        try:
+            from watchfiles import watch
+        except ImportError:
+            return False
+
+        while not self._closed.is_set():
+            paths = [self._path(key) for key in list(self._listings)]
+            try:
+                first = True
+                for changes in watch(
+                    *paths,
+                    watch_filter=None,
+                    debounce=200,
+                    step=20,
+                    stop_event=self._closed,
+                    rust_timeout=_WATCH_TIMEOUT_MS,
+                    yield_on_timeout=True,
+                    raise_interrupt=False,
+                    recursive=False,
+                    ignore_permission_denied=True,
+                ):
+                    received_ns = time.time_ns()
+                    if first:
+                        # Changes made before the directories were watched are not reported.
+                        self._notify(None)
+                    # Catch up with the changes made before the directories were watched.
+                    added = self._poll() if first else False
+                    first = False
+                    keys: set[str] = set()
+                    changed_keys: set[str] = set()
+                    for _, changed in changes:
+                        if (changed_key := self._key(changed)) is not None:
+                            changed_keys.add(changed_key)
+                        parent, name = os.path.split(changed)
+                        if (key := self._key(parent)) is None:
+                            continue
+                        keys.add(key)
+                        if name == GITIGNORE_FILENAME:
+                            with self._lock:
+                                self._requests.add(key)
+                    added = self._update(keys) or added
+                    if changed_keys:
+                        self._notify(changed_keys)
+                    self._synced_ns = received_ns - _WATCH_DELAY_NS
+                    if added:
+                        # Watch the new directories too.
+                        break
+            except Exception as e:
+                logger.warning(
+                    "Cannot watch the workspace {root}, polling it instead: {error}",
+                    root=self.root,
+                    error=e,
+                )
+                return False
+        return True
+
+    def _notify(self, keys: set[str] | None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(keys)
+            except Exception:
+                logger.exception("Failed to report the changes of {root}", root=self.root)
+
+    def _poll(self) -> bool:
+        """List the directories that changed since they were listed again.
+
+        Returns whether directories were added to the index.
+        """
+        keys: set[str] = set()
+        for key, listing in list(self._listings.items()):
+            path = self._path(key)
+            try:
+                mtime = os.stat(path).st_mtime
+                gitignore_mtime = (
+                    _gitignore_mtime(path) if listing.gitignore_mtime is not None else None
+                )
+            except OSError:
+                keys.add(key)
+                continue
+            if listing.racy or mtime != listing.mtime or gitignore_mtime != listing.gitignore_mtime:
+                keys.add(key)
+        return self._update(keys)
+
+    def _update(self, keys: set[str]) -> bool:
+        """List the directories `keys`, and those asked for, again.
+
+        Returns whether directories were added to the index.
+        """
+        with self._lock:
+            keys |= self._requests
+            self._requests.clear()
+        for listing_key, listing in list(self._listings.items()):
+            if listing.racy:
+                keys.add(listing_key)
+        added = False
+        # Parents first, as they may drop their subdirectories.
+        for key in sorted(keys, key=lambda k: (k.count(os.sep), k)):
+            added = self._relist(key) or added
+        if self._skipped and self._entry_count < self._max_entries:
+            added = self._index_skipped() or added
+        return added
+
+    def _index_skipped(self) -> bool:
+        """Index the directories skipped before the limit of entries was raised.
+
+        Returns whether directories were added to the index.
+        """
+        skipped, self._skipped = self._skipped, set()
+        subdirectories: dict[str, set[str]] = {}
+        added = False
+        for key in sorted(skipped, key=lambda k: (k.count(os.sep), k)):
+            parent_key, name = os.path.split(key)
+            parent = self._listings.get(parent_key)
+            if parent is None or key in self._listings:
+                continue
+            if parent_key not in subdirectories:
+                subdirectories[parent_key] = {
+                    entry.name for entry in parent.entries if _is_indexed_dir(entry)
+                }
+            if name not in subdirectories[parent_key]:
+                continue
+            if self._entry_count >= self._max_entries:
+                self._skipped.add(key)
+                continue
+            added = bool(self._index_tree(key, parent.rules)) or added
+        return added
+
+    def _relist(self, key: str) -> bool:
+        old = self._listings.get(key)
+        if old is None:
+            return False
+        parent_rules: IgnoreRules | None = None
+        if key:
+            parent = self._listings.get(os.path.dirname(key))
+            if parent is None:
+                self._drop(key)
+                return False
+            parent_rules = parent.rules
+        listing = self._scan(key, parent_rules)
+        if listing is None:
+            self._drop(key)
+            return False
+        if listing.gitignore_mtime != old.gitignore_mtime:
+            # The rules of the whole subtree changed. Its listings are replaced as it is
+            # indexed again, so that it never looks empty in between.
+            prefix = key + os.sep if key else ""
+            stale = {k for k in self._listings if k == key or k.startswith(prefix)}
+            indexed = self._index_tree(key, parent_rules)
+            for other in stale - indexed:
+                self._drop(other)
+            return bool(indexed - stale)
+
+        old_dirs = {entry.name for entry in old.entries if _is_indexed_dir(entry)}
+        new_dirs = {entry.name for entry in listing.entries if _is_indexed_dir(entry)}
+        for name in old_dirs - new_dirs:
+            self._drop(os.path.join(key, name))
+        self._store(key, listing)
+        added = False
+        for name in sorted(new_dirs - old_dirs):
+            added = bool(self._index_tree(os.path.join(key, name), listing.rules)) or added
+        return added
+
+    def _index_tree(self, key: str, parent_rules: IgnoreRules | None) -> set[str]:
+        """Index the directory `key` and its subdirectories, breadth first.
+
+        Returns the keys of the directories indexed.
+        """
+        queue: deque[tuple[str, IgnoreRules | None]] = deque([(key, parent_rules)])
+        indexed: set[str] = set()
+        while queue and not self._closed.is_set():
+            key, parent_rules = queue.popleft()
+            listing = self._scan(key, parent_rules)
+            if listing is None:
+                continue
+            self._store(key, listing)
+            indexed.add(key)
+            for entry in listing.entries:
+                if not _is_indexed_dir(entry):
+                    continue
+                if self._entry_count >= self._max_entries:
+                    self._skipped.add(os.path.join(key, entry.name))
+                    continue
+                queue.append((os.path.join(key, entry.name), listing.rules))
+        return indexed
+
+    def _scan(self, key: str, parent_rules: IgnoreRules | None) -> _Listing | None:
+        path = self._path(key)
+        scanned_at = time.time()
+        try:
+            mtime = os.stat(path).st_mtime
+            with os.scandir(path) as it:
+                dir_entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            return None
+
+        gitignore_mtime: float | None = None
+        for dir_entry in dir_entries:
+            if dir_entry.name == GITIGNORE_FILENAME:
+                with contextlib.suppress(OSError):
+                    gitignore_mtime = dir_entry.stat().st_mtime
+        if parent_rules is None:
+            rules = load_local_ignore_rules(Path(path))
+        else:
+            own = read_local_ignore_rules(Path(path)) if gitignore_mtime is not None else None
+            rules = parent_rules.descend(os.path.basename(key), own)
+
+        entries: list[IndexEntry] = []
+        for dir_entry in dir_entries:
+            try:
+                is_symlink = dir_entry.is_symlink()
+                is_dir = dir_entry.is_dir()
+            except OSError:
+                continue
+            ignored = rules.is_ignored(dir_entry.name, is_dir=is_dir)
+            entries.append(IndexEntry(dir_entry.name, is_dir, is_symlink, ignored))
+        return _Listing(
+            tuple(entries),
+            rules,
+            mtime,
+            gitignore_mtime,
+            racy=scanned_at - mtime < _RACY_SECONDS,
+        )
+
+    def _store(self, key: str, listing: _Listing) -> None:
+        with self._lock:
+            old = self._listings.get(key)
+            self._listings[key] = listing
+            self._entry_count += len(listing.entries) - (len(old.entries) if old else 0)
+            if old is None or old.entries != listing.entries:
+                self._version += 1
+
+    def _drop(self, key: str) -> None:
+        """Remove the directory `key` and its subdirectories from the index."""
+        prefix = key + os.sep if key else ""
+        with self._lock:
+            for other in [k for k in self._listings if k == key or k.startswith(prefix)]:
+                self._entry_count -= len(self._listings.pop(other).entries)
+            self._version += 1
+        self._skipped = {k for k in self._skipped if k != key and not k.startswith(prefix)}
+
+
+def _is_indexed_dir(entry: IndexEntry) -> bool:
+    return entry.is_dir and not entry.is_symlink and not entry.ignored
+
+
+def _gitignore_mtime(directory: str) -> float | None:
+    try:
+        return os.stat(os.path.join(directory, GITIGNORE_FILENAME)).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+_indexes: dict[str, WorkspaceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_workspace_index(root: Path) -> WorkspaceIndex:
+    """The index of the local directory `root`, which is started when first asked for."""
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.closed:
+            index = _indexes[key] = WorkspaceIndex(Path(key))
+            index.start()
+    return index
+
+
+@atexit.register
+def _close_indexes() -> None:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
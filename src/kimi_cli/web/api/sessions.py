@@ -8,10 +8,15 @@ import mimetypes
 import os
 import re
 import shutil
+import threading
 import time
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, BinaryIO, cast
 from urllib.parse import quote
 from uuid import UUID, uuid4
 
@@ -24,18 +29,28 @@ from starlette.websockets import WebSocket, WebSocketDisconnect
 
 from kimi_cli.metadata import load_metadata, save_metadata
 from kimi_cli.session import Session as KimiCLISession
+from kimi_cli.utils.io import copy_file_prefix, link_or_copy
 from kimi_cli.utils.subprocess_env import get_clean_env
 from kimi_cli.web.auth import is_origin_allowed, is_private_ip, verify_token
+from kimi_cli.web.metrics import REPLAY_BYTES, REPLAY_SECONDS
 from kimi_cli.web.models import (
     GenerateTitleRequest,
     GenerateTitleResponse,
     GitDiffStats,
     GitFileDiff,
     Session,
+    SessionClientLag,
+    SessionSearchResult,
     SessionStatus,
     UpdateSessionRequest,
 )
 from kimi_cli.web.runner.messages import new_session_status_message, send_history_complete
+from kimi_cli.web.runner.peers import (
+    CLOSE_CODE_TRY_AGAIN,
+    FORWARDED_HEADER,
+    forward_request,
+    forward_websocket,
+)
 from kimi_cli.web.runner.process import KimiCLIRunner
 from kimi_cli.web.store.sessions import (
     JointSession,
@@ -46,13 +61,15 @@ from kimi_cli.web.store.sessions import (
     load_sessions_page,
     run_auto_archive,
     save_session_metadata,
+    search_sessions,
 )
+from kimi_cli.wire.file import WireFile
 from kimi_cli.wire.jsonrpc import (
     ErrorCodes,
     JSONRPCErrorObject,
     JSONRPCErrorResponse,
-    JSONRPCInMessageAdapter,
     JSONRPCPromptMessage,
+    decode_in_message,
 )
 from kimi_cli.wire.serde import deserialize_wire_message
 from kimi_cli.wire.types import is_request
@@ -111,7 +128,7 @@ def get_runner_ws(ws: WebSocket) -> KimiCLIRunner:
     return ws.app.state.runner
 
 
-def get_editable_session(
+async def get_editable_session(
     session_id: UUID,
     runner: KimiCLIRunner,
 ) -> JointSession:
@@ -123,8 +140,7 @@ def get_editable_session(
             detail="Session not found",
         )
     # Check if session is busy
-    session_process = runner.get_session(session_id)
-    if session_process and session_process.is_busy:
+    if await runner.is_busy(session_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Session is busy. Please wait for it to complete before modifying.",
@@ -132,6 +148,15 @@ def get_editable_session(
     return session
 
 
+async def _fill_statuses(runner: KimiCLIRunner, sessions: Sequence[Session]) -> None:
+    """Set the runtime status of sessions, wherever they run."""
+    statuses = await runner.get_statuses(session.session_id for session in sessions)
+    for session in sessions:
+        shared = statuses.get(session.session_id)
+        session.is_running = shared is not None and shared.is_running
+        session.status = shared.status if shared is not None else None
+
+
 def _relative_parts(path: Path) -> list[str]:
     return [part for part in path.parts if part not in {"", "."}]
 
@@ -195,57 +220,168 @@ def _ensure_public_file_access_allowed(
         )
 
 
-def _read_wire_lines(wire_file: Path) -> list[str]:
-    """Read and parse wire.jsonl into JSONRPC event strings (runs in thread)."""
-    result: list[str] = []
-    with open(wire_file, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                record = json.loads(line)
-                if not isinstance(record, dict):
-                    continue
-                record = cast(dict[str, Any], record)
-                record_type = record.get("type")
-                if isinstance(record_type, str) and record_type == "metadata":
-                    continue
-                message_raw = record.get("message")
-                if not isinstance(message_raw, dict):
-                    continue
-                message_raw = cast(dict[str, Any], message_raw)
-                message = deserialize_wire_message(message_raw)
-                _is_req = is_request(message)
-                event_msg: dict[str, Any] = {
-                    "jsonrpc": "2.0",
-                    "method": "request" if _is_req else "event",
-                    "params": message_raw,
-                }
-                if _is_req:
-                    # JSON-RPC requests require a top-level ``id`` so the
-                    # client can correlate its response.  Use the request's
-                    # own ``id`` field (e.g. ApprovalRequest.id,
-                    # QuestionRequest.id).  Note: ``message_raw`` wraps data
-                    # as ``{"type": ..., "payload": {...}}`` so the id lives
-                    # on the deserialized object, not at the raw dict top level.
-                    event_msg["id"] = message.id
-                result.append(json.dumps(event_msg, ensure_ascii=False))
-            except (json.JSONDecodeError, KeyError, ValueError, TypeError):
-                continue
-    return result
+def _convert_wire_line(line: str) -> str | None:
+    """Convert a wire.jsonl line into a JSONRPC event/request string, if it is a message."""
+    try:
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            return None
+        record = cast(dict[str, Any], record)
+        record_type = record.get("type")
+        if isinstance(record_type, str) and record_type == "metadata":
+            return None
+        message_raw = record.get("message")
+        if not isinstance(message_raw, dict):
+            return None
+        message_raw = cast(dict[str, Any], message_raw)
+        message = deserialize_wire_message(message_raw)
+        _is_req = is_request(message)
+        event_msg: dict[str, Any] = {
+            "jsonrpc": "2.0",
+            "method": "request" if _is_req else "event",
+            "params": message_raw,
+        }
+        if _is_req:
+            # JSON-RPC requests require a top-level ``id`` so the
+            # client can correlate its response.  Use the request's
+            # own ``id`` field (e.g. ApprovalRequest.id,
+            # QuestionRequest.id).  Note: ``message_raw`` wraps data
+            # as ``{"type": ..., "payload": {...}}`` so the id lives
+            # on the deserialized object, not at the raw dict top level.
+            event_msg["id"] = message.id
+        return json.dumps(event_msg, ensure_ascii=False)
+    except (json.JSONDecodeError, KeyError, ValueError, TypeError):
+        return None
+
+
+def _read_wire_chunk(
+    wire_file: Path, offset: int, max_bytes: int | None = None
+) -> tuple[list[str], list[int], int]:
+    """Convert complete lines of wire.jsonl from ``offset`` on (runs in thread).
+
+    Stops after about ``max_bytes`` bytes of the file. Returns the JSONRPC strings, the file
+    offset at which the line of each of them ends, and the offset after the last line read.
+    A trailing line without a newline is still being written and is left for later.
+    """
+    frames: list[str] = []
+    ends: list[int] = []
+    start = offset
+    with open(wire_file, "rb") as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break
+            offset += len(raw_line)
+            line = raw_line.decode("utf-8", errors="replace").strip()
+            frame = _convert_wire_line(line) if line else None
+            if frame is not None:
+                frames.append(frame)
+                ends.append(offset)
+            if max_bytes is not None and offset - start >= max_bytes:
+                break
+    return frames, ends, offset
+
+
+REPLAY_CHUNK_BYTES = 1024 * 1024
+"""How much of wire.jsonl is converted at a time while replaying history."""
+REPLAY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+"""Total size of converted history kept across sessions for later viewers."""
+
+
+@dataclass
+class _ReplayFrames:
+    """The converted part of one wire.jsonl, shared by everyone replaying it."""
+
+    file_id: tuple[int, int]
+    """``(st_dev, st_ino)`` of the file, to notice when it is replaced."""
+    mtime_ns: int = 0
+    size: int = 0
+    """Modification time and size of the file when only a partial line was left to convert."""
+    offset: int = 0
+    """How many bytes of the file have been converted."""
+    frames: list[str] = field(default_factory=list[str])
+    ends: list[int] = field(default_factory=list[int])
+    """File offset at which the line of each frame ends."""
+    nbytes: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class _ReplayCache:
+    """LRU cache of converted history, so a new viewer only converts the new tail."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Path, _ReplayFrames] = OrderedDict()
+
+    def get(self, wire_file: Path, stat: os.stat_result) -> _ReplayFrames:
+        file_id = (stat.st_dev, stat.st_ino)
+        entry = self._entries.get(wire_file)
+        if entry is None or entry.file_id != file_id or stat.st_size < entry.offset:
+            entry = _ReplayFrames(file_id=file_id)
+            self._entries[wire_file] = entry
+        self._entries.move_to_end(wire_file)
+        return entry
+
+    async def extend(self, wire_file: Path, entry: _ReplayFrames, stat: os.stat_result) -> bool:
+        """Convert the next chunk of the file up to ``stat.st_size``; False if there is none."""
+        async with entry.lock:
+            if entry.offset >= stat.st_size or (entry.mtime_ns, entry.size) == (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                return False
+            frames, ends, offset = await asyncio.to_thread(
+                _read_wire_chunk, wire_file, entry.offset, REPLAY_CHUNK_BYTES
+            )
+            if offset == entry.offset:
+                # Only a line still being written is left; don't read it again until the
+                # file changes. Both are compared, as the mtime may not tick on an append.
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                return False
+            entry.frames += frames
+            entry.ends += ends
+            entry.offset = offset
+            entry.nbytes += sum(len(frame) for frame in frames)
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self._max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+
+
+_replay_cache = _ReplayCache(REPLAY_CACHE_MAX_BYTES)
 
 
 async def replay_history(ws: WebSocket, session_dir: Path) -> None:
-    """Replay historical wire messages from wire.jsonl to a WebSocket."""
+    """Replay historical wire messages from wire.jsonl to a WebSocket.
+
+    History is converted chunk by chunk and cached per session, so large sessions start
+    streaming right away and later viewers only convert what was appended since. Each
+    message is sent in a frame of its own, like live messages.
+    """
     wire_file = session_dir / "wire.jsonl"
     if not await asyncio.to_thread(wire_file.exists):
         return
 
+    started_at = time.perf_counter()
     try:
-        lines = await asyncio.to_thread(_read_wire_lines, wire_file)
-        for event_text in lines:
-            await ws.send_text(event_text)
+        # Live messages after this point are buffered by the runner, so stop here.
+        stat = await asyncio.to_thread(wire_file.stat)
+        entry = _replay_cache.get(wire_file, stat)
+        sent = 0
+        while True:
+            available = bisect_right(entry.ends, stat.st_size)
+            if sent < available:
+                for frame in entry.frames[sent:available]:
+                    await ws.send_text(frame)
+                sent = available
+            elif not await _replay_cache.extend(wire_file, entry, stat):
+                break
+        REPLAY_BYTES.inc(amount=entry.ends[sent - 1] if sent else 0)
+        REPLAY_SECONDS.observe(time.perf_counter() - started_at)
     except Exception:
         pass
 
@@ -279,13 +415,36 @@ async def list_sessions(
     await asyncio.to_thread(run_auto_archive)
 
     sessions = load_sessions_page(limit=limit, offset=offset, query=q, archived=archived)
-    for session in sessions:
-        session_process = runner.get_session(session.session_id)
-        session.is_running = session_process is not None and session_process.is_running
-        session.status = session_process.status if session_process else None
+    await _fill_statuses(runner, sessions)
     return cast(list[Session], sessions)
 
 
+@router.get("/search", summary="Search session transcripts")
+async def search_session_transcripts(
+    q: str,
+    runner: KimiCLIRunner = Depends(get_runner),
+    limit: int = 20,
+    offset: int = 0,
+    archived: bool | None = None,
+) -> list[SessionSearchResult]:
+    """Search user prompts, assistant replies and tool names of all sessions.
+
+    Args:
+        q: Search query. Every term of at least three characters must appear, ignoring case.
+        limit: Maximum number of sessions to return (default 20, max 100).
+        offset: Number of sessions to skip (default 0).
+        archived: Search archived sessions if True, otherwise non-archived sessions.
+    """
+    limit = min(max(limit, 1), 100)
+    offset = max(offset, 0)
+
+    results = await asyncio.to_thread(
+        search_sessions, q, limit=limit, offset=offset, archived=archived
+    )
+    await _fill_statuses(runner, [result.session for result in results])
+    return results
+
+
 @router.get("/{session_id}", summary="Get session")
 async def get_session(
     session_id: UUID,
@@ -294,12 +453,20 @@ async def get_session(
     """Get a session by ID."""
     session = load_session_by_id(session_id)
     if session is not None:
-        session_process = runner.get_session(session_id)
-        session.is_running = session_process is not None and session_process.is_running
-        session.status = session_process.status if session_process else None
+        await _fill_statuses(runner, [session])
     return session
 
 
+@router.get("/{session_id}/clients", summary="Get how far behind connected clients are")
+async def get_session_clients(
+    session_id: UUID,
+    runner: KimiCLIRunner = Depends(get_runner),
+) -> list[SessionClientLag]:
+    """Get the send queue of every client connected to a session, to spot slow ones."""
+    session_process = runner.get_session(session_id)
+    return session_process.client_lags if session_process is not None else []
+
+
 @router.post("/", summary="Create a new session")
 async def create_session(request: CreateSessionRequest | None = None) -> Session:
     """Create a new session."""
@@ -338,7 +505,7 @@ async def create_session(request: CreateSessionRequest | None = None) -> Session
         work_dir = KaosPath.unsafe_from_local_path(Path.home())
     kimi_cli_session = await KimiCLISession.create(work_dir=work_dir)
     context_file = kimi_cli_session.dir / "context.jsonl"
-    invalidate_sessions_cache()
+    invalidate_sessions_cache(kimi_cli_session.id)
     invalidate_work_dirs_cache()
     return Session(
         session_id=UUID(kimi_cli_session.id),
@@ -387,7 +554,7 @@ async def upload_session_file(
     runner: KimiCLIRunner = Depends(get_runner),
 ) -> UploadSessionFileResponse:
     """Upload a file to a session."""
-    session = get_editable_session(session_id, runner)
+    session = await get_editable_session(session_id, runner)
     session_dir = session.kimi_cli_session.dir
     upload_dir = session_dir / "uploads"
     upload_dir.mkdir(parents=True, exist_ok=True)
@@ -568,13 +735,27 @@ def _update_last_session_id(session: JointSession) -> None:
     save_metadata(metadata)
 
 
-@router.delete("/{session_id}", summary="Delete a session")
-async def delete_session(session_id: UUID, runner: KimiCLIRunner = Depends(get_runner)) -> None:
+@router.delete("/{session_id}", summary="Delete a session", response_model=None)
+async def delete_session(
+    session_id: UUID, request: Request, runner: KimiCLIRunner = Depends(get_runner)
+) -> Response | None:
     """Delete a session."""
-    session = get_editable_session(session_id, runner)
-    session_process = runner.get_session(session_id)
-    if session_process is not None:
-        await session_process.stop()
+    session = await get_editable_session(session_id, runner)
+    # The worker of a session owned by another server writes to its directory until that
+    # server stops it, so the session is deleted there.
+    owner = await runner.claim_session(session_id)
+    if owner is not None:
+        if request.headers.get(FORWARDED_HEADER):
+            # Ownership changed while forwarding.
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Session moved to another server, try again",
+            )
+        assert runner.server_id is not None
+        response = await forward_request(request, owner.url, server_id=runner.server_id)
+        invalidate_sessions_cache(session_id)
+        return response
+    await runner.remove_session(session_id)
     wd_meta = session.kimi_cli_session.work_dir_meta
     if wd_meta.last_session_id == str(session_id):
         metadata = load_metadata()
@@ -586,7 +767,7 @@ async def delete_session(session_id: UUID, runner: KimiCLIRunner = Depends(get_r
     session_dir = session.kimi_cli_session.dir
     if session_dir.exists():
         shutil.rmtree(session_dir)
-    invalidate_sessions_cache()
+    invalidate_sessions_cache(session_id)
 
 
 @router.patch("/{session_id}", summary="Update session")
@@ -596,7 +777,7 @@ async def update_session(
     runner: KimiCLIRunner = Depends(get_runner),
 ) -> Session:
     """Update a session (e.g., rename title or archive/unarchive)."""
-    session = get_editable_session(session_id, runner)
+    session = await get_editable_session(session_id, runner)
     session_dir = session.kimi_cli_session.dir
 
     # Load existing metadata
@@ -624,7 +805,7 @@ async def update_session(
     save_session_metadata(session_dir, metadata)
 
     # Invalidate cache to force reload
-    invalidate_sessions_cache()
+    invalidate_sessions_cache(session_id)
 
     # Return updated session
     updated_session = load_session_by_id(session_id)
@@ -691,60 +872,147 @@ def extract_first_turn_from_wire(session_dir: Path) -> tuple[str, str] | None:
     return None
 
 
-def truncate_wire_at_turn(wire_path: Path, turn_index: int) -> list[str]:
-    """Read wire.jsonl and return all lines up to and including the given turn.
+def _wire_message_type(line: bytes) -> str | None:
+    """The type of the message recorded on a wire.jsonl line, if it is a message record."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    message = cast(dict[str, Any], record).get("message")
+    if not isinstance(message, dict):
+        return None
+    msg_type = cast(dict[str, Any], message).get("type")
+    return msg_type if isinstance(msg_type, str) else None
 
-    Args:
-        wire_path: Path to the wire.jsonl file
-        turn_index: 0-based turn index. Returns turns 0..turn_index inclusive.
 
-    Returns:
-        List of raw JSON lines (including the metadata header)
+def _wire_turn_end(wire_path: Path, start: int, end: int) -> int:
+    """Offset right after the last ``TurnEnd`` line in ``[start, end)``, or ``end``."""
+    turn_end = end
+    with open(wire_path, "rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if pos >= end:
+                break
+            pos += len(line)
+            if b'"TurnEnd"' in line and _wire_message_type(line) == "TurnEnd":
+                turn_end = pos
+    return turn_end
 
-    Raises:
-        ValueError: If turn_index is out of range
+
+class _LineIndex[T]:
     """
-    if not wire_path.exists():
-        raise ValueError("wire.jsonl not found")
+    What ``parse`` finds in the lines of a JSONL file, at the offsets of those lines.
 
-    lines: list[str] = []
-    current_turn = -1  # Will become 0 on first TurnBegin
+    Only the lines appended since the last update are scanned, unless the file was replaced
+    or truncated.
+    """
 
-    with open(wire_path, encoding="utf-8") as f:
+    def __init__(self, path: Path, parse: Callable[[bytes], T]) -> None:
+        self.path = path
+        self._parse = parse
+        self._items: list[tuple[int, T]] = []
+        self._file_id: tuple[int, int] | None = None
+        self._indexed_size = 0
+        self._lock = threading.Lock()
+
+    def update(self) -> tuple[list[tuple[int, T]], int]:
+        """Scan the newly appended lines; return the non-empty results and the file size."""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    return self._update(f)
+            except FileNotFoundError:
+                self._items.clear()
+                self._file_id = None
+                self._indexed_size = 0
+                return [], 0
+
+    def _update(self, f: BinaryIO) -> tuple[list[tuple[int, T]], int]:
+        stat = os.fstat(f.fileno())
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id or stat.st_size < self._indexed_size:
+            # The file was replaced or rewritten, start over.
+            self._items.clear()
+            self._file_id = file_id
+            self._indexed_size = 0
+        f.seek(self._indexed_size)
+        pos = self._indexed_size
         for line in f:
-            stripped = line.strip()
-            if not stripped:
-                continue
+            if not line.endswith(b"\n"):
+                break  # partially written, pick it up next time
+            offset, pos = pos, pos + len(line)
+            if item := self._parse(line):
+                self._items.append((offset, item))
+        self._indexed_size = pos
+        return list(self._items), max(stat.st_size, pos)
 
-            try:
-                record: dict[str, Any] = json.loads(stripped)
-            except json.JSONDecodeError:
-                continue
 
-            # Always keep metadata header
-            if record.get("type") == "metadata":
-                lines.append(stripped)
-                continue
+class _HistoryIndex:
+    """Offset indexes of the history files of a session."""
 
-            message: dict[str, Any] = record.get("message", {})
-            msg_type: str | None = message.get("type")
+    def __init__(self, session_dir: Path) -> None:
+        self.wire_file = WireFile(session_dir / "wire.jsonl")
+        self.videos = _LineIndex(self.wire_file.path, _video_names)
+        """Names of the videos referenced by each line of wire.jsonl."""
+        self.context_turns = _LineIndex(session_dir / "context.jsonl", _is_user_turn)
+        """Lines of context.jsonl that start a turn."""
 
-            if msg_type == "TurnBegin":
-                current_turn += 1
-                if current_turn > turn_index:
-                    break
 
-            if current_turn <= turn_index:
-                lines.append(stripped)
+HISTORY_INDEX_CACHE_SIZE = 64
+"""Sessions whose history indexes are kept, so forking them again only scans what was
+appended."""
 
-            # Stop after the TurnEnd of the target turn
-            if msg_type == "TurnEnd" and current_turn == turn_index:
-                break
+_history_indexes: OrderedDict[Path, _HistoryIndex] = OrderedDict()
+
+
+def _history_index(session_dir: Path) -> _HistoryIndex:
+    index = _history_indexes.pop(session_dir, None) or _HistoryIndex(session_dir)
+    _history_indexes[session_dir] = index
+    while len(_history_indexes) > HISTORY_INDEX_CACHE_SIZE:
+        _history_indexes.popitem(last=False)
+    return index
+
+
+async def wire_offset_after_turn(wire_file: WireFile, turn_index: int) -> int:
+    """Return the byte offset in wire.jsonl right after the given turn.
+
+    The offset is found with the turn index of the wire file, so only the lines of the
+    target turn are read. Everything before it (including the metadata header) is kept,
+    and the turn ends after its ``TurnEnd``.
+
+    Args:
+        wire_file: The wire.jsonl file
+        turn_index: 0-based turn index. Turns 0..turn_index inclusive are kept.
+
+    Raises:
+        ValueError: If turn_index is out of range
+    """
+    wire_path = wire_file.path
+    if not await asyncio.to_thread(wire_path.exists):
+        raise ValueError("wire.jsonl not found")
+
+    offsets, size = await wire_file.turn_offsets()
+    if offsets:
+        # Records before the first TurnBegin form a turn of their own in the turn index,
+        # but belong to turn 0 here.
+        first_line = await asyncio.to_thread(_read_line_at, wire_path, offsets[0])
+        if _wire_message_type(first_line) != "TurnBegin":
+            offsets = offsets[1:]
+    if turn_index >= len(offsets):
+        raise ValueError(f"turn_index {turn_index} out of range (max turn: {len(offsets) - 1})")
 
-    if current_turn < turn_index:
-        raise ValueError(f"turn_index {turn_index} out of range (max turn: {current_turn})")
+    start = offsets[turn_index]
+    end = offsets[turn_index + 1] if turn_index + 1 < len(offsets) else size
+    return await asyncio.to_thread(_wire_turn_end, wire_path, start, end)
 
-    return lines
+
+def _read_line_at(path: Path, offset: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.readline()
 
 
 def _is_checkpoint_user_message(record: dict[str, Any]) -> bool:
@@ -766,42 +1034,81 @@ def _is_checkpoint_user_message(record: dict[str, Any]) -> bool:
     return False
 
 
-def truncate_context_at_turn(context_path: Path, turn_index: int) -> list[str]:
-    """Read context.jsonl and return all lines up to and including the given turn.
+def _is_user_turn(line: bytes) -> bool:
+    """Whether a context line is a real user message, which starts a turn."""
+    if b'"user"' not in line:
+        return False
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return False
+    return (
+        isinstance(record, dict)
+        and cast(dict[str, Any], record).get("role") == "user"
+        and not _is_checkpoint_user_message(cast(dict[str, Any], record))
+    )
+
+
+def context_offset_after_turn(context_turns: _LineIndex[bool], turn_index: int) -> int:
+    """Return the byte offset in context.jsonl right after the given turn.
 
     Turn detection is based on real user messages, excluding synthetic checkpoint
-    user entries like ``<system>CHECKPOINT N</system>``.
+    user entries like ``<system>CHECKPOINT N</system>``. The turns are found with the
+    turn index of the file, so only lines appended since the last fork are parsed.
 
     Unlike wire truncation, this is best-effort: if context has fewer user turns
     than ``turn_index`` (e.g. slash-command turns that did not mutate context),
-    return all available context lines instead of failing.
+    the whole context is kept instead of failing.
     """
-    if not context_path.exists():
-        return []
+    turns, size = context_turns.update()
+    if turn_index + 1 < len(turns):
+        return turns[turn_index + 1][0]
+    return size
 
-    lines: list[str] = []
-    current_turn = -1  # Will become 0 on first real user message
 
-    with open(context_path, encoding="utf-8") as f:
-        for line in f:
-            stripped = line.strip()
-            if not stripped:
-                continue
+def _copy_history_prefix(src: Path, dst: Path, length: int) -> None:
+    """Copy the first ``length`` bytes of a JSONL history file, ending it with a newline."""
+    copy_file_prefix(src, dst, length)
+    with open(dst, "rb+") as f:
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
 
-            try:
-                record: dict[str, Any] = json.loads(stripped)
-            except json.JSONDecodeError:
-                continue
 
-            if record.get("role") == "user" and not _is_checkpoint_user_message(record):
-                current_turn += 1
-                if current_turn > turn_index:
-                    break
+_VIDEO_TAG_PATH = re.compile(rb'<video path=\\"((?:[^"\\\\]|\\\\.)*?)\\"')
+"""The JSON-escaped path of a ``<video path="...">`` tag in a raw wire line."""
+
+
+def _video_names(line: bytes) -> list[str]:
+    """File names of the videos referenced by ``<video path="...">`` tags in a raw wire line."""
+    if b"<video path=" not in line:
+        return []
+    names: list[str] = []
+    for match in _VIDEO_TAG_PATH.finditer(line):
+        try:
+            path = json.loads(b'"' + match.group(1) + b'"')
+        except ValueError:
+            continue
+        names.append(path.replace("\\", "/").rsplit("/", 1)[-1])
+    return names
 
-            if current_turn <= turn_index:
-                lines.append(stripped)
 
-    return lines
+def _referenced_videos(uploads: Path, videos: _LineIndex[list[str]], end: int) -> list[Path]:
+    """The video files in ``uploads`` that the first ``end`` bytes of wire.jsonl reference."""
+    if not uploads.is_dir():
+        return []
+    files = {
+        file.name: file
+        for file in uploads.iterdir()
+        if (mimetypes.guess_type(file.name)[0] or "").startswith("video/") and file.is_file()
+    }
+    if not files:
+        # Nothing to carry over, so the wire history does not need to be scanned.
+        return []
+    lines, _ = videos.update()
+    names = {name for offset, line_names in lines if offset < end for name in line_names}
+    return sorted(files[name] for name in names & files.keys())
 
 
 @router.post("/{session_id}/fork", summary="Fork a session at a specific turn")
@@ -814,19 +1121,24 @@ async def fork_session(
 
     The new session shares the same work_dir as the original session.
     """
-    source_session = get_editable_session(session_id, runner)
+    source_session = await get_editable_session(session_id, runner)
     source_dir = source_session.kimi_cli_session.dir
-    wire_path = source_dir / "wire.jsonl"
-    context_path = source_dir / "context.jsonl"
+    history_index = _history_index(source_dir)
+    wire_path = history_index.wire_file.path
+    context_path = history_index.context_turns.path
 
+    # Find where the turn ends with the turn index of the files rather than parsing
+    # them, then copy the prefixes as byte ranges (reflinked where supported).
     try:
-        truncated_wire_lines = truncate_wire_at_turn(wire_path, request.turn_index)
-        truncated_context_lines = truncate_context_at_turn(context_path, request.turn_index)
+        wire_end = await wire_offset_after_turn(history_index.wire_file, request.turn_index)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         ) from e
+    context_end = await asyncio.to_thread(
+        context_offset_after_turn, history_index.context_turns, request.turn_index
+    )
 
     # Create new session with the same work_dir.
     # Only write the essential files explicitly — do NOT copytree the whole
@@ -836,50 +1148,34 @@ async def fork_session(
     new_session = await KimiCLISession.create(work_dir=work_dir)
     new_session_dir = new_session.dir
 
-    # Copy only the video files that are actually referenced in the truncated
-    # wire history.  Videos are referenced by path (<video path="...">) and
-    # served via the uploads endpoint, so the physical file must exist.
-    # Images and text docs are already embedded (base64 / inline) in
-    # context.jsonl and don't need the physical file.
-    source_uploads = source_dir / "uploads"
-    if source_uploads.is_dir():
-        # Collect video filenames referenced in the truncated wire.
-        # In the raw JSON lines the pattern looks like: uploads/filename.mp4
-        referenced_videos: set[str] = set()
-        for line in truncated_wire_lines:
-            for match in re.finditer(r"uploads/([^\"\\<>\s]+)", line):
-                fname = match.group(1)
-                mime, _ = mimetypes.guess_type(fname)
-                if mime and mime.startswith("video/"):
-                    referenced_videos.add(fname)
-
-        # Copy only those referenced video files that exist on disk.
-        files_to_copy = [
-            source_uploads / name for name in referenced_videos if (source_uploads / name).is_file()
-        ]
-        if files_to_copy:
-            new_uploads = new_session_dir / "uploads"
-            new_uploads.mkdir(parents=True, exist_ok=True)
-            copied_names: list[str] = []
-            for vf in files_to_copy:
-                shutil.copy2(vf, new_uploads / vf.name)
-                copied_names.append(vf.name)
-            # Write a .sent marker so _encode_uploaded_files() won't re-send
-            # these inherited videos.  The marker is kept across process
-            # restarts (not deleted after reading).
-            (new_uploads / ".sent").write_text(json.dumps(copied_names), encoding="utf-8")
-
-    # Write truncated wire.jsonl
+    # Copy wire.jsonl and context.jsonl (overwriting the empty file from create())
+    # up to the end of the turn
     new_wire_path = new_session_dir / "wire.jsonl"
-    with open(new_wire_path, "w", encoding="utf-8") as f:
-        for line in truncated_wire_lines:
-            f.write(line + "\n")
-
-    # Write truncated context.jsonl (overwrites the empty file from create())
+    await asyncio.to_thread(_copy_history_prefix, wire_path, new_wire_path, wire_end)
     new_context_path = new_session_dir / "context.jsonl"
-    with open(new_context_path, "w", encoding="utf-8") as f:
-        for line in truncated_context_lines:
-            f.write(line + "\n")
+    if context_path.exists():
+        await asyncio.to_thread(_copy_history_prefix, context_path, new_context_path, context_end)
+
+    # Carry over only the video files that are referenced in the copied wire
+    # history.  Videos are referenced by path (<video path="...">) and served via
+    # the uploads endpoint, so the physical file must exist.  Uploads are never
+    # modified, so they are hard linked rather than copied.
+    # Images and text docs are already embedded (base64 / inline) in
+    # context.jsonl and don't need the physical file.
+    videos = await asyncio.to_thread(
+        _referenced_videos, source_dir / "uploads", history_index.videos, wire_end
+    )
+    if videos:
+        new_uploads = new_session_dir / "uploads"
+        new_uploads.mkdir(parents=True, exist_ok=True)
+        for video in videos:
+            link_or_copy(video, new_uploads / video.name)
+        # Write a .sent marker so _encode_uploaded_files() won't re-send
+        # these inherited videos.  The marker is kept across process
+        # restarts (not deleted after reading).
+        (new_uploads / ".sent").write_text(
+            json.dumps([video.name for video in videos]), encoding="utf-8"
+        )
 
     # Build fresh metadata — not inherited from source — so future
     # SessionMetadata fields get their defaults instead of stale values.
@@ -894,7 +1190,7 @@ async def fork_session(
     )
     save_session_metadata(new_session_dir, new_metadata)
 
-    invalidate_sessions_cache()
+    invalidate_sessions_cache(new_session.id)
     invalidate_work_dirs_cache()
 
     context_file = new_session_dir / "context.jsonl"
@@ -928,7 +1224,7 @@ async def generate_session_title(
     If request body is empty or parameters are missing, the backend will
     automatically read the first turn from wire.jsonl.
     """
-    session = get_editable_session(session_id, runner)
+    session = await get_editable_session(session_id, runner)
     session_dir = session.kimi_cli_session.dir
 
     # Load existing metadata
@@ -967,7 +1263,7 @@ async def generate_session_title(
             }
         )
         save_session_metadata(session_dir, metadata)
-        invalidate_sessions_cache()
+        invalidate_sessions_cache(session_id)
         return GenerateTitleResponse(title=fallback_title)
 
     # Try to generate title using AI
@@ -1045,7 +1341,7 @@ Title:"""
     save_session_metadata(session_dir, metadata)
 
     # Invalidate cache
-    invalidate_sessions_cache()
+    invalidate_sessions_cache(session_id)
 
     return GenerateTitleResponse(title=title)
 
@@ -1059,7 +1355,7 @@ async def session_stream(
     """WebSocket stream for a session.
 
     Flow:
-    1. Accept the WebSocket connection
+    1. Accept the WebSocket connection, and forward it if another server owns the session
     2. If history exists, attach WebSocket in replay mode
     3. Replay history messages from wire.jsonl
     4. Start worker if needed
@@ -1099,6 +1395,17 @@ async def session_stream(
         await websocket.close(code=4004, reason="Session not found")
         return
 
+    # Sessions owned by another server are served there.
+    owner = await runner.claim_session(session_id)
+    if owner is not None:
+        if websocket.headers.get(FORWARDED_HEADER):
+            # Ownership changed while forwarding; the client reconnects and is routed again.
+            await websocket.close(code=CLOSE_CODE_TRY_AGAIN, reason="Session moved")
+            return
+        assert runner.server_id is not None
+        await forward_websocket(websocket, owner.url, server_id=runner.server_id)
+        return
+
     # Check if session has history
     session_dir = session.kimi_cli_session.dir
     wire_file = session_dir / "wire.jsonl"
@@ -1169,39 +1476,35 @@ async def session_stream(
         while True:
             try:
                 message = await websocket.receive_text()
+                try:
+                    in_message = decode_in_message(message)
+                except ValueError:
+                    in_message = None
+
                 # Reject new prompts when session is busy
-                if session_process.is_busy:
-                    try:
-                        in_message = JSONRPCInMessageAdapter.validate_json(message)
-                    except ValueError:
-                        in_message = None
-                    if isinstance(in_message, JSONRPCPromptMessage):
-                        await websocket.send_text(
-                            JSONRPCErrorResponse(
-                                id=in_message.id,
-                                error=JSONRPCErrorObject(
-                                    code=ErrorCodes.INVALID_STATE,
-                                    message=(
-                                        "Session is busy; wait for completion before sending "
-                                        "a new prompt."
-                                    ),
+                if session_process.is_busy and isinstance(in_message, JSONRPCPromptMessage):
+                    await session_process.send_to(
+                        websocket,
+                        JSONRPCErrorResponse(
+                            id=in_message.id,
+                            error=JSONRPCErrorObject(
+                                code=ErrorCodes.INVALID_STATE,
+                                message=(
+                                    "Session is busy; wait for completion before sending "
+                                    "a new prompt."
                                 ),
-                            ).model_dump_json()
-                        )
-                        continue
+                            ),
+                        ).model_dump_json(),
+                    )
+                    continue
 
                 # Update last_session_id on first successful prompt
-                if not last_session_id_updated:
-                    try:
-                        in_message = JSONRPCInMessageAdapter.validate_json(message)
-                    except ValueError:
-                        in_message = None
-                    if isinstance(in_message, JSONRPCPromptMessage):
-                        await asyncio.to_thread(_update_last_session_id, session)
-                        last_session_id_updated = True
+                if not last_session_id_updated and isinstance(in_message, JSONRPCPromptMessage):
+                    await asyncio.to_thread(_update_last_session_id, session)
+                    last_session_id_updated = True
 
                 logger.debug(f"sending message to session {session_id}")
-                await session_process.send_message(message)
+                await session_process.send_message(message, in_message)
             except WebSocketDisconnect:
                 logger.debug("WebSocket disconnected")
                 break
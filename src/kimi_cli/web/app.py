@@ -1,5 +1,7 @@
 """Kimi Code CLI Web UI application."""
 
+import asyncio
+import contextlib
 import os
 import secrets
 import socket
@@ -9,7 +11,7 @@ from collections.abc import Callable
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, cast
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 
 import scalar_fastapi
 from fastapi import FastAPI
@@ -17,7 +19,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, Response
 
 from kimi_cli.web.api import (
     config_router,
@@ -31,7 +33,11 @@ from kimi_cli.web.auth import (
     is_private_ip,
     normalize_allowed_origins,
 )
+from kimi_cli.web.metrics import CONTENT_TYPE, render_metrics
+from kimi_cli.web.runner.coordination import SQLiteCoordinator
+from kimi_cli.web.runner.peers import PeerListener
 from kimi_cli.web.runner.process import KimiCLIRunner
+from kimi_cli.web.store.sessions import index_transcripts
 
 # Configure logging based on LOG_LEVEL environment variable
 _log_level = os.environ.get("LOG_LEVEL", "WARNING").upper()
@@ -132,6 +138,23 @@ def _get_network_addresses() -> list[str]:
 
 
 ENV_LAN_ONLY = "KIMI_WEB_LAN_ONLY"
+ENV_WORKER_POOL_SIZE = "KIMI_WEB_WORKER_POOL_SIZE"
+DEFAULT_WORKER_POOL_SIZE = 0
+ENV_SESSIONS_PER_WORKER = "KIMI_WEB_SESSIONS_PER_WORKER"
+ENV_COORDINATE = "KIMI_WEB_COORDINATE"
+ENV_PEER_HOST = "KIMI_WEB_PEER_HOST"
+DEFAULT_PEER_HOST = "127.0.0.1"
+TRANSCRIPT_INDEX_INTERVAL = 15.0
+"""Seconds between indexing the transcripts of changed sessions for search."""
+
+
+async def _index_transcripts_loop() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(index_transcripts)
+        except Exception as e:
+            logger.warning(f"Failed to index session transcripts: {e.__class__.__name__} {e}")
+        await asyncio.sleep(TRANSCRIPT_INDEX_INTERVAL)
 
 
 def create_app(
@@ -141,6 +164,10 @@ def create_app(
     restrict_sensitive_apis: bool | None = None,
     max_public_path_depth: int | None = None,
     lan_only: bool | None = None,
+    worker_pool_size: int | None = None,
+    sessions_per_worker: int | None = None,
+    coordinate: bool | None = None,
+    peer_host: str | None = None,
 ) -> FastAPI:
     """Create the FastAPI application for Kimi CLI web UI."""
 
@@ -153,6 +180,18 @@ def create_app(
         int(env_max_depth_str) if env_max_depth_str and env_max_depth_str.isdigit() else None
     )
     env_lan_only = _load_env_flag(ENV_LAN_ONLY)
+    env_pool_size_str = os.environ.get(ENV_WORKER_POOL_SIZE)
+    env_pool_size = (
+        int(env_pool_size_str)
+        if env_pool_size_str and env_pool_size_str.isdigit()
+        else DEFAULT_WORKER_POOL_SIZE
+    )
+    env_per_worker_str = os.environ.get(ENV_SESSIONS_PER_WORKER)
+    env_per_worker = (
+        int(env_per_worker_str) if env_per_worker_str and env_per_worker_str.isdigit() else 1
+    )
+    env_coordinate = _load_env_flag(ENV_COORDINATE)
+    env_peer_host = os.environ.get(ENV_PEER_HOST) or DEFAULT_PEER_HOST
 
     session_token = session_token if session_token is not None else env_token
     allowed_origins = allowed_origins if allowed_origins is not None else env_origins
@@ -164,6 +203,10 @@ def create_app(
         max_public_path_depth if max_public_path_depth is not None else env_max_depth
     )
     lan_only = lan_only if lan_only is not None else env_lan_only
+    worker_pool_size = worker_pool_size if worker_pool_size is not None else env_pool_size
+    sessions_per_worker = sessions_per_worker if sessions_per_worker is not None else env_per_worker
+    coordinate = coordinate if coordinate is not None else env_coordinate
+    peer_host = peer_host if peer_host is not None else env_peer_host
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
@@ -175,15 +218,35 @@ def create_app(
         app.state.max_public_path_depth = max_public_path_depth
         app.state.lan_only = lan_only
 
+        # Coordinate with the other servers serving the same sessions
+        coordinator: SQLiteCoordinator | None = None
+        peers: PeerListener | None = None
+        if coordinate:
+            coordinator = SQLiteCoordinator()
+            peers = PeerListener(app, peer_host)
+            await coordinator.register(await peers.start())
+
         # Start KimiCLI runner
-        runner = KimiCLIRunner()
+        runner = KimiCLIRunner(
+            worker_pool_size=worker_pool_size,
+            sessions_per_worker=sessions_per_worker,
+            coordinator=coordinator,
+        )
         app.state.runner = runner
         runner.start()
+        transcript_indexer = asyncio.create_task(_index_transcripts_loop())
 
         try:
             yield
         finally:
+            transcript_indexer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await transcript_indexer
             await runner.stop()
+            if coordinator is not None:
+                await coordinator.unregister()
+            if peers is not None:
+                await peers.close()
 
     application = FastAPI(
         title="Kimi Code CLI Web Interface",
@@ -238,6 +301,24 @@ def create_app(
         """Health check endpoint."""
         return {"status": "ok"}
 
+    @application.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:  # pyright: ignore[reportUnusedFunction]
+        """Metrics of this server in the Prometheus text format."""
+        runner = cast(KimiCLIRunner, application.state.runner)
+        runner.update_metrics()
+        # Coordinated servers share the public address, so tell their series apart.
+        labels = {"server": runner.server_id} if runner.server_id is not None else None
+        return Response(render_metrics(labels), media_type=CONTENT_TYPE)
+
+    @application.get("/metrics/targets", include_in_schema=False)
+    async def metrics_targets() -> list[dict[str, Any]]:  # pyright: ignore[reportUnusedFunction]
+        """Peer listeners of the coordinated servers, for Prometheus HTTP service discovery."""
+        runner = cast(KimiCLIRunner, application.state.runner)
+        return [
+            {"targets": [urlsplit(server.url).netloc], "labels": {"server": server.server_id}}
+            for server in await runner.servers()
+        ]
+
     # Mount static files as fallback (must be last)
     if STATIC_DIR.exists():
         application.mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static")
@@ -293,6 +374,10 @@ def run_web_server(
     dangerously_omit_auth: bool = False,
     restrict_sensitive_apis: bool | None = None,
     lan_only: bool = True,
+    worker_pool_size: int = DEFAULT_WORKER_POOL_SIZE,
+    sessions_per_worker: int = 1,
+    workers: int = 1,
+    peer_host: str | None = None,
 ) -> None:
     """Run the web server."""
     import sys
@@ -404,6 +489,14 @@ def run_web_server(
     os.environ[ENV_ENFORCE_ORIGIN] = "1" if (public_mode and not lan_only) else "0"
     os.environ[ENV_RESTRICT_SENSITIVE_APIS] = "1" if restrict_sensitive_apis else "0"
     os.environ[ENV_LAN_ONLY] = "1" if lan_only else "0"
+    os.environ[ENV_WORKER_POOL_SIZE] = str(max(0, worker_pool_size))
+    os.environ[ENV_SESSIONS_PER_WORKER] = str(max(1, sessions_per_worker))
+    # Several servers, or servers on several hosts, must agree on who runs each session.
+    os.environ[ENV_COORDINATE] = "1" if workers > 1 or peer_host else "0"
+    if peer_host:
+        os.environ[ENV_PEER_HOST] = peer_host
+    else:
+        os.environ.pop(ENV_PEER_HOST, None)
 
     # Determine display URLs
     display_hosts: list[tuple[str, str]] = []
@@ -536,8 +629,11 @@ def run_web_server(
         host=host,
         port=actual_port,
         reload=reload,
+        workers=workers,
         log_level="info",
         timeout_graceful_shutdown=3,
+        # Compress websocket frames; history replay of large sessions is mostly JSON text.
+        ws_per_message_deflate=True,
     )
 
 
@@ -124,7 +124,7 @@ def get_client_ip(request: Request, trust_proxy: bool = False) -> str | None:
 
 
 class AuthMiddleware(BaseHTTPMiddleware):
-    """Bearer token auth, origin checks, and LAN-only mode for API routes."""
+    """Bearer token auth, origin checks, and LAN-only mode for API routes and metrics."""
 
     def __init__(
         self,
@@ -156,7 +156,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
         if path in {"/healthz", "/docs", "/scalar"}:
             return await call_next(request)
-        if not path.startswith("/api/"):
+        if not path.startswith("/api/") and path not in {"/metrics", "/metrics/targets"}:
             return await call_next(request)
 
         if self._enforce_origin:
@@ -0,0 +1,251 @@
+"""In-process metrics of the web server, exposed at `/metrics` in the Prometheus text format.
+
+Counters and histograms are plain numbers updated on the event loop, so recording costs a
+dictionary lookup and an addition. Gauges of the runner state (workers, in-flight prompts,
+connected clients) are set when the metrics are scraped, see `KimiCLIRunner.update_metrics`.
+
+The metrics are those of the current process. Coordinated servers label them with their
+server ID, and each of them has to be scraped at its peer listener.
+"""
+
+from __future__ import annotations
+
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""Buckets in seconds for waits a user notices, e.g. starting a worker or the first token."""
+THROUGHPUT_BUCKETS = (5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0)
+"""Buckets in tokens per second."""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+
+    def _labels(
+        self, values: Sequence[str], const_labels: Mapping[str, str] | None, extra: str = ""
+    ) -> str:
+        const_labels = const_labels or {}
+        names = (*const_labels, *self.label_names)
+        return _labels(names, (*const_labels.values(), *values), extra)
+
+    @abstractmethod
+    def render(self, const_labels: Mapping[str, str] | None = None) -> list[str]:
+        """The lines of the metric in the Prometheus text format, with `const_labels` added."""
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self, const_labels: Mapping[str, str] | None = None) -> list[str]:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            label_text = self._labels(labels, const_labels)
+            lines.append(f"{self.name}{label_text} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value that is set to what it currently is."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def clear(self) -> None:
+        """Forget all label values, before setting the current ones."""
+        self._values.clear()
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self, const_labels: Mapping[str, str] | None = None) -> list[str]:
+        lines = self._header()
+        for labels, value in sorted(self._values.items()):
+            label_text = self._labels(labels, const_labels)
+            lines.append(f"{self.name}{label_text} {_format_value(value)}")
+        return lines
+
+
+class _Buckets:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Counts of observed values by upper bound, with their sum."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple[str, ...], _Buckets] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = _Buckets(len(self.buckets))
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            entry.counts[index] += 1
+        entry.sum += value
+        entry.count += 1
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return entry.count if entry is not None else 0
+
+    def render(self, const_labels: Mapping[str, str] | None = None) -> list[str]:
+        lines = self._header()
+        for labels, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry.counts, strict=True):
+                cumulative += count
+                le = self._labels(labels, const_labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._labels(labels, const_labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {entry.count}")
+            label_text = self._labels(labels, const_labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(entry.sum)}")
+            lines.append(f"{self.name}_count{label_text} {entry.count}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render_metrics(const_labels: Mapping[str, str] | None = None) -> str:
+    """All metrics in the Prometheus text exposition format, with `const_labels` added."""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(const_labels))
+    return "\n".join(lines) + "\n"
+
+
+# Session workers
+WORKER_STARTS = Counter(
+    "kimi_web_worker_starts_total", "Session workers started, by kind.", ("kind",)
+)
+WORKER_START_SECONDS = Histogram(
+    "kimi_web_worker_start_seconds", "Time to get a worker process for a session.", ("kind",)
+)
+WORKER_FIRST_MESSAGE_SECONDS = Histogram(
+    "kimi_web_worker_first_message_seconds",
+    "Time from starting a session worker to its first message.",
+    ("kind",),
+)
+WORKER_OUTPUT_BYTES = Counter(
+    "kimi_web_worker_output_bytes_total", "Bytes of messages read from session workers."
+)
+SESSION_WORKERS = Gauge("kimi_web_session_workers", "Session workers running.")
+IDLE_WORKERS = Gauge("kimi_web_idle_workers", "Started workers waiting for a session.")
+SESSIONS = Gauge("kimi_web_sessions", "Sessions known to this server, by state.", ("state",))
+SESSION_STATUS_CHANGES = Counter(
+    "kimi_web_session_status_changes_total", "Session status changes, by new state.", ("state",)
+)
+
+# Prompts
+PROMPTS_IN_FLIGHT = Gauge("kimi_web_prompts_in_flight", "Prompts being processed.")
+PROMPTS = Counter("kimi_web_prompts_total", "Prompts finished, by outcome.", ("outcome",))
+PROMPT_SECONDS = Histogram(
+    "kimi_web_prompt_seconds",
+    "Time from sending a prompt to the worker to its response.",
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+
+# LLM
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "kimi_web_llm_time_to_first_token_seconds",
+    "Time from the start of a step to the first content or tool call streamed by the model.",
+)
+LLM_OUTPUT_TOKENS_PER_SECOND = Histogram(
+    "kimi_web_llm_output_tokens_per_second",
+    "Output tokens of a step per second of streaming.",
+    buckets=THROUGHPUT_BUCKETS,
+)
+LLM_TOKENS = Counter("kimi_web_llm_tokens_total", "Tokens used by the model, by type.", ("type",))
+
+# Websockets
+WEBSOCKETS = Gauge("kimi_web_websockets", "Connected session websockets.")
+BROADCAST_MESSAGES = Counter(
+    "kimi_web_broadcast_messages_total",
+    "Worker messages fanned out to session websockets, by kind.",
+    ("kind",),
+)
+WEBSOCKET_QUEUED_BYTES = Gauge(
+    "kimi_web_websocket_queued_bytes", "Bytes queued for all session websockets."
+)
+WEBSOCKET_MAX_LAG_SECONDS = Gauge(
+    "kimi_web_websocket_max_lag_seconds", "Age of the oldest message queued for any websocket."
+)
+WEBSOCKET_DROPPED_MESSAGES = Counter(
+    "kimi_web_websocket_dropped_messages_total", "Events dropped because a client was slow."
+)
+WEBSOCKET_SLOW_DISCONNECTS = Counter(
+    "kimi_web_websocket_slow_disconnects_total", "Websockets closed because they fell behind."
+)
+
+# History replay
+REPLAY_SECONDS = Histogram(
+    "kimi_web_replay_seconds", "Time to replay the history of a session to a websocket."
+)
+REPLAY_BYTES = Counter("kimi_web_replay_bytes_total", "Wire history bytes replayed.")
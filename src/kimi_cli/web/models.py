@@ -23,6 +23,16 @@ class SessionStatus(BaseModel):
     updated_at: datetime = Field(..., description="Timestamp for this state")
 
 
+class SessionClientLag(BaseModel):
+    """How far behind the live stream of a session a connected client is."""
+
+    client: str = Field(..., description="Client address")
+    queued_messages: int = Field(..., description="Messages queued and not yet sent")
+    queued_bytes: int = Field(..., description="Size of the queued messages")
+    lag_ms: int = Field(..., description="Age of the oldest queued message in milliseconds")
+    dropped_messages: int = Field(..., description="Events dropped because the client was slow")
+
+
 class SessionNoticePayload(BaseModel):
     """Payload for session notice events."""
 
@@ -74,6 +84,14 @@ class Session(BaseModel):
     archived: bool = Field(default=False, description="Whether the session is archived")
 
 
+class SessionSearchResult(BaseModel):
+    """A session whose transcript matches a search query."""
+
+    session: Session = Field(..., description="The matching session")
+    snippet: str = Field(..., description="Best matching part of the session's transcript")
+    score: float = Field(..., description="BM25 score of the session's transcript, lower is better")
+
+
 class UpdateSessionRequest(BaseModel):
     """Update session request."""
 
@@ -0,0 +1,308 @@
+"""Coordination of `kimi web` servers that serve the same sessions.
+
+Several server processes may serve the sessions of one share directory: the worker
+processes of `kimi web --workers`, or servers on several hosts sharing the storage. The
+worker of a session must only run in one of them, so every session is owned by the server
+that opened it first:
+
+- Servers register with the URL of their peer listener (see `kimi_cli.web.runner.peers`)
+  and keep a heartbeat. A server whose heartbeat is older than `SERVER_TTL` is gone, and
+  the sessions it owned may be claimed by others.
+- Opening the websocket of a session claims it. Servers that do not own a session forward
+  its websockets to the owner.
+- Owners publish the runtime status of their sessions, so every server can list them.
+
+`SessionCoordinator` is the interface to the shared state. `SQLiteCoordinator` keeps it in
+a SQLite database in the share directory and relies on SQLite's file locks, so no other
+service is needed; servers on several hosts need a filesystem with working POSIX locks and
+reasonably synchronized clocks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Generator, Mapping
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from loguru import logger
+
+from kimi_cli.share import get_share_dir
+from kimi_cli.web.models import SessionStatus
+
+COORDINATION_FILENAME = "coordination.db"
+SERVER_TTL = 20.0
+"""Seconds after its last heartbeat that a server is considered gone."""
+HEARTBEAT_INTERVAL = 5.0
+_SCHEMA_VERSION = 1
+_BUSY_TIMEOUT_MS = 10000
+
+_SCHEMA = """
+CREATE TABLE servers (
+    server_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE owners (
+    session_id TEXT PRIMARY KEY,
+    server_id TEXT NOT NULL,
+    status TEXT,
+    is_running INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX owners_by_server ON owners (server_id);
+"""
+_TABLES = ("servers", "owners")
+
+
+@dataclass(slots=True, frozen=True)
+class PeerServer:
+    """A server taking part in the coordination."""
+
+    server_id: str
+    url: str
+    """Base URL of the peer listener of the server, e.g. `http://127.0.0.1:50123`."""
+
+
+@dataclass(slots=True, frozen=True)
+class SharedSessionStatus:
+    """Runtime status of a session as published by the server owning it."""
+
+    status: SessionStatus
+    is_running: bool
+
+
+class SessionCoordinator(ABC):
+    """Shared session ownership and status of the servers serving the same sessions."""
+
+    def __init__(self) -> None:
+        self.server_id = uuid4().hex
+
+    @abstractmethod
+    async def register(self, url: str) -> None:
+        """Announce this server, reachable by other servers at `url`."""
+
+    @abstractmethod
+    async def unregister(self) -> None:
+        """Withdraw this server, releasing all sessions it owns."""
+
+    @abstractmethod
+    async def servers(self) -> list[PeerServer]:
+        """The live servers, this one included."""
+
+    @abstractmethod
+    async def heartbeat(self, owned: Collection[UUID]) -> set[UUID]:
+        """Keep this server alive.
+
+        Args:
+            owned: The sessions this server believes it owns.
+
+        Returns:
+            The sessions of `owned` that this server does not own anymore.
+        """
+
+    @abstractmethod
+    async def claim(self, session_id: UUID) -> PeerServer | None:
+        """Claim a session for this server unless another live server owns it.
+
+        Returns:
+            The server owning the session, or `None` if it is this one.
+        """
+
+    @abstractmethod
+    async def release(self, session_ids: Collection[UUID]) -> None:
+        """Release sessions, whichever server owns them."""
+
+    @abstractmethod
+    async def publish_statuses(self, statuses: Mapping[UUID, SharedSessionStatus]) -> None:
+        """Publish the status of sessions owned by this server."""
+
+    @abstractmethod
+    async def get_statuses(self, session_ids: Collection[UUID]) -> dict[UUID, SharedSessionStatus]:
+        """Get the published status of sessions owned by live servers."""
+
+
+class SQLiteCoordinator(SessionCoordinator):
+    """Coordination through a SQLite database shared by all servers."""
+
+    def __init__(self, db_file: Path | None = None, *, server_ttl: float = SERVER_TTL) -> None:
+        super().__init__()
+        self.db_file = db_file or get_share_dir() / COORDINATION_FILENAME
+        self._server_ttl = server_ttl
+        self._url: str | None = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _init_db(self) -> None:
+        with closing(sqlite3.connect(self.db_file, timeout=_BUSY_TIMEOUT_MS / 1000)) as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+                return
+            # Unlike the session index, keep the rollback journal: WAL needs shared memory,
+            # which servers on different hosts do not have.
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                    for table in _TABLES:
+                        conn.execute(f"DROP TABLE IF EXISTS {table}")
+                    for statement in _SCHEMA.split(";"):
+                        if statement.strip():
+                            conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self) -> Generator[sqlite3.Connection]:
+        """A connection in a write transaction, so that reads and writes are atomic."""
+        with self._init_lock:
+            if not self._initialized:
+                self._init_db()
+                self._initialized = True
+        conn = sqlite3.connect(self.db_file, timeout=_BUSY_TIMEOUT_MS / 1000)
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def _register(self, url: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO servers (server_id, url, heartbeat_at) VALUES (?, ?, ?)",
+                (self.server_id, url, time.time()),
+            )
+
+    async def register(self, url: str) -> None:
+        self._url = url
+        await asyncio.to_thread(self._register, url)
+
+    def _unregister(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM owners WHERE server_id = ?", (self.server_id,))
+            conn.execute("DELETE FROM servers WHERE server_id = ?", (self.server_id,))
+
+    async def unregister(self) -> None:
+        await asyncio.to_thread(self._unregister)
+
+    def _servers(self) -> list[PeerServer]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT server_id, url FROM servers WHERE heartbeat_at >= ? ORDER BY server_id",
+                (time.time() - self._server_ttl,),
+            ).fetchall()
+        return [PeerServer(server_id=str(server_id), url=str(url)) for server_id, url in rows]
+
+    async def servers(self) -> list[PeerServer]:
+        return await asyncio.to_thread(self._servers)
+
+    def _heartbeat(self, owned: Collection[UUID]) -> set[UUID]:
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE servers SET heartbeat_at = ? WHERE server_id = ?", (now, self.server_id)
+            ).rowcount
+            if not updated and self._url is not None:
+                # Forgotten after missing heartbeats; the sessions it owned are lost.
+                logger.warning(f"Server {self.server_id} missed its heartbeats")
+                conn.execute(
+                    "INSERT INTO servers (server_id, url, heartbeat_at) VALUES (?, ?, ?)",
+                    (self.server_id, self._url, now),
+                )
+            # Forget servers that are gone, with the sessions they owned.
+            expired = (now - self._server_ttl,)
+            conn.execute(
+                "DELETE FROM owners WHERE server_id IN "
+                "(SELECT server_id FROM servers WHERE heartbeat_at < ?)",
+                expired,
+            )
+            conn.execute("DELETE FROM servers WHERE heartbeat_at < ?", expired)
+            still_owned = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT session_id FROM owners WHERE server_id = ?", (self.server_id,)
+                )
+            }
+        return {session_id for session_id in owned if str(session_id) not in still_owned}
+
+    async def heartbeat(self, owned: Collection[UUID]) -> set[UUID]:
+        return await asyncio.to_thread(self._heartbeat, owned)
+
+    def _claim(self, session_id: UUID) -> PeerServer | None:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT o.server_id, s.url, s.heartbeat_at FROM owners o "
+                "LEFT JOIN servers s ON s.server_id = o.server_id WHERE o.session_id = ?",
+                (str(session_id),),
+            ).fetchone()
+            if row is not None:
+                server_id, url, heartbeat_at = row
+                if server_id == self.server_id:
+                    return None
+                if url is not None and heartbeat_at >= now - self._server_ttl:
+                    return PeerServer(server_id=str(server_id), url=str(url))
+            conn.execute(
+                "INSERT OR REPLACE INTO owners (session_id, server_id) VALUES (?, ?)",
+                (str(session_id), self.server_id),
+            )
+        return None
+
+    async def claim(self, session_id: UUID) -> PeerServer | None:
+        return await asyncio.to_thread(self._claim, session_id)
+
+    def _release(self, session_ids: Collection[UUID]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM owners WHERE session_id = ?",
+                [(str(session_id),) for session_id in session_ids],
+            )
+
+    async def release(self, session_ids: Collection[UUID]) -> None:
+        if session_ids:
+            await asyncio.to_thread(self._release, session_ids)
+
+    def _publish_statuses(self, statuses: Mapping[UUID, SharedSessionStatus]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE owners SET status = ?, is_running = ? "
+                "WHERE session_id = ? AND server_id = ?",
+                [
+                    (
+                        shared.status.model_dump_json(),
+                        shared.is_running,
+                        str(session_id),
+                        self.server_id,
+                    )
+                    for session_id, shared in statuses.items()
+                ],
+            )
+
+    async def publish_statuses(self, statuses: Mapping[UUID, SharedSessionStatus]) -> None:
+        if statuses:
+            await asyncio.to_thread(self._publish_statuses, statuses)
+
+    def _get_statuses(self, session_ids: Collection[UUID]) -> dict[UUID, SharedSessionStatus]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT o.status, o.is_running FROM owners o "
+                "JOIN servers s ON s.server_id = o.server_id "
+                f"WHERE o.session_id IN ({', '.join('?' * len(session_ids))}) "
+                "AND o.status IS NOT NULL AND s.heartbeat_at >= ?",
+                [*(str(session_id) for session_id in session_ids), time.time() - self._server_ttl],
+            ).fetchall()
+        statuses: dict[UUID, SharedSessionStatus] = {}
+        for status_json, is_running in rows:
+            status = SessionStatus.model_validate_json(status_json)
+            statuses[status.session_id] = SharedSessionStatus(
+                status=status, is_running=bool(is_running)
+            )
+        return statuses
+
+    async def get_statuses(self, session_ids: Collection[UUID]) -> dict[UUID, SharedSessionStatus]:
+        if not session_ids:
+            return {}
+        return await asyncio.to_thread(self._get_statuses, session_ids)
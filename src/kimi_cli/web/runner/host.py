@@ -0,0 +1,281 @@
+"""
+Worker hosts: one worker process serving the Wire of several sessions.
+
+Runner and host talk over the host's stdio in frames, each a header line
+`<channel> <kind> <length>` followed by `length` bytes of body. A channel is one run of one
+session on the host, so that a late frame of a stopped run is never mistaken for the next
+run of the same session. Kinds:
+
+- `open` (runner to host): start a channel; the body is the session ID.
+- `data` (both ways): Wire protocol bytes of the channel, passed through verbatim.
+- `close` (runner to host): stop the channel, cancelling whatever the session is running.
+- `exit` (host to runner): the channel stopped; the body is JSON with `returncode` and
+  `stderr`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Literal, Protocol
+from uuid import UUID, uuid4
+
+from loguru import logger
+
+from kimi_cli.web.runner.pool import WORKER_STREAM_LIMIT, spawn_worker
+
+if TYPE_CHECKING:
+    from kimi_cli.wire.server import WireWriter
+
+type FrameKind = Literal["open", "data", "close", "exit"]
+
+HOST_WORKER_ARG = "+"
+"""Worker argument telling it to host several sessions over multiplexed stdio."""
+
+MAX_SESSIONS_PER_WORKER = 64
+
+
+class WorkerProcess(Protocol):
+    """What `SessionProcess` needs from a worker: a subprocess, or a session on a host."""
+
+    @property
+    def stdin(self) -> WireWriter | None: ...
+
+    @property
+    def stdout(self) -> asyncio.StreamReader | None: ...
+
+    @property
+    def stderr(self) -> asyncio.StreamReader | None: ...
+
+    @property
+    def returncode(self) -> int | None: ...
+
+    def terminate(self) -> None: ...
+
+    def kill(self) -> None: ...
+
+    async def wait(self) -> int: ...
+
+
+def write_frame(stream: asyncio.StreamWriter, channel: str, kind: FrameKind, body: bytes) -> None:
+    """Write a frame; header and body go out together since nothing awaits in between."""
+    stream.writelines([f"{channel} {kind} {len(body)}\n".encode("ascii"), body])
+
+
+async def read_frame(stream: asyncio.StreamReader) -> tuple[str, str, bytes] | None:
+    """
+    Read a frame as `(channel, kind, body)`, or return `None` at the end of the stream.
+
+    Raises:
+        ValueError: If the frame header is malformed.
+        asyncio.IncompleteReadError: If the stream ends in the middle of a frame.
+    """
+    header = await stream.readline()
+    if not header:
+        return None
+    channel, kind, length = header.decode("ascii").split()
+    body = await stream.readexactly(int(length))
+    return channel, kind, body
+
+
+class FrameWriter:
+    """Writes the bytes of one channel as `data` frames to a shared stream."""
+
+    def __init__(self, channel: str, stream: asyncio.StreamWriter) -> None:
+        self._channel = channel
+        self._stream = stream
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        if self._closed or not data:
+            return
+        write_frame(self._stream, self._channel, "data", data)
+
+    async def drain(self) -> None:
+        await self._stream.drain()
+
+    def close(self) -> None:
+        self._closed = True
+
+    def is_closing(self) -> bool:
+        return self._closed
+
+    async def wait_closed(self) -> None:
+        return None
+
+
+class HostedSession:
+    """A session run on a `WorkerHost`, looking like the worker subprocess it replaces."""
+
+    def __init__(self, host: WorkerHost, channel: str) -> None:
+        self._host = host
+        self._channel = channel
+        self.stdin = FrameWriter(channel, host.stdin)
+        self.stdout = asyncio.StreamReader(limit=WORKER_STREAM_LIMIT)
+        self.stderr = asyncio.StreamReader()
+        self.returncode: int | None = None
+        self._exited = asyncio.Event()
+
+    def terminate(self) -> None:
+        """Ask the host to stop the session."""
+        if self.returncode is None:
+            self._host.close_channel(self._channel)
+
+    def kill(self) -> None:
+        """Stop waiting for the host and consider the session gone."""
+        self.terminate()
+        self._host.forget_channel(self._channel)
+        self.exit(-9, b"")
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        assert self.returncode is not None
+        return self.returncode
+
+    def exit(self, returncode: int, stderr: bytes) -> None:
+        if self.returncode is not None:
+            return
+        # The return code must be known by the time readers see the end of stdout.
+        self.returncode = returncode
+        self.stdin.close()
+        if stderr:
+            self.stderr.feed_data(stderr)
+        self.stderr.feed_eof()
+        self.stdout.feed_eof()
+        self._exited.set()
+
+
+class WorkerHost:
+    """A worker process hosting several sessions."""
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        *,
+        on_empty: Callable[[WorkerHost], None] | None = None,
+    ) -> None:
+        assert process.stdin is not None
+        self._process = process
+        self.stdin: asyncio.StreamWriter = process.stdin
+        self._on_empty = on_empty
+        self._sessions: dict[str, HostedSession] = {}
+        self._read_task = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def spawn(cls, *, on_empty: Callable[[WorkerHost], None] | None = None) -> WorkerHost:
+        return cls(await spawn_worker(HOST_WORKER_ARG), on_empty=on_empty)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.returncode is None and not self._read_task.done()
+
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+    def open(self, session_id: UUID) -> HostedSession:
+        """Start serving a session on this host."""
+        channel = uuid4().hex
+        session = HostedSession(self, channel)
+        self._sessions[channel] = session
+        write_frame(self.stdin, channel, "open", str(session_id).encode("ascii"))
+        return session
+
+    def close_channel(self, channel: str) -> None:
+        if self.is_alive and channel in self._sessions:
+            write_frame(self.stdin, channel, "close", b"")
+
+    def forget_channel(self, channel: str) -> None:
+        if self._sessions.pop(channel, None) is not None and not self._sessions:
+            self._notify_empty()
+
+    async def close(self) -> None:
+        """Stop the host and every session on it."""
+        if self._process.returncode is None:
+            # At the end of its stdin, the host stops its sessions and exits.
+            self.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=10.0)
+            except TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._read_task
+
+    def _notify_empty(self) -> None:
+        if self._on_empty is not None and self.is_alive:
+            self._on_empty(self)
+
+    async def _read_loop(self) -> None:
+        assert self._process.stdout is not None
+        assert self._process.stderr is not None
+        try:
+            while (frame := await read_frame(self._process.stdout)) is not None:
+                channel, kind, body = frame
+                session = self._sessions.get(channel)
+                if session is None:
+                    continue
+                if kind == "data":
+                    session.stdout.feed_data(body)
+                elif kind == "exit":
+                    info = json.loads(body)
+                    session.exit(info["returncode"], info["stderr"].encode("utf-8"))
+                    self.forget_channel(channel)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            logger.error(f"Invalid frame from worker host: {e.__class__.__name__} {e}")
+            self._process.kill()
+        finally:
+            returncode = await self._process.wait()
+            stderr = await self._process.stderr.read()
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            if sessions:
+                logger.warning(f"Worker host exited with {returncode}, ending {len(sessions)}")
+            for session in sessions:
+                session.exit(returncode or -1, stderr)
+
+
+class WorkerHostGroup:
+    """Places sessions on worker hosts, at most `sessions_per_worker` per host."""
+
+    def __init__(self, sessions_per_worker: int) -> None:
+        self._capacity = max(1, min(sessions_per_worker, MAX_SESSIONS_PER_WORKER))
+        self._hosts: list[WorkerHost] = []
+        self._lock = asyncio.Lock()
+        self._closing: set[asyncio.Task[None]] = set()
+
+    @property
+    def sessions_per_worker(self) -> int:
+        return self._capacity
+
+    @property
+    def host_count(self) -> int:
+        return len(self._hosts)
+
+    async def open(self, session_id: UUID) -> HostedSession:
+        """Start a session on the first host with room, starting a new host if all are full."""
+        async with self._lock:
+            self._hosts = [host for host in self._hosts if host.is_alive]
+            host = next((h for h in self._hosts if h.session_count < self._capacity), None)
+            if host is None:
+                host = await WorkerHost.spawn(on_empty=self._on_host_empty)
+                self._hosts.append(host)
+            return host.open(session_id)
+
+    async def close(self) -> None:
+        """Stop all hosts."""
+        async with self._lock:
+            hosts = self._hosts
+            self._hosts = []
+        await asyncio.gather(*(host.close() for host in hosts), *self._closing)
+
+    def _on_host_empty(self, host: WorkerHost) -> None:
+        # Keep one empty host around, already started, for the next session.
+        if host not in self._hosts or len(self._hosts) == 1:
+            return
+        self._hosts.remove(host)
+        task = asyncio.create_task(host.close())
+        task.add_done_callback(self._closing.discard)
+        self._closing.add(task)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, Mapping
+from pathlib import PurePath
+from typing import Literal
+
+from kaos import KaosProcess, StatResult, StrOrKaosPath
+from kaos.local import LocalKaos, local_kaos
+from kaos.path import KaosPath
+
+
+class WorkDirKaos:
+    """
+    Local KAOS backend with a working directory of its own.
+
+    Sessions hosted by the same worker process cannot share the process-wide working
+    directory, so this backend keeps one per session: `chdir` only moves it, relative paths
+    are resolved against it, and commands are started in it.
+    """
+
+    name: str = local_kaos.name
+
+    def __init__(self, cwd: KaosPath) -> None:
+        self._cwd = local_kaos.normpath(cwd)
+
+    def _abs(self, path: StrOrKaosPath) -> KaosPath:
+        path = path if isinstance(path, KaosPath) else KaosPath(path)
+        return path if path.is_absolute() else self._cwd / path
+
+    def pathclass(self) -> type[PurePath]:
+        return local_kaos.pathclass()
+
+    def normpath(self, path: StrOrKaosPath) -> KaosPath:
+        return local_kaos.normpath(path)
+
+    def gethome(self) -> KaosPath:
+        return local_kaos.gethome()
+
+    def getcwd(self) -> KaosPath:
+        return self._cwd
+
+    async def chdir(self, path: StrOrKaosPath) -> None:
+        target = local_kaos.normpath(self._abs(path))
+        if not await asyncio.to_thread(target.unsafe_to_local_path().is_dir):
+            raise NotADirectoryError(f"Not a directory: {target}")
+        self._cwd = target
+
+    async def stat(self, path: StrOrKaosPath, *, follow_symlinks: bool = True) -> StatResult:
+        return await local_kaos.stat(self._abs(path), follow_symlinks=follow_symlinks)
+
+    def iterdir(self, path: StrOrKaosPath) -> AsyncGenerator[KaosPath]:
+        return local_kaos.iterdir(self._abs(path))
+
+    def glob(
+        self, path: StrOrKaosPath, pattern: str, *, case_sensitive: bool = True
+    ) -> AsyncGenerator[KaosPath]:
+        return local_kaos.glob(self._abs(path), pattern, case_sensitive=case_sensitive)
+
+    async def readbytes(
+        self, path: StrOrKaosPath, n: int | None = None, *, offset: int = 0
+    ) -> bytes:
+        return await local_kaos.readbytes(self._abs(path), n=n, offset=offset)
+
+    async def readtext(
+        self,
+        path: StrOrKaosPath,
+        *,
+        encoding: str = "utf-8",
+        errors: Literal["strict", "ignore", "replace"] = "strict",
+    ) -> str:
+        return await local_kaos.readtext(self._abs(path), encoding=encoding, errors=errors)
+
+    def readlines(
+        self,
+        path: StrOrKaosPath,
+        *,
+        encoding: str = "utf-8",
+        errors: Literal["strict", "ignore", "replace"] = "strict",
+    ) -> AsyncGenerator[str]:
+        return local_kaos.readlines(self._abs(path), encoding=encoding, errors=errors)
+
+    async def writebytes(self, path: StrOrKaosPath, data: bytes) -> int:
+        return await local_kaos.writebytes(self._abs(path), data)
+
+    async def writetext(
+        self,
+        path: StrOrKaosPath,
+        data: str,
+        *,
+        mode: Literal["w", "a"] = "w",
+        encoding: str = "utf-8",
+        errors: Literal["strict", "ignore", "replace"] = "strict",
+    ) -> int:
+        return await local_kaos.writetext(
+            self._abs(path), data, mode=mode, encoding=encoding, errors=errors
+        )
+
+    async def mkdir(
+        self, path: StrOrKaosPath, parents: bool = False, exist_ok: bool = False
+    ) -> None:
+        await local_kaos.mkdir(self._abs(path), parents=parents, exist_ok=exist_ok)
+
+    async def exec(self, *args: str, env: Mapping[str, str] | None = None) -> KaosProcess:
+        if not args:
+            raise ValueError("At least one argument (the program to execute) is required.")
+
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=self._cwd.unsafe_to_local_path(),
+        )
+        return LocalKaos.Process(process)
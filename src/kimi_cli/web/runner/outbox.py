@@ -0,0 +1,224 @@
+"""Per-WebSocket outbound queues, so a slow viewer of a session does not hold up the others."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Literal
+
+from kosong.message import MergeableMixin
+from loguru import logger
+from starlette.websockets import WebSocket, WebSocketState
+
+from kimi_cli.web.metrics import WEBSOCKET_DROPPED_MESSAGES, WEBSOCKET_SLOW_DISCONNECTS
+from kimi_cli.web.models import SessionClientLag
+from kimi_cli.wire.jsonrpc import JSONRPCEventMessage, encode_out_message
+from kimi_cli.wire.serde import deserialize_wire_message
+from kimi_cli.wire.types import Event, is_event
+
+type OverflowPolicy = Literal["coalesce", "drop", "disconnect"]
+"""
+What to do when a WebSocket falls too far behind:
+
+- `coalesce`: merge consecutive queued text, thinking and tool call argument deltas, and
+  disconnect if that is not enough.
+- `drop`: drop the oldest queued events; requests, responses and status messages are kept.
+- `disconnect`: close the WebSocket so the client reconnects and replays the history.
+"""
+
+DEFAULT_MAX_QUEUED_BYTES = 8 * 1024 * 1024
+SLOW_CLIENT_CLOSE_CODE = 4008
+LAG_WARNING_SECONDS = 10.0
+
+
+@dataclass(slots=True)
+class _Outgoing:
+    text: str
+    is_event: bool
+    queued_at: float
+
+
+class WebSocketOutbox:
+    """
+    Bounded outbound queue and sender task of one WebSocket.
+
+    Messages are queued without waiting, and sent by a task of their own. The outbox starts
+    held, so live messages wait in order while the history is replayed straight to the
+    WebSocket, and is released afterwards.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        *,
+        max_queued_bytes: int = DEFAULT_MAX_QUEUED_BYTES,
+        overflow: OverflowPolicy = "coalesce",
+        on_disconnect: Callable[[WebSocket], Awaitable[None]],
+    ) -> None:
+        self._ws = ws
+        self._max_queued_bytes = max_queued_bytes
+        self._overflow: OverflowPolicy = overflow
+        self._on_disconnect = on_disconnect
+        self._queue: deque[_Outgoing] = deque()
+        self._queued_bytes = 0
+        self._dropped = 0
+        self._lag_warned = False
+        self._wakeup = asyncio.Event()
+        self._held = True
+        self._closed = False
+        self._task: asyncio.Task[None] | None = None
+        self._disconnect_task: asyncio.Task[None] | None = None
+
+    @property
+    def is_held(self) -> bool:
+        return self._held
+
+    @property
+    def lag(self) -> SessionClientLag:
+        client = self._ws.client
+        oldest = self._queue[0].queued_at if self._queue else None
+        return SessionClientLag(
+            client=f"{client.host}:{client.port}" if client else "unknown",
+            queued_messages=len(self._queue),
+            queued_bytes=self._queued_bytes,
+            lag_ms=int((time.monotonic() - oldest) * 1000) if oldest is not None else 0,
+            dropped_messages=self._dropped,
+        )
+
+    def put(self, message: str, *, is_event: bool = False) -> None:
+        """Queue a message; `is_event` marks Wire events, which may be merged or dropped."""
+        if self._closed:
+            return
+        self._queue.append(_Outgoing(message, is_event, time.monotonic()))
+        self._queued_bytes += len(message)
+        if self._queued_bytes > self._max_queued_bytes:
+            self._handle_overflow()
+        if not self._held:
+            self._wakeup.set()
+
+    def release(self) -> None:
+        """Start sending queued and future messages."""
+        if self._closed or not self._held:
+            return
+        self._held = False
+        self._task = asyncio.create_task(self._send_loop())
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """Stop sending; whatever is still queued is discarded."""
+        self._closed = True
+        self._queue.clear()
+        self._queued_bytes = 0
+        task, self._task = self._task, None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def _handle_overflow(self) -> None:
+        match self._overflow:
+            case "coalesce":
+                self._coalesce()
+            case "drop":
+                self._drop_events()
+            case "disconnect":
+                pass
+        if self._queued_bytes > self._max_queued_bytes:
+            logger.warning(
+                f"WebSocket {self.lag.client} fell {self._queued_bytes} bytes behind, "
+                "disconnecting it"
+            )
+            WEBSOCKET_SLOW_DISCONNECTS.inc()
+            self._closed = True
+            self._queue.clear()
+            self._queued_bytes = 0
+            self._disconnect_task = asyncio.create_task(self._disconnect())
+
+    def _coalesce(self) -> None:
+        merged: deque[_Outgoing] = deque()
+        pending: Event | None = None
+        pending_item: _Outgoing | None = None
+
+        def flush() -> None:
+            nonlocal pending, pending_item
+            if pending is not None and pending_item is not None:
+                event = JSONRPCEventMessage(params=pending)
+                text = encode_out_message(event).decode("utf-8").rstrip("\n")
+                merged.append(_Outgoing(text, True, pending_item.queued_at))
+            pending = pending_item = None
+
+        for item in self._queue:
+            msg = _parse_mergeable(item) if item.is_event else None
+            if msg is None:
+                flush()
+                merged.append(item)
+            elif isinstance(pending, MergeableMixin) and pending.merge_in_place(msg):
+                continue
+            else:
+                flush()
+                pending, pending_item = msg, item
+        flush()
+
+        self._queue = merged
+        self._queued_bytes = sum(len(item.text) for item in merged)
+
+    def _drop_events(self) -> None:
+        kept: deque[_Outgoing] = deque()
+        for item in self._queue:
+            if item.is_event and self._queued_bytes > self._max_queued_bytes:
+                self._queued_bytes -= len(item.text)
+                self._dropped += 1
+                WEBSOCKET_DROPPED_MESSAGES.inc()
+            else:
+                kept.append(item)
+        self._queue = kept
+
+    async def _disconnect(self) -> None:
+        with contextlib.suppress(Exception):
+            if self._ws.client_state == WebSocketState.CONNECTED:
+                await self._ws.close(code=SLOW_CLIENT_CLOSE_CODE, reason="Client too slow")
+        await self._on_disconnect(self._ws)
+
+    async def _send_loop(self) -> None:
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue and not self._closed:
+                self._check_lag()
+                # One message per frame: clients parse every frame as a single JSON message.
+                item = self._queue.popleft()
+                self._queued_bytes -= len(item.text)
+                try:
+                    if self._ws.client_state != WebSocketState.CONNECTED:
+                        raise ConnectionError("WebSocket is not connected")
+                    await self._ws.send_text(item.text)
+                except Exception as e:
+                    logger.warning(f"websocket failed: {e.__class__.__name__} {e}")
+                    self._closed = True
+                    await self._on_disconnect(self._ws)
+                    return
+
+    def _check_lag(self) -> None:
+        lag_seconds = time.monotonic() - self._queue[0].queued_at
+        if lag_seconds >= LAG_WARNING_SECONDS and not self._lag_warned:
+            self._lag_warned = True
+            lag = self.lag
+            logger.warning(
+                f"WebSocket {lag.client} is {lag.lag_ms}ms behind "
+                f"({lag.queued_messages} messages, {lag.queued_bytes} bytes queued)"
+            )
+        elif lag_seconds < LAG_WARNING_SECONDS:
+            self._lag_warned = False
+
+
+def _parse_mergeable(item: _Outgoing) -> Event | None:
+    try:
+        msg = deserialize_wire_message(json.loads(item.text)["params"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    return msg if isinstance(msg, MergeableMixin) and is_event(msg) else None
@@ -0,0 +1,182 @@
+"""Routing of session websockets and requests between coordinated `kimi web` servers.
+
+Worker processes of `kimi web --workers` share one listening socket, so a connection to the
+public address may reach any of them. Every server therefore also serves the app on an
+address of its own, the peer listener, which is what other servers forward the websockets
+of sessions it owns to (see `kimi_cli.web.runner.coordination`), and requests that must be
+handled where the session runs, like deleting it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import socket
+
+import httpx
+import uvicorn
+from loguru import logger
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp
+from starlette.websockets import WebSocket, WebSocketDisconnect
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+FORWARDED_HEADER = "x-kimi-forwarded-by"
+"""Header with the ID of the server that forwarded a websocket."""
+PEER_CONNECT_TIMEOUT = 10.0
+PEER_REQUEST_TIMEOUT = 60.0
+"""Seconds to wait for the response to a forwarded request, e.g. while a session stops."""
+CLOSE_CODE_TRY_AGAIN = 1013
+
+# Headers that only apply to one connection, or that the HTTP client sets itself.
+_UNFORWARDED_HEADERS = frozenset(
+    {"connection", "content-length", "host", "keep-alive", "transfer-encoding", "upgrade"}
+)
+
+
+class PeerListener:
+    """Serves the app on an ephemeral port of `host` for other servers."""
+
+    def __init__(self, app: ASGIApp, host: str = "127.0.0.1") -> None:
+        self._app = app
+        self._host = host
+        self._server: uvicorn.Server | None = None
+        self._socket: socket.socket | None = None
+
+    async def start(self) -> str:
+        """Start listening, and return the URL to reach this server at."""
+        family = socket.AF_INET6 if ":" in self._host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self._host, 0))
+        # `log_config=None` keeps the logging of the main server as it is.
+        config = uvicorn.Config(
+            self._app,
+            lifespan="off",
+            log_config=None,
+            access_log=False,
+            timeout_graceful_shutdown=1,
+        )
+        config.load()
+        server = uvicorn.Server(config)
+        server.lifespan = config.lifespan_class(config)
+        await server.startup(sockets=[sock])
+        self._server = server
+        self._socket = sock
+        port = sock.getsockname()[1]
+        host = f"[{self._host}]" if family == socket.AF_INET6 else self._host
+        return f"http://{host}:{port}"
+
+    async def close(self) -> None:
+        if self._server is not None:
+            await self._server.shutdown(sockets=[self._socket] if self._socket else None)
+            self._server = None
+            self._socket = None
+
+
+async def _to_upstream(ws: WebSocket, upstream: ClientConnection) -> None:
+    while True:
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if (text := message.get("text")) is not None:
+            await upstream.send(text)
+        elif (data := message.get("bytes")) is not None:
+            await upstream.send(data)
+
+
+async def _from_upstream(ws: WebSocket, upstream: ClientConnection) -> None:
+    with contextlib.suppress(ConnectionClosed):
+        async for message in upstream:
+            if isinstance(message, str):
+                await ws.send_text(message)
+            else:
+                await ws.send_bytes(message)
+    await ws.close(code=upstream.close_code or 1000, reason=upstream.close_reason or "")
+
+
+async def forward_websocket(ws: WebSocket, url: str, *, server_id: str) -> None:
+    """Relay an accepted websocket to the same path on the server at `url`.
+
+    Args:
+        ws: The websocket to relay.
+        url: Base URL of the peer listener of the server to relay to.
+        server_id: ID of this server, so the other one does not forward it again.
+    """
+    target = "ws" + url.removeprefix("http") + ws.url.path
+    if ws.url.query:
+        target += f"?{ws.url.query}"
+    logger.debug(f"Forwarding websocket {ws.url.path} to {url}")
+    try:
+        upstream = await connect(
+            target,
+            additional_headers={FORWARDED_HEADER: server_id},
+            compression=None,
+            proxy=None,
+            open_timeout=PEER_CONNECT_TIMEOUT,
+            max_size=None,
+        )
+    except (OSError, TimeoutError, WebSocketException) as e:
+        logger.warning(f"Failed to forward websocket to {url}: {e}")
+        await ws.close(code=CLOSE_CODE_TRY_AGAIN, reason="Session owner is unreachable")
+        return
+
+    async with upstream:
+        tasks = [
+            asyncio.create_task(_to_upstream(ws, upstream)),
+            asyncio.create_task(_from_upstream(ws, upstream)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with contextlib.suppress(
+                    asyncio.CancelledError, ConnectionClosed, WebSocketDisconnect, RuntimeError
+                ):
+                    await task
+
+
+async def forward_request(request: Request, url: str, *, server_id: str) -> Response:
+    """Relay a request to the same path on the server at `url`, and return its response.
+
+    Args:
+        request: The request to relay.
+        url: Base URL of the peer listener of the server to relay to.
+        server_id: ID of this server, so the other one does not forward it again.
+    """
+    headers = {
+        name: value
+        for name, value in request.headers.items()
+        if name.lower() not in _UNFORWARDED_HEADERS
+    }
+    headers[FORWARDED_HEADER] = server_id
+    logger.debug(f"Forwarding {request.method} {request.url.path} to {url}")
+    try:
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(PEER_REQUEST_TIMEOUT, connect=PEER_CONNECT_TIMEOUT),
+            trust_env=False,
+        ) as client:
+            upstream = await client.request(
+                request.method,
+                url + request.url.path,
+                params=request.url.query,
+                headers=headers,
+                content=await request.body(),
+            )
+    except httpx.HTTPError as e:
+        logger.warning(f"Failed to forward request to {url}: {e}")
+        return JSONResponse(
+            status_code=503, content={"detail": "Session owner is unreachable, try again"}
+        )
+    response_headers = {
+        name: value
+        for name, value in upstream.headers.items()
+        if name.lower() not in _UNFORWARDED_HEADERS and name.lower() != "content-encoding"
+    }
+    return Response(
+        content=upstream.content, status_code=upstream.status_code, headers=response_headers
+    )
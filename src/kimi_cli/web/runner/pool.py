@@ -0,0 +1,143 @@
+"""Spawning of worker subprocesses, and a pool of idle workers to bind to sessions."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from loguru import logger
+
+from kimi_cli.utils.subprocess_env import get_clean_env
+
+WORKER_STREAM_LIMIT = 16 * 1024 * 1024
+"""Buffer size of worker stdout, large enough for big messages (e.g. base64-encoded images)."""
+
+POOLED_WORKER_ARG = "-"
+"""Worker argument telling it to wait for its session ID on stdin."""
+
+MAX_WORKER_POOL_SIZE = 8
+WORKER_POOL_IDLE_TIMEOUT = 600.0
+"""Seconds an idle worker may wait for a session before it is reaped."""
+_REAP_INTERVAL = 30.0
+
+
+async def spawn_worker(session_arg: str) -> asyncio.subprocess.Process:
+    """Start a worker subprocess for a session ID, or `POOLED_WORKER_ARG` for a pooled one."""
+    if getattr(sys, "frozen", False):
+        worker_cmd = [sys.executable, "__web-worker", session_arg]
+    else:
+        worker_cmd = [sys.executable, "-m", "kimi_cli.web.runner.worker", session_arg]
+
+    return await asyncio.create_subprocess_exec(
+        *worker_cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=WORKER_STREAM_LIMIT,
+        env=get_clean_env(),
+    )
+
+
+@dataclass(slots=True)
+class _IdleWorker:
+    process: asyncio.subprocess.Process
+    idle_since: float
+
+
+class WorkerPool:
+    """Keeps up to `size` workers started and fully imported, waiting to be bound to a session.
+
+    Taking a worker refills the pool in the background. Workers left idle for longer than
+    `idle_timeout` are reaped, and the pool is only refilled on the next `acquire`, so an
+    unused web UI does not keep idle processes around.
+    """
+
+    def __init__(self, size: int, *, idle_timeout: float = WORKER_POOL_IDLE_TIMEOUT) -> None:
+        self._size = max(0, min(size, MAX_WORKER_POOL_SIZE))
+        self._idle_timeout = idle_timeout
+        self._idle: deque[_IdleWorker] = deque()
+        self._refill_task: asyncio.Task[None] | None = None
+        self._reap_task: asyncio.Task[None] | None = None
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def start(self) -> None:
+        """Start filling the pool. Must be called from the event loop."""
+        if self._size == 0:
+            return
+        self._schedule_refill()
+        self._reap_task = asyncio.create_task(self._reap_loop())
+
+    async def acquire(self) -> asyncio.subprocess.Process | None:
+        """Take an idle worker, or return `None` if there is none ready."""
+        process: asyncio.subprocess.Process | None = None
+        while self._idle:
+            worker = self._idle.popleft()
+            if worker.process.returncode is None:
+                process = worker.process
+                break
+            logger.warning(f"Pooled worker exited with {worker.process.returncode} while idle")
+        self._schedule_refill()
+        return process
+
+    async def close(self) -> None:
+        """Stop refilling and terminate all idle workers."""
+        self._closed = True
+        for task in (self._refill_task, self._reap_task):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        idle = list(self._idle)
+        self._idle.clear()
+        await asyncio.gather(*(_terminate(worker.process) for worker in idle))
+
+    def _schedule_refill(self) -> None:
+        if self._closed or self._size == 0:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        while not self._closed and len(self._idle) < self._size:
+            try:
+                process = await spawn_worker(POOLED_WORKER_ARG)
+            except Exception as e:
+                logger.warning(f"Failed to start pooled worker: {e.__class__.__name__} {e}")
+                return
+            self._idle.append(_IdleWorker(process=process, idle_since=time.monotonic()))
+
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(_REAP_INTERVAL, self._idle_timeout))
+            now = time.monotonic()
+            expired = [w for w in self._idle if now - w.idle_since >= self._idle_timeout]
+            if not expired:
+                continue
+            for worker in expired:
+                self._idle.remove(worker)
+            logger.debug(f"Reaping {len(expired)} idle pooled worker(s)")
+            await asyncio.gather(*(_terminate(worker.process) for worker in expired))
+
+
+async def _terminate(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        # Closing stdin makes a pooled worker exit on its own.
+        if process.stdin is not None:
+            process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5.0)
+        except TimeoutError:
+            process.kill()
+            await process.wait()
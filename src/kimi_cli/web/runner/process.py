@@ -3,52 +3,74 @@
 from __future__ import annotations
 
 import asyncio
-import base64
 import contextlib
-import io
 import json
-import mimetypes
-import sys
 import time
-from collections.abc import AsyncGenerator
+from collections import Counter
+from collections.abc import Callable, Collection, Iterable
 from dataclasses import dataclass
 from datetime import UTC, datetime
-from pathlib import Path
 from uuid import UUID, uuid4
 
-from kosong.message import ContentPart, ImageURLPart, TextPart
+from kosong.message import ContentPart, TextPart
 from loguru import logger
-from PIL import Image
-from PIL.Image import Image as PILImage
-from pydantic import TypeAdapter
 from starlette.websockets import WebSocket, WebSocketState
 
-from kimi_cli.config import load_config
-from kimi_cli.llm import ModelCapability
-from kimi_cli.utils.subprocess_env import get_clean_env
+from kimi_cli.web.metrics import (
+    BROADCAST_MESSAGES,
+    IDLE_WORKERS,
+    LLM_OUTPUT_TOKENS_PER_SECOND,
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS,
+    LLM_TOKENS,
+    PROMPT_SECONDS,
+    PROMPTS,
+    PROMPTS_IN_FLIGHT,
+    SESSION_STATUS_CHANGES,
+    SESSION_WORKERS,
+    SESSIONS,
+    WEBSOCKET_MAX_LAG_SECONDS,
+    WEBSOCKET_QUEUED_BYTES,
+    WEBSOCKETS,
+    WORKER_FIRST_MESSAGE_SECONDS,
+    WORKER_OUTPUT_BYTES,
+    WORKER_START_SECONDS,
+    WORKER_STARTS,
+)
 from kimi_cli.web.models import (
+    SessionClientLag,
     SessionNoticeEvent,
     SessionNoticePayload,
     SessionState,
     SessionStatus,
 )
+from kimi_cli.web.runner.coordination import (
+    HEARTBEAT_INTERVAL,
+    PeerServer,
+    SessionCoordinator,
+    SharedSessionStatus,
+)
+from kimi_cli.web.runner.host import WorkerHostGroup, WorkerProcess
 from kimi_cli.web.runner.messages import new_session_status_message
+from kimi_cli.web.runner.outbox import (
+    DEFAULT_MAX_QUEUED_BYTES,
+    OverflowPolicy,
+    WebSocketOutbox,
+)
+from kimi_cli.web.runner.pool import WorkerPool, spawn_worker
+from kimi_cli.web.runner.uploads import UploadManifest, encode_uploads
 from kimi_cli.web.store.sessions import load_session_by_id
 from kimi_cli.wire.jsonrpc import (
     JSONRPCCancelMessage,
     JSONRPCErrorObject,
     JSONRPCErrorResponse,
-    JSONRPCEventMessage,
     JSONRPCInMessage,
-    JSONRPCInMessageAdapter,
-    JSONRPCOutMessage,
     JSONRPCPromptMessage,
-    JSONRPCRequestMessage,
     JSONRPCSuccessResponse,
+    decode_in_message,
+    peek_out_message,
 )
 from kimi_cli.wire.serde import deserialize_wire_message
-
-JSONRPCOutMessageAdapter = TypeAdapter[JSONRPCOutMessage](JSONRPCOutMessage)
+from kimi_cli.wire.types import StatusUpdate
 
 
 class SessionProcess:
@@ -68,17 +90,45 @@ class SessionProcess:
       - `is_busy`: there is at least one in-flight prompt id.
     - WebSocket fanout supports "join while running":
       - New clients replay `wire.jsonl` history first.
-      - Live messages during replay are buffered per-WS and flushed afterwards.
+      - Live messages during replay are queued per-WS and sent afterwards.
+    - Every WebSocket has an outbox with a bounded queue and a sender task of its own, so
+      a slow client neither delays the others nor blocks reading from the worker.
 
     Locks:
     - `_lock` guards worker lifecycle and busy state.
     - `_ws_lock` guards WebSocket state.
     """
 
-    def __init__(self, session_id: UUID) -> None:
-        """Initialize a session process."""
+    def __init__(
+        self,
+        session_id: UUID,
+        pool: WorkerPool | None = None,
+        hosts: WorkerHostGroup | None = None,
+        *,
+        max_queued_bytes: int = DEFAULT_MAX_QUEUED_BYTES,
+        overflow: OverflowPolicy = "coalesce",
+        on_status: Callable[[SessionProcess], None] | None = None,
+    ) -> None:
+        """Initialize a session process.
+
+        Args:
+            session_id: ID of the session.
+            pool: Pool of idle workers to take a worker from, if any.
+            hosts: Worker hosts to run the session on instead of a worker of its own.
+            max_queued_bytes: How much may be queued for a WebSocket before `overflow` applies.
+            overflow: What to do with a WebSocket that falls too far behind.
+            on_status: Called whenever the status of the session changes.
+        """
         self.session_id = session_id
-        self._in_flight_prompt_ids: set[str] = set()
+        self._pool = pool
+        self._hosts = hosts
+        self._worker_kind = "new"
+        self._started_at: float | None = None
+        self._first_event_ms: int | None = None
+        self._in_flight_prompt_ids: dict[str, float] = {}
+        """IDs of the prompts sent to the worker, with when they were sent."""
+        self._step_started_at: float | None = None
+        self._step_first_token_at: float | None = None
         self._status_seq = 0
         self._worker_id: str | None = None
         self._status = SessionStatus(
@@ -90,15 +140,16 @@ class SessionProcess:
             detail=None,
             updated_at=datetime.now(UTC),
         )
-        self._process: asyncio.subprocess.Process | None = None
-        self._websockets: set[WebSocket] = set()
-        self._websocket_count = 0
-        self._replay_buffers: dict[WebSocket, list[str]] = {}
+        self._process: WorkerProcess | None = None
+        self._outboxes: dict[WebSocket, WebSocketOutbox] = {}
+        self._max_queued_bytes = max_queued_bytes
+        self._overflow: OverflowPolicy = overflow
+        self._on_status = on_status
         self._read_task: asyncio.Task[None] | None = None
         self._expecting_exit = False
         self._lock = asyncio.Lock()
         self._ws_lock = asyncio.Lock()
-        self._sent_files: set[str] = set()
+        self._uploads: UploadManifest | None = None
 
     @property
     def is_alive(self) -> bool:
@@ -116,19 +167,34 @@ class SessionProcess:
         """Whether the session is currently processing a prompt."""
         return len(self._in_flight_prompt_ids) > 0
 
+    @property
+    def prompts_in_flight(self) -> int:
+        """Number of prompts sent to the worker and not yet answered."""
+        return len(self._in_flight_prompt_ids)
+
     @property
     def status(self) -> SessionStatus:
         """Current runtime status snapshot."""
         return self._status
 
+    @property
+    def first_event_ms(self) -> int | None:
+        """Milliseconds from starting the current worker to its first message, if any yet."""
+        return self._first_event_ms
+
     @property
     def websocket_count(self) -> int:
         """Get the number of connected WebSockets."""
-        return self._websocket_count
+        return len(self._outboxes)
+
+    @property
+    def client_lags(self) -> list[SessionClientLag]:
+        """How far behind each connected WebSocket is."""
+        return [outbox.lag for outbox in self._outboxes.values()]
 
     async def send_status_snapshot(self, ws: WebSocket) -> None:
         """Send the current status snapshot to a specific WebSocket."""
-        await ws.send_text(new_session_status_message(self._status).model_dump_json())
+        await self.send_to(ws, new_session_status_message(self._status).model_dump_json())
 
     def _build_status(
         self,
@@ -169,6 +235,9 @@ class SessionProcess:
         status = self._build_status(state, reason, detail)
         if status is None:
             return
+        SESSION_STATUS_CHANGES.inc(state)
+        if self._on_status is not None:
+            self._on_status(self)
         await self._broadcast(new_session_status_message(status).model_dump_json())
 
     async def start(
@@ -188,28 +257,13 @@ class SessionProcess:
             self._in_flight_prompt_ids.clear()
             self._expecting_exit = False
             self._worker_id = str(uuid4())
+            self._started_at = time.perf_counter()
+            self._first_event_ms = None
 
-            # 16MB buffer for large messages (e.g., base64-encoded images)
-            STREAM_LIMIT = 16 * 1024 * 1024
-
-            if getattr(sys, "frozen", False):
-                worker_cmd = [sys.executable, "__web-worker", str(self.session_id)]
-            else:
-                worker_cmd = [
-                    sys.executable,
-                    "-m",
-                    "kimi_cli.web.runner.worker",
-                    str(self.session_id),
-                ]
-
-            self._process = await asyncio.create_subprocess_exec(
-                *worker_cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                limit=STREAM_LIMIT,
-                env=get_clean_env(),
-            )
+            self._process = await self._start_process()
+            start_seconds = time.perf_counter() - self._started_at
+            WORKER_STARTS.inc(self._worker_kind)
+            WORKER_START_SECONDS.observe(start_seconds, self._worker_kind)
 
             self._read_task = asyncio.create_task(self._read_loop())
             if restart_started_at is not None:
@@ -220,6 +274,21 @@ class SessionProcess:
             else:
                 await self._emit_status("idle", reason=reason or "start", detail=None)
 
+    async def _start_process(self) -> WorkerProcess:
+        if self._hosts is not None:
+            self._worker_kind = "hosted"
+            return await self._hosts.open(self.session_id)
+
+        process = await self._pool.acquire() if self._pool is not None else None
+        if process is None:
+            self._worker_kind = "new"
+            return await spawn_worker(str(self.session_id))
+        self._worker_kind = "pooled"
+        assert process.stdin is not None
+        process.stdin.write(f"{self.session_id}\n".encode())
+        await process.stdin.drain()
+        return process
+
     async def stop(self) -> None:
         """Stop the session: terminate worker and close all WebSockets."""
         await self.stop_worker(reason="stop")
@@ -250,6 +319,8 @@ class SessionProcess:
                     await self._read_task
                 self._read_task = None
 
+            if self._in_flight_prompt_ids:
+                PROMPTS.inc("stopped", amount=len(self._in_flight_prompt_ids))
             self._in_flight_prompt_ids.clear()
             self._worker_id = None
             self._expecting_exit = False
@@ -315,6 +386,8 @@ class SessionProcess:
                             f"Process exited with {self._process.returncode}: "
                             f"{stderr.decode('utf-8')}"
                         )
+                        if self._in_flight_prompt_ids:
+                            PROMPTS.inc("worker_exit", amount=len(self._in_flight_prompt_ids))
                         self._in_flight_prompt_ids.clear()
                         await self._emit_status(
                             "error",
@@ -325,183 +398,104 @@ class SessionProcess:
                     else:
                         continue
 
-                await self._broadcast(line.decode("utf-8").rstrip("\n"))
-
-                # Handle out message
+                WORKER_OUTPUT_BYTES.inc(amount=len(line))
+                if self._first_event_ms is None and self._started_at is not None:
+                    first_event_seconds = time.perf_counter() - self._started_at
+                    self._first_event_ms = int(first_event_seconds * 1000)
+                    WORKER_FIRST_MESSAGE_SECONDS.observe(first_event_seconds, self._worker_kind)
+                    logger.info(
+                        f"Session {self.session_id}: first worker message after "
+                        f"{self._first_event_ms}ms ({self._worker_kind} worker)"
+                    )
+
+                # Only the envelope is looked at: the runner reacts to nothing but responses
+                # to prompts, and the rest of each line goes to the clients as it is.
                 try:
-                    msg = json.loads(line)
-                    match msg.get("method"):
-                        case "event":
-                            msg["params"] = deserialize_wire_message(msg["params"])
-                            await self._handle_out_message(JSONRPCEventMessage.model_validate(msg))
-                        case "request":
-                            msg["params"] = deserialize_wire_message(msg["params"])
-                            await self._handle_out_message(
-                                JSONRPCRequestMessage.model_validate(msg)
-                            )
-                        case _:
-                            if msg.get("error"):
-                                await self._handle_out_message(
-                                    JSONRPCErrorResponse.model_validate(msg)
-                                )
-                            else:
-                                await self._handle_out_message(
-                                    JSONRPCSuccessResponse.model_validate(msg)
-                                )
-                except json.JSONDecodeError:
+                    envelope = peek_out_message(line)
+                except ValueError:
                     logger.error(f"Invalid JSONRPC out message: {line}")
+                    envelope = None
+                if envelope is not None and envelope.method == "event":
+                    self._record_event(envelope.type, line)
+
+                await self._broadcast(
+                    line.decode("utf-8").rstrip("\n"),
+                    is_event=envelope is not None and envelope.method == "event",
+                )
+                if envelope is not None and envelope.method is None and envelope.id is not None:
+                    await self._handle_response(envelope.id, is_error=envelope.is_error)
 
         except asyncio.CancelledError:
             raise
         except Exception as e:
             logger.warning(f"Unexpected error in read loop: {e.__class__.__name__} {e}")
 
-    async def _handle_out_message(self, message: JSONRPCOutMessage) -> None:
-        """Handle outbound message from worker."""
-        match message:
-            case JSONRPCSuccessResponse():
-                was_busy = self.is_busy
-                if message.id in self._in_flight_prompt_ids:
-                    self._in_flight_prompt_ids.remove(message.id)
-                if was_busy and not self.is_busy:
-                    await self._emit_status("idle", reason="prompt_complete")
-            case JSONRPCErrorResponse():
-                was_busy = self.is_busy
-                if message.id in self._in_flight_prompt_ids:
-                    self._in_flight_prompt_ids.remove(message.id)
-                if was_busy and not self.is_busy:
-                    await self._emit_status("idle", reason="prompt_error")
+    def _record_event(self, msg_type: str | None, line: bytes) -> None:
+        """Record LLM latency and token metrics of a Wire event."""
+        match msg_type:
+            case "StepBegin":
+                self._step_started_at = time.perf_counter()
+                self._step_first_token_at = None
+            case "ContentPart" | "ToolCall" | "ToolCallPart":
+                if self._step_started_at is not None and self._step_first_token_at is None:
+                    self._step_first_token_at = time.perf_counter()
+                    LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(
+                        self._step_first_token_at - self._step_started_at
+                    )
+            case "StatusUpdate":
+                # Status updates are small, so decoding them in full is cheap.
+                try:
+                    msg = deserialize_wire_message(json.loads(line)["params"])
+                except (ValueError, KeyError, TypeError):
+                    return
+                if not isinstance(msg, StatusUpdate) or msg.token_usage is None:
+                    return
+                usage = msg.token_usage
+                LLM_TOKENS.inc("input_other", amount=usage.input_other)
+                LLM_TOKENS.inc("output", amount=usage.output)
+                LLM_TOKENS.inc("input_cache_read", amount=usage.input_cache_read)
+                LLM_TOKENS.inc("input_cache_creation", amount=usage.input_cache_creation)
+                if self._step_first_token_at is not None and usage.output:
+                    streaming_seconds = time.perf_counter() - self._step_first_token_at
+                    if streaming_seconds > 0:
+                        LLM_OUTPUT_TOKENS_PER_SECOND.observe(usage.output / streaming_seconds)
+                self._step_started_at = self._step_first_token_at = None
             case _:
-                return
-
-    async def _encode_uploaded_files(self) -> AsyncGenerator[ContentPart]:
-        """Encode uploaded files for sending to the model."""
-        session = load_session_by_id(self.session_id)
-        assert session is not None
+                pass
 
-        uploads_dir = session.kimi_cli_session.dir / "uploads"
-        if not uploads_dir.exists():
+    async def _handle_response(self, msg_id: str, *, is_error: bool) -> None:
+        """Handle a response from the worker, which may complete a prompt."""
+        sent_at = self._in_flight_prompt_ids.pop(msg_id, None)
+        if sent_at is None:
             return
+        PROMPTS.inc("error" if is_error else "complete")
+        PROMPT_SECONDS.observe(time.perf_counter() - sent_at)
+        if not self.is_busy:
+            await self._emit_status(
+                "idle", reason="prompt_error" if is_error else "prompt_complete"
+            )
 
-        # Load .sent marker left by fork to avoid re-sending inherited files.
-        # The marker is kept (not deleted) so it survives process restarts.
-        sent_marker = uploads_dir / ".sent"
-        if sent_marker.exists():
-            try:
-                already_sent = json.loads(sent_marker.read_text(encoding="utf-8"))
-                self._sent_files.update(already_sent)
-            except Exception:
-                pass
-
-        all_files = sorted(
-            (f for f in uploads_dir.iterdir() if f.name != ".sent"),
-            key=lambda x: x.name,
-        )
-        files = [f for f in all_files if f.name not in self._sent_files]
+    async def _encode_uploaded_files(self) -> list[ContentPart]:
+        """Encode the files uploaded since the last prompt for sending to the model."""
+        if self._uploads is None:
+            session = await asyncio.to_thread(load_session_by_id, self.session_id)
+            assert session is not None
+            self._uploads = UploadManifest(session.kimi_cli_session.dir / "uploads")
+        uploads = self._uploads
 
-        if not files:
-            return
+        def encode() -> list[ContentPart]:
+            files = uploads.pending()
+            parts = encode_uploads(files)
+            uploads.mark_sent(files)
+            return parts
 
-        # Build file list with paths and mime types
-        file_infos: list[tuple[Path, str]] = []
-        for file in files:
-            mime_type, _ = mimetypes.guess_type(file.name)
-            file_infos.append((file, mime_type or "application/octet-stream"))
-
-        # Output file list summary
-        file_list_lines = ["<uploaded_files>"]
-        for idx, (file, _) in enumerate(file_infos, start=1):
-            file_list_lines.append(f"{idx}. {file}")
-        file_list_lines.append("</uploaded_files>")
-        yield TextPart(text="\n".join(file_list_lines) + "\n\n")
-
-        # Text file extensions
-        text_extensions = {
-            ".txt",
-            ".md",
-            ".json",
-            ".yaml",
-            ".yml",
-            ".xml",
-            ".html",
-            ".css",
-            ".js",
-            ".ts",
-            ".py",
-            ".sh",
-            ".csv",
-            ".log",
-            ".rst",
-            ".toml",
-            ".ini",
-        }
-
-        # Check model capabilities
-        config = load_config()
-        capabilities: set[ModelCapability] = set()
-        if config.default_model:
-            capabilities = config.models[config.default_model].capabilities or set()
-        is_vision = "image_in" in capabilities
-        is_video_in = "video_in" in capabilities
-
-        # Process each file
-        for file, mime_type in file_infos:
-            file_path = str(file)
-            ext = file.suffix.lower()
-
-            if is_vision and mime_type.startswith("image/"):
-                try:
-                    content = file.read_bytes()
-                    with Image.open(io.BytesIO(content)) as img:
-                        pil_img: PILImage = img
-                        width, height = pil_img.size
-                        max_side = max(width, height)
-                        if max_side > 4096:
-                            scale = 4096 / max_side
-                            new_size = (int(width * scale), int(height * scale))
-                            pil_img = pil_img.resize(  # pyright: ignore[reportUnknownMemberType]
-                                new_size
-                            )
-                        buffer = io.BytesIO()
-                        pil_img.save(buffer, format="PNG")
-                        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
-                        tag = f'<image path="{file_path}" content_type="{mime_type}">'
-                        yield TextPart(text=tag)
-                        yield ImageURLPart(
-                            image_url=ImageURLPart.ImageURL(url=f"data:image/png;base64,{encoded}")
-                        )
-                        yield TextPart(text="</image>\n\n")
-                except Exception:
-                    # Skip files that fail to encode - don't block the upload
-                    pass
-            elif is_video_in and mime_type.startswith("video/"):
-                # For video files, emit a <video> tag for frontend display but don't embed content.
-                # The agent will use ReadMediaFile tool to read it, which handles video uploads
-                # properly.
-                yield TextPart(text=f'<video path="{file_path}" content_type="{mime_type}">')
-                yield TextPart(text="</video>\n\n")
-            elif ext in text_extensions or mime_type.startswith("text/"):
-                try:
-                    content = file.read_bytes()
-                    text_content = content.decode("utf-8", errors="replace")
-                    yield TextPart(text=f'<document path="{file_path}" content_type="{mime_type}">')
-                    yield TextPart(text=text_content)
-                    yield TextPart(text="</document>\n\n")
-                except Exception:
-                    # Skip files that fail to decode - don't block the upload
-                    pass
-
-        # Mark files as sent
-        for file in files:
-            self._sent_files.add(file.name)
+        return await asyncio.to_thread(encode)
 
     async def _handle_in_message(self, message: JSONRPCInMessage) -> str | None:
         """Handle inbound message to worker, encoding uploaded files."""
         match message:
             case JSONRPCPromptMessage():
-                user_input: list[ContentPart] = []
-                async for part in self._encode_uploaded_files():
-                    user_input.append(part)
+                user_input = await self._encode_uploaded_files()
                 # Special marker for file-only uploads
                 if isinstance(message.params.user_input, str):
                     if message.params.user_input != "KIMI_FILE_UPLOAD_WITHOUT_MESSAGE":
@@ -523,90 +517,53 @@ class SessionProcess:
                 return None
         return None
 
-    async def _broadcast(self, message: str) -> None:
-        """Broadcast a message to all connected WebSockets."""
-        disconnected: set[WebSocket] = set()
-
+    async def _broadcast(self, message: str, *, is_event: bool = False) -> None:
+        """Queue a message for all connected WebSockets; `is_event` marks Wire events."""
         async with self._ws_lock:
-            websockets = list(self._websockets)
-            to_send: list[WebSocket] = []
-            for ws in websockets:
-                buffer = self._replay_buffers.get(ws)
-                if buffer is not None:
-                    buffer.append(message)
-                else:
-                    to_send.append(ws)
-
-        for ws in to_send:
-            try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_text(message)
-                else:
-                    disconnected.add(ws)
-            except Exception as e:
-                logger.warning(f"websocket failed: {e.__class__.__name__} {e}")
-                disconnected.add(ws)
-
-        if disconnected:
-            async with self._ws_lock:
-                self._websockets -= disconnected
-                self._websocket_count = len(self._websockets)
-                for ws in disconnected:
-                    self._replay_buffers.pop(ws, None)
-            logger.debug(
-                f"Broadcast: removed {len(disconnected)} disconnected ws, "
-                f"remaining={self._websocket_count}"
-            )
+            outboxes = list(self._outboxes.values())
+        BROADCAST_MESSAGES.inc("event" if is_event else "other")
+        for outbox in outboxes:
+            outbox.put(message, is_event=is_event)
 
     async def add_websocket_and_begin_replay(self, ws: WebSocket) -> None:
-        """Atomically attach a WebSocket and enter replay mode for it."""
+        """Atomically attach a WebSocket and enter replay mode for it.
+
+        Live messages are queued for it until `end_replay`.
+        """
         async with self._ws_lock:
-            if ws not in self._websockets:
-                self._websockets.add(ws)
-                self._websocket_count = len(self._websockets)
-            self._replay_buffers.setdefault(ws, [])
-        logger.debug(f"WebSocket added (replay mode), count={self._websocket_count}")
+            if ws not in self._outboxes:
+                self._outboxes[ws] = WebSocketOutbox(
+                    ws,
+                    max_queued_bytes=self._max_queued_bytes,
+                    overflow=self._overflow,
+                    on_disconnect=self.remove_websocket,
+                )
+        logger.debug(f"WebSocket added (replay mode), count={self.websocket_count}")
 
     async def end_replay(self, ws: WebSocket) -> None:
-        """Flush buffered live messages for a websocket after history replay."""
-        while True:
-            async with self._ws_lock:
-                buffer = self._replay_buffers.get(ws)
-                if buffer is None:
-                    return
-                if not buffer:
-                    self._replay_buffers.pop(ws, None)
-                    return
-                chunk = buffer.copy()
-                buffer.clear()
+        """Start sending live messages, including those queued during history replay."""
+        async with self._ws_lock:
+            outbox = self._outboxes.get(ws)
+        if outbox is not None:
+            outbox.release()
 
-            if ws.client_state != WebSocketState.CONNECTED:
-                logger.warning("end_replay: ws not connected, cleaning up replay buffer")
-                async with self._ws_lock:
-                    self._replay_buffers.pop(ws, None)
-                return
-            for message in chunk:
-                try:
-                    await ws.send_text(message)
-                except Exception as e:
-                    # Send failed — pop the replay buffer so _broadcast()
-                    # sends directly (or detects disconnect) on the next call.
-                    # Do NOT remove ws from _websockets here; let _broadcast()
-                    # or session_stream's finally block handle cleanup.
-                    logger.warning(f"end_replay: send_text failed during buffer flush: {e}")
-                    async with self._ws_lock:
-                        self._replay_buffers.pop(ws, None)
-                    return
+    async def send_to(self, ws: WebSocket, message: str) -> None:
+        """Send a message to one WebSocket, in order with the live messages sent to it."""
+        async with self._ws_lock:
+            outbox = self._outboxes.get(ws)
+        if outbox is not None:
+            outbox.put(message)
+        else:
+            await ws.send_text(message)
 
     async def _close_all_websockets(self) -> None:
         """Close all connected WebSockets."""
         async with self._ws_lock:
-            websockets = list(self._websockets)
-            self._websockets.clear()
-            self._websocket_count = 0
-            self._replay_buffers.clear()
+            outboxes = self._outboxes
+            self._outboxes = {}
 
-        for ws in websockets:
+        for ws, outbox in outboxes.items():
+            await outbox.close()
             try:
                 if ws.client_state == WebSocketState.CONNECTED:
                     await ws.close(code=1001, reason="Session process exited")
@@ -617,14 +574,17 @@ class SessionProcess:
     async def remove_websocket(self, ws: WebSocket) -> None:
         """Remove a WebSocket connection from this session."""
         async with self._ws_lock:
-            if ws in self._websockets:
-                self._websockets.discard(ws)
-                self._websocket_count = len(self._websockets)
-                logger.debug(f"WebSocket removed, count={self._websocket_count}")
-            self._replay_buffers.pop(ws, None)
-
-    async def send_message(self, message: str) -> None:
-        """Send a message to the subprocess stdin."""
+            outbox = self._outboxes.pop(ws, None)
+        if outbox is not None:
+            await outbox.close()
+            logger.debug(f"WebSocket removed, count={self.websocket_count}")
+
+    async def send_message(self, message: str, in_message: JSONRPCInMessage | None = None) -> None:
+        """
+        Send a message to the subprocess stdin.
+
+        `in_message` is the already decoded form of `message`, if the caller has it.
+        """
         await self.start()
         process = self._process
         assert process is not None
@@ -632,10 +592,11 @@ class SessionProcess:
 
         # Handle in message
         try:
-            in_message = JSONRPCInMessageAdapter.validate_json(message)
+            if in_message is None:
+                in_message = decode_in_message(message)
             if isinstance(in_message, JSONRPCPromptMessage):
                 was_busy = self.is_busy
-                self._in_flight_prompt_ids.add(in_message.id)
+                self._in_flight_prompt_ids[in_message.id] = time.perf_counter()
                 if not was_busy:
                     await self._emit_status("busy", reason="prompt")
             elif isinstance(in_message, JSONRPCCancelMessage) and not self.is_busy:
@@ -659,17 +620,59 @@ class SessionProcess:
 class KimiCLIRunner:
     """Manages multiple session processes."""
 
-    def __init__(self) -> None:
-        """Initialize the runner."""
+    def __init__(
+        self,
+        *,
+        worker_pool_size: int = 0,
+        sessions_per_worker: int = 1,
+        coordinator: SessionCoordinator | None = None,
+    ) -> None:
+        """Initialize the runner.
+
+        Args:
+            worker_pool_size: Number of idle workers to keep ready for new sessions.
+            sessions_per_worker: Number of sessions a worker process may host. With more
+                than one, sessions run on shared worker hosts and the pool is not used.
+            coordinator: Coordination with other servers serving the same sessions, if any.
+                Sessions are then only run here once claimed with `claim_session`.
+        """
         self._sessions: dict[UUID, SessionProcess] = {}
         self._lock = asyncio.Lock()
+        self._hosts = WorkerHostGroup(sessions_per_worker) if sessions_per_worker > 1 else None
+        self._pool = (
+            WorkerPool(worker_pool_size) if worker_pool_size > 0 and self._hosts is None else None
+        )
+        self._coordinator = coordinator
+        self._coordination_tasks: list[asyncio.Task[None]] = []
+        self._status_updates: dict[UUID, SharedSessionStatus] = {}
+        self._status_updated = asyncio.Event()
+
+    @property
+    def server_id(self) -> str | None:
+        """ID of this server among coordinated servers, if coordinated."""
+        return self._coordinator.server_id if self._coordinator is not None else None
+
+    async def servers(self) -> list[PeerServer]:
+        """The coordinated servers, this one included; empty if not coordinated."""
+        return await self._coordinator.servers() if self._coordinator is not None else []
 
     def start(self) -> None:
-        """Start the runner (no-op, sessions started on demand)."""
-        pass
+        """Start the runner (sessions are started on demand)."""
+        if self._pool is not None:
+            self._pool.start()
+        if self._coordinator is not None:
+            self._coordination_tasks = [
+                asyncio.create_task(self._heartbeat_loop()),
+                asyncio.create_task(self._publish_status_loop()),
+            ]
 
     async def stop(self) -> None:
         """Stop all running sessions."""
+        for task in self._coordination_tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._coordination_tasks = []
         tasks: list[asyncio.Task[None]] = []
         for session in self._sessions.values():
             if session.is_running:
@@ -680,18 +683,124 @@ class KimiCLIRunner:
                 t.cancel()
                 with contextlib.suppress(asyncio.CancelledError):
                     await t
+        if self._pool is not None:
+            await self._pool.close()
+        if self._hosts is not None:
+            await self._hosts.close()
+
+    async def claim_session(self, session_id: UUID) -> PeerServer | None:
+        """Claim a session for this server.
+
+        Returns:
+            The server owning the session instead, if another coordinated server does.
+        """
+        if self._coordinator is None or session_id in self._sessions:
+            return None
+        return await self._coordinator.claim(session_id)
 
     async def get_or_create_session(self, session_id: UUID) -> SessionProcess:
         """Get or create a session process."""
         async with self._lock:
             if session_id not in self._sessions:
-                self._sessions[session_id] = SessionProcess(session_id)
+                self._sessions[session_id] = SessionProcess(
+                    session_id,
+                    pool=self._pool,
+                    hosts=self._hosts,
+                    on_status=self._on_status if self._coordinator is not None else None,
+                )
             return self._sessions[session_id]
 
     def get_session(self, session_id: UUID) -> SessionProcess | None:
         """Get a session process if it exists."""
         return self._sessions.get(session_id)
 
+    async def remove_session(self, session_id: UUID) -> None:
+        """Stop a session and release it, e.g. before deleting it.
+
+        When coordinated, the session must be owned by this server (see `claim_session`),
+        as a session running on another server is only stopped there.
+        """
+        async with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            await session.stop()
+        if self._coordinator is not None:
+            await self._coordinator.release([session_id])
+
+    async def get_statuses(self, session_ids: Iterable[UUID]) -> dict[UUID, SharedSessionStatus]:
+        """Runtime status of sessions, whether they run on this server or another one."""
+        statuses: dict[UUID, SharedSessionStatus] = {}
+        elsewhere: list[UUID] = []
+        for session_id in session_ids:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                statuses[session_id] = SharedSessionStatus(
+                    status=session.status, is_running=session.is_running
+                )
+            else:
+                elsewhere.append(session_id)
+        if self._coordinator is not None and elsewhere:
+            statuses.update(await self._coordinator.get_statuses(elsewhere))
+        return statuses
+
+    async def is_busy(self, session_id: UUID) -> bool:
+        """Whether a session is processing a prompt, on this server or another one."""
+        status = (await self.get_statuses([session_id])).get(session_id)
+        return status is not None and status.status.state == "busy"
+
+    def update_metrics(self) -> None:
+        """Set the gauges of `kimi_cli.web.metrics` to the current state of the runner."""
+        sessions = list(self._sessions.values())
+        SESSION_WORKERS.set(sum(session.is_alive for session in sessions))
+        IDLE_WORKERS.set(self._pool.idle_count if self._pool is not None else 0)
+        SESSIONS.clear()
+        states = Counter(session.status.state for session in sessions)
+        for state, count in states.items():
+            SESSIONS.set(count, state)
+        PROMPTS_IN_FLIGHT.set(sum(session.prompts_in_flight for session in sessions))
+        WEBSOCKETS.set(sum(session.websocket_count for session in sessions))
+        lags = [lag for session in sessions for lag in session.client_lags]
+        WEBSOCKET_QUEUED_BYTES.set(sum(lag.queued_bytes for lag in lags))
+        WEBSOCKET_MAX_LAG_SECONDS.set(max((lag.lag_ms for lag in lags), default=0) / 1000)
+
+    def _on_status(self, session: SessionProcess) -> None:
+        self._status_updates[session.session_id] = SharedSessionStatus(
+            status=session.status, is_running=session.is_running
+        )
+        self._status_updated.set()
+
+    async def _publish_status_loop(self) -> None:
+        """Publish status changes in the order they happen, batching those in between."""
+        assert self._coordinator is not None
+        while True:
+            await self._status_updated.wait()
+            self._status_updated.clear()
+            updates, self._status_updates = self._status_updates, {}
+            try:
+                await self._coordinator.publish_statuses(updates)
+            except Exception as e:
+                logger.warning(f"Failed to publish session statuses: {e}")
+
+    async def _heartbeat_loop(self) -> None:
+        assert self._coordinator is not None
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                lost = await self._coordinator.heartbeat(list(self._sessions))
+            except Exception as e:
+                logger.warning(f"Failed to send heartbeat: {e}")
+                continue
+            await self._drop_sessions(lost)
+
+    async def _drop_sessions(self, session_ids: Collection[UUID]) -> None:
+        """Stop sessions claimed by other servers, so their clients reconnect to the owner."""
+        for session_id in session_ids:
+            async with self._lock:
+                session = self._sessions.pop(session_id, None)
+            if session is not None:
+                logger.warning(f"Session {session_id} is owned by another server, stopping it")
+                await session.stop()
+
     async def detach_websocket(self, ws: WebSocket, session_id: UUID) -> None:
         """Detach a WebSocket from a session."""
         async with self._lock:
@@ -0,0 +1,215 @@
+"""Encoding of files uploaded to a web session into the next prompt.
+
+Everything here does blocking file I/O or image processing and runs in a worker thread, see
+`SessionProcess._encode_uploaded_files`.
+"""
+
+from __future__ import annotations
+
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import mimetypes
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from kosong.message import ContentPart, ImageURLPart, TextPart
+from PIL import Image
+from PIL.Image import Image as PILImage
+
+from kimi_cli.config import get_config_file, load_config
+from kimi_cli.llm import ModelCapability
+
+SENT_MARKER = ".sent"
+"""Names of uploads that are already in the history, written when a session is forked."""
+MAX_IMAGE_SIDE = 4096
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+"""Total size of encoded images kept across sessions."""
+
+TEXT_EXTENSIONS = {
+    ".txt",
+    ".md",
+    ".json",
+    ".yaml",
+    ".yml",
+    ".xml",
+    ".html",
+    ".css",
+    ".js",
+    ".ts",
+    ".py",
+    ".sh",
+    ".csv",
+    ".log",
+    ".rst",
+    ".toml",
+    ".ini",
+}
+
+
+class UploadManifest:
+    """The uploads of a session, and which of them were already sent to the model."""
+
+    def __init__(self, uploads_dir: Path) -> None:
+        self.uploads_dir = uploads_dir
+        self._sent: set[str] = set()
+        self._marker_loaded = False
+
+    def pending(self) -> list[Path]:
+        """Uploads not sent yet, by name."""
+        if not self.uploads_dir.is_dir():
+            return []
+        if not self._marker_loaded:
+            # The marker is kept (not deleted) so it survives process restarts.
+            self._marker_loaded = True
+            with contextlib.suppress(OSError, ValueError, TypeError):
+                self._sent.update(
+                    json.loads((self.uploads_dir / SENT_MARKER).read_text(encoding="utf-8"))
+                )
+        return sorted(
+            (
+                path
+                for path in self.uploads_dir.iterdir()
+                if path.name != SENT_MARKER and path.name not in self._sent
+            ),
+            key=lambda path: path.name,
+        )
+
+    def mark_sent(self, files: list[Path]) -> None:
+        self._sent.update(file.name for file in files)
+
+
+class _ImageCache:
+    """LRU cache of encoded images by content hash, so re-uploads are not encoded again."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            url = self._entries.get(key)
+            if url is not None:
+                self._entries.move_to_end(key)
+            return url
+
+    def put(self, key: str, url: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = url
+            self._size += len(url)
+            while self._size > self._max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_image_cache = _ImageCache(IMAGE_CACHE_MAX_BYTES)
+_capabilities_cache: tuple[tuple[Path, int], set[ModelCapability]] | None = None
+_capabilities_lock = threading.Lock()
+
+
+def model_capabilities() -> set[ModelCapability]:
+    """Capabilities of the default model, loaded again only when the config file changes."""
+    global _capabilities_cache
+
+    config_file = get_config_file()
+    try:
+        key = (config_file, config_file.stat().st_mtime_ns)
+    except OSError:
+        key = (config_file, 0)
+    with _capabilities_lock:
+        if _capabilities_cache is not None and _capabilities_cache[0] == key:
+            return _capabilities_cache[1]
+        config = load_config()
+        capabilities: set[ModelCapability] = set()
+        if config.default_model:
+            capabilities = set(config.models[config.default_model].capabilities or set())
+        _capabilities_cache = (key, capabilities)
+        return capabilities
+
+
+def encode_image(content: bytes) -> str:
+    """Encode an image as a PNG data URL, downscaled to at most `MAX_IMAGE_SIDE` pixels."""
+    key = hashlib.sha256(content).hexdigest()
+    if (url := _image_cache.get(key)) is not None:
+        return url
+    with Image.open(io.BytesIO(content)) as img:
+        pil_img: PILImage = img
+        width, height = pil_img.size
+        max_side = max(width, height)
+        if max_side > MAX_IMAGE_SIDE:
+            scale = MAX_IMAGE_SIDE / max_side
+            new_size = (int(width * scale), int(height * scale))
+            pil_img = pil_img.resize(new_size)  # pyright: ignore[reportUnknownMemberType]
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="PNG")
+    url = f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+    _image_cache.put(key, url)
+    return url
+
+
+def encode_uploads(files: list[Path]) -> list[ContentPart]:
+    """Encode uploaded files as content parts of a prompt."""
+    if not files:
+        return []
+
+    # Build file list with paths and mime types
+    file_infos: list[tuple[Path, str]] = []
+    for file in files:
+        mime_type, _ = mimetypes.guess_type(file.name)
+        file_infos.append((file, mime_type or "application/octet-stream"))
+
+    # Output file list summary
+    file_list_lines = ["<uploaded_files>"]
+    for idx, (file, _) in enumerate(file_infos, start=1):
+        file_list_lines.append(f"{idx}. {file}")
+    file_list_lines.append("</uploaded_files>")
+    parts: list[ContentPart] = [TextPart(text="\n".join(file_list_lines) + "\n\n")]
+
+    # Check model capabilities
+    capabilities = model_capabilities()
+    is_vision = "image_in" in capabilities
+    is_video_in = "video_in" in capabilities
+
+    # Process each file
+    for file, mime_type in file_infos:
+        file_path = str(file)
+        ext = file.suffix.lower()
+
+        if is_vision and mime_type.startswith("image/"):
+            try:
+                url = encode_image(file.read_bytes())
+            except Exception:
+                # Skip files that fail to encode - don't block the upload
+                continue
+            parts += [
+                TextPart(text=f'<image path="{file_path}" content_type="{mime_type}">'),
+                ImageURLPart(image_url=ImageURLPart.ImageURL(url=url)),
+                TextPart(text="</image>\n\n"),
+            ]
+        elif is_video_in and mime_type.startswith("video/"):
+            # For video files, emit a <video> tag for frontend display but don't embed content.
+            # The agent will use ReadMediaFile tool to read it, which handles video uploads
+            # properly.
+            parts += [
+                TextPart(text=f'<video path="{file_path}" content_type="{mime_type}">'),
+                TextPart(text="</video>\n\n"),
+            ]
+        elif ext in TEXT_EXTENSIONS or mime_type.startswith("text/"):
+            try:
+                text_content = file.read_bytes().decode("utf-8", errors="replace")
+            except Exception:
+                # Skip files that fail to decode - don't block the upload
+                continue
+            parts += [
+                TextPart(text=f'<document path="{file_path}" content_type="{mime_type}">'),
+                TextPart(text=text_content),
+                TextPart(text="</document>\n\n"),
+            ]
+    return parts
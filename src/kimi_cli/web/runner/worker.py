@@ -5,26 +5,45 @@ It reads the session configuration from disk and runs KimiCLI.run_wire_stdio().
 
 Usage:
     python -m kimi_cli.web.runner.worker <session_id>
+    python -m kimi_cli.web.runner.worker -
+    python -m kimi_cli.web.runner.worker +
+
+With `-`, the worker is started ahead of time for the runner's pool: it imports what it
+needs, then waits for a line with the session ID on stdin before creating the session.
+
+With `+`, the worker hosts several sessions at once, multiplexed over stdio as described
+in `kimi_cli.web.runner.host`.
 """
 
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import importlib
 import json
+import os
 import sys
 from typing import Any
 from uuid import UUID
 
+import acp  # type: ignore[reportMissingTypeStubs]
+from kaos import set_current_kaos
 from loguru import logger
 
 from kimi_cli.app import KimiCLI, enable_logging
 from kimi_cli.cli.mcp import get_global_mcp_config_file
 from kimi_cli.exception import MCPConfigError
+from kimi_cli.web.runner.host import FrameWriter, read_frame, write_frame
+from kimi_cli.web.runner.kaos import WorkDirKaos
 from kimi_cli.web.store.sessions import load_session_by_id
+from kimi_cli.wire.server import STDIO_BUFFER_LIMIT, WireWriter
 
 
-async def run_worker(session_id: UUID) -> None:
-    """Run the KimiCLI worker for a session."""
+async def run_worker(
+    session_id: UUID,
+    streams: tuple[asyncio.StreamReader, WireWriter] | None = None,
+) -> None:
+    """Run the KimiCLI worker for a session, on stdio or on the given streams."""
     # Find session by ID using the web store
     joint_session = load_session_by_id(session_id)
     if joint_session is None:
@@ -32,6 +51,9 @@ async def run_worker(session_id: UUID) -> None:
 
     # Get the kimi-cli session object
     session = joint_session.kimi_cli_session
+    if streams is not None:
+        # Sessions sharing a host process cannot share its working directory.
+        set_current_kaos(WorkDirKaos(session.work_dir))
 
     # Load default MCP config file if it exists
     default_mcp_file = get_global_mcp_config_file()
@@ -58,7 +80,98 @@ async def run_worker(session_id: UUID) -> None:
         kimi_cli = await KimiCLI.create(session, mcp_configs=None)
 
     # Run in wire stdio mode
-    await kimi_cli.run_wire_stdio()
+    if streams is None:
+        await kimi_cli.run_wire_stdio()
+    else:
+        await kimi_cli.run_wire(*streams)
+
+
+def _prewarm() -> None:
+    """Import the modules that creating a session and serving the wire would import lazily."""
+    from kimi_cli.agentspec import DEFAULT_AGENT_FILE, load_agent_spec
+
+    for module_name in ("kimi_cli.wire.server", "kosong.chat_provider.kimi"):
+        importlib.import_module(module_name)
+    try:
+        agent_spec = load_agent_spec(DEFAULT_AGENT_FILE)
+    except Exception:
+        return
+    for tool in agent_spec.tools:
+        with contextlib.suppress(Exception):
+            importlib.import_module(tool.partition(":")[0])
+
+
+def _read_session_id() -> UUID | None:
+    """Read the session ID line from stdin, or return `None` if stdin is closed first."""
+    # Read unbuffered, byte by byte, so nothing after the line is taken away from the
+    # wire server reading stdin next.
+    line = bytearray()
+    while True:
+        byte = os.read(0, 1)
+        if not byte:
+            return None
+        if byte == b"\n":
+            break
+        line += byte
+    return UUID(line.decode("ascii").strip())
+
+
+async def run_pooled_worker() -> None:
+    """Run a pooled worker: warm up, then wait to be bound to a session."""
+    _prewarm()
+    session_id = await asyncio.to_thread(_read_session_id)
+    if session_id is None:
+        logger.debug("Pooled worker reaped before being bound to a session")
+        return
+    await run_worker(session_id)
+
+
+async def run_host() -> None:
+    """Run a worker hosting several sessions until its stdin is closed."""
+    _prewarm()
+    reader, writer = await acp.stdio_streams(limit=STDIO_BUFFER_LIMIT)
+    channels: dict[str, tuple[asyncio.StreamReader, asyncio.Task[None]]] = {}
+
+    async def serve(channel: str, session_id: str, channel_reader: asyncio.StreamReader) -> None:
+        returncode, stderr = 0, ""
+        try:
+            await run_worker(UUID(session_id), (channel_reader, FrameWriter(channel, writer)))
+        except asyncio.CancelledError:
+            logger.debug("Hosted session {id} closed", id=session_id)
+        except Exception as e:
+            logger.exception("Hosted session {id} failed:", id=session_id)
+            returncode, stderr = 1, f"{e.__class__.__name__}: {e}"
+        finally:
+            channels.pop(channel, None)
+        # Only sent once the session has fully stopped, so it can be reopened right away.
+        body = json.dumps({"returncode": returncode, "stderr": stderr}).encode("utf-8")
+        write_frame(writer, channel, "exit", body)
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+
+    try:
+        while (frame := await read_frame(reader)) is not None:
+            channel, kind, body = frame
+            match kind:
+                case "open":
+                    channel_reader = asyncio.StreamReader(limit=STDIO_BUFFER_LIMIT)
+                    task = asyncio.create_task(serve(channel, body.decode("ascii"), channel_reader))
+                    channels[channel] = (channel_reader, task)
+                case "data":
+                    if (entry := channels.get(channel)) is not None:
+                        entry[0].feed_data(body)
+                case "close":
+                    if (entry := channels.get(channel)) is not None:
+                        entry[1].cancel()
+                case _:
+                    logger.warning("Unknown frame kind from runner: {kind}", kind=kind)
+    except (ValueError, asyncio.IncompleteReadError) as e:
+        logger.error("Invalid frame from runner: {error}", error=e)
+    finally:
+        tasks = [task for _, task in channels.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 def main() -> None:
@@ -68,9 +181,18 @@ def main() -> None:
     set_process_title("kimi-code-worker")
 
     if len(sys.argv) < 2:
-        print("Usage: python -m kimi_cli.web.runner.worker <session_id>", file=sys.stderr)
+        print("Usage: python -m kimi_cli.web.runner.worker <session_id>|-|+", file=sys.stderr)
         sys.exit(1)
 
+    if sys.argv[1] == "-":
+        enable_logging(debug=False)
+        asyncio.run(run_pooled_worker())
+        return
+    if sys.argv[1] == "+":
+        enable_logging(debug=False)
+        asyncio.run(run_host())
+        return
+
     try:
         session_id = UUID(sys.argv[1])
     except ValueError:
@@ -0,0 +1,375 @@
+"""Persistent SQLite index of the sessions of all work directories.
+
+The index lives in the share directory and is only a cache of what is on disk: rows are
+updated when the web API changes a session, and reconciled against the modification times
+of `context.jsonl` and `metadata.json` otherwise. Deleting the index file is always safe.
+
+Next to the sessions, an FTS5 table holds the text of their transcripts, see
+`kimi_cli.web.store.transcripts`. SQLite builds without FTS5 or its trigram tokenizer
+(SQLite < 3.34) keep the session index but cannot search transcripts.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from collections.abc import Generator, Iterable
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from kimi_cli.share import get_share_dir
+
+SESSION_INDEX_FILENAME = "sessions.db"
+_SCHEMA_VERSION = 2
+_BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE sessions (
+    session_id TEXT PRIMARY KEY,
+    work_dir TEXT NOT NULL,
+    kaos TEXT NOT NULL,
+    session_dir TEXT NOT NULL,
+    context_file TEXT NOT NULL,
+    context_mtime REAL NOT NULL,
+    metadata_mtime REAL,
+    metadata TEXT,
+    title TEXT NOT NULL,
+    archived INTEGER NOT NULL,
+    auto_archive_exempt INTEGER NOT NULL,
+    search_key TEXT NOT NULL
+);
+CREATE INDEX sessions_by_update ON sessions (archived, context_mtime DESC, session_id DESC);
+"""
+
+_TRANSCRIPT_SCHEMA = """
+CREATE TABLE transcript_state (
+    session_id TEXT PRIMARY KEY,
+    transcript_rowid INTEGER,
+    wire_offset INTEGER NOT NULL,
+    context_mtime REAL NOT NULL
+);
+CREATE VIRTUAL TABLE transcripts USING fts5(
+    session_id UNINDEXED, prompts, replies, tools, tokenize = 'trigram case_sensitive 0'
+);
+"""
+_TABLES = ("sessions", "transcript_state", "transcripts")
+
+_COLUMNS = (
+    "session_id, work_dir, kaos, session_dir, context_file, context_mtime, metadata_mtime, "
+    "metadata, title, archived, auto_archive_exempt"
+)
+
+_initialized: dict[Path, bool] = {}
+"""Initialized index files, and whether transcripts can be searched in them."""
+_init_lock = threading.Lock()
+
+
+@dataclass(slots=True, frozen=True)
+class IndexedSession:
+    """A row of the session index."""
+
+    session_id: str
+    work_dir: str
+    kaos: str
+    session_dir: str
+    context_file: str
+    context_mtime: float
+    """Modification time of the context file, used as the last update time of the session."""
+    metadata_mtime: float | None
+    """Modification time of `metadata.json`, or `None` if the session has none."""
+    metadata: str | None
+    """The `SessionMetadata` of the session as JSON."""
+    title: str
+    archived: bool
+    auto_archive_exempt: bool
+
+    @property
+    def stamp(self) -> tuple[str, float, float | None]:
+        """What the row is reconciled against."""
+        return self.context_file, self.context_mtime, self.metadata_mtime
+
+
+@dataclass(slots=True, frozen=True)
+class TranscriptUpdate:
+    """Transcript text read from the wire file of a session, see `add_transcripts`."""
+
+    session_id: str
+    prompts: str
+    replies: str
+    tools: str
+    wire_offset: int
+    """How much of the wire file is indexed with this text."""
+    context_mtime: float
+    """The modification time of the context file the text was read at."""
+    reset: bool = False
+    """Whether to drop what was indexed for the session before."""
+
+
+def get_session_index_file() -> Path:
+    return get_share_dir() / SESSION_INDEX_FILENAME
+
+
+def _init_db(path: Path) -> bool:
+    with closing(sqlite3.connect(path, timeout=_BUSY_TIMEOUT_MS / 1000)) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            with conn:
+                for table in _TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.executescript(_SCHEMA)
+                try:
+                    conn.executescript(_TRANSCRIPT_SCHEMA)
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Transcript search is unavailable: {e}")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.execute("PRAGMA journal_mode = WAL")
+        return (
+            conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transcripts'").fetchone()
+            is not None
+        )
+
+
+@contextmanager
+def _connect() -> Generator[sqlite3.Connection]:
+    path = get_session_index_file()
+    with _init_lock:
+        if path not in _initialized or not path.exists():
+            try:
+                _initialized[path] = _init_db(path)
+            except sqlite3.DatabaseError as e:
+                logger.warning(f"Session index {path} is unusable, rebuilding it: {e}")
+                for suffix in ("", "-wal", "-shm"):
+                    path.with_name(path.name + suffix).unlink(missing_ok=True)
+                _initialized[path] = _init_db(path)
+    conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT_MS / 1000)
+    # Losing the last transactions on power loss is fine for a cache.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _search_key(title: str, work_dir: str) -> str:
+    # Case-folded in Python, since SQLite's `lower()` only folds ASCII.
+    return f"{title.lower()}\0{work_dir.lower()}"
+
+
+def _row(values: tuple[Any, ...]) -> IndexedSession:
+    (
+        session_id,
+        work_dir,
+        kaos,
+        session_dir,
+        context_file,
+        context_mtime,
+        metadata_mtime,
+        metadata,
+        title,
+        archived,
+        auto_archive_exempt,
+    ) = values
+    return IndexedSession(
+        session_id=str(session_id),
+        work_dir=str(work_dir),
+        kaos=str(kaos),
+        session_dir=str(session_dir),
+        context_file=str(context_file),
+        context_mtime=float(context_mtime),
+        metadata_mtime=None if metadata_mtime is None else float(metadata_mtime),
+        metadata=None if metadata is None else str(metadata),
+        title=str(title),
+        archived=bool(archived),
+        auto_archive_exempt=bool(auto_archive_exempt),
+    )
+
+
+def upsert_sessions(rows: Iterable[IndexedSession]) -> None:
+    """Insert or replace rows of the index."""
+    with _connect() as conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO sessions ({_COLUMNS}, search_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    row.session_id,
+                    row.work_dir,
+                    row.kaos,
+                    row.session_dir,
+                    row.context_file,
+                    row.context_mtime,
+                    row.metadata_mtime,
+                    row.metadata,
+                    row.title,
+                    int(row.archived),
+                    int(row.auto_archive_exempt),
+                    _search_key(row.title, row.work_dir),
+                )
+                for row in rows
+            ],
+        )
+
+
+def delete_sessions(session_ids: Iterable[str]) -> None:
+    """Remove sessions, and their transcripts, from the index."""
+    params = [(sid,) for sid in session_ids]
+    with _connect() as conn:
+        conn.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+        if _initialized[get_session_index_file()]:
+            conn.executemany(
+                "DELETE FROM transcripts WHERE rowid = "
+                "(SELECT transcript_rowid FROM transcript_state WHERE session_id = ?)",
+                params,
+            )
+            conn.executemany("DELETE FROM transcript_state WHERE session_id = ?", params)
+
+
+def get_session(session_id: str) -> IndexedSession | None:
+    with _connect() as conn:
+        values = conn.execute(
+            f"SELECT {_COLUMNS} FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    return _row(values) if values is not None else None
+
+
+def get_stamps() -> dict[str, tuple[str, float, float | None]]:
+    """The `IndexedSession.stamp` of every indexed session, by session ID."""
+    with _connect() as conn:
+        return {
+            session_id: (context_file, context_mtime, metadata_mtime)
+            for session_id, context_file, context_mtime, metadata_mtime in conn.execute(
+                "SELECT session_id, context_file, context_mtime, metadata_mtime FROM sessions"
+            )
+        }
+
+
+def query_sessions(
+    *,
+    archived: bool | None = None,
+    query: str | None = None,
+    title: str | None = None,
+    updated_before: float | None = None,
+    auto_archive_exempt: bool | None = None,
+    session_ids: list[str] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> list[IndexedSession]:
+    """Query the index, most recently updated sessions first.
+
+    Args:
+        archived: Only return sessions with this archived status.
+        query: Only return sessions whose title or work dir contains this, ignoring case.
+        title: Only return sessions with exactly this title.
+        updated_before: Only return sessions last updated before this timestamp.
+        auto_archive_exempt: Only return sessions with this auto-archive exemption.
+        session_ids: Only return sessions with these IDs.
+        limit: Maximum number of sessions to return.
+        offset: Number of sessions to skip.
+    """
+    clauses: list[str] = []
+    params: list[object] = []
+    if archived is not None:
+        clauses.append("archived = ?")
+        params.append(int(archived))
+    if query:
+        clauses.append("instr(search_key, ?) > 0")
+        params.append(query.lower())
+    if title is not None:
+        clauses.append("title = ?")
+        params.append(title)
+    if updated_before is not None:
+        clauses.append("context_mtime <= ?")
+        params.append(updated_before)
+    if auto_archive_exempt is not None:
+        clauses.append("auto_archive_exempt = ?")
+        params.append(int(auto_archive_exempt))
+    if session_ids is not None:
+        clauses.append(f"session_id IN ({', '.join('?' * len(session_ids))})")
+        params.extend(session_ids)
+    sql = f"SELECT {_COLUMNS} FROM sessions"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY context_mtime DESC, session_id DESC"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params.extend((limit, offset))
+    with _connect() as conn:
+        return [_row(values) for values in conn.execute(sql, params)]
+
+
+def transcripts_available() -> bool:
+    """Whether transcripts can be indexed and searched with this SQLite."""
+    with _connect():
+        return _initialized[get_session_index_file()]
+
+
+def get_stale_transcripts() -> list[tuple[str, str, int, float]]:
+    """Sessions whose context file changed since their transcript was indexed.
+
+    Returns:
+        The session ID, session dir, how much of the wire file is indexed and the
+        modification time of the context file for each session.
+    """
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT s.session_id, s.session_dir, coalesce(t.wire_offset, 0), s.context_mtime "
+            "FROM sessions s LEFT JOIN transcript_state t USING (session_id) "
+            "WHERE t.context_mtime IS NULL OR t.context_mtime != s.context_mtime"
+        ).fetchall()
+
+
+def add_transcripts(updates: Iterable[TranscriptUpdate]) -> None:
+    """Append transcript text of sessions to the index, in a single transaction."""
+    with _connect() as conn:
+        for update in updates:
+            state = conn.execute(
+                "SELECT transcript_rowid FROM transcript_state WHERE session_id = ?",
+                (update.session_id,),
+            ).fetchone()
+            rowid: int | None = state[0] if state is not None else None
+            if rowid is not None and update.reset:
+                conn.execute("DELETE FROM transcripts WHERE rowid = ?", (rowid,))
+                rowid = None
+            text = (update.prompts, update.replies, update.tools)
+            if any(text):
+                if rowid is None:
+                    rowid = conn.execute(
+                        "INSERT INTO transcripts (session_id, prompts, replies, tools) "
+                        "VALUES (?, ?, ?, ?)",
+                        (update.session_id, *text),
+                    ).lastrowid
+                else:
+                    conn.execute(
+                        "UPDATE transcripts SET prompts = prompts || char(10) || ?, "
+                        "replies = replies || char(10) || ?, tools = tools || ' ' || ? "
+                        "WHERE rowid = ?",
+                        (*text, rowid),
+                    )
+            conn.execute(
+                "INSERT OR REPLACE INTO transcript_state VALUES (?, ?, ?, ?)",
+                (update.session_id, rowid, update.wire_offset, update.context_mtime),
+            )
+
+
+def search_transcripts(
+    match: str, *, archived: bool, limit: int, offset: int, snippet_tokens: int = 48
+) -> list[tuple[str, float, str]]:
+    """Rank sessions by how well their transcripts match an FTS5 query.
+
+    Returns:
+        The session ID, the BM25 score (lower is better) and a snippet of the best matching
+        part of the transcript of each session, best matches first.
+    """
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT session_id, rank, snippet(transcripts, -1, '', '', '…', ?) "
+            "FROM transcripts WHERE transcripts MATCH ? AND session_id IN "
+            "(SELECT session_id FROM sessions WHERE archived = ?) "
+            "ORDER BY rank LIMIT ? OFFSET ?",
+            (snippet_tokens, match, int(archived), limit, offset),
+        ).fetchall()
@@ -1,23 +1,25 @@
-"""Session storage with simple in-memory caching for web UI.
+"""Session storage for the web UI, backed by a persistent SQLite index.
 
 ## Design Philosophy
 
-This module uses a simple cache-aside pattern with TTL fallback:
+Listing sessions used to mean globbing every session directory of every work dir and
+loading its metadata. Sessions are now read from an on-disk index (see
+`kimi_cli.web.store.index`):
 
-1. **Cache on read**: First read populates cache, subsequent reads hit cache
-2. **Invalidate on write**: API mutations call invalidate_sessions_cache()
-3. **TTL fallback**: Cache expires after CACHE_TTL seconds as safety net
+1. **Incremental updates**: API mutations call `invalidate_sessions_cache(session_id)`,
+   and `save_session_metadata()` updates the row of the session it writes
+2. **Reconcile by mtime**: At most every CACHE_TTL seconds, the index is reconciled with the
+   disk. Only sessions whose `context.jsonl` or `metadata.json` changed are loaded again,
+   so sessions changed by the CLI or by other processes show up too
+3. **Indexed queries**: Listing, lookup by ID, archive filtering and pagination are queries
 
-## Applicable Scope
-
-This design works well when:
-- Single worker process (e.g., `uvicorn app:app` without -w flag)
-- All mutations go through the same API
-- Occasional staleness (up to CACHE_TTL) from external changes is acceptable
+The index is only a cache: deleting it is always safe.
 """
 
 from __future__ import annotations
 
+import contextlib
+import dataclasses
 import time
 from dataclasses import dataclass
 from datetime import UTC, datetime
@@ -28,11 +30,14 @@ from pydantic import BaseModel, ConfigDict, Field
 
 from kimi_cli.metadata import WorkDirMeta, load_metadata
 from kimi_cli.session import Session as KimiCLISession
-from kimi_cli.web.models import Session
+from kimi_cli.web.models import Session, SessionSearchResult
+from kimi_cli.web.store import index
+from kimi_cli.web.store.index import IndexedSession
+from kimi_cli.web.store.transcripts import build_match_query, catch_up_transcripts
 from kimi_cli.wire.file import WireFile
 
 # Cache configuration
-CACHE_TTL = 5.0  # seconds - balance between freshness and performance
+CACHE_TTL = 5.0  # seconds - how often the index is reconciled with the disk
 SESSION_METADATA_FILENAME = "metadata.json"
 
 # Auto-archive configuration
@@ -40,21 +45,23 @@ AUTO_ARCHIVE_DAYS = 15  # Sessions older than this will be auto-archived
 
 _sessions_cache: list[JointSession] | None = None
 _cache_timestamp: float = 0.0
-_sessions_index_cache: list[SessionIndexEntry] | None = None
-_index_cache_timestamp: float = 0.0
+_index_reconciled_at: float = 0.0
 
 
-def invalidate_sessions_cache() -> None:
+def invalidate_sessions_cache(session_id: UUID | str | None = None) -> None:
     """Clear the sessions cache.
 
-    Call this after any mutation (create/update/delete).
+    Call this after any mutation (create/update/delete). With a session ID, only that
+    session is indexed again; otherwise the next read reconciles the whole index.
     This ensures the next read sees fresh data.
     """
-    global _sessions_cache, _cache_timestamp, _sessions_index_cache, _index_cache_timestamp
+    global _sessions_cache, _cache_timestamp, _index_reconciled_at
     _sessions_cache = None
     _cache_timestamp = 0.0
-    _sessions_index_cache = None
-    _index_cache_timestamp = 0.0
+    if session_id is None:
+        _index_reconciled_at = 0.0
+    else:
+        _reindex_session(UUID(str(session_id)))
 
 
 class JointSession(Session):
@@ -119,7 +126,22 @@ def save_session_metadata(session_dir: Path, metadata: SessionMetadata) -> None:
             encoding="utf-8",
         )
     except Exception:
-        pass
+        return
+
+    row = index.get_session(metadata.session_id)
+    if row is not None and row.session_dir == str(session_dir):
+        index.upsert_sessions(
+            [
+                dataclasses.replace(
+                    row,
+                    metadata_mtime=_mtime(metadata_file),
+                    metadata=metadata.model_dump_json(),
+                    title=metadata.title or "Untitled",
+                    archived=metadata.archived,
+                    auto_archive_exempt=metadata.auto_archive_exempt,
+                )
+            ]
+        )
 
 
 def _derive_title_from_wire(session_dir: Path) -> str:
@@ -269,15 +291,116 @@ def _should_auto_archive(last_updated: datetime, session_metadata: SessionMetada
     return age_days >= AUTO_ARCHIVE_DAYS
 
 
-def _build_sessions_index() -> list[SessionIndexEntry]:
-    """Build the sessions index from disk.
+def _mtime(path: Path) -> float | None:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _stamp(context_file: Path, session_dir: Path) -> tuple[str, float | None, float | None]:
+    """What `IndexedSession.stamp` of a session is on disk."""
+    return (
+        str(context_file),
+        _mtime(context_file),
+        _mtime(session_dir / SESSION_METADATA_FILENAME),
+    )
+
+
+def _load_entry(
+    wd: WorkDirMeta, session_dir: Path, context_file: Path, session_id: UUID
+) -> SessionIndexEntry | None:
+    context_mtime = _mtime(context_file)
+    if context_mtime is None:
+        return None
+    session_metadata = load_session_metadata(session_dir, str(session_id))
+    return SessionIndexEntry(
+        session_id=session_id,
+        session_dir=session_dir,
+        context_file=context_file,
+        work_dir=wd.path,
+        work_dir_meta=wd,
+        last_updated=datetime.fromtimestamp(context_mtime, tz=UTC),
+        title=session_metadata.title if session_metadata.title else "Untitled",
+        metadata=session_metadata,
+    )
+
+
+def _find_entry(work_dirs: list[WorkDirMeta], session_id: UUID) -> SessionIndexEntry | None:
+    """Look for a session in every work dir, without the index."""
+    session_id_str = str(session_id)
+    for wd in work_dirs:
+        session_dir = wd.sessions_dir / session_id_str
+        entry = _load_entry(wd, session_dir, session_dir / "context.jsonl", session_id)
+        if entry is None:
+            # Legacy sessions: context.jsonl stored directly in sessions_dir
+            legacy_context = wd.sessions_dir / f"{session_id_str}.jsonl"
+            entry = _load_entry(wd, session_dir, legacy_context, session_id)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _to_row(entry: SessionIndexEntry) -> IndexedSession:
+    metadata = entry.metadata or SessionMetadata(session_id=str(entry.session_id))
+    return IndexedSession(
+        session_id=str(entry.session_id),
+        work_dir=entry.work_dir,
+        kaos=entry.work_dir_meta.kaos,
+        session_dir=str(entry.session_dir),
+        context_file=str(entry.context_file),
+        # The exact mtime rather than `last_updated`, which is only precise to microseconds
+        context_mtime=_mtime(entry.context_file) or entry.last_updated.timestamp(),
+        metadata_mtime=_mtime(entry.session_dir / SESSION_METADATA_FILENAME),
+        metadata=metadata.model_dump_json(),
+        title=entry.title,
+        archived=metadata.archived,
+        auto_archive_exempt=metadata.auto_archive_exempt,
+    )
 
-    Note: This function only reads data and does NOT perform auto-archive writes.
+
+def _to_entries(rows: list[IndexedSession]) -> list[SessionIndexEntry]:
+    work_dirs = {(wd.path, wd.kaos): wd for wd in load_metadata().work_dirs}
+    entries: list[SessionIndexEntry] = []
+    for row in rows:
+        wd = work_dirs.get((row.work_dir, row.kaos))
+        if wd is None:
+            wd = WorkDirMeta(path=row.work_dir, kaos=row.kaos)
+        session_metadata: SessionMetadata | None = None
+        if row.metadata is not None:
+            with contextlib.suppress(ValueError):
+                session_metadata = SessionMetadata.model_validate_json(row.metadata)
+        entries.append(
+            SessionIndexEntry(
+                session_id=UUID(row.session_id),
+                session_dir=Path(row.session_dir),
+                context_file=Path(row.context_file),
+                work_dir=row.work_dir,
+                work_dir_meta=wd,
+                last_updated=datetime.fromtimestamp(row.context_mtime, tz=UTC),
+                title=row.title,
+                metadata=session_metadata,
+            )
+        )
+    return entries
+
+
+def _reconcile_index() -> None:
+    """Bring the index up to date with the disk.
+
+    Every session directory is still listed, but only sessions whose context file or
+    metadata changed since they were indexed are loaded again.
+
+    Note: This function only reads session data and does NOT perform auto-archive writes.
     Auto-archive is handled separately by run_auto_archive() to avoid disk writes
     during read operations.
     """
+    global _index_reconciled_at
+
     metadata = load_metadata()
-    entries: list[SessionIndexEntry] = []
+    stamps = index.get_stamps()
+    seen: set[str] = set()
+    changed: list[IndexedSession] = []
 
     for wd in metadata.work_dirs:
         for session_dir, context_file in _iter_session_dirs(wd):
@@ -286,28 +409,49 @@ def _build_sessions_index() -> list[SessionIndexEntry]:
             except (ValueError, AttributeError, TypeError):
                 continue
 
-            if not context_file.exists():
+            context_mtime = _mtime(context_file)
+            if context_mtime is None:
+                continue
+            session_id_str = str(session_id)
+            seen.add(session_id_str)
+            metadata_mtime = _mtime(session_dir / SESSION_METADATA_FILENAME)
+            if stamps.get(session_id_str) == (str(context_file), context_mtime, metadata_mtime):
                 continue
 
-            last_updated = datetime.fromtimestamp(context_file.stat().st_mtime, tz=UTC)
-            session_metadata = load_session_metadata(session_dir, str(session_id))
-            title = session_metadata.title if session_metadata.title else "Untitled"
-
-            entries.append(
-                SessionIndexEntry(
-                    session_id=session_id,
-                    session_dir=session_dir,
-                    context_file=context_file,
-                    work_dir=wd.path,
-                    work_dir_meta=wd,
-                    last_updated=last_updated,
-                    title=title,
-                    metadata=session_metadata,
-                )
-            )
+            entry = _load_entry(wd, session_dir, context_file, session_id)
+            if entry is not None:
+                changed.append(_to_row(entry))
+
+    if changed:
+        index.upsert_sessions(changed)
+    if gone := stamps.keys() - seen:
+        index.delete_sessions(gone)
+    _index_reconciled_at = time.time()
 
-    entries.sort(key=lambda x: (x.last_updated, str(x.session_id)), reverse=True)
-    return entries
+
+def _reconcile_index_if_stale() -> None:
+    if time.time() - _index_reconciled_at >= CACHE_TTL:
+        _reconcile_index()
+
+
+def _reindex_session(session_id: UUID) -> SessionIndexEntry | None:
+    """Index a single session again, returning it if it still exists."""
+    work_dirs = load_metadata().work_dirs
+    entry: SessionIndexEntry | None = None
+    row = index.get_session(str(session_id))
+    if row is not None:
+        for wd in work_dirs:
+            if (wd.path, wd.kaos) == (row.work_dir, row.kaos):
+                entry = _load_entry(wd, Path(row.session_dir), Path(row.context_file), session_id)
+                break
+    if entry is None:
+        entry = _find_entry(work_dirs, session_id)
+
+    if entry is not None:
+        index.upsert_sessions([_to_row(entry)])
+    elif row is not None:
+        index.delete_sessions([row.session_id])
+    return entry
 
 
 # Track when auto-archive was last run to avoid running too frequently
@@ -324,7 +468,7 @@ def run_auto_archive() -> int:
     Returns:
         Number of sessions that were auto-archived.
     """
-    global _last_auto_archive_time
+    global _last_auto_archive_time, _sessions_cache
 
     now = time.time()
     if now - _last_auto_archive_time < AUTO_ARCHIVE_INTERVAL:
@@ -333,10 +477,15 @@ def run_auto_archive() -> int:
     _last_auto_archive_time = now
     archived_count = 0
 
-    # Load fresh index (bypass cache to get current state)
-    entries = _build_sessions_index()
+    # Reconcile first (bypass the TTL to get current state)
+    _reconcile_index()
+    candidates = index.query_sessions(
+        archived=False,
+        auto_archive_exempt=False,
+        updated_before=now - AUTO_ARCHIVE_DAYS * 24 * 60 * 60,
+    )
 
-    for entry in entries:
+    for entry in _to_entries(candidates):
         if entry.metadata is None:
             continue
 
@@ -347,34 +496,22 @@ def run_auto_archive() -> int:
                     "archived_at": time.time(),
                 }
             )
+            # Also updates the index
             save_session_metadata(entry.session_dir, updated_metadata)
             archived_count += 1
 
-    # Invalidate cache if we archived anything
     if archived_count > 0:
-        invalidate_sessions_cache()
+        _sessions_cache = None
 
     return archived_count
 
 
-def _load_sessions_index_cached() -> list[SessionIndexEntry]:
-    global _sessions_index_cache, _index_cache_timestamp
-
-    now = time.time()
-    if _sessions_index_cache is not None and (now - _index_cache_timestamp) < CACHE_TTL:
-        return _sessions_index_cache
-
-    _sessions_index_cache = _build_sessions_index()
-    _index_cache_timestamp = now
-    return _sessions_index_cache
-
-
 def load_all_sessions() -> list[JointSession]:
     """Load all sessions from all work directories."""
-    entries = _load_sessions_index_cached()
+    _reconcile_index_if_stale()
     sessions: list[JointSession] = []
 
-    for entry in entries:
+    for entry in _to_entries(index.query_sessions()):
         _ensure_title(entry, refresh=False)
         sessions.append(_build_joint_session(entry))
 
@@ -402,6 +539,23 @@ def load_all_sessions_cached() -> list[JointSession]:
     return _sessions_cache
 
 
+def _wire_changed(entry: SessionIndexEntry) -> bool:
+    """Whether the wire file changed since the title of the session was last derived."""
+    return entry.metadata is None or entry.metadata.wire_mtime != _mtime(
+        entry.session_dir / "wire.jsonl"
+    )
+
+
+def _derive_missing_titles(*, archived: bool) -> None:
+    """Derive titles from wire files for untitled sessions, so that queries can match them.
+
+    A wire file is only read again when it changed since its title was last derived.
+    """
+    for entry in _to_entries(index.query_sessions(archived=archived, title="Untitled")):
+        if _wire_changed(entry):
+            _ensure_title(entry, refresh=True)
+
+
 def load_sessions_page(
     *,
     limit: int = 100,
@@ -420,35 +574,26 @@ def load_sessions_page(
             - True: Only return archived sessions.
             - False: Only return non-archived sessions.
     """
-    entries = list(_load_sessions_index_cached())
+    _reconcile_index_if_stale()
 
-    # Filter by archived status
-    if archived is None or archived is False:
-        # Default: only non-archived sessions
-        entries = [e for e in entries if not (e.metadata and e.metadata.archived)]
-    else:
-        # Only archived sessions
-        entries = [e for e in entries if e.metadata and e.metadata.archived]
+    # Default: only non-archived sessions
+    only_archived = archived is True
 
-    if query:
-        query_text = query.strip().lower()
-        if query_text:
-            for entry in entries:
-                _ensure_title(entry, refresh=True)
-            entries = [
-                entry
-                for entry in entries
-                if query_text in entry.title.lower() or query_text in (entry.work_dir or "").lower()
-            ]
+    query_text = query.strip() if query else ""
+    if query_text:
+        _derive_missing_titles(archived=only_archived)
 
     if offset < 0:
         offset = 0
     if limit <= 0:
         limit = 100
 
-    page_entries = entries[offset : offset + limit]
+    rows = index.query_sessions(
+        archived=only_archived, query=query_text or None, limit=limit, offset=offset
+    )
+    page_entries = _to_entries(rows)
 
-    if not query:
+    if not query_text:
         for entry in page_entries:
             if entry.metadata is None or not entry.title or entry.title == "Untitled":
                 _ensure_title(entry, refresh=True)
@@ -456,57 +601,72 @@ def load_sessions_page(
     return [_build_joint_session(entry) for entry in page_entries]
 
 
-def load_session_by_id(id: UUID) -> JointSession | None:
-    """Load a session by ID.
+def index_transcripts() -> None:
+    """Index the transcripts of sessions that changed since they were last indexed.
 
-    This function first checks the cache/disk scan, then falls back to
-    directly constructing the session from metadata if not found (handles
-    newly created sessions with empty context files).
+    Run periodically in the background by the web server, so searches do not wait for it.
     """
-    global_metadata = load_metadata()
-    session_id_str = str(id)
+    if not index.transcripts_available():
+        return
+    _reconcile_index_if_stale()
+    catch_up_transcripts()
 
-    for wd in global_metadata.work_dirs:
-        session_dir = wd.sessions_dir / session_id_str
-        context_file = session_dir / "context.jsonl"
-
-        if context_file.exists():
-            last_updated = datetime.fromtimestamp(context_file.stat().st_mtime, tz=UTC)
-            session_metadata = load_session_metadata(session_dir, session_id_str)
-            title = session_metadata.title if session_metadata.title else "Untitled"
-            entry = SessionIndexEntry(
-                session_id=id,
-                session_dir=session_dir,
-                context_file=context_file,
-                work_dir=wd.path,
-                work_dir_meta=wd,
-                last_updated=last_updated,
-                title=title,
-                metadata=session_metadata,
-            )
-            _ensure_title(entry, refresh=True)
-            return _build_joint_session(entry)
-
-        # Legacy sessions: context.jsonl stored directly in sessions_dir
-        legacy_context = wd.sessions_dir / f"{session_id_str}.jsonl"
-        if legacy_context.exists():
-            last_updated = datetime.fromtimestamp(legacy_context.stat().st_mtime, tz=UTC)
-            session_metadata = load_session_metadata(session_dir, session_id_str)
-            title = session_metadata.title if session_metadata.title else "Untitled"
-            entry = SessionIndexEntry(
-                session_id=id,
-                session_dir=session_dir,
-                context_file=legacy_context,
-                work_dir=wd.path,
-                work_dir_meta=wd,
-                last_updated=last_updated,
-                title=title,
-                metadata=session_metadata,
-            )
-            _ensure_title(entry, refresh=True)
-            return _build_joint_session(entry)
 
-    return None
+def search_sessions(
+    query: str,
+    *,
+    limit: int = 20,
+    offset: int = 0,
+    archived: bool | None = None,
+) -> list[SessionSearchResult]:
+    """Search the transcripts of sessions, best matches first.
+
+    Prompts, assistant replies and tool names are searched for every term of the query,
+    as a case-insensitive substring. Terms shorter than three characters are ignored.
+    Only what `index_transcripts()` has indexed so far is searched.
+
+    Args:
+        query: Search query.
+        limit: Maximum number of sessions to return.
+        offset: Number of sessions to skip.
+        archived: Search archived sessions instead of non-archived ones if True.
+    """
+    match = build_match_query(query)
+    if match is None or not index.transcripts_available():
+        return []
+
+    ranked = index.search_transcripts(
+        match, archived=archived is True, limit=max(limit, 1), offset=max(offset, 0)
+    )
+    rows = {row.session_id: row for row in index.query_sessions(session_ids=[r[0] for r in ranked])}
+    entries = {str(entry.session_id): entry for entry in _to_entries(list(rows.values()))}
+    return [
+        SessionSearchResult(
+            session=_build_joint_session(entries[session_id]),
+            snippet=snippet,
+            score=score,
+        )
+        for session_id, score, snippet in ranked
+        if session_id in entries
+    ]
+
+
+def load_session_by_id(id: UUID) -> JointSession | None:
+    """Load a session by ID.
+
+    The session is served from its row in the index while its context file and metadata
+    are unchanged. Otherwise, or if it is not indexed yet (e.g. newly created sessions
+    with empty context files), it is indexed again, checking every work dir if needed.
+    """
+    row = index.get_session(str(id))
+    if row is not None and row.stamp == _stamp(Path(row.context_file), Path(row.session_dir)):
+        entry = _to_entries([row])[0]
+    else:
+        entry = _reindex_session(id)
+        if entry is None:
+            return None
+    _ensure_title(entry, refresh=_wire_changed(entry))
+    return _build_joint_session(entry)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""Transcript text of sessions for full-text search.
+
+User prompts, assistant text and the names of called tools are extracted from `wire.jsonl`
+into the FTS5 table of the session index (see `kimi_cli.web.store.index`). Indexing is
+incremental: only sessions whose context file changed are looked at, and only the part of
+their wire file appended since it was last indexed is read.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, cast
+
+from kosong.message import Message
+from loguru import logger
+
+from kimi_cli.web.store import index
+from kimi_cli.web.store.index import TranscriptUpdate
+
+MIN_QUERY_TERM_LENGTH = 3
+"""Terms are matched as substrings with a trigram tokenizer, so shorter ones are ignored."""
+
+_INDEXED_TYPES = (b'"TurnBegin"', b'"ContentPart"', b'"ToolCall"')
+_CATCH_UP_BATCH = 256
+
+
+@dataclass(slots=True)
+class _Transcript:
+    prompts: list[str] = field(default_factory=list[str])
+    replies: list[str] = field(default_factory=list[str])
+    tools: list[str] = field(default_factory=list[str])
+
+
+def _prompt_text(user_input: Any) -> str:
+    try:
+        return Message(role="user", content=user_input).extract_text(" ")
+    except ValueError:
+        return ""
+
+
+def read_transcript(wire_file: Path, offset: int = 0) -> tuple[str, str, str, int]:
+    """Read the transcript text from a wire file, starting at `offset`.
+
+    A trailing line that is not complete yet is left for the next time.
+
+    Returns:
+        The prompts, the replies (one line per turn) and the tool names, and the offset to
+        continue from.
+    """
+    transcript = _Transcript()
+    with open(wire_file, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if not any(t in line for t in _INDEXED_TYPES):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            message = cast(dict[str, Any], record).get("message")
+            if not isinstance(message, dict):
+                continue
+            message = cast(dict[str, Any], message)
+            payload = message.get("payload")
+            if not isinstance(payload, dict):
+                continue
+            payload = cast(dict[str, Any], payload)
+
+            match message.get("type"):
+                case "TurnBegin":
+                    if transcript.replies and transcript.replies[-1] != "\n":
+                        transcript.replies.append("\n")
+                    if text := _prompt_text(payload.get("user_input")):
+                        transcript.prompts.append(text)
+                case "ContentPart":
+                    text = payload.get("text")
+                    if payload.get("type") == "text" and isinstance(text, str):
+                        transcript.replies.append(text)
+                case "ToolCall":
+                    function = payload.get("function")
+                    if isinstance(function, dict):
+                        name = cast(dict[str, Any], function).get("name")
+                        if isinstance(name, str):
+                            transcript.tools.append(name)
+                case _:
+                    pass
+    return (
+        "\n".join(transcript.prompts),
+        "".join(transcript.replies).strip("\n"),
+        " ".join(transcript.tools),
+        offset,
+    )
+
+
+def catch_up_transcripts() -> None:
+    """Index what was appended to the wire files of changed sessions."""
+    updates: list[TranscriptUpdate] = []
+    for session_id, session_dir, wire_offset, context_mtime in index.get_stale_transcripts():
+        wire_file = Path(session_dir) / "wire.jsonl"
+        try:
+            size = wire_file.stat().st_size
+        except OSError:
+            size = 0
+        # A wire file smaller than what was indexed has been rewritten.
+        reset = size < wire_offset
+        if reset:
+            wire_offset = 0
+        prompts = replies = tools = ""
+        if size > wire_offset:
+            try:
+                prompts, replies, tools, wire_offset = read_transcript(wire_file, wire_offset)
+            except OSError as e:
+                logger.warning(f"Failed to index transcript of session {session_id}: {e}")
+                continue
+        updates.append(
+            TranscriptUpdate(
+                session_id=session_id,
+                prompts=prompts,
+                replies=replies,
+                tools=tools,
+                wire_offset=wire_offset,
+                context_mtime=context_mtime,
+                reset=reset,
+            )
+        )
+        if len(updates) >= _CATCH_UP_BATCH:
+            index.add_transcripts(updates)
+            updates.clear()
+    if updates:
+        index.add_transcripts(updates)
+
+
+def build_match_query(query: str) -> str | None:
+    """Turn a search query into an FTS5 query matching all of its terms as substrings.
+
+    Returns `None` if no term is long enough to be matched.
+    """
+    terms = [
+        '"' + term.replace('"', '""') + '"'
+        for term in query.split()
+        if len(term) >= MIN_QUERY_TERM_LENGTH
+    ]
+    return " ".join(terms) if terms else None
@@ -0,0 +1,237 @@
+"""
+A minimal CBOR (RFC 8949) codec for the binary framing of the Wire protocol.
+
+Only the JSON data model is supported, plus one extension: the base64 `data:` URLs of image,
+audio and video parts travel as raw bytes in a "binary MIME message" (tag 257), so neither
+side has to pay for base64 on the wire.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import re
+import struct
+from typing import Any, cast
+
+from kosong.utils.typing import JsonType
+
+MIME_MESSAGE_TAG = 257
+"""Tag of a binary MIME message: MIME headers, a blank line, then the raw body."""
+
+_MEDIA_PART_KEYS = frozenset({"image_url", "audio_url", "video_url"})
+"""Keys of the media parts whose `url` may be sent as a binary MIME message."""
+# A MIME type made of RFC 2045 tokens, so it can be written as a header as-is.
+_TOKEN = r"[!#$%&'*+\-.^_`{|}~0-9A-Za-z]+"
+_DATA_URL_RE = re.compile(rf"data:({_TOKEN}/{_TOKEN});base64,")
+_MIME_SEPARATOR = b"\r\n\r\n"
+_CONTENT_TYPE_HEADER = b"content-type:"
+
+_FLOAT64 = struct.Struct(">d")
+
+MAX_NESTING_DEPTH = 256
+"""Deepest nesting of arrays, maps and tags accepted when decoding, well below the recursion
+limit, so that a malformed item is rejected rather than crash the reader."""
+
+
+class CBORDecodeError(ValueError):
+    """Raised when the input is not well-formed CBOR or uses unsupported features."""
+
+
+def dumps(obj: JsonType) -> bytes:
+    """Encode a jsonifiable value as CBOR."""
+    out = bytearray()
+    _encode(obj, out)
+    return bytes(out)
+
+
+def loads(data: bytes | bytearray | memoryview) -> JsonType:
+    """
+    Decode a single CBOR item into a jsonifiable value.
+
+    Raises:
+        CBORDecodeError: If the input is malformed, has trailing bytes, is nested deeper than
+            `MAX_NESTING_DEPTH` or uses unsupported features (byte strings outside a MIME
+            message, indefinite lengths, unknown simple values).
+    """
+    view = memoryview(data)
+    try:
+        value, pos = _decode(view, 0)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise CBORDecodeError(f"Malformed CBOR: {e}") from e
+    if pos != len(view):
+        raise CBORDecodeError("Trailing bytes after CBOR item")
+    return value
+
+
+def _encode_head(major: int, value: int, out: bytearray) -> None:
+    major <<= 5
+    if value < 24:
+        out.append(major | value)
+    elif value < 0x100:
+        out.append(major | 24)
+        out.append(value)
+    elif value < 0x10000:
+        out.append(major | 25)
+        out += value.to_bytes(2, "big")
+    elif value < 0x100000000:
+        out.append(major | 26)
+        out += value.to_bytes(4, "big")
+    else:
+        out.append(major | 27)
+        out += value.to_bytes(8, "big")
+
+
+def _encode(obj: Any, out: bytearray) -> None:
+    if isinstance(obj, str):
+        encoded = obj.encode("utf-8")
+        _encode_head(3, len(encoded), out)
+        out += encoded
+    elif obj is None:
+        out.append(0xF6)
+    elif obj is True:
+        out.append(0xF5)
+    elif obj is False:
+        out.append(0xF4)
+    elif isinstance(obj, int):
+        if obj >= 0:
+            _encode_head(0, obj, out)
+        else:
+            _encode_head(1, -1 - obj, out)
+    elif isinstance(obj, float):
+        out.append(0xFB)
+        out += _FLOAT64.pack(obj)
+    elif isinstance(obj, dict):
+        mapping = cast(dict[str, Any], obj)
+        _encode_head(5, len(mapping), out)
+        for key, value in mapping.items():
+            _encode(key, out)
+            if key in _MEDIA_PART_KEYS and isinstance(value, dict):
+                _encode_media(cast(dict[str, Any], value), out)
+            else:
+                _encode(value, out)
+    elif isinstance(obj, list | tuple):
+        items = cast(list[Any], obj)
+        _encode_head(4, len(items), out)
+        for item in items:
+            _encode(item, out)
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__} as CBOR")
+
+
+def _encode_media(media: dict[str, Any], out: bytearray) -> None:
+    _encode_head(5, len(media), out)
+    for key, value in media.items():
+        _encode(key, out)
+        if not (key == "url" and isinstance(value, str) and _encode_data_url(value, out)):
+            _encode(value, out)
+
+
+def _encode_data_url(url: str, out: bytearray) -> bool:
+    match = _DATA_URL_RE.match(url)
+    if match is None:
+        return False
+    encoded_body = url[match.end() :]
+    try:
+        body = base64.b64decode(encoded_body, validate=True)
+    except binascii.Error:
+        return False
+    if base64.b64encode(body).decode("ascii") != encoded_body:
+        # Non-canonical base64 would not decode back to the same string.
+        return False
+    message = b"Content-Type: " + match.group(1).encode("ascii") + _MIME_SEPARATOR + body
+    _encode_head(6, MIME_MESSAGE_TAG, out)
+    _encode_head(2, len(message), out)
+    out += message
+    return True
+
+
+def _decode_data_url(message: bytes) -> str:
+    headers, sep, body = message.partition(_MIME_SEPARATOR)
+    if not sep:
+        raise CBORDecodeError("MIME message without a header section")
+    mime_type = "application/octet-stream"
+    for line in headers.split(b"\r\n"):
+        if line.lower().startswith(_CONTENT_TYPE_HEADER):
+            mime_type = line[len(_CONTENT_TYPE_HEADER) :].strip().decode("ascii")
+            break
+    return f"data:{mime_type};base64,{base64.b64encode(body).decode('ascii')}"
+
+
+def _decode_argument(view: memoryview, pos: int, info: int) -> tuple[int, int]:
+    if info < 24:
+        return info, pos
+    if info == 24:
+        return view[pos], pos + 1
+    if info == 25:
+        return int.from_bytes(view[pos : pos + 2], "big"), pos + 2
+    if info == 26:
+        return int.from_bytes(view[pos : pos + 4], "big"), pos + 4
+    if info == 27:
+        return int.from_bytes(view[pos : pos + 8], "big"), pos + 8
+    raise CBORDecodeError("Indefinite-length items are not supported")
+
+
+def _read_bytes(view: memoryview, pos: int, length: int) -> tuple[bytes, int]:
+    end = pos + length
+    if end > len(view):
+        raise CBORDecodeError("Unexpected end of CBOR input")
+    return view[pos:end].tobytes(), end
+
+
+def _decode(view: memoryview, pos: int, depth: int = 0) -> tuple[Any, int]:
+    if depth > MAX_NESTING_DEPTH:
+        raise CBORDecodeError(f"CBOR nested deeper than {MAX_NESTING_DEPTH} levels")
+    initial = view[pos]
+    pos += 1
+    major, info = initial >> 5, initial & 0x1F
+
+    if major == 7:
+        match info:
+            case 20:
+                return False, pos
+            case 21:
+                return True, pos
+            case 22 | 23:
+                return None, pos
+            case 25:
+                return struct.unpack(">e", view[pos : pos + 2])[0], pos + 2
+            case 26:
+                return struct.unpack(">f", view[pos : pos + 4])[0], pos + 4
+            case 27:
+                return _FLOAT64.unpack(view[pos : pos + 8])[0], pos + 8
+            case _:
+                raise CBORDecodeError(f"Unsupported simple value {info}")
+
+    arg, pos = _decode_argument(view, pos, info)
+    match major:
+        case 0:
+            return arg, pos
+        case 1:
+            return -1 - arg, pos
+        case 2:
+            raise CBORDecodeError("Byte strings are only supported inside MIME messages")
+        case 3:
+            raw, pos = _read_bytes(view, pos, arg)
+            return raw.decode("utf-8"), pos
+        case 4:
+            items: list[Any] = []
+            for _ in range(arg):
+                item, pos = _decode(view, pos, depth + 1)
+                items.append(item)
+            return items, pos
+        case 5:
+            mapping: dict[str, Any] = {}
+            for _ in range(arg):
+                key, pos = _decode(view, pos, depth + 1)
+                if not isinstance(key, str):
+                    raise CBORDecodeError("Map keys must be text strings")
+                mapping[key], pos = _decode(view, pos, depth + 1)
+            return mapping, pos
+        case _:  # 6: tag
+            if arg == MIME_MESSAGE_TAG and view[pos] >> 5 == 2:
+                length, pos = _decode_argument(view, pos + 1, view[pos] & 0x1F)
+                message, pos = _read_bytes(view, pos, length)
+                return _decode_data_url(message), pos
+            # Other tags carry no meaning for us; use the tagged value as-is.
+            return _decode(view, pos, depth + 1)
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import time
 from collections.abc import AsyncIterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal, cast
 
 import aiofiles
+import pydantic_core
 from pydantic import BaseModel, ConfigDict, ValidationError
 
 from kimi_cli.utils.logging import logger
@@ -60,6 +62,10 @@ def parse_wire_file_line(line: str) -> WireFileMetadata | WireMessageRecord:
 class WireFile:
     path: Path
     protocol_version: str = WIRE_PROTOCOL_VERSION
+    _turn_offsets: list[int] = field(default_factory=list[int], init=False, repr=False)
+    """Byte offsets at which each turn starts, see `turn_offsets`."""
+    _indexed_size: int = field(default=0, init=False, repr=False)
+    """How many bytes of the file `_turn_offsets` covers."""
 
     def __post_init__(self) -> None:
         if self.path.exists():
@@ -92,17 +98,31 @@ class WireFile:
             return False
         return True
 
-    async def iter_records(self) -> AsyncIterator[WireMessageRecord]:
+    async def iter_records(
+        self, *, start: int = 0, end: int | None = None
+    ) -> AsyncIterator[WireMessageRecord]:
+        """
+        Iterate over the message records in the file.
+
+        Args:
+            start: Byte offset of the first line to read, usually one from `turn_offsets`.
+            end: Byte offset to stop reading at (exclusive), or `None` for the end of file.
+        """
         if not self.path.exists():
             return
         try:
-            async with aiofiles.open(self.path, encoding="utf-8") as f:
-                async for line in f:
-                    line = line.strip()
-                    if not line:
+            async with aiofiles.open(self.path, mode="rb") as f:
+                if start:
+                    await f.seek(start)
+                pos = start
+                async for raw_line in f:
+                    if end is not None and pos >= end:
+                        break
+                    pos += len(raw_line)
+                    if not raw_line.strip():
                         continue
                     try:
-                        parsed = parse_wire_file_line(line)
+                        parsed = parse_wire_file_line(raw_line.decode("utf-8").strip())
                     except Exception:
                         logger.exception(
                             "Failed to parse line in wire file {file}:", file=self.path
@@ -114,6 +134,49 @@ class WireFile:
         except Exception:
             logger.exception("Failed to read wire file {file}:", file=self.path)
 
+    async def turn_offsets(self) -> tuple[list[int], int]:
+        """
+        Return the byte offsets at which each recorded turn starts, and the size of the
+        file they cover.
+
+        Turn `i` spans from `offsets[i]` up to `offsets[i + 1]` (or the returned size for the
+        last turn). Records written before the first `TurnBegin`, if any, form a turn of
+        their own. The index is built incrementally, so only newly appended lines are scanned.
+        """
+        if not self.path.exists():
+            return [], 0
+        await asyncio.to_thread(self._update_turn_offsets)
+        return list(self._turn_offsets), self._indexed_size
+
+    def _update_turn_offsets(self) -> None:
+        try:
+            with self.path.open("rb") as f:
+                if f.seek(0, 2) < self._indexed_size:
+                    # The file was rewritten, start over.
+                    self._turn_offsets.clear()
+                    self._indexed_size = 0
+                f.seek(self._indexed_size)
+                pos = self._indexed_size
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partially written, pick it up next time
+                    offset, pos = pos, pos + len(line)
+                    if not line.strip():
+                        continue
+                    if b'"metadata"' in line and parse_wire_file_metadata(
+                        line.decode("utf-8", errors="replace")
+                    ):
+                        continue
+                    # The first record opens a turn, whatever it is.
+                    starts_turn = not self._turn_offsets or (
+                        b'"TurnBegin"' in line and _is_turn_begin(line)
+                    )
+                    if starts_turn:
+                        self._turn_offsets.append(offset)
+                self._indexed_size = pos
+        except OSError:
+            logger.exception("Failed to index wire file {file}:", file=self.path)
+
     async def append_message(self, msg: WireMessage, *, timestamp: float | None = None) -> None:
         record = WireMessageRecord.from_wire_message(
             msg,
@@ -131,6 +194,17 @@ class WireFile:
             await f.write(_dump_line(record))
 
 
+def _is_turn_begin(line: bytes) -> bool:
+    try:
+        data = pydantic_core.from_json(line)
+    except ValueError:
+        return False
+    if not isinstance(data, dict):
+        return False
+    message = cast(dict[str, Any], data).get("message")
+    return isinstance(message, dict) and cast(dict[str, Any], message).get("type") == "TurnBegin"
+
+
 def _dump_line(model: BaseModel) -> str:
     return json.dumps(model.model_dump(mode="json"), ensure_ascii=False) + "\n"
 
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from typing import Any, Literal
+import json
+from typing import Annotated, Any, Literal, NamedTuple, cast
 
+import pydantic_core
 from kosong.utils.typing import JsonType
 from pydantic import (
     BaseModel,
     ConfigDict,
+    Discriminator,
+    Field,
+    Tag,
     TypeAdapter,
     field_serializer,
     field_validator,
     model_serializer,
 )
 
-from kimi_cli.wire.serde import serialize_wire_message
+from kimi_cli.wire.serde import serialize_wire_message, serialize_wire_message_json
 from kimi_cli.wire.types import (
     ContentPart,
     Event,
@@ -89,12 +94,35 @@ class ClientCapabilities(BaseModel):
     """Whether the client can handle QuestionRequest messages."""
 
 
+class DeltaCoalescing(BaseModel):
+    """
+    Options for coalescing streamed deltas (text, thinking and tool call argument chunks)
+    before they are sent to the Wire client.
+    """
+
+    window_ms: int = Field(default=32, ge=1, le=1000)
+    """Maximum time in milliseconds a delta may be held back to merge following deltas."""
+    max_bytes: int = Field(default=16 * 1024, ge=1)
+    """Flush the merged delta as soon as its payload reaches this many bytes."""
+
+
+type WireFraming = Literal["jsonl", "cbor"]
+"""
+How messages are framed on stdio.
+
+- `jsonl`: one JSON message per line (the default).
+- `cbor`: each message is a 4-byte big-endian length followed by that many bytes of CBOR.
+"""
+
+
 class JSONRPCInitializeMessage(_MessageBase):
     class Params(BaseModel):
         protocol_version: str
         client: ClientInfo | None = None
         external_tools: list[ExternalTool] | None = None
         capabilities: ClientCapabilities | None = None
+        delta_coalescing: DeltaCoalescing | None = None
+        framing: WireFraming | None = None
 
     method: Literal["initialize"] = "initialize"
     id: str
@@ -115,9 +143,41 @@ class JSONRPCPromptMessage(_MessageBase):
 
 
 class JSONRPCReplayMessage(_MessageBase):
+    class Params(BaseModel):
+        """
+        Options to replay the history page by page. Without any of them, the whole history
+        is replayed in one go.
+        """
+
+        cursor: str | None = None
+        """The `next_cursor` of the previous page; omit to start from the oldest or newest turn."""
+        direction: Literal["forward", "backward"] = "forward"
+        """Page from the oldest turn onwards, or from the newest turn backwards."""
+        max_turns: int | None = Field(default=None, ge=1)
+        """Maximum number of turns in the page."""
+        max_bytes: int | None = Field(default=None, ge=1)
+        """Approximate maximum size of the page; a page always holds at least one turn."""
+        types: list[str] | None = None
+        """Only replay messages of these types, e.g. `["TurnBegin", "ContentPart"]`."""
+
+        @property
+        def is_paged(self) -> bool:
+            return (
+                self.cursor is not None
+                or self.direction != "forward"
+                or self.max_turns is not None
+                or self.max_bytes is not None
+            )
+
     method: Literal["replay"] = "replay"
     id: str
-    params: JsonType | None = None
+    params: Params | None = None
+
+    @field_validator("params", mode="before")
+    @classmethod
+    def _empty_params(cls, value: Any) -> Any:
+        # Older clients may send an empty list as "no params".
+        return None if value == [] else value
 
 
 class JSONRPCSteerMessage(_MessageBase):
@@ -176,18 +236,52 @@ class JSONRPCRequestMessage(_MessageBase):
         raise NotImplementedError("Request message deserialization is not implemented.")
 
 
-type JSONRPCInMessage = (
-    JSONRPCSuccessResponse
-    | JSONRPCErrorResponse
-    | JSONRPCInitializeMessage
-    | JSONRPCPromptMessage
-    | JSONRPCSteerMessage
-    | JSONRPCReplayMessage
-    | JSONRPCCancelMessage
-)
+def _in_message_tag(value: Any) -> str | None:
+    """Pick the concrete inbound message type from the `method` field (or lack thereof)."""
+    if isinstance(value, dict):
+        fields = cast(dict[str, Any], value)
+        method = fields.get("method")
+        if method is not None:
+            return method if isinstance(method, str) else None
+        return "error" if fields.get("error") is not None else "result"
+    if isinstance(value, JSONRPCErrorResponse):
+        return "error"
+    if isinstance(value, JSONRPCSuccessResponse):
+        return "result"
+    return getattr(value, "method", None)
+
+
+type JSONRPCInMessage = Annotated[
+    Annotated[JSONRPCSuccessResponse, Tag("result")]
+    | Annotated[JSONRPCErrorResponse, Tag("error")]
+    | Annotated[JSONRPCInitializeMessage, Tag("initialize")]
+    | Annotated[JSONRPCPromptMessage, Tag("prompt")]
+    | Annotated[JSONRPCSteerMessage, Tag("steer")]
+    | Annotated[JSONRPCReplayMessage, Tag("replay")]
+    | Annotated[JSONRPCCancelMessage, Tag("cancel")],
+    Discriminator(_in_message_tag),
+]
+"""
+Any inbound message. Validation dispatches on the `method` field straight into the concrete
+message type instead of trying each member of the union in turn.
+"""
 JSONRPCInMessageAdapter = TypeAdapter[JSONRPCInMessage](JSONRPCInMessage)
 JSONRPC_IN_METHODS = {"initialize", "prompt", "steer", "replay", "cancel"}
 
+
+def decode_in_message(data: str | bytes) -> JSONRPCInMessage:
+    """
+    Decode one inbound JSON-RPC line.
+
+    The raw JSON is parsed once and handed to the tagged union as Python objects, which is
+    noticeably faster than `validate_json` for prompts carrying large inline media.
+
+    Raises:
+        ValueError: If the line is not valid JSON or not a valid inbound message.
+    """
+    return JSONRPCInMessageAdapter.validate_python(pydantic_core.from_json(data))
+
+
 type JSONRPCOutMessage = (
     JSONRPCSuccessResponse
     | JSONRPCErrorResponse
@@ -197,6 +291,75 @@ type JSONRPCOutMessage = (
 )
 JSONRPC_OUT_METHODS = {"event", "request"}
 
+_EVENT_MESSAGE_PREFIX = b'{"jsonrpc":"2.0","method":"event","params":'
+_REQUEST_MESSAGE_PREFIX = b'{"jsonrpc":"2.0","method":"request","id":'
+_ENVELOPE_TYPE_PREFIX = b'{"type":"'
+
+
+def encode_out_message(msg: JSONRPCOutMessage) -> bytes:
+    """
+    Encode an outbound message as a single JSON line, including the trailing newline.
+
+    `event` and `request` messages make up nearly all of the outbound traffic, so they are
+    assembled around the pre-serialized Wire message envelope instead of going through the
+    generic model serializer. The output is identical to `msg.model_dump_json()`.
+    """
+    match msg:
+        case JSONRPCEventMessage():
+            return _EVENT_MESSAGE_PREFIX + serialize_wire_message_json(msg.params) + b"}\n"
+        case JSONRPCRequestMessage():
+            return (
+                _REQUEST_MESSAGE_PREFIX
+                + json.dumps(msg.id, ensure_ascii=False).encode("utf-8")
+                + b',"params":'
+                + serialize_wire_message_json(msg.params)
+                + b"}\n"
+            )
+        case _:
+            return msg.model_dump_json().encode("utf-8") + b"\n"
+
+
+class OutMessageEnvelope(NamedTuple):
+    """The fields of an outbound message needed to route it, see `peek_out_message`."""
+
+    method: str | None
+    """`event` or `request`, or `None` for responses."""
+    id: str | None
+    type: str | None
+    """Wire message type of the params of `event` and `request` messages."""
+    is_error: bool
+
+
+def peek_out_message(line: bytes) -> OutMessageEnvelope:
+    """
+    Read the routing fields of one encoded outbound line without decoding its params.
+
+    Events written by `encode_out_message` are recognized by their prefix, so even large
+    ones cost no parsing at all. Anything else is parsed as JSON, which is cheap for
+    requests and responses.
+
+    Raises:
+        ValueError: If the line is not a JSON object.
+    """
+    if line.startswith(_EVENT_MESSAGE_PREFIX):
+        start = len(_EVENT_MESSAGE_PREFIX) + len(_ENVELOPE_TYPE_PREFIX)
+        end = line.find(b'"', start)
+        if line.startswith(_ENVELOPE_TYPE_PREFIX, len(_EVENT_MESSAGE_PREFIX)) and end != -1:
+            return OutMessageEnvelope("event", None, line[start:end].decode("ascii"), False)
+    msg = pydantic_core.from_json(line)
+    if not isinstance(msg, dict):
+        raise ValueError("Not a JSON-RPC message")
+    msg = cast(dict[str, Any], msg)
+    method, msg_id = msg.get("method"), msg.get("id")
+    params = msg.get("params")
+    msg_type = cast(dict[str, Any], params).get("type") if isinstance(params, dict) else None
+    return OutMessageEnvelope(
+        method if isinstance(method, str) else None,
+        msg_id if isinstance(msg_id, str) else None,
+        msg_type if isinstance(msg_type, str) else None,
+        "error" in msg,
+    )
+
 
 class ErrorCodes:
     # Predefined JSON-RPC 2.0 error codes
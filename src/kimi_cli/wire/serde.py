@@ -4,7 +4,7 @@ from typing import Any
 
 from kosong.utils.typing import JsonType
 
-from kimi_cli.wire.types import WireMessage, WireMessageEnvelope
+from kimi_cli.wire.types import WireMessage, WireMessageEnvelope, wire_message_type_name
 
 
 def serialize_wire_message(msg: WireMessage) -> dict[str, JsonType]:
@@ -15,6 +15,18 @@ def serialize_wire_message(msg: WireMessage) -> dict[str, JsonType]:
     return envelope.model_dump(mode="json")
 
 
+def serialize_wire_message_json(msg: WireMessage) -> bytes:
+    """
+    Convert a `WireMessage` into the JSON bytes of its envelope.
+
+    Equivalent to JSON-encoding `serialize_wire_message(msg)`, but the payload is encoded
+    by pydantic-core in a single pass without building an intermediate dict.
+    """
+    typename = wire_message_type_name(msg)
+    payload = msg.model_dump_json().encode("utf-8")
+    return b'{"type":"' + typename.encode("ascii") + b'","payload":' + payload + b"}"
+
+
 def deserialize_wire_message(data: dict[str, JsonType] | Any) -> WireMessage:
     """
     Convert a jsonifiable dict into a `WireMessage`.
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import copy
+import enum
 import json
-from typing import Any, cast
+import struct
+from typing import Any, Protocol, cast
 
 import acp  # type: ignore[reportMissingTypeStubs]
 import pydantic
+import pydantic_core
 from kosong.chat_provider import ChatProviderError
+from kosong.message import MergeableMixin
 from kosong.tooling import ToolError, ToolResult
 from kosong.utils.typing import JsonType
 
@@ -18,7 +23,7 @@ from kimi_cli.soul.toolset import KimiToolset, WireExternalTool
 from kimi_cli.utils.aioqueue import Queue, QueueShutDown
 from kimi_cli.utils.logging import logger
 from kimi_cli.utils.signals import install_sigint_handler
-from kimi_cli.wire import Wire
+from kimi_cli.wire import Wire, WireUISide, cbor
 from kimi_cli.wire.types import (
     ApprovalRequest,
     ApprovalResponse,
@@ -26,13 +31,19 @@ from kimi_cli.wire.types import (
     QuestionRequest,
     QuestionResponse,
     Request,
+    TextPart,
+    ThinkPart,
+    ToolCall,
+    ToolCallPart,
     ToolCallRequest,
+    WireMessage,
     is_event,
     is_request,
 )
 
 from .jsonrpc import (
     ClientInfo,
+    DeltaCoalescing,
     ErrorCodes,
     JSONRPCCancelMessage,
     JSONRPCErrorObject,
@@ -50,6 +61,8 @@ from .jsonrpc import (
     JSONRPCSteerMessage,
     JSONRPCSuccessResponse,
     Statuses,
+    WireFraming,
+    encode_out_message,
 )
 
 # Maximum buffer size for the asyncio StreamReader used for stdio.
@@ -60,15 +73,88 @@ from .jsonrpc import (
 # growth or buffer-overrun errors when peers send unexpectedly large payloads.
 STDIO_BUFFER_LIMIT = 100 * 1024 * 1024
 
+_FRAME_HEADER = struct.Struct(">I")
+"""Length prefix of a frame in `cbor` framing."""
+
+
+class _Frame(enum.Enum):
+    INVALID = enum.auto()
+    """A frame whose body is not valid CBOR, as opposed to a valid CBOR `null`."""
+
+
+def _encode_cbor_frame(msg: JSONRPCOutMessage) -> bytes:
+    body = cbor.dumps(msg.model_dump(mode="json"))
+    return _FRAME_HEADER.pack(len(body)) + body
+
+
+def _replay_page(
+    offsets: list[int], size: int, params: JSONRPCReplayMessage.Params
+) -> tuple[int, int, str | None]:
+    """
+    Pick the turns of a replay page.
+
+    Returns the byte range of the page in the wire file and the cursor of the next page, or
+    `None` if this is the last one. Cursors are turn indices, which stay valid as the wire file
+    only ever grows.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    total = len(offsets)
+    bounds = [*offsets, size]
+
+    def fits(first: int, last: int) -> bool:
+        # `first..last` (exclusive) is within the limits; a page always takes one turn.
+        if last - first <= 1:
+            return True
+        if params.max_turns is not None and last - first > params.max_turns:
+            return False
+        return params.max_bytes is None or bounds[last] - bounds[first] <= params.max_bytes
+
+    if params.cursor is None:
+        cursor = 0 if params.direction == "forward" else total
+    else:
+        try:
+            cursor = int(params.cursor)
+        except ValueError:
+            cursor = -1
+        if not 0 <= cursor <= total:
+            raise ValueError(f"Invalid replay cursor: {params.cursor!r}")
+
+    if params.direction == "forward":
+        first = last = cursor
+        while last < total and fits(first, last + 1):
+            last += 1
+        next_cursor = str(last) if last < total else None
+    else:
+        first = last = cursor
+        while first > 0 and fits(first - 1, last):
+            first -= 1
+        next_cursor = str(first) if first > 0 else None
+    return bounds[first], bounds[last], next_cursor
+
+
+class WireWriter(Protocol):
+    """The part of `asyncio.StreamWriter` the Wire server writes its output through."""
+
+    def write(self, data: bytes) -> None: ...
+
+    async def drain(self) -> None: ...
+
+    def close(self) -> None: ...
+
+    async def wait_closed(self) -> None: ...
+
 
 class WireServer:
     def __init__(self, soul: Soul):
         self._reader: asyncio.StreamReader | None = None
-        self._writer: asyncio.StreamWriter | None = None
+        self._writer: WireWriter | None = None
 
         # outward
         self._write_task: asyncio.Task[None] | None = None
-        self._write_queue: Queue[JSONRPCOutMessage] = Queue()
+        self._write_queue: Queue[JSONRPCOutMessage | WireFraming] = Queue()
+        """Outbound messages, plus framing switches that apply to the messages after them."""
 
         # inward
         self._dispatch_tasks: set[asyncio.Task[None]] = set()
@@ -80,15 +166,34 @@ class WireServer:
         """Maps JSON RPC message IDs to pending `Request`s."""
         self._client_supports_question: bool = False
         """Whether the Wire client supports QuestionRequest."""
+        self._delta_coalescing: DeltaCoalescing | None = None
+        """Delta coalescing options negotiated during initialization, if any."""
+        self._framing: WireFraming = "jsonl"
+        """Framing of inbound messages; switched after an `initialize` that negotiates it."""
+        self._accepted_framing: WireFraming = "jsonl"
+        """Framing accepted by the last successful `initialize`."""
+
+    async def serve(self, streams: tuple[asyncio.StreamReader, WireWriter] | None = None) -> None:
+        """
+        Serve the Wire protocol on stdio, or on the given streams.
+
+        Serving on given streams leaves SIGINT alone, since the owner of the streams (e.g. a
+        web worker hosting several sessions) is in charge of the process.
+        """
+        stop_event = asyncio.Event()
+        if streams is None:
+            logger.info("Starting Wire server on stdio")
+            self._reader, self._writer = await acp.stdio_streams(limit=STDIO_BUFFER_LIMIT)
+            loop = asyncio.get_running_loop()
+            remove_sigint = install_sigint_handler(loop, stop_event.set)
+        else:
+            logger.info("Starting Wire server on given streams")
+            self._reader, self._writer = streams
 
-    async def serve(self) -> None:
-        logger.info("Starting Wire server on stdio")
+            def remove_sigint() -> None:
+                pass
 
-        self._reader, self._writer = await acp.stdio_streams(limit=STDIO_BUFFER_LIMIT)
         self._write_task = asyncio.create_task(self._write_loop())
-        stop_event = asyncio.Event()
-        loop = asyncio.get_running_loop()
-        remove_sigint = install_sigint_handler(loop, stop_event.set)
         read_task = asyncio.create_task(self._read_loop())
         stop_task = asyncio.create_task(stop_event.wait())
         tasks: set[asyncio.Task[Any]] = {read_task, stop_task}
@@ -123,15 +228,36 @@ class WireServer:
     async def _write_loop(self) -> None:
         assert self._writer is not None
 
+        encode = encode_out_message
         try:
             while True:
                 try:
-                    msg = await self._write_queue.get()
+                    item = await self._write_queue.get()
                 except QueueShutDown:
                     logger.debug("Send queue shut down, stopping Wire server write loop")
                     break
-                self._writer.write(msg.model_dump_json().encode("utf-8") + b"\n")
-                await self._writer.drain()
+                # Drain everything already queued into a single write, so bursts of
+                # deltas cost one `drain()` instead of one per message.
+                chunks: list[bytes] = []
+                shut_down = False
+                while True:
+                    if isinstance(item, str):
+                        encode = _encode_cbor_frame if item == "cbor" else encode_out_message
+                    else:
+                        chunks.append(encode(item))
+                    if self._write_queue.empty():
+                        break
+                    try:
+                        item = self._write_queue.get_nowait()
+                    except QueueShutDown:
+                        shut_down = True
+                        break
+                if chunks:
+                    self._writer.write(b"".join(chunks))
+                    await self._writer.drain()
+                if shut_down:
+                    logger.debug("Send queue shut down, stopping Wire server write loop")
+                    break
         except asyncio.CancelledError:
             raise
         except Exception:
@@ -142,105 +268,147 @@ class WireServer:
         assert self._reader is not None
 
         while True:
-            raw_line = await self._reader.readline()
-            if not raw_line:
-                logger.info("stdin closed, Wire server exiting")
-                break
-            line = raw_line.decode("utf-8", errors="replace").strip()
+            if self._framing == "cbor":
+                try:
+                    msg_json = await self._read_cbor_frame()
+                except asyncio.IncompleteReadError:
+                    logger.info("stdin closed, Wire server exiting")
+                    break
+                except ValueError as e:
+                    # A malformed frame header leaves the stream out of sync; nothing
+                    # after it can be trusted, so give up on the connection.
+                    logger.error("Invalid CBOR frame: {error}", error=e)
+                    break
+                if msg_json is _Frame.INVALID:
+                    await self._send_parse_error("Invalid CBOR format")
+                    continue
+            else:
+                raw_line = await self._reader.readline()
+                if not raw_line:
+                    logger.info("stdin closed, Wire server exiting")
+                    break
 
+                try:
+                    msg_json = pydantic_core.from_json(raw_line)
+                except ValueError:
+                    # tolerate invalid UTF-8 the same way as before, only on this slow path
+                    line = raw_line.decode("utf-8", errors="replace").strip()
+                    try:
+                        msg_json = json.loads(line)
+                    except ValueError:
+                        logger.error("Invalid JSON line: {line}", line=line)
+                        await self._send_parse_error("Invalid JSON format")
+                        continue
+
+            # Single pass: the adapter dispatches on `method` straight into the concrete type.
+            # Only when that fails do we look closer to report the right error.
             try:
-                msg_json = json.loads(line)
-            except ValueError:
-                logger.error("Invalid JSON line: {line}", line=line)
-                await self._send_msg(
-                    JSONRPCErrorResponseNullableID(
-                        id=None,
-                        error=JSONRPCErrorObject(
-                            code=ErrorCodes.PARSE_ERROR,
-                            message="Invalid JSON format",
-                        ),
-                    )
-                )
+                msg = JSONRPCInMessageAdapter.validate_python(msg_json)
+            except pydantic.ValidationError as e:
+                await self._reject_invalid_message(msg_json, e)
                 continue
 
-            try:
-                generic_msg = JSONRPCMessage.model_validate(msg_json)
-            except pydantic.ValidationError as e:
-                logger.error("Invalid JSON-RPC message: {error}", error=e)
-                await self._send_msg(
-                    JSONRPCErrorResponseNullableID(
-                        id=None,
-                        error=JSONRPCErrorObject(
-                            code=ErrorCodes.INVALID_REQUEST,
-                            message="Invalid request",
-                        ),
-                    )
-                )
+            if isinstance(msg, JSONRPCInitializeMessage) and msg.params.framing is not None:
+                # The framing switch must land between this message and the next one, so
+                # handle the handshake before reading any further.
+                await self._dispatch_msg(msg)
+                if self._accepted_framing != self._framing:
+                    self._framing = self._accepted_framing
+                    await self._write_queue.put(self._framing)
                 continue
 
-            if generic_msg.is_response():
-                # for responses, we skip the method check
-                try:
-                    msg = JSONRPCInMessageAdapter.validate_python(msg_json)
-                except pydantic.ValidationError as e:
-                    logger.error("Invalid JSON-RPC response: {error}", error=e)
-                    await self._send_msg(
-                        JSONRPCErrorResponseNullableID(
-                            id=None,
-                            error=JSONRPCErrorObject(
-                                code=ErrorCodes.INVALID_REQUEST,
-                                message="Invalid response",
-                            ),
-                        )
-                    )
-                    continue  # ignore invalid json-rpc responses
+            task = asyncio.create_task(self._dispatch_msg(msg))
+            task.add_done_callback(self._dispatch_tasks.discard)
+            self._dispatch_tasks.add(task)
 
-                if not isinstance(msg, (JSONRPCSuccessResponse, JSONRPCErrorResponse)):
-                    logger.error(
-                        "Invalid JSON-RPC response message: {msg}",
-                        msg=msg_json,
-                    )
-                    continue  # ignore invalid response messages
+    async def _read_cbor_frame(self) -> JsonType | _Frame:
+        """
+        Read one length-prefixed CBOR frame.
 
-                task = asyncio.create_task(self._dispatch_msg(msg))
-                task.add_done_callback(self._dispatch_tasks.discard)
-                self._dispatch_tasks.add(task)
-                continue
+        Returns `_Frame.INVALID` if the frame body is not valid CBOR.
 
-            if not generic_msg.method_is_inbound():
-                logger.error(
-                    "Unexpected JSON-RPC method received: {method}",
-                    method=generic_msg.method,
+        Raises:
+            asyncio.IncompleteReadError: If stdin is closed.
+            ValueError: If the frame is larger than `STDIO_BUFFER_LIMIT`.
+        """
+        assert self._reader is not None
+
+        header = await self._reader.readexactly(_FRAME_HEADER.size)
+        (length,) = _FRAME_HEADER.unpack(header)
+        if length > STDIO_BUFFER_LIMIT:
+            raise ValueError(f"Frame of {length} bytes exceeds the {STDIO_BUFFER_LIMIT} limit")
+        body = await self._reader.readexactly(length)
+        try:
+            return cbor.loads(body)
+        except cbor.CBORDecodeError as e:
+            logger.error("Invalid CBOR frame: {error}", error=e)
+            return _Frame.INVALID
+
+    async def _send_parse_error(self, message: str) -> None:
+        await self._send_msg(
+            JSONRPCErrorResponseNullableID(
+                id=None,
+                error=JSONRPCErrorObject(code=ErrorCodes.PARSE_ERROR, message=message),
+            )
+        )
+
+    async def _reject_invalid_message(self, msg_json: Any, error: pydantic.ValidationError) -> None:
+        try:
+            generic_msg = JSONRPCMessage.model_validate(msg_json)
+        except pydantic.ValidationError as e:
+            logger.error("Invalid JSON-RPC message: {error}", error=e)
+            await self._send_msg(
+                JSONRPCErrorResponseNullableID(
+                    id=None,
+                    error=JSONRPCErrorObject(
+                        code=ErrorCodes.INVALID_REQUEST,
+                        message="Invalid request",
+                    ),
+                )
+            )
+            return
+
+        if generic_msg.is_response():
+            logger.error("Invalid JSON-RPC response: {error}", error=error)
+            await self._send_msg(
+                JSONRPCErrorResponseNullableID(
+                    id=None,
+                    error=JSONRPCErrorObject(
+                        code=ErrorCodes.INVALID_REQUEST,
+                        message="Invalid response",
+                    ),
                 )
-                if generic_msg.id is not None:
-                    resp = JSONRPCErrorResponse(
+            )
+            return  # ignore invalid json-rpc responses
+
+        if not generic_msg.method_is_inbound():
+            logger.error(
+                "Unexpected JSON-RPC method received: {method}",
+                method=generic_msg.method,
+            )
+            if generic_msg.id is not None:
+                await self._send_msg(
+                    JSONRPCErrorResponse(
                         id=generic_msg.id,
                         error=JSONRPCErrorObject(
                             code=ErrorCodes.METHOD_NOT_FOUND,
                             message=f"Unexpected method received: {generic_msg.method}",
                         ),
                     )
-                    await self._send_msg(resp)
-                continue  # ignore unexpected outbound methods
-
-            try:
-                msg = JSONRPCInMessageAdapter.validate_python(msg_json)
-            except pydantic.ValidationError as e:
-                logger.error("Invalid JSON-RPC inbound message: {error}", error=e)
-                if generic_msg.id is not None:
-                    resp = JSONRPCErrorResponse(
-                        id=generic_msg.id,
-                        error=JSONRPCErrorObject(
-                            code=ErrorCodes.INVALID_PARAMS,
-                            message=f"Invalid parameters for method `{generic_msg.method}`",
-                        ),
-                    )
-                    await self._send_msg(resp)
-                continue  # ignore invalid inbound messages
-
-            task = asyncio.create_task(self._dispatch_msg(msg))
-            task.add_done_callback(self._dispatch_tasks.discard)
-            self._dispatch_tasks.add(task)
+                )
+            return  # ignore unexpected outbound methods
+
+        logger.error("Invalid JSON-RPC inbound message: {error}", error=error)
+        if generic_msg.id is not None:
+            await self._send_msg(
+                JSONRPCErrorResponse(
+                    id=generic_msg.id,
+                    error=JSONRPCErrorObject(
+                        code=ErrorCodes.INVALID_PARAMS,
+                        message=f"Invalid parameters for method `{generic_msg.method}`",
+                    ),
+                )
+            )
 
     async def _shutdown(self) -> None:
         for request in self._pending_requests.values():
@@ -378,6 +546,14 @@ class WireServer:
         if msg.params.capabilities is not None:
             self._client_supports_question = msg.params.capabilities.supports_question
 
+        self._delta_coalescing = msg.params.delta_coalescing
+        if self._delta_coalescing is not None:
+            result["delta_coalescing"] = cast(JsonType, self._delta_coalescing.model_dump())
+
+        if msg.params.framing is not None:
+            self._accepted_framing = msg.params.framing
+            result["framing"] = msg.params.framing
+
         if toolset is not None:
             self._sync_ask_user_tool_visibility(toolset)
 
@@ -534,19 +710,36 @@ class WireServer:
                 ),
             )
 
+        params = msg.params or JSONRPCReplayMessage.Params()
         wire_file = self._soul.wire_file if isinstance(self._soul, KimiSoul) else None
 
         self._cancel_event = asyncio.Event()
         events = 0
         requests = 0
+        start, end = 0, None
+        page: dict[str, JsonType] = {}
         try:
             if wire_file is None or not wire_file.path.exists():
+                if params.is_paged:
+                    page["next_cursor"] = None
                 return JSONRPCSuccessResponse(
                     id=msg.id,
-                    result={"status": Statuses.FINISHED, "events": 0, "requests": 0},
+                    result={"status": Statuses.FINISHED, "events": 0, "requests": 0, **page},
                 )
 
-            async for record in wire_file.iter_records():
+            if params.is_paged:
+                offsets, size = await wire_file.turn_offsets()
+                try:
+                    start, end, next_cursor = _replay_page(offsets, size, params)
+                except ValueError as e:
+                    return JSONRPCErrorResponse(
+                        id=msg.id,
+                        error=JSONRPCErrorObject(code=ErrorCodes.INVALID_PARAMS, message=str(e)),
+                    )
+                page["next_cursor"] = next_cursor
+            types = set(params.types) if params.types is not None else None
+
+            async for record in wire_file.iter_records(start=start, end=end):
                 if self._cancel_event.is_set():
                     return JSONRPCSuccessResponse(
                         id=msg.id,
@@ -554,9 +747,13 @@ class WireServer:
                             "status": Statuses.CANCELLED,
                             "events": events,
                             "requests": requests,
+                            **page,
                         },
                     )
 
+                if types is not None and record.message.type not in types:
+                    continue
+
                 try:
                     wire_msg = record.to_wire_message()
                 except Exception:
@@ -588,12 +785,18 @@ class WireServer:
                         "status": Statuses.CANCELLED,
                         "events": events,
                         "requests": requests,
+                        **page,
                     },
                 )
 
             return JSONRPCSuccessResponse(
                 id=msg.id,
-                result={"status": Statuses.FINISHED, "events": events, "requests": requests},
+                result={
+                    "status": Statuses.FINISHED,
+                    "events": events,
+                    "requests": requests,
+                    **page,
+                },
             )
         except Exception:
             logger.exception("Replay failed:")
@@ -716,17 +919,75 @@ class WireServer:
 
     async def _stream_wire_messages(self, wire: Wire) -> None:
         wire_ui = wire.ui_side(merge=False)
+        if self._delta_coalescing is not None:
+            await self._stream_coalesced_wire_messages(wire_ui, self._delta_coalescing)
+            return
         while True:
             msg = await wire_ui.receive()
-            match msg:
-                case ApprovalRequest():
-                    await self._request_approval(msg)
-                case ToolCallRequest():
-                    await self._request_external_tool(msg)
-                case QuestionRequest():
-                    await self._request_question(msg)
-                case _:
-                    await self._send_msg(JSONRPCEventMessage(method="event", params=msg))
+            await self._forward_wire_message(msg)
+
+    async def _stream_coalesced_wire_messages(
+        self, wire_ui: WireUISide, options: DeltaCoalescing
+    ) -> None:
+        """
+        Forward Wire messages while merging consecutive deltas received within
+        `options.window_ms`, or until the merged payload reaches `options.max_bytes`.
+        Any non-mergeable message flushes the pending delta first, so ordering is preserved.
+        """
+        loop = asyncio.get_running_loop()
+        window = options.window_ms / 1000
+        pending: WireMessage | None = None
+        pending_bytes = 0
+        deadline = 0.0
+
+        async def flush() -> None:
+            nonlocal pending
+            if pending is None:
+                return
+            msg, pending = pending, None
+            await self._forward_wire_message(msg)
+
+        try:
+            while True:
+                if pending is None:
+                    msg = await wire_ui.receive()
+                else:
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            msg = await wire_ui.receive()
+                    except TimeoutError:
+                        await flush()
+                        continue
+
+                if not isinstance(msg, MergeableMixin):
+                    await flush()
+                    await self._forward_wire_message(msg)
+                    continue
+
+                if isinstance(pending, MergeableMixin) and pending.merge_in_place(msg):
+                    pending_bytes += _delta_size(msg)
+                else:
+                    await flush()
+                    # copy before merging in place, the soul may still hold the original
+                    pending = copy.deepcopy(msg)
+                    pending_bytes = _delta_size(msg)
+                    deadline = loop.time() + window
+                if pending_bytes >= options.max_bytes:
+                    await flush()
+        except QueueShutDown:
+            await flush()
+            raise
+
+    async def _forward_wire_message(self, msg: WireMessage) -> None:
+        match msg:
+            case ApprovalRequest():
+                await self._request_approval(msg)
+            case ToolCallRequest():
+                await self._request_external_tool(msg)
+            case QuestionRequest():
+                await self._request_question(msg)
+            case _:
+                await self._send_msg(JSONRPCEventMessage(method="event", params=msg))
 
     async def _request_approval(self, request: ApprovalRequest) -> None:
         msg_id = request.id  # just use the approval request id as message id
@@ -754,3 +1015,19 @@ class WireServer:
         self._pending_requests[msg_id] = request
         await self._send_msg(JSONRPCRequestMessage(id=msg_id, params=request))
         # Same rationale as _request_approval: do not block the UI loop.
+
+
+def _delta_size(msg: WireMessage) -> int:
+    """Size in bytes of the streamed payload carried by a delta message."""
+    match msg:
+        case TextPart():
+            payload = msg.text
+        case ThinkPart():
+            payload = msg.think
+        case ToolCallPart():
+            payload = msg.arguments_part or ""
+        case ToolCall():
+            payload = msg.function.arguments or ""
+        case _:
+            return 0
+    return len(payload.encode("utf-8"))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 from typing import Any, Literal, TypeGuard, cast
 
 from kosong.chat_provider import TokenUsage
@@ -395,20 +396,27 @@ _NAME_TO_WIRE_MESSAGE_TYPE: dict[str, type[WireMessage]] = {
 _NAME_TO_WIRE_MESSAGE_TYPE["ApprovalRequestResolved"] = ApprovalResponse
 
 
+def wire_message_type_name(msg: WireMessage) -> str:
+    """Get the envelope type name of a `WireMessage`."""
+    return _wire_message_type_name(type(msg))
+
+
+@functools.cache
+def _wire_message_type_name(msg_type: type[WireMessage]) -> str:
+    for name, typ in _NAME_TO_WIRE_MESSAGE_TYPE.items():
+        if issubclass(msg_type, typ):
+            return name
+    raise AssertionError(f"Unknown wire message type: {msg_type}")
+
+
 class WireMessageEnvelope(BaseModel):
     type: str
     payload: dict[str, JsonType]
 
     @classmethod
     def from_wire_message(cls, msg: WireMessage) -> WireMessageEnvelope:
-        typename: str | None = None
-        for name, typ in _NAME_TO_WIRE_MESSAGE_TYPE.items():
-            if issubclass(type(msg), typ):
-                typename = name
-                break
-        assert typename is not None, f"Unknown wire message type: {type(msg)}"
         return cls(
-            type=typename,
+            type=wire_message_type_name(msg),
             payload=msg.model_dump(mode="json"),
         )
 
@@ -31,8 +31,10 @@ from kimi_cli.tools.dmail import SendDMail
 from kimi_cli.tools.file.glob import Glob
 from kimi_cli.tools.file.grep_local import Grep
 from kimi_cli.tools.file.read import ReadFile
+from kimi_cli.tools.file.read_batch import ReadFiles
 from kimi_cli.tools.file.read_media import ReadMediaFile
 from kimi_cli.tools.file.replace import StrReplaceFile
+from kimi_cli.tools.file.symbols import FindSymbol
 from kimi_cli.tools.file.write import WriteFile
 from kimi_cli.tools.multiagent.create import CreateSubagent
 from kimi_cli.tools.multiagent.task import Task
@@ -256,6 +258,12 @@ def read_file_tool(runtime: Runtime) -> ReadFile:
     return ReadFile(runtime)
 
 
+@pytest.fixture
+def read_files_tool(runtime: Runtime) -> ReadFiles:
+    """Create a ReadFiles tool instance."""
+    return ReadFiles(runtime)
+
+
 @pytest.fixture
 def read_media_file_tool(runtime: Runtime) -> ReadMediaFile:
     """Create a ReadMediaFile tool instance."""
@@ -269,9 +277,15 @@ def glob_tool(runtime: Runtime) -> Glob:
 
 
 @pytest.fixture
-def grep_tool() -> Grep:
+def grep_tool(runtime: Runtime) -> Grep:
     """Create a Grep tool instance."""
-    return Grep()
+    return Grep(runtime)
+
+
+@pytest.fixture
+def find_symbol_tool(runtime: Runtime) -> FindSymbol:
+    """Create a FindSymbol tool instance."""
+    return FindSymbol(runtime)
 
 
 @pytest.fixture
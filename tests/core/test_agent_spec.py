@@ -28,9 +28,11 @@ def test_load_default_agent_spec():
             "kimi_cli.tools.todo:SetTodoList",
             "kimi_cli.tools.shell:Shell",
             "kimi_cli.tools.file:ReadFile",
+            "kimi_cli.tools.file:ReadFiles",
             "kimi_cli.tools.file:ReadMediaFile",
             "kimi_cli.tools.file:Glob",
             "kimi_cli.tools.file:Grep",
+            "kimi_cli.tools.file:FindSymbol",
             "kimi_cli.tools.file:WriteFile",
             "kimi_cli.tools.file:StrReplaceFile",
             "kimi_cli.tools.web:SearchWeb",
@@ -68,9 +70,11 @@ def test_load_default_agent_spec():
             "kimi_cli.tools.todo:SetTodoList",
             "kimi_cli.tools.shell:Shell",
             "kimi_cli.tools.file:ReadFile",
+            "kimi_cli.tools.file:ReadFiles",
             "kimi_cli.tools.file:ReadMediaFile",
             "kimi_cli.tools.file:Glob",
             "kimi_cli.tools.file:Grep",
+            "kimi_cli.tools.file:FindSymbol",
             "kimi_cli.tools.file:WriteFile",
             "kimi_cli.tools.file:StrReplaceFile",
             "kimi_cli.tools.web:SearchWeb",
@@ -159,9 +163,11 @@ agent:
                 "kimi_cli.tools.todo:SetTodoList",
                 "kimi_cli.tools.shell:Shell",
                 "kimi_cli.tools.file:ReadFile",
+                "kimi_cli.tools.file:ReadFiles",
                 "kimi_cli.tools.file:ReadMediaFile",
                 "kimi_cli.tools.file:Glob",
                 "kimi_cli.tools.file:Grep",
+                "kimi_cli.tools.file:FindSymbol",
                 "kimi_cli.tools.file:WriteFile",
                 "kimi_cli.tools.file:StrReplaceFile",
                 "kimi_cli.tools.web:SearchWeb",
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+import httpx
+import pytest
+from kaos.path import KaosPath
+from starlette.applications import Starlette
+from starlette.routing import WebSocketRoute
+from starlette.websockets import WebSocket
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+from kimi_cli.session import Session as KimiCLISession
+from kimi_cli.web.app import create_app
+from kimi_cli.web.models import SessionStatus
+from kimi_cli.web.runner import process as process_module
+from kimi_cli.web.runner.coordination import SharedSessionStatus, SQLiteCoordinator
+from kimi_cli.web.runner.peers import FORWARDED_HEADER, PeerListener, forward_websocket
+from kimi_cli.web.runner.process import KimiCLIRunner
+
+
+def _status(session_id, state) -> SharedSessionStatus:
+    return SharedSessionStatus(
+        status=SessionStatus(
+            session_id=session_id, state=state, seq=1, updated_at=datetime.now(UTC)
+        ),
+        is_running=True,
+    )
+
+
+async def test_sessions_are_owned_by_one_server(tmp_path: Path):
+    db_file = tmp_path / "coordination.db"
+    first = SQLiteCoordinator(db_file)
+    second = SQLiteCoordinator(db_file, server_ttl=0.5)
+    await first.register("http://127.0.0.1:1")
+    await second.register("http://127.0.0.1:2")
+    assert {(server.server_id, server.url) for server in await second.servers()} == {
+        (first.server_id, "http://127.0.0.1:1"),
+        (second.server_id, "http://127.0.0.1:2"),
+    }
+    session_id = uuid4()
+
+    assert await first.claim(session_id) is None
+    assert await first.claim(session_id) is None
+    owner = await second.claim(session_id)
+    assert owner is not None
+    assert (owner.server_id, owner.url) == (first.server_id, "http://127.0.0.1:1")
+
+    await first.publish_statuses({session_id: _status(session_id, "busy")})
+    # Only the owner publishes the status of a session.
+    await second.publish_statuses({session_id: _status(session_id, "idle")})
+    statuses = await second.get_statuses([session_id, uuid4()])
+    assert list(statuses) == [session_id]
+    assert statuses[session_id].status.state == "busy"
+
+    # Sessions of a server that stopped sending heartbeats can be claimed by others.
+    await asyncio.sleep(0.6)
+    assert await second.get_statuses([session_id]) == {}
+    assert await second.heartbeat([]) == set()
+    assert await second.claim(session_id) is None
+    assert await first.heartbeat([session_id]) == {session_id}
+
+    await second.release([session_id])
+    assert await first.claim(session_id) is None
+    await first.unregister()
+    assert await second.claim(session_id) is None
+    assert [server.server_id for server in await second.servers()] == [second.server_id]
+
+
+async def _echo(ws: WebSocket) -> None:
+    await ws.accept()
+    await ws.send_text(f"forwarded by {ws.headers.get(FORWARDED_HEADER)}, {ws.url.query}")
+    async for text in ws.iter_text():
+        if text == "bye":
+            await ws.close(code=4000, reason="bye")
+            return
+        await ws.send_text(text.upper())
+
+
+@pytest.fixture
+async def upstream_url():
+    listener = PeerListener(Starlette(routes=[WebSocketRoute("/stream", _echo)]))
+    yield await listener.start()
+    await listener.close()
+
+
+async def test_websockets_are_forwarded_to_the_owner(upstream_url: str):
+    async def front(ws: WebSocket) -> None:
+        await ws.accept()
+        await forward_websocket(ws, upstream_url, server_id="front")
+
+    listener = PeerListener(Starlette(routes=[WebSocketRoute("/stream", front)]))
+    front_url = await listener.start()
+    try:
+        async with connect(front_url.replace("http", "ws") + "/stream?token=t") as ws:
+            assert await ws.recv() == "forwarded by front, token=t"
+            await ws.send("hello")
+            assert await ws.recv() == "HELLO"
+            await ws.send("bye")
+            with pytest.raises(ConnectionClosed):
+                await asyncio.wait_for(ws.recv(), 5)
+            assert ws.close_code == 4000
+    finally:
+        await listener.close()
+
+
+class _FakeStdin:
+    def write(self, data: bytes) -> None:
+        return None
+
+    async def drain(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+class _FakeWorker:
+    """A worker subprocess that takes prompts and never answers them."""
+
+    def __init__(self, session_dir: Path) -> None:
+        self.stdin = _FakeStdin()
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode: int | None = None
+        self.session_dir_existed_at_exit: bool | None = None
+        self._session_dir = session_dir
+        self._exited = asyncio.Event()
+
+    def terminate(self) -> None:
+        if self.returncode is None:
+            self.session_dir_existed_at_exit = self._session_dir.exists()
+            self.returncode = 0
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+            self._exited.set()
+
+    def kill(self) -> None:
+        self.terminate()
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        assert self.returncode is not None
+        return self.returncode
+
+
+@dataclass(slots=True)
+class _Server:
+    runner: KimiCLIRunner
+    coordinator: SQLiteCoordinator
+    url: str
+
+
+@dataclass(slots=True)
+class _Cluster:
+    """Two coordinated servers sharing the sessions and the coordination database."""
+
+    owner: _Server
+    other: _Server
+    session_id: UUID
+    session_dir: Path
+    workers: list[_FakeWorker]
+
+
+async def _wait_until(condition: Callable[[], Awaitable[bool]], timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not await condition():
+            await asyncio.sleep(0.02)
+
+
+@pytest.fixture
+async def cluster(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> AsyncIterator[_Cluster]:
+    monkeypatch.setenv("KIMI_SHARE_DIR", str(tmp_path / "share"))
+    monkeypatch.setattr(process_module, "HEARTBEAT_INTERVAL", 0.05)
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    session = await KimiCLISession.create(KaosPath.unsafe_from_local_path(work_dir))
+    workers: list[_FakeWorker] = []
+
+    async def fake_spawn_worker(session_arg: str) -> Any:
+        assert session_arg == session.id
+        workers.append(_FakeWorker(session.dir))
+        return workers[-1]
+
+    monkeypatch.setattr(process_module, "spawn_worker", fake_spawn_worker)
+
+    servers: list[_Server] = []
+    listeners: list[PeerListener] = []
+    for _ in range(2):
+        app = create_app(coordinate=False)
+        coordinator = SQLiteCoordinator(tmp_path / "coordination.db")
+        runner = KimiCLIRunner(coordinator=coordinator)
+        app.state.runner = runner
+        listeners.append(PeerListener(app))
+        url = await listeners[-1].start()
+        await coordinator.register(url)
+        runner.start()
+        servers.append(_Server(runner, coordinator, url))
+    try:
+        yield _Cluster(servers[0], servers[1], UUID(session.id), session.dir, workers)
+    finally:
+        for server, listener in zip(servers, listeners, strict=True):
+            await server.runner.stop()
+            await server.coordinator.unregister()
+            await listener.close()
+
+
+async def _open_stream(server: _Server, session_id: UUID) -> ClientConnection:
+    ws = await connect(f"{server.url.replace('http', 'ws')}/api/sessions/{session_id}/stream")
+    # The status snapshot is sent once the worker is started.
+    while '"session_status"' not in str(await asyncio.wait_for(ws.recv(), 5)):
+        pass
+    return ws
+
+
+async def test_coordinated_runners_share_sessions(cluster: _Cluster):
+    owner, other, session_id = cluster.owner, cluster.other, cluster.session_id
+
+    # The first server to open a session owns it; the other forwards its websockets.
+    first = await _open_stream(owner, session_id)
+    second = await _open_stream(other, session_id)
+    async with first, second:
+        session = owner.runner.get_session(session_id)
+        assert session is not None and session.is_running
+        assert other.runner.get_session(session_id) is None
+        assert len(cluster.workers) == 1
+
+        async def both_attached() -> bool:
+            return session.websocket_count == 2
+
+        await _wait_until(both_attached)
+
+        # Statuses are published by the owner and seen by every server.
+        statuses = await other.runner.get_statuses([session_id])
+        assert statuses[session_id].is_running
+        assert not await other.runner.is_busy(session_id)
+        prompt = {"jsonrpc": "2.0", "method": "prompt", "id": "1", "params": {}}
+        prompt["params"] = {"user_input": "hello"}
+        await second.send(json.dumps(prompt))
+
+        async def busy_elsewhere() -> bool:
+            return await other.runner.is_busy(session_id)
+
+        await _wait_until(busy_elsewhere)
+        assert session.is_busy
+
+        # A session taken over by another server is stopped on the next heartbeat,
+        # closing its websockets so that clients reconnect to the new owner.
+        await other.coordinator.release([session_id])
+        assert await other.runner.claim_session(session_id) is None
+
+        async def dropped() -> bool:
+            return owner.runner.get_session(session_id) is None
+
+        await _wait_until(dropped)
+        assert cluster.workers[0].returncode == 0
+        with pytest.raises(ConnectionClosed):
+            while True:
+                await asyncio.wait_for(first.recv(), 5)
+
+
+async def test_sessions_are_deleted_by_their_owner(cluster: _Cluster):
+    owner, other, session_id = cluster.owner, cluster.other, cluster.session_id
+
+    async with await _open_stream(owner, session_id):
+        async with httpx.AsyncClient(trust_env=False) as client:
+            response = await client.delete(f"{other.url}/api/sessions/{session_id}")
+        assert response.status_code == 200
+
+    # The owner stopped the worker of the session before removing its directory.
+    assert owner.runner.get_session(session_id) is None
+    assert cluster.workers[0].session_dir_existed_at_exit is True
+    assert not cluster.session_dir.exists()
+    assert await other.runner.get_statuses([session_id]) == {}
+    assert await other.runner.claim_session(session_id) is None
+
+
+async def test_metrics_of_every_server_can_be_scraped(cluster: _Cluster):
+    servers = [cluster.owner, cluster.other]
+    async with httpx.AsyncClient(trust_env=False) as client:
+        response = await client.get(f"{cluster.other.url}/metrics/targets")
+        targets = response.json()
+        assert sorted(targets, key=lambda target: target["labels"]["server"]) == sorted(
+            (
+                {
+                    "targets": [server.url.removeprefix("http://")],
+                    "labels": {"server": server.coordinator.server_id},
+                }
+                for server in servers
+            ),
+            key=lambda target: target["labels"]["server"],
+        )
+
+        for server in servers:
+            response = await client.get(f"{server.url}/metrics")
+            server_label = f'server="{server.coordinator.server_id}"'
+            assert f"kimi_web_session_workers{{{server_label}}} 0\n" in response.text
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+from kimi_cli.web import metrics
+from kimi_cli.web.metrics import Counter, Gauge, Histogram
+from kimi_cli.web.runner.process import KimiCLIRunner, SessionProcess
+from kimi_cli.wire.jsonrpc import JSONRPCEventMessage, encode_out_message, peek_out_message
+from kimi_cli.wire.types import StatusUpdate, StepBegin, TextPart, TokenUsage
+
+
+def _render(metric: metrics._Metric, const_labels: dict[str, str] | None = None) -> list[str]:
+    metrics.REGISTRY.remove(metric)
+    return metric.render(const_labels)
+
+
+def test_counter_and_gauge_render():
+    counter = Counter("test_total", "A counter.", ("kind",))
+    counter.inc("a")
+    counter.inc("b", amount=2.5)
+    counter.inc("a")
+    assert _render(counter) == [
+        "# HELP test_total A counter.",
+        "# TYPE test_total counter",
+        'test_total{kind="a"} 2',
+        'test_total{kind="b"} 2.5',
+    ]
+
+    gauge = Gauge("test_gauge", "A gauge.", ("state",))
+    gauge.set(3, 'quo"te')
+    gauge.clear()
+    gauge.set(1, "idle")
+    assert _render(gauge)[2:] == ['test_gauge{state="idle"} 1']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "A histogram.", buckets=(1.0, 5.0))
+    for value in (0.5, 1.0, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.count() == 4
+    assert _render(histogram)[2:] == [
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="5"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        "test_seconds_sum 14.5",
+        "test_seconds_count 4",
+    ]
+
+
+def test_const_labels_come_first():
+    histogram = Histogram("test_labeled_seconds", "A histogram.", ("kind",), buckets=(1.0,))
+    histogram.observe(0.5, "a")
+    assert _render(histogram, {"server": "s1"})[2:] == [
+        'test_labeled_seconds_bucket{server="s1",kind="a",le="1"} 1',
+        'test_labeled_seconds_bucket{server="s1",kind="a",le="+Inf"} 1',
+        'test_labeled_seconds_sum{server="s1",kind="a"} 0.5',
+        'test_labeled_seconds_count{server="s1",kind="a"} 1',
+    ]
+
+    gauge = Gauge("test_labeled_gauge", "A gauge.")
+    gauge.set(2)
+    assert _render(gauge, {"server": "s1"})[2:] == ['test_labeled_gauge{server="s1"} 2']
+
+
+def test_llm_metrics_from_wire_events():
+    session = SessionProcess(uuid4())
+    first_tokens = metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.count()
+    throughputs = metrics.LLM_OUTPUT_TOKENS_PER_SECOND.count()
+    output_tokens = metrics.LLM_TOKENS.value("output")
+
+    for msg in (
+        StepBegin(n=1),
+        TextPart(text="Hello"),
+        TextPart(text=" world"),
+        StatusUpdate(token_usage=TokenUsage(input_other=10, output=2)),
+    ):
+        line = encode_out_message(JSONRPCEventMessage(params=msg))
+        session._record_event(peek_out_message(line).type, line)
+
+    assert metrics.LLM_TIME_TO_FIRST_TOKEN_SECONDS.count() == first_tokens + 1
+    assert metrics.LLM_OUTPUT_TOKENS_PER_SECOND.count() == throughputs + 1
+    assert metrics.LLM_TOKENS.value("output") == output_tokens + 2
+
+
+def test_runner_gauges():
+    runner = KimiCLIRunner()
+    runner._sessions[uuid4()] = SessionProcess(uuid4())
+    runner.update_metrics()
+    assert metrics.SESSIONS.value("stopped") == 1
+    assert metrics.SESSION_WORKERS.value() == 0
+    assert metrics.PROMPTS_IN_FLIGHT.value() == 0
+    text = metrics.render_metrics()
+    assert 'kimi_web_sessions{state="stopped"} 1\n' in text
+    assert "# TYPE kimi_web_prompt_seconds histogram\n" in text
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from kimi_cli.web.api.sessions import (
+    _is_user_turn,  # pyright: ignore[reportPrivateUsage]
+    _LineIndex,  # pyright: ignore[reportPrivateUsage]
+    _referenced_videos,  # pyright: ignore[reportPrivateUsage]
+    _video_names,  # pyright: ignore[reportPrivateUsage]
+    context_offset_after_turn,
+    wire_offset_after_turn,
+)
+from kimi_cli.wire.file import WireFile, WireFileMetadata, WireMessageRecord
+from kimi_cli.wire.protocol import WIRE_PROTOCOL_VERSION
+from kimi_cli.wire.types import (
+    StatusUpdate,
+    TextPart,
+    TurnBegin,
+    TurnEnd,
+    WireMessage,
+)
+
+
+def _lines(path: Path, end: int) -> list[str]:
+    return path.read_bytes()[:end].decode().splitlines()
+
+
+def _record(msg: WireMessage) -> str:
+    return WireMessageRecord.from_wire_message(msg, timestamp=0).model_dump_json()
+
+
+async def test_wire_offset_after_turn(tmp_path: Path):
+    wire_path = tmp_path / "wire.jsonl"
+    header = WireFileMetadata(protocol_version=WIRE_PROTOCOL_VERSION).model_dump_json()
+    before = _record(StatusUpdate(context_usage=0.1))
+    turns = [
+        [
+            _record(TurnBegin(user_input=f"turn {i}")),
+            _record(TextPart(text=f'"TurnEnd" in turn {i}')),
+            _record(TurnEnd()),
+        ]
+        for i in range(3)
+    ]
+    after_end = _record(StatusUpdate(context_usage=0.5))
+    lines = [header, before, *turns[0], after_end, *turns[1], *turns[2][:2]]
+    wire_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    wire_file = WireFile(wire_path)
+
+    # Records before the first turn are kept, records after its TurnEnd are not.
+    end = await wire_offset_after_turn(wire_file, 0)
+    assert _lines(wire_path, end) == [header, before, *turns[0]]
+    end = await wire_offset_after_turn(wire_file, 1)
+    assert _lines(wire_path, end) == [header, before, *turns[0], after_end, *turns[1]]
+    # The last turn has not ended yet.
+    end = await wire_offset_after_turn(wire_file, 2)
+    assert end == wire_path.stat().st_size
+    with pytest.raises(ValueError, match="out of range"):
+        await wire_offset_after_turn(wire_file, 3)
+
+
+def test_context_offset_after_turn(tmp_path: Path):
+    context_path = tmp_path / "context.jsonl"
+    records = [
+        {"role": "_checkpoint", "id": 0},
+        {"role": "user", "content": "<system>CHECKPOINT 0</system>"},
+        {"role": "user", "content": "first"},
+        {"role": "assistant", "content": "the user said first"},
+        {"role": "_checkpoint", "id": 1},
+        {"role": "user", "content": [{"type": "text", "text": "<system>CHECKPOINT 1</system>"}]},
+        {"role": "user", "content": [{"type": "text", "text": "second"}]},
+        {"role": "assistant", "content": "ok"},
+    ]
+    lines = [json.dumps(record) for record in records]
+    context_path.write_text("\n".join(lines[:4]) + "\n", encoding="utf-8")
+    context_turns = _LineIndex(context_path, _is_user_turn)
+    assert _lines(context_path, context_offset_after_turn(context_turns, 0)) == lines[:4]
+
+    # Only the appended lines are scanned.
+    with context_path.open("a", encoding="utf-8") as f:
+        f.write("\n".join(lines[4:]) + "\n")
+    assert _lines(context_path, context_offset_after_turn(context_turns, 0)) == lines[:6]
+    assert _lines(context_path, context_offset_after_turn(context_turns, 1)) == lines
+    assert _lines(context_path, context_offset_after_turn(context_turns, 5)) == lines
+
+    # A rotated context is indexed from scratch.
+    context_path.unlink()
+    context_path.write_text("\n".join(lines[6:]) + "\n", encoding="utf-8")
+    assert _lines(context_path, context_offset_after_turn(context_turns, 0)) == lines[6:]
+    missing = _LineIndex(tmp_path / "missing.jsonl", _is_user_turn)
+    assert context_offset_after_turn(missing, 0) == 0
+
+
+def test_referenced_videos(tmp_path: Path):
+    wire_path = tmp_path / "wire.jsonl"
+    lines = [
+        _record(
+            TurnBegin(
+                user_input=[
+                    TextPart(
+                        text='<video path="/s/uploads/my clip_1a2b3c.mp4" content_type="video/mp4">'
+                    ),
+                    TextPart(text="</video>"),
+                ]
+            )
+        ),
+        _record(TextPart(text="uploads/notes.mp4 is mentioned, not attached")),
+        _record(TurnBegin(user_input=r'<video path="C:\s\uploads\win.webm"></video> again')),
+    ]
+    wire_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    for name in ["my clip_1a2b3c.mp4", "win.webm", "notes.mp4", "unused.mp4", "photo.png"]:
+        (uploads / name).write_bytes(b"")
+    videos = _LineIndex(wire_path, _video_names)
+
+    assert _referenced_videos(uploads, videos, wire_path.stat().st_size) == [
+        uploads / "my clip_1a2b3c.mp4",
+        uploads / "win.webm",
+    ]
+    first_turn_end = len(lines[0]) + 1
+    assert _referenced_videos(uploads, videos, first_turn_end) == [uploads / "my clip_1a2b3c.mp4"]
+
+
+def test_referenced_videos_without_video_uploads(tmp_path: Path):
+    wire_path = tmp_path / "wire.jsonl"
+    wire_path.write_text(_record(TurnBegin(user_input='<video path="/a.mp4">')) + "\n")
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "photo.png").write_bytes(b"")
+    scanned: list[bytes] = []
+
+    def parse(line: bytes) -> list[str]:
+        scanned.append(line)
+        return _video_names(line)
+
+    videos = _LineIndex(wire_path, parse)
+    assert _referenced_videos(uploads, videos, wire_path.stat().st_size) == []
+    assert _referenced_videos(tmp_path / "missing", videos, wire_path.stat().st_size) == []
+    assert scanned == []
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from kosong.message import ToolCall
+
+from kimi_cli.metadata import Metadata, WorkDirMeta, save_metadata
+from kimi_cli.web.store import index
+from kimi_cli.web.store.sessions import (
+    SessionMetadata,
+    index_transcripts,
+    invalidate_sessions_cache,
+    load_session_by_id,
+    load_sessions_page,
+    run_auto_archive,
+    save_session_metadata,
+    search_sessions,
+)
+from kimi_cli.wire.file import WireMessageRecord
+from kimi_cli.wire.types import TextPart, TurnBegin, WireMessage
+
+
+@pytest.fixture
+def work_dirs(monkeypatch, tmp_path: Path) -> list[WorkDirMeta]:
+    monkeypatch.setenv("KIMI_SHARE_DIR", str(tmp_path / "share"))
+    monkeypatch.setattr("kimi_cli.web.store.sessions._last_auto_archive_time", 0.0)
+    work_dirs = [
+        WorkDirMeta(path=str(tmp_path / "alpha")),
+        WorkDirMeta(path=str(tmp_path / "Beta")),
+    ]
+    save_metadata(Metadata(work_dirs=work_dirs))
+    invalidate_sessions_cache()
+    return work_dirs
+
+
+def _create_session(wd: WorkDirMeta, title: str | None, *, mtime: float) -> UUID:
+    session_id = uuid4()
+    session_dir = wd.sessions_dir / str(session_id)
+    session_dir.mkdir()
+    context_file = session_dir / "context.jsonl"
+    context_file.write_text('{"role": "user", "content": "hi"}\n', encoding="utf-8")
+    os.utime(context_file, (mtime, mtime))
+    if title is not None:
+        save_session_metadata(session_dir, SessionMetadata(session_id=str(session_id), title=title))
+    return session_id
+
+
+def _append_wire(wd: WorkDirMeta, session_id: UUID, *messages: WireMessage) -> None:
+    session_dir = wd.sessions_dir / str(session_id)
+    with (session_dir / "wire.jsonl").open("a", encoding="utf-8") as f:
+        for msg in messages:
+            record = WireMessageRecord.from_wire_message(msg, timestamp=time.time())
+            f.write(record.model_dump_json() + "\n")
+    # Transcripts are looked at again when the context file changes.
+    context_file = session_dir / "context.jsonl"
+    with context_file.open("a", encoding="utf-8") as f:
+        f.write("{}\n")
+    mtime = context_file.stat().st_mtime + 1
+    os.utime(context_file, (mtime, mtime))
+    invalidate_sessions_cache()
+
+
+def _titles(**kwargs) -> list[str]:
+    return [session.title for session in load_sessions_page(**kwargs)]
+
+
+def test_sessions_are_listed_from_index(work_dirs: list[WorkDirMeta]):
+    alpha, beta = work_dirs
+    now = time.time()
+    first = _create_session(alpha, "First", mtime=now - 30)
+    _create_session(beta, "Second", mtime=now - 20)
+    _create_session(alpha, "Third Ünïcode", mtime=now - 10)
+
+    assert _titles() == ["Third Ünïcode", "Second", "First"]
+    assert _titles(limit=1, offset=1) == ["Second"]
+    assert _titles(query="ÜNÏ") == ["Third Ünïcode"]
+    assert _titles(query="beta") == ["Second"]
+    assert len(index.query_sessions()) == 3
+
+    session = load_session_by_id(first)
+    assert session is not None
+    assert session.work_dir == alpha.path
+    assert load_session_by_id(uuid4()) is None
+
+
+def test_index_follows_changes_on_disk(work_dirs: list[WorkDirMeta]):
+    alpha, _ = work_dirs
+    now = time.time()
+    kept = _create_session(alpha, "Kept", mtime=now - 20)
+    removed = _create_session(alpha, "Removed", mtime=now - 10)
+    assert _titles() == ["Removed", "Kept"]
+
+    # Changes made by other processes show up once the index is reconciled.
+    session_dir = alpha.sessions_dir / str(kept)
+    (session_dir / "metadata.json").write_text(
+        json.dumps({"session_id": str(kept), "title": "Renamed", "archived": True}),
+        encoding="utf-8",
+    )
+    for path in (alpha.sessions_dir / str(removed)).iterdir():
+        path.unlink()
+    (alpha.sessions_dir / str(removed)).rmdir()
+    invalidate_sessions_cache()
+    assert _titles() == []
+    assert _titles(archived=True) == ["Renamed"]
+
+    # Metadata written through the store updates the index right away.
+    metadata = SessionMetadata(session_id=str(kept), title="Restored")
+    save_session_metadata(session_dir, metadata)
+    assert _titles() == ["Restored"]
+
+
+def test_session_lookup_is_served_from_index(
+    work_dirs: list[WorkDirMeta], monkeypatch: pytest.MonkeyPatch
+):
+    alpha, _ = work_dirs
+    session_id = _create_session(alpha, "Indexed", mtime=time.time() - 10)
+    assert _titles() == ["Indexed"]
+
+    upserted: list[str] = []
+    upsert_sessions = index.upsert_sessions
+
+    def record_upsert(rows: list[index.IndexedSession]) -> None:
+        upserted.extend(row.title for row in rows)
+        upsert_sessions(rows)
+
+    monkeypatch.setattr(index, "upsert_sessions", record_upsert)
+    for _ in range(3):
+        session = load_session_by_id(session_id)
+        assert session is not None and session.title == "Indexed"
+    assert upserted == []
+
+    # A session changed on disk is indexed again.
+    session_dir = alpha.sessions_dir / str(session_id)
+    metadata_file = session_dir / "metadata.json"
+    metadata_file.write_text(
+        json.dumps({"session_id": str(session_id), "title": "Changed"}), encoding="utf-8"
+    )
+    mtime = metadata_file.stat().st_mtime + 1
+    os.utime(metadata_file, (mtime, mtime))
+    session = load_session_by_id(session_id)
+    assert session is not None and session.title == "Changed"
+    assert upserted == ["Changed"]
+
+
+def test_auto_archive_uses_index(work_dirs: list[WorkDirMeta]):
+    alpha, _ = work_dirs
+    now = time.time()
+    _create_session(alpha, "Old", mtime=now - 30 * 24 * 60 * 60)
+    _create_session(alpha, "Recent", mtime=now - 60)
+
+    assert run_auto_archive() == 1
+    assert _titles() == ["Recent"]
+    assert _titles(archived=True) == ["Old"]
+
+
+def test_corrupt_index_is_rebuilt(work_dirs: list[WorkDirMeta]):
+    alpha, _ = work_dirs
+    _create_session(alpha, "Only", mtime=time.time())
+    assert _titles() == ["Only"]
+
+    index_file = index.get_session_index_file()
+    index._initialized.pop(index_file, None)
+    index_file.write_bytes(b"not a database" * 100)
+    invalidate_sessions_cache()
+    assert _titles() == ["Only"]
+
+
+def test_search_session_transcripts(work_dirs: list[WorkDirMeta]):
+    alpha, beta = work_dirs
+    now = time.time()
+    parser = _create_session(alpha, "Parser", mtime=now - 20)
+    deploy = _create_session(beta, "Deploy", mtime=now - 10)
+    _append_wire(
+        alpha,
+        parser,
+        TurnBegin(user_input="Why does the parser raise a TypeError?"),
+        TextPart(text="The tokenizer returns "),
+        TextPart(text="None for empty input."),
+        ToolCall(id="1", function=ToolCall.FunctionBody(name="ReadFile", arguments="{}")),
+    )
+    _append_wire(beta, deploy, TurnBegin(user_input="Deploy the 错误处理 fix"))
+
+    def search(query: str) -> list[str]:
+        return [result.session.title for result in search_sessions(query)]
+
+    # Searches only see what has been indexed so far.
+    assert search("typeerror") == []
+    index_transcripts()
+    assert search("typeerror") == ["Parser"]
+    assert search("returns None") == ["Parser"]
+    assert search("readfile") == ["Parser"]
+    assert search("错误处") == ["Deploy"]
+    assert search("fix typeerror") == []
+    assert search("no") == []
+
+    # Appended turns are indexed incrementally.
+    _append_wire(beta, deploy, TurnBegin(user_input="Now the tokenizer, too"))
+    index_transcripts()
+    assert sorted(search("tokenizer")) == ["Deploy", "Parser"]
+    result = search_sessions("empty input")[0]
+    assert "None for empty input" in result.snippet
+
+    save_session_metadata(
+        alpha.sessions_dir / str(parser),
+        SessionMetadata(session_id=str(parser), title="Parser", archived=True),
+    )
+    assert search("tokenizer") == ["Deploy"]
+    assert [r.session.title for r in search_sessions("tokenizer", archived=True)] == ["Parser"]
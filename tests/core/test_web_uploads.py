@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import base64
+import io
+import json
+from pathlib import Path
+
+import pytest
+from kosong.message import ImageURLPart, TextPart
+from PIL import Image
+
+from kimi_cli.web.runner import uploads
+from kimi_cli.web.runner.uploads import UploadManifest, encode_uploads
+
+
+def _png(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    monkeypatch.setattr(uploads, "model_capabilities", lambda: {"image_in"})
+    monkeypatch.setattr(uploads, "_image_cache", uploads._ImageCache(1024 * 1024))
+
+
+def test_manifest_skips_sent_uploads(tmp_path: Path):
+    uploads_dir = tmp_path / "uploads"
+    uploads_dir.mkdir()
+    (uploads_dir / "a.txt").write_text("a")
+    (uploads_dir / "b.txt").write_text("b")
+    (uploads_dir / ".sent").write_text(json.dumps(["a.txt"]))
+
+    manifest = UploadManifest(uploads_dir)
+    files = manifest.pending()
+    assert [f.name for f in files] == ["b.txt"]
+    manifest.mark_sent(files)
+    assert manifest.pending() == []
+
+    (uploads_dir / "c.txt").write_text("c")
+    assert [f.name for f in manifest.pending()] == ["c.txt"]
+    assert UploadManifest(tmp_path / "missing").pending() == []
+
+
+def test_encode_uploads(tmp_path: Path, vision):
+    (tmp_path / "notes.md").write_text("# Notes")
+    (tmp_path / "big.png").write_bytes(_png((5000, 100)))
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+
+    parts = encode_uploads(sorted(tmp_path.iterdir()))
+    assert isinstance(parts[0], TextPart)
+    assert parts[0].text.startswith("<uploaded_files>\n1. ")
+    images = [part for part in parts if isinstance(part, ImageURLPart)]
+    assert len(images) == 1
+    data = images[0].image_url.url.removeprefix("data:image/png;base64,")
+    with Image.open(io.BytesIO(base64.b64decode(data))) as img:
+        assert img.size == (uploads.MAX_IMAGE_SIDE, 81)
+    assert TextPart(text="# Notes") in parts
+    # Images that fail to encode are only listed.
+    assert not any(
+        isinstance(p, TextPart)
+        and p.text.startswith('<image path="' + str(tmp_path / "broken.png"))
+        for p in parts
+    )
+
+
+def test_images_are_encoded_once(monkeypatch, vision):
+    content = _png((10, 10))
+    url = uploads.encode_image(content)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("image encoded again")
+
+    monkeypatch.setattr(uploads.Image, "open", fail)
+    assert uploads.encode_image(content) == url
+
+
+def test_image_cache_is_bounded():
+    cache = uploads._ImageCache(10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    assert cache.get("a") == "12345"
+    cache.put("c", "12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "12345"
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, cast
+
+from starlette.websockets import WebSocket, WebSocketState
+
+from kimi_cli.web.runner.outbox import SLOW_CLIENT_CLOSE_CODE, WebSocketOutbox
+from kimi_cli.wire.jsonrpc import JSONRPCEventMessage, encode_out_message
+from kimi_cli.wire.types import TextPart, TurnBegin
+
+
+class _FakeWebSocket:
+    def __init__(self) -> None:
+        self.client = None
+        self.client_state = WebSocketState.CONNECTED
+        self.sent: list[str] = []
+        self.closed_with: int | None = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send_text(self, data: str) -> None:
+        await self.gate.wait()
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.closed_with = code
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+def _event(msg: Any) -> str:
+    return encode_out_message(JSONRPCEventMessage(params=msg)).decode().rstrip("\n")
+
+
+def _outbox(ws: _FakeWebSocket, **kwargs: Any) -> tuple[WebSocketOutbox, list[WebSocket]]:
+    disconnected: list[WebSocket] = []
+
+    async def on_disconnect(ws: WebSocket) -> None:
+        disconnected.append(ws)
+
+    outbox = WebSocketOutbox(cast(WebSocket, ws), on_disconnect=on_disconnect, **kwargs)
+    return outbox, disconnected
+
+
+async def test_outbox_holds_until_released():
+    ws = _FakeWebSocket()
+    outbox, _ = _outbox(ws)
+    outbox.put("a")
+    outbox.put("b")
+    await asyncio.sleep(0)
+    assert ws.sent == []
+    assert outbox.lag.queued_messages == 2
+
+    outbox.release()
+    await asyncio.sleep(0)
+    assert ws.sent == ["a", "b"]
+    outbox.put("c")
+    await asyncio.sleep(0)
+    assert ws.sent == ["a", "b", "c"]
+    assert outbox.lag.queued_messages == 0
+    await outbox.close()
+
+
+async def test_outbox_coalesces_deltas_on_overflow():
+    ws = _FakeWebSocket()
+    ws.gate.clear()
+    deltas = [_event(TextPart(text=f"chunk {i} ")) for i in range(20)]
+    outbox, disconnected = _outbox(ws, max_queued_bytes=sum(map(len, deltas)) - 1)
+
+    outbox.put(_event(TurnBegin(user_input="hi")), is_event=True)
+    for delta in deltas:
+        outbox.put(delta, is_event=True)
+    outbox.put('{"jsonrpc":"2.0","id":"1","result":{}}')
+    lag = outbox.lag
+    assert lag.queued_messages == 3
+    assert lag.dropped_messages == 0
+
+    outbox.release()
+    ws.gate.set()
+    await asyncio.sleep(0)
+    assert ws.sent == [
+        _event(TurnBegin(user_input="hi")),
+        _event(TextPart(text="".join(f"chunk {i} " for i in range(20)))),
+        '{"jsonrpc":"2.0","id":"1","result":{}}',
+    ]
+    assert disconnected == []
+    await outbox.close()
+
+
+async def test_outbox_drop_keeps_responses():
+    ws = _FakeWebSocket()
+    outbox, _ = _outbox(ws, max_queued_bytes=100, overflow="drop")
+    response = '{"jsonrpc":"2.0","id":"1","result":{}}'
+    outbox.put(response)
+    for _ in range(10):
+        outbox.put(_event(TurnBegin(user_input="hi")), is_event=True)
+    assert outbox.lag.dropped_messages > 0
+    assert outbox.lag.queued_bytes <= 100
+
+    outbox.release()
+    await asyncio.sleep(0)
+    assert ws.sent[0] == response
+    await outbox.close()
+
+
+async def test_outbox_disconnects_slow_client():
+    ws = _FakeWebSocket()
+    outbox, disconnected = _outbox(ws, max_queued_bytes=10, overflow="disconnect")
+    outbox.put("x" * 11)
+    await asyncio.sleep(0)
+    assert ws.closed_with == SLOW_CLIENT_CLOSE_CODE
+    assert disconnected == [ws]
+    outbox.put("ignored")
+    assert outbox.lag.queued_messages == 0
@@ -0,0 +1,125 @@
+import base64
+
+import pytest
+from kosong.utils.typing import JsonType
+
+from kimi_cli.wire import cbor
+from kimi_cli.wire.jsonrpc import JSONRPCEventMessage, JSONRPCInMessageAdapter, JSONRPCPromptMessage
+from kimi_cli.wire.types import ImageURLPart, TextPart
+
+
+def test_cbor_roundtrip():
+    value = {
+        "jsonrpc": "2.0",
+        "id": "1",
+        "params": {
+            "ints": [0, 23, 24, 255, 256, 65536, 2**32, -1, -25, -(2**40)],
+            "floats": [0.5, -1.25, 1e300],
+            "text": "héllo, 世界",
+            "flags": [True, False, None],
+            "nested": {"empty_list": [], "empty_map": {}, "empty_text": ""},
+        },
+    }
+    assert cbor.loads(cbor.dumps(value)) == value
+
+
+def test_cbor_rfc_examples():
+    # Appendix A of RFC 8949.
+    assert cbor.dumps(1000000) == bytes.fromhex("1a000f4240")
+    assert cbor.dumps(-100) == bytes.fromhex("3863")
+    assert cbor.dumps("IETF") == bytes.fromhex("6449455446")
+    assert cbor.dumps([1, [2, 3]]) == bytes.fromhex("8201820203")
+    assert cbor.dumps({"a": 1}) == bytes.fromhex("a1616101")
+    assert cbor.loads(bytes.fromhex("f93c00")) == 1.0
+    assert cbor.loads(bytes.fromhex("fa47c35000")) == 100000.0
+
+
+def test_cbor_data_url_travels_as_raw_bytes():
+    image = bytes(range(256)) * 64
+    url = "data:image/png;base64," + base64.b64encode(image).decode("ascii")
+
+    part = {"type": "image_url", "image_url": {"url": url, "id": None}}
+    encoded = cbor.dumps(part)
+    assert image in encoded
+    assert len(encoded) < len(url)
+    assert b"Content-Type: image/png\r\n\r\n" in encoded
+    assert cbor.loads(encoded) == part
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        # Data URLs outside media parts stay strings.
+        {"text": "data:image/png;base64,AAAA"},
+        {"url": "data:image/png;base64,AAAA"},
+        # Not base64 after all.
+        {"image_url": {"url": "data:text/plain;base64,not base64!"}},
+        # Non-canonical base64 would not decode back to the same string.
+        {"image_url": {"url": "data:image/png;base64,AB=="}},
+        # MIME types that are not RFC 2045 tokens.
+        {"image_url": {"url": "data:imäge/png;base64,AAAA"}},
+        {"image_url": {"url": "data:image/png\r\nX-Injected: 1;base64,AAAA"}},
+        {"image_url": {"url": "data:image;base64,AAAA"}},
+    ],
+)
+def test_cbor_data_url_kept_as_text(value: JsonType):
+    encoded = cbor.dumps(value)
+    assert b"Content-Type" not in encoded
+    assert cbor.loads(encoded) == value
+
+
+def test_cbor_wire_messages():
+    image_url = "data:image/jpeg;base64," + base64.b64encode(b"\xff\xd8\xff\xe0jpeg").decode()
+    event = JSONRPCEventMessage(params=ImageURLPart(image_url=ImageURLPart.ImageURL(url=image_url)))
+    data = event.model_dump(mode="json")
+    assert cbor.loads(cbor.dumps(data)) == data
+
+    prompt = JSONRPCInMessageAdapter.validate_python(
+        cbor.loads(
+            cbor.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": "p-1",
+                    "method": "prompt",
+                    "params": {
+                        "user_input": [
+                            {"type": "text", "text": "what is this?"},
+                            {"type": "image_url", "image_url": {"url": image_url}},
+                        ]
+                    },
+                }
+            )
+        )
+    )
+    assert isinstance(prompt, JSONRPCPromptMessage)
+    assert prompt.params.user_input == [
+        TextPart(text="what is this?"),
+        ImageURLPart(image_url=ImageURLPart.ImageURL(url=image_url)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        bytes.fromhex("6449"),  # truncated text
+        bytes.fromhex("4401020304"),  # bare byte string
+        bytes.fromhex("9f01ff"),  # indefinite-length array
+        bytes.fromhex("a10101"),  # non-text map key
+        bytes.fromhex("0101"),  # trailing bytes
+        bytes.fromhex("81") * 100_000 + bytes.fromhex("00"),  # deeply nested arrays
+        bytes.fromhex("d820") * 100_000 + bytes.fromhex("00"),  # deeply nested tags
+    ],
+)
+def test_cbor_rejects_invalid_input(data: bytes):
+    with pytest.raises(cbor.CBORDecodeError):
+        cbor.loads(data)
+
+
+def test_cbor_nesting_depth():
+    nested: JsonType = [0]
+    for _ in range(cbor.MAX_NESTING_DEPTH - 1):
+        nested = [nested]
+    assert cbor.loads(cbor.dumps(nested)) == nested
+    with pytest.raises(cbor.CBORDecodeError):
+        cbor.loads(cbor.dumps([nested]))
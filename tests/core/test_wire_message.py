@@ -1,12 +1,31 @@
 import inspect
+import json
+import os
 from pathlib import Path
 
 import pytest
 from inline_snapshot import snapshot
 from pydantic import BaseModel
 
-from kimi_cli.wire.file import WireMessageRecord
-from kimi_cli.wire.serde import deserialize_wire_message, serialize_wire_message
+from kimi_cli.wire.file import WireFile, WireMessageRecord
+from kimi_cli.wire.jsonrpc import (
+    JSONRPCCancelMessage,
+    JSONRPCErrorObject,
+    JSONRPCErrorResponse,
+    JSONRPCEventMessage,
+    JSONRPCOutMessage,
+    JSONRPCPromptMessage,
+    JSONRPCRequestMessage,
+    JSONRPCSuccessResponse,
+    decode_in_message,
+    encode_out_message,
+    peek_out_message,
+)
+from kimi_cli.wire.serde import (
+    deserialize_wire_message,
+    serialize_wire_message,
+    serialize_wire_message_json,
+)
 from kimi_cli.wire.types import (
     ApprovalRequest,
     ApprovalResponse,
@@ -288,6 +307,105 @@ async def test_approval_request_deserialize_without_display():
     assert msg.display == []
 
 
+def test_wire_message_json_matches_envelope():
+    messages: list[WireMessage] = [
+        TurnBegin(user_input=[TextPart(text="你好"), TextPart(text='quote " and \\ slash')]),
+        TurnEnd(stats_text="1 step"),
+        StepBegin(n=3),
+        TextPart(text="Hello"),
+        ToolCall(
+            id="call_1",
+            function=ToolCall.FunctionBody(name="Shell", arguments='{"command": "ls"}'),
+        ),
+        ToolCallPart(arguments_part=None),
+        ToolResult(
+            tool_call_id="call_1",
+            return_value=ToolReturnValue(
+                is_error=False,
+                output="ok",
+                message="done",
+                display=[BriefDisplayBlock(text="done")],
+            ),
+        ),
+        SubagentEvent(task_tool_call_id="task_1", event=TextPart(text="from subagent")),
+        ApprovalRequest(
+            id="approval_1",
+            tool_call_id="call_1",
+            sender="Shell",
+            action="run command",
+            description="Run `ls`",
+        ),
+    ]
+    for msg in messages:
+        assert json.loads(serialize_wire_message_json(msg)) == serialize_wire_message(msg)
+
+
+def test_encode_out_message_matches_model_dump():
+    request = ToolCallRequest(id="call_ü", name="open_in_ide", arguments="{}")
+    messages: list[JSONRPCOutMessage] = [
+        JSONRPCEventMessage(params=TextPart(text="Hello, 世界")),
+        JSONRPCEventMessage(params=StatusUpdate(context_usage=0.5)),
+        JSONRPCRequestMessage(id=request.id, params=request),
+        JSONRPCSuccessResponse(id="1", result={"status": "finished"}),
+        JSONRPCErrorResponse(id="2", error=JSONRPCErrorObject(code=-32000, message="busy")),
+    ]
+    for msg in messages:
+        encoded = encode_out_message(msg)
+        assert encoded.endswith(b"\n")
+        assert encoded.count(b"\n") == 1
+        assert encoded == msg.model_dump_json().encode("utf-8") + b"\n"
+
+
+def test_peek_out_message_reads_envelope():
+    request = ToolCallRequest(id="call_1", name="open_in_ide", arguments="{}")
+    messages: list[JSONRPCOutMessage] = [
+        JSONRPCEventMessage(params=TextPart(text="Hello, 世界")),
+        JSONRPCRequestMessage(id=request.id, params=request),
+        JSONRPCSuccessResponse(id="1", result={"status": "finished"}),
+        JSONRPCErrorResponse(id="2", error=JSONRPCErrorObject(code=-32000, message="busy")),
+    ]
+    assert [tuple(peek_out_message(encode_out_message(msg))) for msg in messages] == [
+        ("event", None, "ContentPart", False),
+        ("request", "call_1", "ToolCallRequest", False),
+        (None, "1", None, False),
+        (None, "2", None, True),
+    ]
+    # Lines not written by `encode_out_message` are parsed in full.
+    assert tuple(
+        peek_out_message(b'{"method": "event", "params": {"type": "TurnBegin"}, "jsonrpc": "2.0"}')
+    ) == ("event", None, "TurnBegin", False)
+    for line in (b"not json", b"[]"):
+        with pytest.raises(ValueError):
+            peek_out_message(line)
+
+
+def test_decode_in_message_dispatches_on_method():
+    prompt = decode_in_message(
+        '{"jsonrpc": "2.0", "id": "1", "method": "prompt", "params": {"user_input": "hi"}}'
+    )
+    assert isinstance(prompt, JSONRPCPromptMessage)
+    assert prompt.params.user_input == "hi"
+
+    cancel = decode_in_message(b'{"jsonrpc": "2.0", "id": "2", "method": "cancel"}')
+    assert isinstance(cancel, JSONRPCCancelMessage)
+
+    result = decode_in_message('{"jsonrpc": "2.0", "id": "3", "result": {}}')
+    assert isinstance(result, JSONRPCSuccessResponse)
+
+    error = decode_in_message(
+        '{"jsonrpc": "2.0", "id": "4", "error": {"code": -32603, "message": "boom"}}'
+    )
+    assert isinstance(error, JSONRPCErrorResponse)
+
+    for bad in (
+        "not json",
+        '{"jsonrpc": "2.0", "id": "5", "method": "event", "params": {}}',
+        '{"jsonrpc": "2.0", "id": "6", "method": "prompt", "params": {}}',
+    ):
+        with pytest.raises(ValueError):
+            decode_in_message(bad)
+
+
 def test_wire_message_record_roundtrip():
     envelope = WireMessageEnvelope.from_wire_message(TurnBegin(user_input=[TextPart(text="hi")]))
     record = WireMessageRecord(timestamp=123.456, message=envelope)
@@ -307,6 +425,36 @@ def test_wire_message_record_roundtrip():
     assert parsed.to_wire_message() == TurnBegin(user_input=[TextPart(text="hi")])
 
 
+async def test_wire_file_turn_offsets(tmp_path: Path):
+    wire_file = WireFile(tmp_path / "wire.jsonl")
+    assert await wire_file.turn_offsets() == ([], 0)
+
+    await wire_file.append_message(StepBegin(n=1))
+    await wire_file.append_message(TurnBegin(user_input="first"))
+    await wire_file.append_message(TextPart(text='not a "TurnBegin"'))
+    await wire_file.append_message(TurnBegin(user_input="second"))
+    await wire_file.append_message(StepBegin(n=1))
+    offsets, size = await wire_file.turn_offsets()
+    assert size == wire_file.path.stat().st_size
+    # Records before the first `TurnBegin` form a turn of their own.
+    assert len(offsets) == 3
+
+    await wire_file.append_message(TurnBegin(user_input="third"))
+    offsets, size = await wire_file.turn_offsets()
+    assert len(offsets) == 4
+
+    turns = [
+        [record.to_wire_message() async for record in wire_file.iter_records(start=start, end=end)]
+        for start, end in zip(offsets, [*offsets[1:], size], strict=True)
+    ]
+    assert turns == [
+        [StepBegin(n=1)],
+        [TurnBegin(user_input="first"), TextPart(text='not a "TurnBegin"')],
+        [TurnBegin(user_input="second"), StepBegin(n=1)],
+        [TurnBegin(user_input="third")],
+    ]
+
+
 def test_bad_wire_message_serde():
     with pytest.raises(ValueError):
         deserialize_wire_message(None)
@@ -459,11 +607,11 @@ def test_wire_message_type_alias():
         assert type_ in module._WIRE_MESSAGE_TYPES
 
 
-def test_read_wire_lines_request_id(tmp_path: Path):
-    """Verify _read_wire_lines emits a top-level JSON-RPC ``id`` for request messages.
+def test_read_wire_chunk_request_id(tmp_path: Path):
+    """Verify _read_wire_chunk emits a top-level JSON-RPC ``id`` for request messages.
 
     wire.jsonl stores messages as ``{"type": "QuestionRequest", "payload": {"id": ..., ...}}``.
-    The ``id`` lives inside ``payload``, NOT at the top of ``message``.  _read_wire_lines
+    The ``id`` lives inside ``payload``, NOT at the top of ``message``.  _read_wire_chunk
     must extract it to the top-level ``id`` field of the JSON-RPC envelope so that the
     frontend client can correlate responses.
 
@@ -473,7 +621,7 @@ def test_read_wire_lines_request_id(tmp_path: Path):
     import json
     import time
 
-    from kimi_cli.web.api.sessions import _read_wire_lines
+    from kimi_cli.web.api.sessions import _read_wire_chunk
 
     # Build a realistic wire.jsonl with request and event messages
     wire_file = tmp_path / "wire.jsonl"
@@ -509,7 +657,7 @@ def test_read_wire_lines_request_id(tmp_path: Path):
     wire_file.write_text("\n".join(records) + "\n")
 
     # Parse
-    lines = _read_wire_lines(wire_file)
+    lines, _, _ = _read_wire_chunk(wire_file, 0)
     assert len(lines) == 3
 
     parsed = [json.loads(line) for line in lines]
@@ -531,3 +679,72 @@ def test_read_wire_lines_request_id(tmp_path: Path):
     approval_msg = parsed[2]
     assert approval_msg["method"] == "request"
     assert approval_msg["id"] == "a-def-456"
+
+
+async def test_replay_history_streams_cached_history(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    import time
+
+    from kimi_cli.web.api import sessions
+
+    read_offsets: list[int] = []
+    read_wire_chunk = sessions._read_wire_chunk  # type: ignore[reportPrivateUsage]
+
+    def tracking_read_wire_chunk(wire_file: Path, offset: int, max_bytes: int | None = None):
+        read_offsets.append(offset)
+        return read_wire_chunk(wire_file, offset, max_bytes)
+
+    monkeypatch.setattr(sessions, "_read_wire_chunk", tracking_read_wire_chunk)
+
+    class FakeWebSocket:
+        def __init__(self) -> None:
+            self.sent: list[str] = []
+
+        async def send_text(self, data: str) -> None:
+            self.sent.append(data)
+
+    def append(*messages: WireMessage) -> None:
+        with wire_file.open("a", encoding="utf-8") as f:
+            for msg in messages:
+                envelope = WireMessageEnvelope.from_wire_message(msg)
+                record = {"timestamp": time.time(), "message": envelope.model_dump(mode="json")}
+                f.write(json.dumps(record) + "\n")
+
+    def replayed(ws: FakeWebSocket) -> list[str]:
+        return [json.loads(frame)["params"]["type"] for frame in ws.sent]
+
+    wire_file = tmp_path / "wire.jsonl"
+    wire_file.write_text('{"type": "metadata", "protocol_version": "1.3"}\n')
+    append(TurnBegin(user_input="hi"), StepBegin(n=1), TextPart(text="hello"))
+
+    first = FakeWebSocket()
+    await sessions.replay_history(first, tmp_path)  # type: ignore[arg-type]
+    assert replayed(first) == ["TurnBegin", "StepBegin", "ContentPart"]
+    size = wire_file.stat().st_size
+    assert read_offsets == [0]
+
+    # A second viewer reuses the converted history.
+    await sessions.replay_history(FakeWebSocket(), tmp_path)  # type: ignore[arg-type]
+    assert read_offsets == [0]
+
+    # A trailing line that is still being written is left out.
+    append(TurnEnd())
+    with wire_file.open("a", encoding="utf-8") as f:
+        f.write('{"timestamp": 1, "message": {"type": "TurnBe')
+    second = FakeWebSocket()
+    await sessions.replay_history(second, tmp_path)  # type: ignore[arg-type]
+    assert replayed(second) == ["TurnBegin", "StepBegin", "ContentPart", "TurnEnd"]
+    assert read_offsets[:2] == [0, size]  # only the tail is converted
+
+    entry = sessions._replay_cache.get(wire_file, wire_file.stat())  # type: ignore[reportPrivateUsage]
+    assert len(entry.frames) == 4
+
+    # The line is completed within the same mtime tick.
+    stat = wire_file.stat()
+    with wire_file.open("a", encoding="utf-8") as f:
+        f.write('gin", "payload": {"user_input": "again"}}}\n')
+    os.utime(wire_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    third = FakeWebSocket()
+    await sessions.replay_history(third, tmp_path)  # type: ignore[arg-type]
+    assert replayed(third) == ["TurnBegin", "StepBegin", "ContentPart", "TurnEnd", "TurnBegin"]
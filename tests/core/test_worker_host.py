@@ -0,0 +1,298 @@
+import asyncio
+import json
+import platform
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from kaos import get_current_kaos, reset_current_kaos, set_current_kaos
+from kaos.path import KaosPath
+
+from kimi_cli.web.runner import host as host_module
+from kimi_cli.web.runner.host import (
+    HOST_WORKER_ARG,
+    FrameWriter,
+    HostedSession,
+    WorkerHost,
+    WorkerHostGroup,
+    read_frame,
+    write_frame,
+)
+from kimi_cli.web.runner.kaos import WorkDirKaos
+
+
+class _BufferTransport(asyncio.WriteTransport):
+    def __init__(self, reader: asyncio.StreamReader) -> None:
+        super().__init__()
+        self._reader = reader
+
+    def write(self, data: bytes | bytearray | memoryview) -> None:
+        self._reader.feed_data(bytes(data))
+
+    def close(self) -> None:
+        self._reader.feed_eof()
+
+    def is_closing(self) -> bool:
+        return False
+
+
+def _buffer_writer(reader: asyncio.StreamReader) -> asyncio.StreamWriter:
+    protocol = asyncio.StreamReaderProtocol(reader)
+    return asyncio.StreamWriter(
+        _BufferTransport(reader), protocol, reader, asyncio.get_running_loop()
+    )
+
+
+class _StubHost:
+    """Stands in for a `+` worker: echoes `data` frames and answers `close` with `exit`."""
+
+    def __init__(self) -> None:
+        self._input = asyncio.StreamReader()
+        self.stdin = _buffer_writer(self._input)
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode: int | None = None
+        self.channels: dict[str, str] = {}
+        self._exited = asyncio.Event()
+        self._task = asyncio.create_task(self._serve())
+
+    async def _serve(self) -> None:
+        while (frame := await read_frame(self._input)) is not None:
+            channel, kind, body = frame
+            if kind == "open":
+                self.channels[channel] = body.decode("ascii")
+            elif kind == "data" and channel in self.channels:
+                self._send(channel, "data", body)
+            elif kind == "close" and channel in self.channels:
+                self.end_channel(channel)
+        for channel in list(self.channels):
+            self.end_channel(channel)
+        self.crash(0)
+
+    def _send(self, channel: str, kind: str, body: bytes) -> None:
+        self.stdout.feed_data(f"{channel} {kind} {len(body)}\n".encode("ascii") + body)
+
+    def end_channel(self, channel: str, returncode: int = 0, stderr: str = "") -> None:
+        del self.channels[channel]
+        body = json.dumps({"returncode": returncode, "stderr": stderr}).encode("utf-8")
+        self._send(channel, "exit", body)
+
+    def crash(self, returncode: int, stderr: bytes = b"") -> None:
+        if self.returncode is not None:
+            return
+        self.returncode = returncode
+        self.stderr.feed_data(stderr)
+        self.stderr.feed_eof()
+        self.stdout.feed_eof()
+        self._exited.set()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def kill(self) -> None:
+        self.crash(-9)
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        assert self.returncode is not None
+        return self.returncode
+
+
+@pytest.fixture
+async def stub_hosts(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[list[_StubHost]]:
+    hosts: list[_StubHost] = []
+
+    async def fake_spawn_worker(session_arg: str) -> Any:
+        assert session_arg == HOST_WORKER_ARG
+        hosts.append(_StubHost())
+        return hosts[-1]
+
+    monkeypatch.setattr(host_module, "spawn_worker", fake_spawn_worker)
+    yield hosts
+    for stub in hosts:
+        stub.kill()
+    await asyncio.sleep(0)
+
+
+async def _wait_for_exit(session: HostedSession) -> int:
+    return await asyncio.wait_for(session.wait(), timeout=5.0)
+
+
+async def test_frames_roundtrip():
+    reader = asyncio.StreamReader()
+    writer = _buffer_writer(reader)
+
+    write_frame(writer, "a", "open", b"session-1")
+    channel = FrameWriter("a", writer)
+    channel.write(b'{"jsonrpc": "2.0"}\n{"jsonrpc": "2.0"}\n')
+    channel.write(b"\x00\xff binary\nframe")
+    channel.close()
+    channel.write(b"dropped after close")
+    write_frame(writer, "a", "close", b"")
+    writer.close()
+
+    frames = []
+    while (frame := await read_frame(reader)) is not None:
+        frames.append(frame)
+    assert frames == [
+        ("a", "open", b"session-1"),
+        ("a", "data", b'{"jsonrpc": "2.0"}\n{"jsonrpc": "2.0"}\n'),
+        ("a", "data", b"\x00\xff binary\nframe"),
+        ("a", "close", b""),
+    ]
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="Uses `pwd`.")
+async def test_work_dir_kaos_keeps_its_own_cwd(tmp_path: Path):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    (first / "sub").mkdir(parents=True)
+    second.mkdir()
+    process_cwd = Path.cwd()
+
+    async def run_in(work_dir: Path) -> tuple[str, str]:
+        token = set_current_kaos(WorkDirKaos(KaosPath.unsafe_from_local_path(work_dir)))
+        try:
+            kaos = get_current_kaos()
+            await kaos.writetext("note.txt", work_dir.name)
+            await asyncio.sleep(0)
+            process = await kaos.exec("pwd")
+            output = (await process.stdout.read()).decode().strip()
+            await process.wait()
+            return str(KaosPath.cwd()), output
+        finally:
+            reset_current_kaos(token)
+
+    results = await asyncio.gather(run_in(first), run_in(second))
+    assert results == [(str(first), str(first)), (str(second), str(second))]
+    assert (first / "note.txt").read_text() == "first"
+    assert (second / "note.txt").read_text() == "second"
+    assert Path.cwd() == process_cwd
+
+    kaos = WorkDirKaos(KaosPath.unsafe_from_local_path(first))
+    await kaos.chdir("sub")
+    assert kaos.getcwd() == KaosPath.unsafe_from_local_path(first / "sub")
+    with pytest.raises(NotADirectoryError):
+        await kaos.chdir("missing")
+
+
+async def test_worker_host_channel_lifecycle(stub_hosts: list[_StubHost]):
+    emptied: list[WorkerHost] = []
+    host = await WorkerHost.spawn(on_empty=emptied.append)
+    stub = stub_hosts[0]
+    session_id = uuid4()
+
+    session = host.open(session_id)
+    assert host.session_count == 1
+    session.stdin.write(b'{"jsonrpc": "2.0"}\n')
+    await session.stdin.drain()
+    assert await asyncio.wait_for(session.stdout.readline(), 5.0) == b'{"jsonrpc": "2.0"}\n'
+    assert list(stub.channels.values()) == [str(session_id)]
+
+    session.terminate()
+    assert await _wait_for_exit(session) == 0
+    assert await session.stdout.read() == b""
+    assert session.stdin.is_closing()
+    assert host.session_count == 0
+    assert emptied == [host]
+    assert host.is_alive
+
+    # The same session can be reopened on a new channel once its run has exited.
+    reopened = host.open(session_id)
+    reopened.stdin.write(b"again\n")
+    assert await asyncio.wait_for(reopened.stdout.readline(), 5.0) == b"again\n"
+    assert stub.channels == {reopened._channel: str(session_id)}  # pyright: ignore[reportPrivateUsage]
+    assert session.returncode == 0
+
+    await host.close()
+    assert await _wait_for_exit(reopened) == 0
+    assert stub.returncode == 0
+    assert not host.is_alive
+
+
+async def test_worker_host_routes_exit_frames(stub_hosts: list[_StubHost]):
+    host = await WorkerHost.spawn()
+    stub = stub_hosts[0]
+    first, second = host.open(uuid4()), host.open(uuid4())
+    await asyncio.sleep(0.01)
+    channel = first._channel  # pyright: ignore[reportPrivateUsage]
+
+    stub.end_channel(channel, 1, "RuntimeError: boom")
+    assert await _wait_for_exit(first) == 1
+    assert await first.stderr.read() == b"RuntimeError: boom"
+    assert second.returncode is None
+    assert host.session_count == 1
+
+    # Frames for a channel that has exited are dropped.
+    stub._send(channel, "data", b"late\n")  # pyright: ignore[reportPrivateUsage]
+    second.stdin.write(b"still here\n")
+    assert await asyncio.wait_for(second.stdout.readline(), 5.0) == b"still here\n"
+    await host.close()
+
+
+async def test_worker_host_crash_ends_all_sessions(stub_hosts: list[_StubHost]):
+    emptied: list[WorkerHost] = []
+    host = await WorkerHost.spawn(on_empty=emptied.append)
+    sessions = [host.open(uuid4()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    stub_hosts[0].crash(1, b"Segmentation fault")
+    for session in sessions:
+        assert await _wait_for_exit(session) == 1
+        assert await session.stderr.read() == b"Segmentation fault"
+        assert await session.stdout.read() == b""
+    assert not host.is_alive
+    assert host.session_count == 0
+    # A dead host is not offered for reuse.
+    assert emptied == []
+    await host.close()
+
+
+async def test_hosted_session_kill_does_not_wait_for_host(stub_hosts: list[_StubHost]):
+    host = await WorkerHost.spawn()
+    session = host.open(uuid4())
+    await asyncio.sleep(0.01)
+    # A host that never answers `close`.
+    stub_hosts[0].end_channel = lambda *args, **kwargs: None
+
+    session.kill()
+    assert await _wait_for_exit(session) == -9
+    assert host.session_count == 0
+    await host.close()
+
+
+async def test_worker_host_group_places_sessions(stub_hosts: list[_StubHost]):
+    group = WorkerHostGroup(2)
+    sessions = [await group.open(uuid4()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert group.host_count == 2
+    assert [len(stub.channels) for stub in stub_hosts] == [2, 1]
+
+    # An emptied host is stopped while another host is left.
+    sessions[2].terminate()
+    assert await _wait_for_exit(sessions[2]) == 0
+    await asyncio.wait_for(stub_hosts[1].wait(), 5.0)
+    assert group.host_count == 1
+
+    # The last host is kept around for the next session, even when empty.
+    for session in sessions[:2]:
+        session.terminate()
+        await _wait_for_exit(session)
+    assert group.host_count == 1
+    assert stub_hosts[0].returncode is None
+    reopened = await group.open(uuid4())
+    await asyncio.sleep(0.01)
+    assert len(stub_hosts) == 2
+    assert len(stub_hosts[0].channels) == 1
+
+    # Sessions of a crashed host end, and the next session gets a new host.
+    stub_hosts[0].crash(1)
+    assert await _wait_for_exit(reopened) == 1
+    await group.open(uuid4())
+    assert len(stub_hosts) == 3
+    assert group.host_count == 1
+
+    await group.close()
+    assert group.host_count == 0
+    assert all(stub.returncode is not None for stub in stub_hosts)
@@ -0,0 +1,165 @@
+import asyncio
+from typing import Any, cast
+
+import pytest
+
+from kimi_cli.web.runner import pool as pool_module
+from kimi_cli.web.runner.pool import MAX_WORKER_POOL_SIZE, POOLED_WORKER_ARG, WorkerPool
+
+
+class _FakeStdin:
+    def __init__(self, process: "_FakeProcess") -> None:
+        self._process = process
+
+    def close(self) -> None:
+        # Pooled workers exit once their stdin is closed.
+        self._process.exit(0)
+
+
+class _FakeProcess:
+    def __init__(self) -> None:
+        self.returncode: int | None = None
+        self.stdin = _FakeStdin(self)
+        self._exited = asyncio.Event()
+
+    def exit(self, returncode: int) -> None:
+        if self.returncode is None:
+            self.returncode = returncode
+            self._exited.set()
+
+    def kill(self) -> None:
+        self.exit(-9)
+
+    async def wait(self) -> int:
+        await self._exited.wait()
+        assert self.returncode is not None
+        return self.returncode
+
+
+@pytest.fixture
+def spawned(monkeypatch: pytest.MonkeyPatch) -> list[_FakeProcess]:
+    processes: list[_FakeProcess] = []
+
+    async def fake_spawn_worker(session_arg: str) -> Any:
+        assert session_arg == POOLED_WORKER_ARG
+        process = _FakeProcess()
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(pool_module, "spawn_worker", fake_spawn_worker)
+    return processes
+
+
+async def _settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def test_worker_pool_fills_and_refills_after_acquire(spawned: list[_FakeProcess]):
+    pool = WorkerPool(2)
+    pool.start()
+    await _settle()
+    assert pool.idle_count == 2
+    assert len(spawned) == 2
+
+    process = await pool.acquire()
+    assert process is cast(Any, spawned[0])
+    await _settle()
+    assert pool.idle_count == 2
+    assert len(spawned) == 3
+
+    await pool.close()
+    assert pool.idle_count == 0
+    # The acquired worker belongs to its session now and is left running.
+    assert [p.returncode for p in spawned] == [None, 0, 0]
+
+
+async def test_worker_pool_skips_exited_workers(spawned: list[_FakeProcess]):
+    pool = WorkerPool(2)
+    pool.start()
+    await _settle()
+    spawned[0].exit(1)
+
+    assert await pool.acquire() is cast(Any, spawned[1])
+    await pool.close()
+
+
+async def test_worker_pool_size_is_capped(spawned: list[_FakeProcess]):
+    pool = WorkerPool(MAX_WORKER_POOL_SIZE + 5)
+    assert pool.size == MAX_WORKER_POOL_SIZE
+    pool.start()
+    await _settle()
+    assert pool.idle_count == MAX_WORKER_POOL_SIZE
+    await pool.close()
+    assert len(spawned) == MAX_WORKER_POOL_SIZE
+    assert all(p.returncode == 0 for p in spawned)
+
+
+async def test_empty_worker_pool_falls_back(spawned: list[_FakeProcess]):
+    pool = WorkerPool(0)
+    pool.start()
+    await _settle()
+    assert await pool.acquire() is None
+    await _settle()
+    assert spawned == []
+    await pool.close()
+
+
+async def test_worker_pool_acquire_before_ready(spawned: list[_FakeProcess]):
+    pool = WorkerPool(1)
+    # Nothing is started yet, so the caller spawns its own worker.
+    assert await pool.acquire() is None
+    await _settle()
+    assert pool.idle_count == 1
+    await pool.close()
+
+
+async def test_worker_pool_stops_refilling_after_close(spawned: list[_FakeProcess]):
+    pool = WorkerPool(1)
+    pool.start()
+    await _settle()
+    await pool.close()
+    assert await pool.acquire() is None
+    await _settle()
+    assert len(spawned) == 1
+
+
+async def test_worker_pool_reaps_idle_workers(
+    spawned: list[_FakeProcess], monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(pool_module, "_REAP_INTERVAL", 0.01)
+    pool = WorkerPool(2, idle_timeout=0.05)
+    pool.start()
+    await _settle()
+    assert pool.idle_count == 2
+
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if all(p.returncode is not None for p in spawned):
+            break
+    assert pool.idle_count == 0
+    assert [p.returncode for p in spawned] == [0, 0]
+
+    # Reaped workers are only replaced on the next `acquire`.
+    assert await pool.acquire() is None
+    await _settle()
+    assert pool.idle_count == 2
+    await pool.close()
+
+
+async def test_worker_pool_kills_workers_that_do_not_exit(
+    spawned: list[_FakeProcess], monkeypatch: pytest.MonkeyPatch
+):
+    pool = WorkerPool(1)
+    pool.start()
+    await _settle()
+    monkeypatch.setattr(_FakeStdin, "close", lambda self: None)
+
+    real_wait_for = asyncio.wait_for
+
+    async def short_wait_for(fut: Any, timeout: float | None) -> Any:
+        return await real_wait_for(fut, timeout=0.01)
+
+    monkeypatch.setattr(pool_module.asyncio, "wait_for", short_wait_for)
+    await pool.close()
+    assert spawned[0].returncode == -9
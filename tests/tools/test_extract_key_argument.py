@@ -20,6 +20,12 @@ class TestExtractKeyArgument:
         assert result is not None
         assert "foo/bar.py" in result
 
+    def test_readfiles(self):
+        result = extract_key_argument(
+            '{"files": [{"path": "foo/a.py"}, {"path": "b.py", "line_offset": 3}]}', "ReadFiles"
+        )
+        assert result == "foo/a.py, b.py"
+
     def test_grep(self):
         result = extract_key_argument('{"pattern": "hello"}', "Grep")
         assert result == "hello"
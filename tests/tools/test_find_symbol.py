@@ -0,0 +1,267 @@
+"""Tests for the FindSymbol tool and its symbol index."""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from inline_snapshot import snapshot
+from kaos import reset_current_kaos, set_current_kaos
+from kaos.path import KaosPath
+
+from kimi_cli.tools.file import symbol_index
+from kimi_cli.tools.file.symbol_index import SymbolIndex, parse_symbols
+from kimi_cli.tools.file.symbols import FindSymbol, Params
+from kimi_cli.web.runner.kaos import WorkDirKaos
+
+PYTHON_SOURCE = """\
+import os
+
+LIMIT = 10
+
+
+class Parser:
+    cache: dict[str, str] = {}
+
+    def parse(self, text):
+        def helper():
+            return text
+
+        return helper()
+
+
+def main():
+    return Parser().parse("x")
+"""
+
+TYPESCRIPT_SOURCE = """\
+// class Commented {
+export class Renderer extends Base {
+  private readonly cache = new Map<string, string>();
+
+  constructor(private src: string) {
+    super();
+    if (src) { this.cache.set("}", src); }
+  }
+
+  async render(text: string): Promise<string> {
+    const inner = () => { return text; };
+    return inner();
+  }
+
+  abstract reset(): void;
+}
+
+export function parse(input: string) {
+  return new Renderer(input).render(`${input}{`);
+}
+
+export const format = (x: number): string => String(x);
+
+export interface Shape {
+  area(): number;
+}
+"""
+
+
+def _outline(path: str, text: str) -> list[str]:
+    symbols = parse_symbols(path, text)
+    assert symbols is not None
+    return [f"{s.line}-{s.end_line} {s.kind} {s.qualified_name}" for s in symbols]
+
+
+def test_python_symbols():
+    assert _outline("a.py", PYTHON_SOURCE) == snapshot(
+        [
+            "3-3 variable LIMIT",
+            "6-13 class Parser",
+            "7-7 variable Parser.cache",
+            "9-13 method Parser.parse",
+            "10-11 function Parser.parse.helper",
+            "16-17 function main",
+        ]
+    )
+    # Files with syntax errors still have their definitions found.
+    assert _outline("a.py", "def ok():\n    pass\n\nclass Broken(:\n") == snapshot(
+        ["1-1 function ok", "4-4 class Broken"]
+    )
+    assert parse_symbols("a.txt", "def ok(): pass") is None
+
+
+def test_typescript_symbols():
+    assert _outline("a.ts", TYPESCRIPT_SOURCE) == snapshot(
+        [
+            "2-16 class Renderer",
+            "5-8 method Renderer.constructor",
+            "10-13 method Renderer.render",
+            "11-11 function Renderer.render.inner",
+            "18-20 function parse",
+            "22-22 function format",
+            "24-26 interface Shape",
+        ]
+    )
+
+
+def test_other_language_symbols():
+    go = """\
+type Server struct {
+	addr string
+}
+
+func (s *Server) Start() error {
+	c := '{'
+	return nil
+}
+"""
+    assert _outline("a.go", go) == snapshot(["1-3 struct Server", "5-8 method Server.Start"])
+
+    rust = """\
+pub struct Point { x: i32 }
+impl<'a> fmt::Display for Point {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        write!(f, "}")
+    }
+}
+mod inner {
+    pub fn helper() {}
+}
+"""
+    assert _outline("a.rs", rust) == snapshot(
+        [
+            "1-1 struct Point",
+            "3-5 method Point.fmt",
+            "7-9 module inner",
+            "8-8 function inner.helper",
+        ]
+    )
+
+    java = """\
+public class Account {
+    public Account(String id) {
+        this.id = id;
+    }
+    public <T> List<T> find(String q) throws IOException {
+        return lookup(q);
+    }
+    abstract void todo();
+}
+"""
+    assert _outline("A.java", java) == snapshot(
+        ["1-9 class Account", "2-4 constructor Account.Account", "5-7 method Account.find"]
+    )
+
+    cpp = """\
+namespace app {
+class Widget : public Base {
+ public:
+  void draw() const {
+    if (x) { y(); }
+  }
+  int size() const;
+};
+int Widget::size() const {
+  return 1;
+}
+int declared(int);
+}
+"""
+    assert _outline("a.cpp", cpp) == snapshot(
+        [
+            "1-13 namespace app",
+            "2-8 class app.Widget",
+            "4-6 method app.Widget.draw",
+            "9-11 function app.Widget.size",
+        ]
+    )
+
+
+async def test_symbol_index_is_invalidated_by_changes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(symbol_index, "_RACY_NS", 0)
+    source = tmp_path / "a.py"
+    source.write_text("def first():\n    pass\n")
+    path = str(source)
+
+    index = SymbolIndex(tmp_path, tmp_path / "index.sqlite3")
+    assert [s.name for s in (await index.symbols_of([path]))[path]] == ["first"]
+    index.close()
+
+    # Symbols are loaded from the database, and parsed again once the file changed.
+    index = SymbolIndex(tmp_path, tmp_path / "index.sqlite3")
+    assert [s.name for s in (await index.symbols_of([path]))[path]] == ["first"]
+    source.write_text("def first():\n    pass\n\n\ndef second():\n    pass\n")
+    assert [s.name for s in (await index.symbols_of([path]))[path]] == ["first", "second"]
+    assert await index.symbols_of([str(tmp_path / "missing.py"), str(tmp_path)]) == {}
+    index.close()
+
+
+@pytest.fixture
+def project(find_symbol_tool: FindSymbol, tmp_path: Path) -> Generator[Path]:
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "parser.py").write_text(PYTHON_SOURCE)
+    (root / "src" / "render.ts").write_text(TYPESCRIPT_SOURCE)
+    (root / "src" / "notes.txt").write_text("Parser.parse is documented here\n")
+    find_symbol_tool._index = SymbolIndex(root, tmp_path / "index.sqlite3")
+    token = set_current_kaos(WorkDirKaos(KaosPath.unsafe_from_local_path(root)))
+    try:
+        yield root
+    finally:
+        reset_current_kaos(token)
+        find_symbol_tool._index.close()
+
+
+async def test_find_definition(find_symbol_tool: FindSymbol, project: Path):
+    result = await find_symbol_tool(Params(query="definition", name="parse"))
+    assert not result.is_error
+    assert result.output == snapshot(
+        """\
+./src/parser.py:9-13: method Parser.parse: def parse(self, text):
+./src/render.ts:18-20: function parse: export function parse(input: string) {
+"""
+    )
+    assert result.message == snapshot("Found 2 definitions of `parse`.")
+
+    result = await find_symbol_tool(Params(query="definition", name="Parser.parse", path="src"))
+    assert result.output == snapshot(
+        "src/parser.py:9-13: method Parser.parse: def parse(self, text):\n"
+    )
+
+    result = await find_symbol_tool(Params(query="definition", name="missing"))
+    assert not result.is_error
+    assert result.message == snapshot("No definitions of `missing` found.")
+
+    result = await find_symbol_tool(Params(query="definition", name="not a name"))
+    assert result.is_error
+
+
+async def test_find_references(find_symbol_tool: FindSymbol, project: Path):
+    result = await find_symbol_tool(Params(query="references", name="Parser", path="src"))
+    assert not result.is_error
+    assert sorted(str(result.output).splitlines()) == snapshot(
+        [
+            'src/parser.py:17 (in main): return Parser().parse("x")',
+            "src/parser.py:6 (definition of Parser): class Parser:",
+        ]
+    )
+    assert result.message == snapshot("Found 2 references to `Parser`.")
+
+
+async def test_outline(find_symbol_tool: FindSymbol, project: Path):
+    result = await find_symbol_tool(Params(query="outline", path="src/parser.py"))
+    assert not result.is_error
+    assert result.output == snapshot(
+        """\
+3-3 variable LIMIT
+6-13 class Parser
+  7-7 variable cache
+  9-13 method parse
+    10-11 function helper
+16-17 function main
+"""
+    )
+
+    result = await find_symbol_tool(Params(query="outline", path="src/notes.txt"))
+    assert result.is_error
@@ -2,13 +2,17 @@
 
 from __future__ import annotations
 
+import os
 import platform
+import time
 from pathlib import Path
 
 import pytest
 from kaos.path import KaosPath
 
+from kimi_cli.soul.agent import Runtime
 from kimi_cli.tools.file.glob import MAX_MATCHES, Glob, Params
+from kimi_cli.utils.workspace_index import WorkspaceIndex
 
 
 @pytest.fixture
@@ -54,13 +58,29 @@ async def test_glob_multiple_matches(glob_tool: Glob, test_files: KaosPath):
     assert "Found 1 matches" in result.message
 
 
-async def test_glob_recursive_pattern_prohibited(glob_tool: Glob, test_files: KaosPath):
-    """Test that recursive glob pattern starting with **/ is prohibited."""
+async def test_glob_recursive_pattern(glob_tool: Glob, test_files: KaosPath):
+    """Test recursive glob pattern starting with **."""
     result = await glob_tool(Params(pattern="**/*.py", directory=str(test_files)))
 
-    assert result.is_error
-    assert "starts with '**' which is not allowed" in result.message
-    assert "Unsafe pattern" in result.brief
+    assert not result.is_error
+    assert isinstance(result.output, str)
+    assert result.output.replace("\\", "/").split("\n") == [
+        "setup.py",
+        "src/main/app.py",
+        "src/main/config.py",
+        "src/main.py",
+        "src/test/test_app.py",
+        "src/test/test_config.py",
+        "src/utils.py",
+    ]
+
+    result = await glob_tool(Params(pattern="**/main/*.py", directory=str(test_files)))
+    assert not result.is_error
+    assert isinstance(result.output, str)
+    assert result.output.replace("\\", "/").split("\n") == [
+        "src/main/app.py",
+        "src/main/config.py",
+    ]
 
 
 async def test_glob_safe_recursive_pattern(glob_tool: Glob, test_files: KaosPath):
@@ -216,27 +236,6 @@ async def test_glob_max_matches_limit(glob_tool: Glob, temp_work_dir: KaosPath):
     assert f"Only the first {MAX_MATCHES} matches are returned" in result.message
 
 
-async def test_glob_enhanced_double_star_validation(glob_tool: Glob, temp_work_dir: KaosPath):
-    """Test enhanced ** pattern validation with directory listing."""
-    # Create some top-level files and directories for listing
-    await (temp_work_dir / "file1.txt").write_text("content1")
-    await (temp_work_dir / "file2.py").write_text("content2")
-    await (temp_work_dir / "src").mkdir()
-    await (temp_work_dir / "docs").mkdir()
-
-    result = await glob_tool(Params(pattern="**/*.txt", directory=str(temp_work_dir)))
-
-    assert result.is_error
-    assert "starts with '**' which is not allowed" in result.message
-    assert "Use more specific patterns instead" in result.message
-    # Should include directory listing
-    assert isinstance(result.output, str)
-    assert "file1.txt" in result.output
-    assert "file2.py" in result.output
-    assert "src" in result.output
-    assert "docs" in result.output
-
-
 async def test_glob_exactly_max_matches(glob_tool: Glob, temp_work_dir: KaosPath):
     """Test behavior when exactly MAX_MATCHES files are found."""
     # Create exactly MAX_MATCHES files
@@ -276,35 +275,98 @@ async def test_glob_complex_pattern(glob_tool: Glob, test_files: KaosPath):
     # Should not match anything since there are no Python files in docs/main
 
 
-async def test_glob_wildcard_with_double_star_patterns(glob_tool: Glob, test_files: KaosPath):
-    """Test various patterns with ** that are allowed."""
-    # Test pattern with ** in the middle
-    result = await glob_tool(Params(pattern="**/main/*.py", directory=str(test_files)))
-
-    assert result.is_error
-    assert "starts with '**' which is not allowed" in result.message
+async def test_glob_skips_gitignored(glob_tool: Glob, temp_work_dir: KaosPath):
+    """Test that ignored directories are not walked unless named in the pattern."""
+    await (temp_work_dir / ".git").mkdir()
+    await (temp_work_dir / ".gitignore").write_text("node_modules/\n*.log\n")
+    await (temp_work_dir / "node_modules" / "react").mkdir(parents=True)
+    await (temp_work_dir / "node_modules" / "react" / "index.js").write_text("react")
+    await (temp_work_dir / "src").mkdir()
+    await (temp_work_dir / "src" / ".gitignore").write_text("gen/\n")
+    await (temp_work_dir / "src" / "gen").mkdir()
+    await (temp_work_dir / "src" / "gen" / "out.js").write_text("out")
+    await (temp_work_dir / "src" / "app.js").write_text("app")
+    await (temp_work_dir / "src" / "debug.log").write_text("log")
 
-    # Test pattern with ** not at the beginning
-    result = await glob_tool(Params(pattern="src/**/test_*.py", directory=str(test_files)))
+    result = await glob_tool(Params(pattern="**", directory=str(temp_work_dir)))
+    assert not result.is_error
+    assert isinstance(result.output, str)
+    assert result.output.replace("\\", "/").split("\n") == [
+        ".gitignore",
+        "src",
+        "src/.gitignore",
+        "src/app.js",
+    ]
 
+    result = await glob_tool(
+        Params(pattern="node_modules/react/*.js", directory=str(temp_work_dir))
+    )
     assert not result.is_error
     assert isinstance(result.output, str)
-    output = result.output.replace("\\", "/")  # Normalize for Windows paths
-    assert "src/test/test_app.py" in output
-    assert "src/test/test_config.py" in output
+    assert result.output.replace("\\", "/") == "node_modules/react/index.js"
 
 
-async def test_glob_pattern_edge_cases(glob_tool: Glob, test_files: KaosPath):
-    """Test edge cases for pattern validation."""
-    # Test pattern that has ** but not at the start
-    result = await glob_tool(Params(pattern="src/**", directory=str(test_files)))
-    assert not result.is_error
+async def test_glob_stops_at_max_matches(glob_tool: Glob, temp_work_dir: KaosPath):
+    """Test that recursive patterns stop walking once enough is found."""
+    for i in range(3):
+        await (temp_work_dir / f"dir_{i}").mkdir()
+        for j in range(MAX_MATCHES // 2):
+            await (temp_work_dir / f"dir_{i}" / f"file_{j}.txt").write_text("")
 
-    # Test pattern that starts with * but not **
-    result = await glob_tool(Params(pattern="*.py", directory=str(test_files)))
+    result = await glob_tool(Params(pattern="**/*.txt", directory=str(temp_work_dir)))
     assert not result.is_error
+    assert isinstance(result.output, str)
+    output_lines = result.output.replace("\\", "/").split("\n")
+    assert len(output_lines) == MAX_MATCHES
+    assert not any(line.startswith("dir_2/") for line in output_lines)
+    assert f"Found more than {MAX_MATCHES} matches" in result.message
 
-    # Test pattern that starts with **/
-    result = await glob_tool(Params(pattern="**/*.txt", directory=str(test_files)))
-    assert result.is_error
-    assert "starts with '**' which is not allowed" in result.message
+
+async def test_glob_sort_by_mtime(glob_tool: Glob, temp_work_dir: KaosPath):
+    """Test sorting matches by modification time, newest first."""
+    for i, name in enumerate(["b.txt", "c.txt", "a.txt"]):
+        await (temp_work_dir / name).write_text(name)
+        os.utime(str(temp_work_dir / name), (1_000_000 + i, 1_000_000 + i))
+
+    result = await glob_tool(
+        Params(pattern="*.txt", directory=str(temp_work_dir), sort_by_mtime=True)
+    )
+    assert not result.is_error
+    assert result.output == "a.txt\nc.txt\nb.txt"
+
+
+async def test_glob_with_workspace_index(runtime: Runtime, test_files: KaosPath):
+    """Test that matches come out the same when listings are taken from the workspace index."""
+    past = time.time() - 10
+    for directory in ("", "src", "src/main", "src/test", "docs"):
+        path = str(test_files / directory) if directory else str(test_files)
+        os.utime(path, (past, past))
+    for i, name in enumerate(["README.md", "setup.py"]):
+        os.utime(str(test_files / name), (1_000_000 + i, 1_000_000 + i))
+    index = WorkspaceIndex(test_files.unsafe_to_local_path())
+    index.start()
+    try:
+        assert index.wait_ready(10)
+        runtime.workspace_index = index
+        glob_tool = Glob(runtime)
+
+        result = await glob_tool(Params(pattern="**/*.py", directory=str(test_files)))
+        assert not result.is_error
+        assert result.output == (
+            "setup.py\nsrc/main/app.py\nsrc/main/config.py\nsrc/main.py\n"
+            "src/test/test_app.py\nsrc/test/test_config.py\nsrc/utils.py"
+        )
+
+        # Entries are stat-ed for sorting by modification time.
+        result = await glob_tool(
+            Params(pattern="*.*", directory=str(test_files), sort_by_mtime=True)
+        )
+        assert result.output == "setup.py\nREADME.md"
+
+        # Directories changed since they were indexed are listed again.
+        await (test_files / "src" / "new.py").write_text("new")
+        result = await glob_tool(Params(pattern="src/*.py", directory=str(test_files)))
+        assert result.output == "src/main.py\nsrc/new.py\nsrc/utils.py"
+    finally:
+        runtime.workspace_index = None
+        index.close()
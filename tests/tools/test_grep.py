@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
 import tempfile
 from pathlib import Path
+from typing import cast
 
 import pytest
 from inline_snapshot import snapshot
-
-from kimi_cli.tools.file.grep_local import Grep, Params
+from kaos import reset_current_kaos, set_current_kaos
+from kaos.path import KaosPath
+
+from kimi_cli.tools.file.grep_local import (
+    MAX_LINE_CHARS,
+    MAX_MATCHES_PER_FILE,
+    Grep,
+    Params,
+    iter_lines,
+)
 from kimi_cli.tools.utils import DEFAULT_MAX_CHARS
+from kimi_cli.web.runner.kaos import WorkDirKaos
 
 
 @pytest.fixture
@@ -240,10 +251,10 @@ async def test_grep_head_limit(grep_tool: Grep, temp_test_files):
 async def test_grep_output_truncation(grep_tool: Grep):
     """Ensure extremely long output is truncated automatically."""
     with tempfile.TemporaryDirectory() as temp_dir:
-        test_file = Path(temp_dir) / "big.txt"
-        test_file.write_text(
-            "match line with filler content that keeps growing for truncation purposes\n" * 2000
-        )
+        for i in range(100):
+            (Path(temp_dir) / f"big{i}.txt").write_text(
+                "match line with filler content that keeps growing for truncation purposes\n" * 20
+            )
 
         result = await grep_tool(
             Params.model_validate(
@@ -258,7 +269,8 @@ async def test_grep_output_truncation(grep_tool: Grep):
 
         assert not result.is_error
         assert isinstance(result.output, str)
-        assert result.message == snapshot("Output is truncated to fit in the message.")
+        assert result.message.startswith("Found at least ")
+        assert result.message.endswith("Output is truncated to fit in the message.")
         assert len(result.output) < DEFAULT_MAX_CHARS + 100
 
 
@@ -380,3 +392,89 @@ async def test_grep_before_after_context(grep_tool: Grep, temp_test_files):
     assert "constructor()" in result.output
     assert "this.message" in result.output
     assert "}" not in result.output
+
+
+async def test_grep_head_limit_stops_early(grep_tool: Grep):
+    """Test that results beyond `head_limit` are neither read nor returned."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        big = Path(temp_dir) / "big.txt"
+        big.write_text("match\n" * 100_000)
+
+        result = await grep_tool(
+            Params.model_validate(
+                {"pattern": "match", "path": str(big), "output_mode": "content", "head_limit": 3}
+            )
+        )
+        assert not result.is_error
+        assert result.output == snapshot("""\
+match
+match
+match
+... (results truncated to 3 lines)\
+""")
+        assert result.message == snapshot(
+            "Found at least 4 matching lines in 1 file. Results truncated to first 3 lines."
+        )
+
+
+async def test_grep_invalid_pattern_is_error(grep_tool: Grep):
+    """Test that ripgrep errors are reported as tool errors."""
+    result = await grep_tool(Params(pattern="(unclosed", path="."))
+    assert result.is_error
+    assert "regex parse error" in result.message
+
+
+async def test_grep_relative_path_uses_kaos_cwd(grep_tool: Grep, tmp_path: Path):
+    """Test that relative paths are resolved against the KAOS working directory."""
+    (tmp_path / "found.txt").write_text("needle\n")
+
+    token = set_current_kaos(WorkDirKaos(KaosPath.unsafe_from_local_path(tmp_path)))
+    try:
+        result = await grep_tool(Params(pattern="needle", path="."))
+    finally:
+        reset_current_kaos(token)
+    assert not result.is_error
+    assert result.output == snapshot("./found.txt\n")
+
+
+async def test_grep_content_is_capped_per_file(grep_tool: Grep):
+    """Test that content mode samples every file and reports what is not shown."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (Path(temp_dir) / "a.txt").write_text("match\n" * (MAX_MATCHES_PER_FILE + 5))
+        (Path(temp_dir) / "b.txt").write_text("x" * 5000 + " match " + "y" * 5000 + "\n")
+
+        result = await grep_tool(
+            Params.model_validate(
+                {"pattern": "match", "path": temp_dir, "output_mode": "content", "-n": True}
+            )
+        )
+        assert not result.is_error
+        assert isinstance(result.output, str)
+        lines = result.output.splitlines()
+        assert lines[0] == str(Path(temp_dir) / "a.txt") + ":1:match"
+        assert lines[MAX_MATCHES_PER_FILE] == (
+            str(Path(temp_dir) / "a.txt") + ": ... 5 more matching lines not shown"
+        )
+        long_line = lines[MAX_MATCHES_PER_FILE + 1]
+        assert " match " in long_line
+        assert long_line.endswith("...")
+        assert len(long_line) < MAX_LINE_CHARS + len(temp_dir) + 20
+        assert result.message == snapshot(
+            "Found 26 matching lines in 2 files, showing at most 20 per file."
+        )
+
+
+class _ChunkedStream:
+    def __init__(self, chunks: list[bytes]) -> None:
+        self._chunks = chunks
+
+    async def read(self, n: int) -> bytes:
+        return self._chunks.pop(0) if self._chunks else b""
+
+
+async def test_iter_lines_cuts_long_lines():
+    # The second line is longer than the limit within one chunk, the fourth only
+    # across several chunks.
+    stream = _ChunkedStream([b"short\n" + b"x" * 20 + b"\nok\n" + b"y" * 6, b"y" * 6, b"y\nlast"])
+    lines = [line async for line in iter_lines(cast(asyncio.StreamReader, stream), 8)]
+    assert lines == [b"short\n", b"x" * 8 + b"\n", b"ok\n", b"y" * 8 + b"\n", b"last"]
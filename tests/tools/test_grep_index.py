@@ -0,0 +1,319 @@
+"""Tests for the trigram index of the grep tool."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+from kaos import reset_current_kaos, set_current_kaos
+from kaos.path import KaosPath
+
+from kimi_cli.tools.file import grep_index
+from kimi_cli.tools.file.grep_index import (
+    GrepIndex,
+    _file_trigrams,  # pyright: ignore[reportPrivateUsage]
+    _required_literals,  # pyright: ignore[reportPrivateUsage]
+    required_trigrams,
+)
+from kimi_cli.tools.file.grep_local import Grep, Params, _list_files, ensure_rg_path
+from kimi_cli.utils import workspace_index
+from kimi_cli.utils.workspace_index import WorkspaceIndex
+from kimi_cli.web.runner.kaos import WorkDirKaos
+
+
+def _trigrams(*literals: str) -> set[int]:
+    return {
+        int.from_bytes(literal.encode()[i : i + 3], "big")
+        for literal in literals
+        for i in range(len(literal.encode()) - 2)
+    }
+
+
+@pytest.mark.parametrize(
+    ("pattern", "literals"),
+    [
+        ("hello", ["hello"]),
+        (r"def\s+main\(", ["def", "main("]),
+        ("ab?cd", ["a", "cd"]),
+        ("ab+cd", ["ab", "cd"]),
+        ("ab{0,2}cd", ["a", "cd"]),
+        ("ab{2}cd", ["ab", "cd"]),
+        ("foo(bar|baz)qux", ["foo", "qux"]),
+        ("foo[abc]bar", ["foo", "bar"]),
+        (r"\bword\b", ["word"]),
+        (r"a\.b", ["a.b"]),
+        ("foo|bar", None),
+        ("(?x)foo bar", None),
+        ("*foo", None),
+        ("foo)", None),
+        ("foo[", None),
+    ],
+)
+def test_required_literals(pattern: str, literals: list[str] | None):
+    parsed = _required_literals(pattern)
+    assert (parsed[0] if parsed is not None else None) == literals
+
+
+def test_required_trigrams():
+    assert required_trigrams("Hello", ignore_case=False) == _trigrams("hello")
+    assert required_trigrams("ab", ignore_case=False) is None
+    assert required_trigrams("a.b.c", ignore_case=False) is None
+    assert required_trigrams("(?i)héllo", ignore_case=False) == _trigrams("llo")
+    assert required_trigrams("héllo", ignore_case=True) == _trigrams("llo")
+
+
+def test_file_trigrams():
+    assert _file_trigrams(b"The QUICK brown fox") >= _trigrams("quick", "brown")
+    # ripgrep matches `k` to KELVIN SIGN with `--ignore-case`.
+    assert _trigrams("ok!") <= _file_trigrams("o\u212a!".encode())
+
+
+@pytest.fixture(autouse=True)
+def narrow_small_searches(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(grep_index, "MIN_FILES_TO_NARROW", 1)
+
+
+@contextlib.asynccontextmanager
+async def _indexed(root: Path, db_path: Path) -> AsyncIterator[GrepIndex]:
+    workspace = WorkspaceIndex(root)
+    workspace.start()
+    index = GrepIndex(workspace, db_path)
+    index.start()
+    try:
+        # The index is checked again once the directories are watched.
+        for _ in range(1000):
+            if workspace.synced_ns:
+                break
+            await asyncio.sleep(0.01)
+        assert workspace.mode == "watch"
+        assert await asyncio.to_thread(index.wait_ready, 10)
+        yield index
+    finally:
+        index.close()
+        workspace.close()
+
+
+class _Lister:
+    """Lists the files ripgrep searches in `root`, counting how often it does."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.calls = 0
+
+    async def __call__(self) -> list[str] | None:
+        self.calls += 1
+        return await _list_files(
+            await ensure_rg_path(), Params(pattern="", path="."), str(self.root)
+        )
+
+
+async def test_candidates_follow_changes(tmp_path: Path):
+    root = tmp_path / "root"
+    root.mkdir()
+    for i in range(10):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    (root / "3.txt").write_text("needle\n")
+    trigrams = required_trigrams("needle", ignore_case=False)
+    assert trigrams is not None
+    lister = _Lister(root)
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+
+        async def candidates() -> list[str] | None:
+            return await index.candidates(str(root), (".", None, None), lister, trigrams)
+
+        assert await candidates() == ["./3.txt"]
+        # Files that changed are indexed before they are searched.
+        (root / "5.txt").write_text("another needle\n")
+        assert await candidates() == ["./3.txt", "./5.txt"]
+        # The files ripgrep searches are only listed again when files are added or removed.
+        assert lister.calls == 1
+
+        (root / "new.txt").write_text("a new needle\n")
+        (root / "3.txt").unlink()
+        assert await candidates() == ["./5.txt", "./new.txt"]
+        assert lister.calls == 2
+        (root / "5.txt").write_text("nothing\n")
+        assert await candidates() == ["./new.txt"]
+        assert (
+            await index.candidates(str(root), (".", None, None), lister, _trigrams("missing")) == []
+        )
+
+        # ripgrep reports matches in binary files it is given differently.
+        (root / "data.bin").write_bytes(b"\0needle")
+        assert await candidates() is None
+        (root / "data.bin").write_bytes(b"\0")
+        assert await candidates() == ["./new.txt"]
+
+
+async def test_candidates_of_unwatched_files(tmp_path: Path):
+    root = tmp_path / "root"
+    (root / "node_modules").mkdir(parents=True)
+    (root / ".gitignore").write_text("node_modules/\n")
+    (root / "a.txt").write_text("needle\n")
+    (root / "node_modules" / "b.txt").write_text("needle\n")
+    for i in range(5):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    trigrams = required_trigrams("needle", ignore_case=False)
+    assert trigrams is not None
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+
+        async def list_files() -> list[str]:
+            # As ripgrep lists them outside of a git repository, where `.gitignore` files
+            # do not apply.
+            return ["./a.txt", *(f"./{i}.txt" for i in range(5)), "./node_modules/b.txt"]
+
+        # Directories that are not indexed are searched as a whole.
+        assert await index.candidates(str(root), (".", None, None), list_files, trigrams) == [
+            "./a.txt",
+            "./node_modules",
+        ]
+        (root / ".git").mkdir()
+        assert await index.candidates(str(root), (".", None, None), _Lister(root), trigrams) == [
+            "./a.txt"
+        ]
+
+
+async def test_candidates_of_skipped_directories(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(workspace_index, "MAX_INDEXED_ENTRIES", 3)
+    monkeypatch.setattr(grep_index, "MAX_WORKSPACE_ENTRIES", 3)
+    root = tmp_path / "root"
+    (root / "deep").mkdir(parents=True)
+    (root / "needle.txt").write_text("needle\n")
+    for i in range(6):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    (root / "deep" / "x.txt").write_text("needle\n")
+    (root / "deep" / "y.txt").write_text("nothing\n")
+    trigrams = required_trigrams("needle", ignore_case=False)
+    assert trigrams is not None
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+        # The workspace index skipped `deep`, which is searched as a whole.
+        assert index.workspace.listing(root / "deep") is None
+        lister = _Lister(root)
+        assert await index.candidates(str(root), (".", None, None), lister, trigrams) == [
+            "./needle.txt",
+            "./deep",
+        ]
+
+        async def list_deep() -> list[str]:
+            return ["deep/x.txt", "deep/y.txt"]
+
+        # Searches over the skipped directory itself are not narrowed down.
+        assert await index.candidates(str(root), ("deep", None, None), list_deep, trigrams) is None
+
+        # Once it is indexed, its files are narrowed down too.
+        index.workspace.raise_max_entries(100)
+        expected = ["./deep/x.txt", "./needle.txt"]
+        for _ in range(1000):
+            if await index.candidates(str(root), (".", None, None), lister, trigrams) == expected:
+                break
+            await asyncio.sleep(0.01)
+        assert await index.candidates(str(root), (".", None, None), lister, trigrams) == expected
+
+
+async def test_index_is_kept(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(grep_index, "_RACY_NS", 0)
+    root = tmp_path / "root"
+    root.mkdir()
+    for i in range(10):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    (root / "3.txt").write_text("needle\n")
+    trigrams = required_trigrams("needle", ignore_case=False)
+    assert trigrams is not None
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+        ids = {key: entry.id for key, entry in index._files.items()}  # pyright: ignore[reportPrivateUsage]
+    (root / "5.txt").write_text("needle\n")
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+        files = index._files  # pyright: ignore[reportPrivateUsage]
+        # Only the file that changed while the index was closed is indexed again.
+        assert {key for key, entry in files.items() if entry.id != ids[key]} == {"5.txt"}
+        assert await index.candidates(str(root), (".", None, None), _Lister(root), trigrams) == [
+            "./3.txt",
+            "./5.txt",
+        ]
+
+
+async def test_posting_lists_are_compacted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(grep_index, "_MAX_CHUNKS", 2)
+    monkeypatch.setattr(grep_index, "_MIN_DEAD_IDS_TO_COMPACT", 0)
+    root = tmp_path / "root"
+    root.mkdir()
+    for i in range(10):
+        (root / f"{i}.txt").write_text(f"file {i}\n")
+    trigrams = required_trigrams("needle", ignore_case=False)
+    assert trigrams is not None
+
+    async with _indexed(root, tmp_path / "index.sqlite3") as index:
+        lister = _Lister(root)
+        for i in range(5):
+            (root / f"{i}.txt").write_text("needle\n")
+            assert await index.candidates(str(root), (".", None, None), lister, trigrams) == [
+                f"./{j}.txt" for j in range(i + 1)
+            ]
+        assert await asyncio.to_thread(index.wait_ready, 10)
+        assert index._next_chunk <= 2  # pyright: ignore[reportPrivateUsage]
+        assert index._dead_ids <= 1  # pyright: ignore[reportPrivateUsage]
+        assert await index.candidates(str(root), (".", None, None), lister, trigrams) == [
+            f"./{j}.txt" for j in range(5)
+        ]
+
+
+async def test_grep_with_trigram_index(grep_tool: Grep, tmp_path: Path):
+    root = tmp_path / "root"
+    (root / "src" / "[sub]").mkdir(parents=True)
+    for i in range(20):
+        (root / "src" / f"module_{i}.py").write_text(f"value = {i}\n")
+    (root / "src" / "module_7.py").write_text("def find_me():\n    pass\n")
+    (root / "src" / "[sub]" / "a *file.py").write_text("find_me()\n")
+    (root / ".gitignore").write_text("ignored.py\n")
+    (root / "ignored.py").write_text("find_me()\n")
+    (root / ".git").mkdir()
+
+    token = set_current_kaos(WorkDirKaos(KaosPath.unsafe_from_local_path(root)))
+    try:
+        params = Params(pattern=r"find_me\(", path=".", output_mode="files_with_matches")
+        expected = await grep_tool(params)
+
+        async with _indexed(root, tmp_path / "index.sqlite3") as index:
+            grep_tool._index = index  # pyright: ignore[reportPrivateUsage]
+            rg_path = await ensure_rg_path()
+            narrow = grep_tool._narrow_search  # pyright: ignore[reportPrivateUsage]
+            assert await narrow(rg_path, params, str(root)) == [
+                "./src/[sub]/a *file.py",
+                "./src/module_7.py",
+            ]
+
+            result = await grep_tool(params)
+            assert not result.is_error
+            lines = sorted(str(result.output).splitlines())
+            assert lines == sorted(str(expected.output).splitlines())
+            assert lines == ["./src/[sub]/a *file.py", "./src/module_7.py"]
+
+            content = await grep_tool(
+                Params.model_validate(
+                    {
+                        "pattern": "FIND_ME",
+                        "path": "src",
+                        "output_mode": "content",
+                        "-n": True,
+                        "-i": True,
+                    }
+                )
+            )
+            assert "src/module_7.py:1:def find_me():" in str(content.output)
+
+            # Paths are shown when a single file is searched too.
+            count_params = Params(pattern="def find_me", path=".", output_mode="count_matches")
+            assert await narrow(rg_path, count_params, str(root)) == ["./src/module_7.py"]
+            count = await grep_tool(count_params)
+            assert str(count.output).strip() == "./src/module_7.py:1"
+            grep_tool._index = None  # pyright: ignore[reportPrivateUsage]
+    finally:
+        reset_current_kaos(token)
@@ -0,0 +1,87 @@
+"""Tests for the line-offset index of the read_file tool."""
+
+from __future__ import annotations
+
+import pytest
+from kaos.path import KaosPath
+
+from kimi_cli.tools.file import line_index
+from kimi_cli.tools.file.line_index import read_lines_from
+
+
+async def _read(path: KaosPath, line_offset: int, n_lines: int | None = None) -> list[str]:
+    lines: list[str] = []
+    async for line in read_lines_from(path, line_offset, errors="replace"):
+        lines.append(line)
+        if len(lines) == n_lines:
+            break
+    return lines
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 2, 5, 1 << 20])
+async def test_read_lines_from_matches_read_lines(
+    temp_work_dir: KaosPath, monkeypatch: pytest.MonkeyPatch, chunk_bytes: int
+):
+    monkeypatch.setattr(line_index, "CHUNK_BYTES", chunk_bytes)
+    monkeypatch.setattr(line_index, "CHECKPOINT_LINES", 2)
+    file_path = temp_work_dir / "mixed.txt"
+    await file_path.write_bytes(b"one\r\ntwo\rthree\n\nfive \xff\xc3\r\n\r\xc3\xa9 seven")
+    expected = [line async for line in file_path.read_lines(errors="replace")]
+    assert expected == ["one\n", "two\n", "three\n", "\n", "five ��\n", "\n", "é seven"]
+
+    for line_offset in range(1, len(expected) + 2):
+        assert await _read(file_path, line_offset) == expected[line_offset - 1 :]
+    assert await _read(file_path, 3, 2) == expected[2:4]
+
+
+async def test_read_lines_from_seeks_to_checkpoints(
+    temp_work_dir: KaosPath, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(line_index, "CHECKPOINT_LINES", 10)
+    file_path = temp_work_dir / "numbers.txt"
+    await file_path.write_text("".join(f"{i}\n" for i in range(1, 101)))
+
+    def offset_of(line: int) -> int:
+        return sum(len(f"{i}\n") for i in range(1, line))
+
+    assert await _read(file_path, 55, 3) == ["55\n", "56\n", "57\n"]
+    stat = await file_path.stat()
+    index = next(
+        index
+        for key, index in line_index._indexes.items()
+        if key[1:] == (str(file_path), stat.st_size, stat.st_mtime)
+    )
+    assert index.offsets == [offset_of(line) for line in (1, 11, 21, 31, 41, 51)]
+
+    # Reading starts from the recorded line before the window, not the start of the file.
+    offsets: list[int] = []
+    read_bytes = KaosPath.read_bytes
+
+    async def spy(self: KaosPath, n: int | None = None, *, offset: int = 0) -> bytes:
+        offsets.append(offset)
+        return await read_bytes(self, n, offset=offset)
+
+    monkeypatch.setattr(KaosPath, "read_bytes", spy)
+    assert await _read(file_path, 45, 1) == ["45\n"]
+    assert offsets == [index.offsets[4]]
+    assert await _read(file_path, 100) == ["100\n"]
+    assert index.offsets == [offset_of(line) for line in range(1, 102, 10)]
+
+    # Modified files are indexed again.
+    await file_path.write_text("".join(f"line {i}\n" for i in range(1, 101)))
+    assert await _read(file_path, 45, 1) == ["line 45\n"]
+
+
+async def test_read_lines_from_evicts_least_recently_read(
+    temp_work_dir: KaosPath, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(line_index, "MAX_INDEXED_FILES", 2)
+    monkeypatch.setattr(line_index, "_indexes", type(line_index._indexes)())
+    paths = [temp_work_dir / f"{i}.txt" for i in range(3)]
+    for path in paths:
+        await path.write_text("a\nb\n")
+    await _read(paths[0], 1)
+    await _read(paths[1], 1)
+    await _read(paths[0], 2)
+    await _read(paths[2], 1)
+    assert [key[1] for key in line_index._indexes] == [str(paths[0]), str(paths[2])]
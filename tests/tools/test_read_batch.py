@@ -0,0 +1,111 @@
+"""Tests for the read_files tool."""
+
+from __future__ import annotations
+
+import pytest
+from inline_snapshot import snapshot
+from kaos.path import KaosPath
+
+from kimi_cli.tools.file import read_batch
+from kimi_cli.tools.file.read_batch import FileRange, Params, ReadFiles
+
+
+@pytest.fixture
+async def sample_files(temp_work_dir: KaosPath) -> list[KaosPath]:
+    files = [temp_work_dir / "a.txt", temp_work_dir / "b.py", temp_work_dir / "empty.txt"]
+    await files[0].write_text("alpha\nbeta\ngamma\n")
+    await files[1].write_text("".join(f"line {i}\n" for i in range(1, 11)))
+    await files[2].write_text("")
+    return files
+
+
+async def test_read_files(read_files_tool: ReadFiles, sample_files: KaosPath):
+    """Test reading several files, with ranges and a missing file."""
+    result = await read_files_tool(
+        Params(
+            files=[
+                FileRange(path="a.txt"),
+                FileRange(path="missing.txt"),
+                FileRange(path="b.py", line_offset=4, n_lines=3),
+                FileRange(path="b.py", line_offset=9),
+                FileRange(path="empty.txt"),
+            ]
+        )
+    )
+    assert not result.is_error
+    assert result.output == snapshot("""\
+<file path="a.txt" lines="1-3" end_of_file="true">
+     1	alpha
+     2	beta
+     3	gamma
+</file>
+<file path="missing.txt" error="`missing.txt` does not exist." />
+<file path="b.py" lines="4-6">
+     4	line 4
+     5	line 5
+     6	line 6
+</file>
+<file path="b.py" lines="9-10" end_of_file="true">
+     9	line 9
+    10	line 10
+</file>
+<file path="empty.txt" end_of_file="true">
+</file>
+""")
+    assert result.message == snapshot("4 of 5 files read, 8 lines in total. Failed to read 1 file.")
+
+
+async def test_read_files_shared_budget(
+    read_files_tool: ReadFiles, sample_files: KaosPath, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that the files share one budget of lines, taken in their order."""
+    monkeypatch.setattr(read_batch, "MAX_TOTAL_LINES", 5)
+    result = await read_files_tool(
+        Params(files=[FileRange(path="a.txt"), FileRange(path="b.py"), FileRange(path="a.txt")])
+    )
+    assert not result.is_error
+    assert result.output == snapshot("""\
+<file path="a.txt" lines="1-3" end_of_file="true">
+     1	alpha
+     2	beta
+     3	gamma
+</file>
+<file path="b.py" lines="1-2" truncated="Budget of 5 lines or 204800 bytes for all files reached, continue from line 3">
+     1	line 1
+     2	line 2
+</file>
+<file path="a.txt" truncated="Budget of 5 lines or 204800 bytes for all files reached, continue from line 1">
+</file>
+""")
+    assert result.message == snapshot(
+        "3 of 3 files read, 5 lines in total. Budget for all files reached."
+    )
+
+
+async def test_read_files_all_failed(read_files_tool: ReadFiles, temp_work_dir: KaosPath):
+    """Test that the batch fails if no file could be read."""
+    await (temp_work_dir / "dir").mkdir()
+    result = await read_files_tool(
+        Params(files=[FileRange(path="missing.txt"), FileRange(path="dir")])
+    )
+    assert result.is_error
+    assert result.output == snapshot(
+        """\
+<file path="missing.txt" error="`missing.txt` does not exist." />
+<file path="dir" error="`dir` is not a file." />
+"""
+    )
+    assert result.message == snapshot(
+        "0 of 2 files read, 0 lines in total. Failed to read 2 files."
+    )
+
+
+async def test_read_files_long_lines(read_files_tool: ReadFiles, temp_work_dir: KaosPath):
+    """Test that long lines are truncated and marked."""
+    await (temp_work_dir / "long.txt").write_text("short\n" + "x" * 3000 + "\nend")
+    result = await read_files_tool(Params(files=[FileRange(path="long.txt")]))
+    assert not result.is_error
+    assert str(result.output).startswith(
+        '<file path="long.txt" lines="1-3" end_of_file="true" long_lines_truncated="2">\n'
+    )
+    assert str(result.output).endswith("     3\tend\n</file>\n")
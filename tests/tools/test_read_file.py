@@ -383,3 +383,40 @@ async def test_read_with_tilde_path_expansion(read_file_tool: ReadFile, temp_wor
         # Clean up
         if test_file.exists():
             test_file.unlink()
+
+
+async def test_read_large_file_with_line_index(
+    read_file_tool: ReadFile, temp_work_dir: KaosPath, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that large files are read from the lines to read, with the same output."""
+    file_path = temp_work_dir / "large.log"
+    await file_path.write_text("".join(f"Entry {i}\r\n" for i in range(1, 3001)))
+    params = Params(path=str(file_path), line_offset=2500, n_lines=3)
+    expected = await read_file_tool(params)
+
+    monkeypatch.setattr("kimi_cli.tools.file.read.INDEXED_FILE_BYTES", 0)
+    result = await read_file_tool(params)
+    assert not result.is_error
+    assert (
+        result.output
+        == expected.output
+        == snapshot(
+            """\
+  2500	Entry 2500
+  2501	Entry 2501
+  2502	Entry 2502
+"""
+        )
+    )
+    assert result.message == expected.message
+
+    result = await read_file_tool(Params(path=str(file_path), line_offset=2999))
+    assert result.output == snapshot(
+        """\
+  2999	Entry 2999
+  3000	Entry 3000
+"""
+    )
+    assert result.message == snapshot(
+        "2 lines read from file starting from line 2999. End of file reached."
+    )
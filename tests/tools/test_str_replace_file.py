@@ -29,6 +29,7 @@ async def test_replace_single_occurrence(
     assert diff_block.path == str(file_path)
     assert diff_block.old_text == original_content
     assert diff_block.new_text == "Hello universe! This is a test."
+    assert result.extras == {"lines_added": 1, "lines_removed": 1}
     assert await file_path.read_text() == "Hello universe! This is a test."
 
 
@@ -246,3 +247,23 @@ async def test_replace_empty_strings(
     assert not result.is_error
     assert "successfully edited" in result.message
     assert await file_path.read_text() == "Hello !"
+
+
+async def test_replace_in_large_file(
+    str_replace_file_tool: StrReplaceFile, temp_work_dir: KaosPath
+):
+    """Test that only the edited part of a large file is shown."""
+    file_path = temp_work_dir / "generated.py"
+    await file_path.write_text("".join(f"value_{i} = {i}\n" for i in range(50_000)))
+
+    result = await str_replace_file_tool(
+        Params(path=str(file_path), edit=Edit(old="value_30000 = 30000\n", new=""))
+    )
+
+    assert not result.is_error
+    assert result.extras == {"lines_added": 0, "lines_removed": 1}
+    assert len(result.display) == 1
+    diff_block = result.display[0]
+    assert isinstance(diff_block, DiffDisplayBlock)
+    assert diff_block.old_start_line == 29998
+    assert diff_block.old_text.splitlines()[3] == "value_30000 = 30000"
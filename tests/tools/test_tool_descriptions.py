@@ -11,7 +11,9 @@ from kimi_cli.tools.shell import Shell
 from kimi_cli.tools.dmail import SendDMail
 from kimi_cli.tools.file.glob import Glob
 from kimi_cli.tools.file.grep_local import Grep
+from kimi_cli.tools.file.symbols import FindSymbol
 from kimi_cli.tools.file.read import ReadFile
+from kimi_cli.tools.file.read_batch import ReadFiles
 from kimi_cli.tools.file.read_media import ReadMediaFile
 from kimi_cli.tools.file.replace import StrReplaceFile
 from kimi_cli.tools.file.write import WriteFile
@@ -191,6 +193,24 @@ Read text content from a file.
     )
 
 
+def test_read_files_description(read_files_tool: ReadFiles):
+    """Test the description of ReadFiles tool."""
+    assert read_files_tool.base.description == snapshot("""\
+Read text content from multiple files at once.
+
+**Tips:**
+- Make sure you follow the description of each tool parameter.
+- Prefer this tool over several ReadFile calls when you already know which files you need, e.g. reading the files relevant to a task at its start. Up to 20 files can be read at once.
+- The content of each file is given in a `<file path="...">` tag, with a line number before each line like `cat -n` format. The `lines` attribute tells which lines were read.
+- Files that cannot be read are given as `<file path="..." error="..." />`, without failing the other files.
+- All files share a budget of 3000 lines and 204800 bytes, taken in the order of the files. Up to 1000 lines are read from each file.
+- A file that is not read completely because of the budget or the limit of lines has a `truncated` attribute telling the line to continue from. A file read to its end has `end_of_file="true"`.
+- Use `line_offset` and `n_lines` of a file when you only need to read a part of it.
+- Any lines longer than 2000 characters will be truncated, ending with "...", and listed in the `long_lines_truncated` attribute of the file.
+- This tool can only read text files. To read images or videos, use other appropriate tools.
+""")
+
+
 def test_read_media_file_description(read_media_file_tool: ReadMediaFile):
     """Test the description of ReadMediaFile tool."""
     assert read_media_file_tool.base.description == snapshot(
@@ -227,13 +247,15 @@ Find files and directories using glob patterns. This tool supports standard glob
 
 **Example patterns:**
 - `*.py` - All Python files in current directory
+- `**/*.py` - All Python files, except ignored ones
 - `src/**/*.js` - All JavaScript files in src directory recursively
 - `test_*.py` - Python test files starting with "test_"
 - `*.config.{js,ts}` - Config files with .js or .ts extension
 
-**Bad example patterns:**
-- `**`, `**/*.py` - Any pattern starting with '**' will be rejected. Because it would recursively search all directories and subdirectories, which is very likely to yield large result that exceeds your context size. Always use more specific patterns like `src/**/*.py` instead.
-- `node_modules/**/*.js` - Although this does not start with '**', it would still highly possible to yield large result because `node_modules` is well-known to contain too many directories and files. Avoid recursively searching in such directories, other examples include `venv`, `.venv`, `__pycache__`, `target`. If you really need to search in a dependency, use more specific patterns like `node_modules/react/src/*` instead.
+**Ignored files:**
+- Files and directories ignored by `.gitignore` files, and `.git` directories, are skipped when matched by a wildcard, so `**/*.py` does not look into e.g. `node_modules` or `.venv`.
+- Directories named literally in the pattern are always searched. To look into a dependency, name it, e.g. `node_modules/react/src/*`.
+- At most 1000 matches are returned. Use a more specific pattern if there are more.
 """
     )
 
@@ -247,6 +269,28 @@ A powerful search tool based-on ripgrep.
 **Tips:**
 - ALWAYS use Grep tool instead of running `grep` or `rg` command with Shell tool.
 - Use the ripgrep pattern syntax, not grep syntax. E.g. you need to escape braces like `\\\\{` to search for `{`.
+- In `content` mode, at most 20 matches are shown per file and long lines are cut to 500 characters around the match. The number of matching lines of each file and in total is still reported. Narrow down the search with `path`, `glob` or `type` to see more of one file.
+"""
+    )
+
+
+def test_find_symbol_description(find_symbol_tool: FindSymbol):
+    """Test the description of FindSymbol tool."""
+    assert find_symbol_tool.base.description == snapshot(
+        """\
+Find where classes, functions and other symbols are defined and used in source code, in one call.
+
+**When to use:**
+- Find the definition of a class, function or method by name (`definition`), with its line range, instead of searching with Grep and then reading files.
+- Find where a symbol is used (`references`), with the function or class each use is in.
+- Get an overview of a file (`outline`): its classes, functions and methods with their line ranges, to read only the part you need with ReadFile.
+
+**Tips:**
+- Supported languages: Python, JavaScript, TypeScript, Go, Rust, Java, C#, C and C++. Use Grep for other files.
+- Names are matched exactly and case-sensitively. Qualify a name with its class to tell methods apart, e.g. `Parser.parse`.
+- References are found by name, so uses of other symbols with the same name are included.
+- Files ignored by `.gitignore` are skipped. Narrow down large repositories with `path`.
+- At most 100 definitions or references are returned.
 """
     )
 
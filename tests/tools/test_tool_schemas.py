@@ -9,7 +9,9 @@ from kimi_cli.tools.shell import Shell
 from kimi_cli.tools.dmail import SendDMail
 from kimi_cli.tools.file.glob import Glob
 from kimi_cli.tools.file.grep_local import Grep
+from kimi_cli.tools.file.symbols import FindSymbol
 from kimi_cli.tools.file.read import ReadFile
+from kimi_cli.tools.file.read_batch import ReadFiles
 from kimi_cli.tools.file.read_media import ReadMediaFile
 from kimi_cli.tools.file.replace import StrReplaceFile
 from kimi_cli.tools.file.write import WriteFile
@@ -181,6 +183,48 @@ def test_read_file_params_schema(read_file_tool: ReadFile):
     )
 
 
+def test_read_files_params_schema(read_files_tool: ReadFiles):
+    """Test the schema of ReadFiles tool parameters."""
+    assert read_files_tool.base.parameters == snapshot(
+        {
+            "properties": {
+                "files": {
+                    "description": "The files to read, at most 20.",
+                    "items": {
+                        "properties": {
+                            "path": {
+                                "description": "The path to the file to read. Absolute paths are required when reading files outside the working directory.",
+                                "type": "string",
+                            },
+                            "line_offset": {
+                                "default": 1,
+                                "description": "The line number to start reading the file from.",
+                                "minimum": 1,
+                                "type": "integer",
+                            },
+                            "n_lines": {
+                                "anyOf": [
+                                    {"maximum": 1000, "minimum": 1, "type": "integer"},
+                                    {"type": "null"},
+                                ],
+                                "default": None,
+                                "description": "The number of lines to read from the file. By default read up to 1000 lines, which is the max allowed value.",
+                            },
+                        },
+                        "required": ["path"],
+                        "type": "object",
+                    },
+                    "maxItems": 20,
+                    "minItems": 1,
+                    "type": "array",
+                }
+            },
+            "required": ["files"],
+            "type": "object",
+        }
+    )
+
+
 def test_read_media_file_params_schema(read_media_file_tool: ReadMediaFile):
     """Test the schema of ReadMediaFile tool parameters."""
     assert read_media_file_tool.base.parameters == snapshot(
@@ -216,6 +260,11 @@ def test_glob_params_schema(glob_tool: Glob):
                     "description": "Whether to include directories in results.",
                     "type": "boolean",
                 },
+                "sort_by_mtime": {
+                    "default": False,
+                    "description": "Sort results by modification time, newest first, instead of by path. All matches must then be found before any is returned, so prefer specific patterns with it.",
+                    "type": "boolean",
+                },
             },
             "required": ["pattern"],
             "type": "object",
@@ -294,6 +343,33 @@ def test_grep_params_schema(grep_tool: Grep):
     )
 
 
+def test_find_symbol_params_schema(find_symbol_tool: FindSymbol):
+    """Test the schema of FindSymbol tool parameters."""
+    assert find_symbol_tool.base.parameters == snapshot(
+        {
+            "properties": {
+                "query": {
+                    "description": "`definition`: Where the symbol `name` is defined; `references`: Where `name` is used, with the symbol each use is in; `outline`: The symbols defined in the file `path`.",
+                    "enum": ["definition", "references", "outline"],
+                    "type": "string",
+                },
+                "name": {
+                    "anyOf": [{"type": "string"}, {"type": "null"}],
+                    "default": None,
+                    "description": "Name of the symbol, for `definition` and `references`. May be qualified with the class or type it is defined in, e.g. `Parser.parse`.",
+                },
+                "path": {
+                    "default": ".",
+                    "description": "File or directory to look in. Defaults to current working directory. For `outline`, the file to list the symbols of.",
+                    "type": "string",
+                },
+            },
+            "required": ["query"],
+            "type": "object",
+        }
+    )
+
+
 def test_write_file_params_schema(write_file_tool: WriteFile):
     """Test the schema of WriteFile tool parameters."""
     assert write_file_tool.base.parameters == snapshot(
@@ -9,6 +9,7 @@ from prompt_toolkit.completion import CompleteEvent
 from prompt_toolkit.document import Document
 
 from kimi_cli.ui.shell.prompt import LocalFileMentionCompleter
+from kimi_cli.utils.workspace_index import WorkspaceIndex
 
 
 def _completion_texts(completer: LocalFileMentionCompleter, text: str) -> list[str]:
@@ -117,3 +118,24 @@ def test_basename_prefix_is_ranked_first(tmp_path: Path):
             "src/kimi_cli/tools/file/patch.py",
         ]
     )
+
+
+def test_indexed_paths_are_matched_before_the_limit(tmp_path: Path):
+    """Find deep paths of large workspaces when completing from the workspace index."""
+    for index in range(10):
+        (tmp_path / f"dir{index}").mkdir()
+        (tmp_path / f"dir{index}" / f"file{index}.txt").write_text("x")
+    (tmp_path / "zz" / "deep").mkdir(parents=True)
+    (tmp_path / "zz" / "deep" / "target.py").write_text("x")
+
+    workspace_index = WorkspaceIndex(tmp_path)
+    workspace_index.start()
+    try:
+        assert workspace_index.wait_ready(10)
+        completer = LocalFileMentionCompleter(tmp_path, limit=5, index=workspace_index)
+
+        texts = _completion_texts(completer, "@target")
+
+        assert texts == ["zz/deep/target.py"]
+    finally:
+        workspace_index.close()
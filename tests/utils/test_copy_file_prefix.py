@@ -0,0 +1,45 @@
+"""Tests for copy_file_prefix and link_or_copy utilities."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from kimi_cli.utils.io import copy_file_prefix, link_or_copy
+
+
+class TestCopyFilePrefix:
+    def test_copies_whole_file(self, tmp_path: Path):
+        src = tmp_path / "src.bin"
+        src.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+        dst = tmp_path / "dst.bin"
+        copy_file_prefix(src, dst)
+        assert dst.read_bytes() == src.read_bytes()
+
+    def test_copies_prefix(self, tmp_path: Path):
+        src = tmp_path / "src.bin"
+        data = os.urandom(2 * 1024 * 1024 + 5)
+        src.write_bytes(data)
+        dst = tmp_path / "dst.bin"
+        copy_file_prefix(src, dst, 1024 * 1024 + 3)
+        assert dst.read_bytes() == data[: 1024 * 1024 + 3]
+
+    def test_length_past_end_and_empty(self, tmp_path: Path):
+        src = tmp_path / "src.txt"
+        src.write_bytes(b"abc")
+        dst = tmp_path / "dst.txt"
+        copy_file_prefix(src, dst, 100)
+        assert dst.read_bytes() == b"abc"
+        copy_file_prefix(src, dst, 0)
+        assert dst.read_bytes() == b""
+
+
+def test_link_or_copy(tmp_path: Path):
+    src = tmp_path / "video.mp4"
+    src.write_bytes(b"frames")
+    dst = tmp_path / "uploads" / "video.mp4"
+    dst.parent.mkdir()
+    link_or_copy(src, dst)
+    assert dst.read_bytes() == b"frames"
+    src.unlink()
+    assert dst.read_bytes() == b"frames"
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import pytest
 from inline_snapshot import snapshot
+from kosong.tooling import BriefDisplayBlock
 
-from kimi_cli.utils.diff import build_diff_blocks, format_unified_diff
+from kimi_cli.utils import diff as diff_utils
+from kimi_cli.utils.diff import build_diff_blocks, diff_file, format_unified_diff
 from kimi_cli.wire.types import DiffDisplayBlock
 
 
@@ -298,6 +301,8 @@ Line 14 updated
 Line 15
 Line 16\
 """,
+                old_start_line=11,
+                new_start_line=11,
             ),
         ]
     )
@@ -398,3 +403,58 @@ def test_format_unified_diff_without_header() -> None:
     )
 
     assert diff_text == snapshot("@@ -1,2 +1,2 @@\n alpha\n-beta\n+bravo\n")
+
+
+async def test_diff_file_in_large_file() -> None:
+    old_lines = [f"Line {i}" for i in range(1, 50_001)]
+    new_lines = old_lines[:24_999] + ["Line 25000 updated", "Line 25000.5"] + old_lines[25_000:]
+
+    diff = await diff_file("/tmp/large.txt", "\n".join(old_lines), "\n".join(new_lines))
+
+    assert (diff.lines_added, diff.lines_removed) == (2, 1)
+    assert diff.blocks == build_diff_blocks(
+        "/tmp/large.txt", "\n".join(old_lines), "\n".join(new_lines)
+    )
+    assert diff.blocks == snapshot(
+        [
+            DiffDisplayBlock(
+                path="/tmp/large.txt",
+                old_text="Line 24997\nLine 24998\nLine 24999\nLine 25000\nLine 25001\nLine 25002\nLine 25003",
+                new_text="Line 24997\nLine 24998\nLine 24999\nLine 25000 updated\nLine 25000.5\nLine 25001\nLine 25002\nLine 25003",
+                old_start_line=24997,
+                new_start_line=24997,
+            )
+        ]
+    )
+    assert diff.extras() == {"lines_added": 2, "lines_removed": 1}
+
+
+async def test_diff_file_summary(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(diff_utils, "MAX_DIFF_LINES", 10)
+    monkeypatch.setattr(diff_utils, "N_SUMMARY_LINES", 2)
+    old_text = "\n".join(["head", *(f"old {i}" for i in range(8)), "tail"])
+    new_text = "\n".join(["head", *(f"old {i}" for i in range(0, 8, 2)), "new", "tail"])
+
+    diff = await diff_file("/tmp/summary.txt", old_text, new_text)
+
+    assert (diff.lines_added, diff.lines_removed) == (1, 4)
+    assert diff.blocks == snapshot(
+        [
+            DiffDisplayBlock(
+                path="/tmp/summary.txt",
+                old_text="""\
+old 1
+old 2\
+""",
+                new_text="""\
+old 2
+old 4\
+""",
+                old_start_line=3,
+                new_start_line=3,
+            ),
+            BriefDisplayBlock(
+                text="Diff too large to show, showing the first 2 changed lines from line 3: about +1/-4 lines"
+            ),
+        ]
+    )
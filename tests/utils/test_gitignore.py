@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from kaos.path import KaosPath
+
+from kimi_cli.utils.gitignore import IgnoreRules, load_ignore_rules, parse_gitignore
+
+
+def test_gitignore_rules():
+    rules = IgnoreRules(
+        (("", tuple(parse_gitignore("# comment\nbuild/\n*.pyc\n!keep.pyc\n/dist\ndocs/**/tmp\n"))),)
+    )
+    assert rules.is_ignored("build", is_dir=True)
+    assert not rules.is_ignored("build", is_dir=False)
+    assert rules.is_ignored("a.pyc", is_dir=False)
+    assert not rules.is_ignored("keep.pyc", is_dir=False)
+    assert rules.is_ignored(".git", is_dir=True)
+
+    src = rules.descend("src")
+    assert src.is_ignored("build", is_dir=True)
+    assert src.is_ignored("b.pyc", is_dir=False)
+    # Anchored rules only apply relative to their own directory.
+    assert rules.is_ignored("dist", is_dir=True)
+    assert not src.is_ignored("dist", is_dir=True)
+    assert rules.descend("docs").descend("a").is_ignored("tmp", is_dir=True)
+
+    # Rules of deeper directories take precedence.
+    nested = rules.descend("lib", parse_gitignore("!build/\n"))
+    assert not nested.is_ignored("build", is_dir=True)
+
+
+async def test_load_ignore_rules_from_repository_root(tmp_path: Path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".gitignore").write_text("*.log\n/src/generated/\n")
+    (tmp_path / "src").mkdir()
+
+    rules = await load_ignore_rules(KaosPath.unsafe_from_local_path(tmp_path / "src"))
+    assert rules.is_ignored("debug.log", is_dir=False)
+    assert rules.is_ignored("generated", is_dir=True)
+    assert not rules.is_ignored("main.py", is_dir=False)
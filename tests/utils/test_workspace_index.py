@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from kimi_cli.utils import workspace_index
+from kimi_cli.utils.workspace_index import WorkspaceIndex
+
+
+def _make_tree(root: Path) -> None:
+    (root / ".git").mkdir()
+    (root / ".gitignore").write_text("node_modules/\n*.log\n")
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "pkg" / "mod.py").write_text("")
+    (root / "src" / "main.py").write_text("")
+    (root / "node_modules" / "dep").mkdir(parents=True)
+    (root / "debug.log").write_text("")
+    # Listings of directories modified just before they are scanned are not trusted.
+    past = time.time() - 10
+    for directory in (root, root / "src", root / "src" / "pkg"):
+        os.utime(directory, (past, past))
+
+
+def _wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_workspace_index_lists_files(tmp_path: Path):
+    _make_tree(tmp_path)
+    index = WorkspaceIndex(tmp_path)
+    index.start()
+    try:
+        assert index.wait_ready(10)
+        assert index.paths() == [
+            ".gitignore",
+            "src/",
+            "src/main.py",
+            "src/pkg/",
+            "src/pkg/mod.py",
+        ]
+        listing = index.listing(tmp_path, tmp_path.stat().st_mtime)
+        assert listing is not None
+        ignored = {entry.name for entry in listing if entry.ignored}
+        assert ignored == {".git", "debug.log", "node_modules"}
+        # Ignored directories are not indexed.
+        assert index.listing(tmp_path / "node_modules") is None
+        # Neither are directories outside of the workspace.
+        assert index.listing(tmp_path.parent) is None
+        # Listings are not returned when the directory changed since it was listed.
+        assert index.listing(tmp_path / "src", 0.0) is None
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize("mode", ["watch", "poll"])
+def test_workspace_index_raises_max_entries(
+    tmp_path: Path, mode: str, monkeypatch: pytest.MonkeyPatch
+):
+    if mode == "poll":
+        monkeypatch.setattr(WorkspaceIndex, "_watch", lambda self: False)
+    monkeypatch.setattr(workspace_index, "MAX_INDEXED_ENTRIES", 3)
+    _make_tree(tmp_path)
+    index = WorkspaceIndex(tmp_path, poll_interval=60)
+    index.start()
+    try:
+        assert index.wait_ready(10)
+        # The directories found after the limit are not indexed.
+        assert index.listing(tmp_path / "src") is None
+        assert index.paths() == [".gitignore", "src/"]
+
+        index.raise_max_entries(100)
+        assert _wait_for(lambda: "src/pkg/mod.py" in index.paths())
+        assert index.listing(tmp_path / "node_modules") is None
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize("mode", ["watch", "poll"])
+def test_workspace_index_follows_changes(
+    tmp_path: Path, mode: str, monkeypatch: pytest.MonkeyPatch
+):
+    if mode == "poll":
+        monkeypatch.setattr(WorkspaceIndex, "_watch", lambda self: False)
+    _make_tree(tmp_path)
+    index = WorkspaceIndex(tmp_path, poll_interval=0.1)
+    index.start()
+    try:
+        assert index.wait_ready(10)
+        assert _wait_for(lambda: index.mode == mode)
+
+        (tmp_path / "src" / "new").mkdir()
+        (tmp_path / "src" / "new" / "file.py").write_text("")
+        assert _wait_for(lambda: "src/new/file.py" in index.paths())
+        # New directories are followed too.
+        (tmp_path / "src" / "new" / "other.py").write_text("")
+        assert _wait_for(lambda: "src/new/other.py" in index.paths())
+
+        (tmp_path / "src" / "pkg" / "mod.py").unlink()
+        (tmp_path / "src" / "pkg").rmdir()
+        assert _wait_for(lambda: "src/pkg/" not in index.paths())
+
+        (tmp_path / ".gitignore").write_text("node_modules/\n*.log\nnew/\n")
+        assert _wait_for(lambda: "src/new/" not in index.paths())
+        assert index.paths() == [".gitignore", "src/", "src/main.py"]
+    finally:
+        index.close()
+
+
+def test_workspace_index_reports_changes(tmp_path: Path):
+    _make_tree(tmp_path)
+    index = WorkspaceIndex(tmp_path)
+    reported: list[set[str] | None] = []
+    index.add_listener(reported.append)
+    index.start()
+    try:
+        assert index.wait_ready(10)
+        # Changes made before the directories were watched may have been missed.
+        assert _wait_for(lambda: index.synced_ns > 0)
+        assert reported[0] is None
+
+        written_ns = time.time_ns()
+        (tmp_path / "src" / "main.py").write_text("print()\n")
+        assert _wait_for(lambda: index.synced_ns > written_ns)
+        assert os.path.join("src", "main.py") in set().union(*filter(None, reported))
+    finally:
+        index.close()
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import base64
 import json
-from typing import Any
+import struct
+import subprocess
+import threading
+from typing import IO, Any
 
 from inline_snapshot import snapshot
 
+from kimi_cli.wire import cbor
 from tests_e2e.wire_helpers import (
+    base_command,
     collect_until_response,
+    make_env,
     make_home_dir,
     make_work_dir,
     normalize_response,
@@ -329,3 +336,145 @@ def test_prompt_without_initialize(tmp_path) -> None:
         )
     finally:
         wire.close()
+
+
+def test_delta_coalescing(tmp_path) -> None:
+    script = "\n".join(
+        [
+            'think: "Let me "',
+            "think: think.",
+            "text: Hello",
+            'text: ", "',
+            "text: wire",
+        ]
+    )
+    config_path = write_scripted_config(tmp_path, [script])
+    work_dir = make_work_dir(tmp_path)
+    home_dir = make_home_dir(tmp_path)
+
+    wire = start_wire(
+        config_path=config_path,
+        config_text=None,
+        work_dir=work_dir,
+        home_dir=home_dir,
+        yolo=True,
+    )
+    try:
+        resp = send_initialize(wire, delta_coalescing={"window_ms": 500})
+        result = _as_dict(resp.get("result"))
+        assert result.get("delta_coalescing") == snapshot({"window_ms": 500, "max_bytes": 16384})
+
+        wire.send_json(
+            {
+                "jsonrpc": "2.0",
+                "id": "prompt-1",
+                "method": "prompt",
+                "params": {"user_input": "hi"},
+            }
+        )
+        resp, messages = collect_until_response(wire, "prompt-1")
+        assert resp.get("result", {}).get("status") == "finished"
+        content_parts = [
+            msg["payload"] for msg in summarize_messages(messages) if msg["type"] == "ContentPart"
+        ]
+        assert content_parts == snapshot(
+            [
+                {"type": "think", "think": "Let me think.", "encrypted": None},
+                {"type": "text", "text": "Hello, wire"},
+            ]
+        )
+    finally:
+        wire.close()
+
+
+def _write_frame(stream: IO[bytes], payload: dict[str, Any]) -> None:
+    body = cbor.dumps(payload)
+    stream.write(struct.pack(">I", len(body)) + body)
+    stream.flush()
+
+
+def _read_frame(stream: IO[bytes]) -> dict[str, Any]:
+    header = stream.read(4)
+    assert len(header) == 4, "Wire process closed output stream"
+    (length,) = struct.unpack(">I", header)
+    msg = cbor.loads(stream.read(length))
+    assert isinstance(msg, dict)
+    return msg
+
+
+def test_cbor_framing(tmp_path) -> None:
+    config_path = write_scripted_config(tmp_path, ["text: hello"], capabilities=["image_in"])
+    work_dir = make_work_dir(tmp_path)
+    home_dir = make_home_dir(tmp_path)
+    image_url = "data:image/png;base64," + base64.b64encode(b"\x89PNG\r\n\x1a\n" * 64).decode()
+
+    cmd = [*base_command(), "--wire", "--yolo", "--config-file", str(config_path)]
+    cmd += ["--work-dir", str(work_dir)]
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=make_env(home_dir),
+    )
+    watchdog = threading.Timer(60, process.kill)
+    watchdog.start()
+    assert process.stdin is not None and process.stdout is not None
+    try:
+        init = {"protocol_version": "1.3", "framing": "cbor"}
+        request = {"jsonrpc": "2.0", "id": "init", "method": "initialize", "params": init}
+        process.stdin.write(json.dumps(request).encode() + b"\n")
+        process.stdin.flush()
+        # The handshake itself is still line-delimited JSON.
+        while True:
+            line = process.stdout.readline()
+            assert line, "Wire process closed output stream"
+            if line.startswith(b"{") and json.loads(line).get("id") == "init":
+                assert json.loads(line)["result"]["framing"] == "cbor"
+                break
+
+        user_input = [
+            {"type": "text", "text": "describe"},
+            {"type": "image_url", "image_url": {"url": image_url}},
+        ]
+        _write_frame(
+            process.stdin,
+            {
+                "jsonrpc": "2.0",
+                "id": "prompt-1",
+                "method": "prompt",
+                "params": {"user_input": user_input},
+            },
+        )
+        messages: list[dict[str, Any]] = []
+        while True:
+            msg = _read_frame(process.stdout)
+            if msg.get("id") == "prompt-1":
+                break
+            messages.append(msg)
+        assert msg.get("result", {}).get("status") == "finished"
+
+        payloads = {m["params"]["type"]: m["params"]["payload"] for m in messages}
+        assert payloads["TurnBegin"]["user_input"][1]["image_url"]["url"] == image_url
+        assert payloads["ContentPart"] == {"type": "text", "text": "hello"}
+
+        # Framing errors are reported without dropping the connection.
+        garbage = b"\xff\xff"
+        process.stdin.write(struct.pack(">I", len(garbage)) + garbage)
+        process.stdin.flush()
+        error = _read_frame(process.stdout)
+        assert error.get("error", {}).get("code") == -32700
+
+        # A CBOR `null` is well-formed, just not a request.
+        process.stdin.write(struct.pack(">I", 1) + cbor.dumps(None))
+        process.stdin.flush()
+        error = _read_frame(process.stdout)
+        assert error.get("error", {}).get("code") == -32600
+    finally:
+        watchdog.cancel()
+        process.stdin.close()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        process.stdout.close()
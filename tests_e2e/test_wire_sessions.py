@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import hashlib
 from pathlib import Path
+from typing import Any
 
 from inline_snapshot import snapshot
 
@@ -456,3 +457,68 @@ def test_replay_streams_wire_history(tmp_path) -> None:
         )
     finally:
         wire.close()
+
+
+def test_replay_pages_backwards(tmp_path) -> None:
+    config_path = write_scripted_config(tmp_path, ["text: one", "text: two", "text: three"])
+    work_dir = make_work_dir(tmp_path)
+    home_dir = make_home_dir(tmp_path)
+
+    wire = start_wire(
+        config_path=config_path,
+        config_text=None,
+        work_dir=work_dir,
+        home_dir=home_dir,
+        extra_args=["--session", "replay-pages"],
+        yolo=True,
+    )
+    try:
+        send_initialize(wire)
+        for i, text in enumerate(["first", "second", "third"]):
+            wire.send_json(
+                {
+                    "jsonrpc": "2.0",
+                    "id": f"prompt-{i}",
+                    "method": "prompt",
+                    "params": {"user_input": text},
+                }
+            )
+            resp, _ = collect_until_response(wire, f"prompt-{i}")
+            assert resp.get("result", {}).get("status") == "finished"
+
+        def replay(request_id: str, params: dict[str, object]) -> tuple[Any, list[tuple[Any, Any]]]:
+            wire.send_json(
+                {"jsonrpc": "2.0", "id": request_id, "method": "replay", "params": params}
+            )
+            resp, messages = collect_until_response(wire, request_id)
+            summary = [(msg["type"], msg["payload"]) for msg in summarize_messages(messages)]
+            return resp.get("result"), summary
+
+        page_params = {"direction": "backward", "max_turns": 2, "types": ["TurnBegin"]}
+        result, messages = replay("replay-1", page_params)
+        assert result == snapshot(
+            {"status": "finished", "events": 2, "requests": 0, "next_cursor": "1"}
+        )
+        assert messages == snapshot(
+            [("TurnBegin", {"user_input": "second"}), ("TurnBegin", {"user_input": "third"})]
+        )
+
+        result, messages = replay("replay-2", {**page_params, "cursor": "1"})
+        assert result == snapshot(
+            {"status": "finished", "events": 1, "requests": 0, "next_cursor": None}
+        )
+        assert messages == snapshot([("TurnBegin", {"user_input": "first"})])
+
+        result, messages = replay("replay-3", {"cursor": "2", "types": ["ContentPart"]})
+        assert result == snapshot(
+            {"status": "finished", "events": 1, "requests": 0, "next_cursor": None}
+        )
+        assert messages == snapshot([("ContentPart", {"type": "text", "text": "three"})])
+
+        wire.send_json(
+            {"jsonrpc": "2.0", "id": "replay-4", "method": "replay", "params": {"cursor": "9"}}
+        )
+        resp, _ = collect_until_response(wire, "replay-4")
+        assert resp.get("error", {}).get("code") == -32602
+    finally:
+        wire.close()
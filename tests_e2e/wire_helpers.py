@@ -293,12 +293,15 @@ def send_initialize(
     *,
     external_tools: list[dict[str, Any]] | None = None,
     capabilities: dict[str, Any] | None = None,
+    delta_coalescing: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     params: dict[str, Any] = {"protocol_version": "1.1"}
     if external_tools:
         params["external_tools"] = external_tools
     if capabilities is not None:
         params["capabilities"] = capabilities
+    if delta_coalescing is not None:
+        params["delta_coalescing"] = delta_coalescing
     wire.send_json({"jsonrpc": "2.0", "id": "init", "method": "initialize", "params": params})
     return read_response(wire, "init")
 
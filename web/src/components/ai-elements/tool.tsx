@@ -20,6 +20,7 @@ import {
   ChevronRightIcon,
   FileIcon,
   FilePenIcon,
+  FilesIcon,
   FolderSearchIcon,
   GlobeIcon,
   ImageOffIcon,
@@ -120,6 +121,7 @@ const getPrimaryParam = (input: ToolUIPart["input"]): string | null => {
 /** Map backend tool names to lucide icons */
 const TOOL_ICONS: Record<string, ReactNode> = {
   ReadFile: <FileIcon className="size-3.5" />,
+  ReadFiles: <FilesIcon className="size-3.5" />,
   ReadMediaFile: <ImageIcon className="size-3.5" />,
   WriteFile: <FilePenIcon className="size-3.5" />,
   StrReplaceFile: <FilePenIcon className="size-3.5" />,
@@ -138,6 +140,7 @@ const TOOL_ICONS: Record<string, ReactNode> = {
 /** Map backend tool names to human-readable display names */
 const TOOL_DISPLAY_NAMES: Record<string, string> = {
   ReadFile: "Read",
+  ReadFiles: "Read Files",
   ReadMediaFile: "Read Media",
   WriteFile: "Write",
   StrReplaceFile: "Edit",
@@ -1987,6 +1987,9 @@ export function useSessionStream(
         capabilities: {
           supports_question: true,
         },
+        delta_coalescing: {
+          window_ms: 32,
+        },
       },
     };
     ws.send(JSON.stringify(message));
@@ -2277,6 +2280,9 @@ export function useSessionStream(
           const err = new Error("Too many concurrent sessions");
           setError(err);
           onError?.(err);
+        } else if (event.code === 4008) {
+          // Fell too far behind the live stream; reconnect to catch up from history
+          reconnectRef.current();
         }
 
         // Mark all streaming/subagent messages as complete